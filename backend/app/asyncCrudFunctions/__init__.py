@@ -0,0 +1,2 @@
+### GENERATED by scripts/generate_async_crud.py - do not edit by hand.
+# Async versions of app/crudFunctions for routes that use app.async_database.get_async_db.
@@ -0,0 +1,319 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/conversationFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from .pipelineFunctions import get_general_pipeline_id
+
+
+## CREATE CONVERSATION
+async def create_conversation(db: Session, user_id: int, pipeline_id=None) -> Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                INSERT INTO Conversation (user_id, pipeline_id)
+                VALUES (:user_id, :pipeline_id)
+            """),
+            {
+                'user_id': user_id,
+                'pipeline_id': pipeline_id
+            }
+        )
+        
+        await db.commit()
+        
+        conversation_id = result.lastrowid
+        
+        created_conversation = await db.execute(
+            text("""
+                SELECT * 
+                FROM Conversation 
+                WHERE conversation_id = :conversation_id
+            """),
+            {'conversation_id': conversation_id}
+        )
+        
+        return created_conversation.mappings().first()
+        
+    except Exception as e:
+        await db.rollback()
+        raise e
+  
+
+async def create_general_conversation(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    return await create_conversation(db, user_id, pipeline_id=None)
+
+## READ/QUERY CONVERSATIONS
+async def get_conversation_by_id(db: Session, conversation_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Conversation 
+                WHERE conversation_id = :conversation_id
+            """
+        ),{
+            'conversation_id': conversation_id
+        }
+    )
+
+    return result.mappings().first()
+
+async def get_conversations_by_user(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Conversation 
+                WHERE user_id = :user_id
+            """
+        ),{
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_conversations_by_pipeline(db: Session, pipeline_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Conversation 
+                WHERE pipeline_id = :pipeline_id 
+                ORDER BY 
+                    CASE WHEN last_message_at IS NULL THEN 1 ELSE 0 END,
+                    last_message_at DESC
+            """
+        ),{
+            'pipeline_id': pipeline_id
+        }
+    )
+
+    return result.mappings().all()
+
+
+async def get_conversations_by_pipeline_page(db: Session, pipeline_id: int, limit: int,
+                                       after_last_message_at: Optional[datetime] = None,
+                                       after_conversation_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Most recent first with never-used conversations last, like get_conversations_by_pipeline.
+    # MySQL sorts NULL below every timestamp, so last_message_at DESC already puts them last and
+    # the (pipeline_id, last_message_at, conversation_id) index serves the order directly.
+    # Returns up to limit + 1 rows so the caller can tell whether there is another page.
+    after_clause = ""
+    params = {'pipeline_id': pipeline_id, 'limit': limit + 1}
+    if after_conversation_id is not None:
+        params['after_conversation_id'] = after_conversation_id
+        if after_last_message_at is not None:
+            after_clause = """
+                AND (c.last_message_at < :after_last_message_at
+                     OR (c.last_message_at = :after_last_message_at AND c.conversation_id < :after_conversation_id)
+                     OR c.last_message_at IS NULL)
+            """
+            params['after_last_message_at'] = after_last_message_at
+        else:
+            after_clause = """
+                AND c.last_message_at IS NULL AND c.conversation_id < :after_conversation_id
+            """
+
+    result = await db.execute(
+        text(
+            f"""
+                SELECT
+                    c.*,
+                    (
+                        SELECT m.message_text
+                        FROM Message m
+                        WHERE m.conversation_id = c.conversation_id
+                        ORDER BY m.timestamp ASC, m.message_id ASC
+                        LIMIT 1
+                    ) AS first_message_content
+                FROM Conversation c
+                WHERE c.pipeline_id = :pipeline_id
+                {after_clause}
+                ORDER BY c.last_message_at DESC, c.conversation_id DESC
+                LIMIT :limit
+            """
+        ),
+        params
+    )
+
+    return result.mappings().all()
+
+async def get_general_conversations_for_user(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Conversation 
+                WHERE user_id = :user_id AND pipeline_id IS NULL;
+            """
+        ),{
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_recent_conversations(db: Session, user_id: int, limit=10) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Conversation 
+                WHERE user_id = :user_id 
+                ORDER BY last_message_at DESC
+                LIMIT :limit
+            """
+        ),{
+            'user_id': user_id,
+            'limit': limit
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_recent_conversations_per_pipeline(db: Session, user_id: int, per_pipeline: int = 10) -> List[Dict[str, Any]]:
+    # The most recent conversations of every pipeline (and of pipeline-less chats), each with
+    # its first message, in one query; ordered like get_conversations_by_pipeline
+    result = await db.execute(
+        text(
+            """
+                SELECT ranked.*
+                FROM (
+                    SELECT
+                        c.*,
+                        (
+                            SELECT m.message_text
+                            FROM Message m
+                            WHERE m.conversation_id = c.conversation_id
+                            ORDER BY m.timestamp ASC, m.message_id ASC
+                            LIMIT 1
+                        ) AS first_message_content,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY c.pipeline_id
+                            ORDER BY
+                                CASE WHEN c.last_message_at IS NULL THEN 1 ELSE 0 END,
+                                c.last_message_at DESC,
+                                c.conversation_id DESC
+                        ) AS pipeline_rank
+                    FROM Conversation c
+                    WHERE c.user_id = :user_id
+                ) ranked
+                WHERE ranked.pipeline_rank <= :per_pipeline
+                ORDER BY
+                    ranked.pipeline_id,
+                    ranked.pipeline_rank
+            """
+        ),{
+            'user_id': user_id,
+            'per_pipeline': per_pipeline
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_conversation_count_by_user(db: Session, user_id: int) -> int:
+    result = await db.execute(
+        text(
+            """
+                SELECT COUNT(*) as count 
+                FROM Conversation 
+                WHERE user_id = :user_id 
+            """
+        ),{
+            'user_id': user_id,
+        }
+    )
+
+    return result.mappings().first()['count']
+
+async def get_conversation_count_by_user_pipeline(db: Session, user_id: int, pipeline_id: int) -> int:
+    result = await db.execute(
+        text(
+            """
+                SELECT COUNT(*) as count
+                FROM Conversation 
+                WHERE user_id = :user_id AND pipeline_id = :pipeline_id
+            """
+        ),{
+            'user_id': user_id,
+            'pipeline_id': pipeline_id
+        }
+    )
+
+    return result.mappings().first()['count']
+
+
+## UPDATE CONVERSATIONS
+
+async def update_conversation_timestamp(db: Session, conversation_id: int):
+    try:
+        current_conversation = await get_conversation_by_id(db, conversation_id)
+        if not current_conversation:
+            return False
+
+        result = await db.execute(
+            text(
+                """
+                    UPDATE Conversation
+                    SET last_message_at = NOW()
+                    WHERE conversation_id = :conversation_id
+                """
+            ),
+            {
+                'conversation_id': conversation_id
+            }
+        )
+
+        await db.commit()
+
+        return result.rowcount > 0
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## DELETE CONVERSATIONS
+
+async def delete_conversation(db, conversation_id) -> bool: 
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Conversation WHERE conversation_id = :conversation_id
+                """
+            ),
+            {
+                'conversation_id': conversation_id
+            }
+        )
+        
+        await db.commit()
+
+        return result.rowcount > 0
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def delete_all_conversations_for_user(db, user_id) -> int:
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Conversation WHERE user_id = :user_id
+                """
+            ),
+            {
+                'user_id': user_id
+            }
+        )
+        
+        await db.commit()
+
+        return result.rowcount > 0
+
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
@@ -0,0 +1,677 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/documentFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+import json
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any, Union
+from sqlalchemy.sql import text
+from app.services.active_document_cache import active_document_cache
+from app.services.metadata_cache import metadata_cache, DOCUMENTS, DOCUMENT_METADATA, PIPELINE_DOCUMENT_COUNTS
+
+
+## CREATE A DOCUMENT:
+async def create_document(db: Session, user_id: int, file_name: str, file_type: str) -> Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                INSERT INTO Document (user_id, file_name, file_type)
+                VALUES (:user_id, :file_name, :file_type)
+            """),
+            {
+               'user_id': user_id,
+               'file_name': file_name,
+               'file_type': file_type,
+            })
+        
+        await db.commit()
+        # The Add_Document_To_General_Pipeline trigger also added it to the general pipeline
+        await invalidate_general_pipeline_document_count(db, user_id)
+
+        return await get_document_by_document_id(db, result.lastrowid)
+            
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def create_document_metadata(db: Session, 
+                             document_id: int, 
+                             file_size: int = None,
+                             page_count: int = None,
+                             word_count: int = None,
+                             language: str = None,
+                             encoding: str = None,
+                             firebase_storage_path: str = None,
+                             checksum: str = None,
+                             mime_type: str = None) -> Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                INSERT INTO Document_Metadata (
+                    document_id, 
+                    file_size, 
+                    page_count, 
+                    word_count, 
+                    language, 
+                    encoding, 
+                    firebase_storage_path, 
+                    checksum, 
+                    mime_type
+                )
+                VALUES (
+                    :document_id, 
+                    :file_size,
+                    :page_count,
+                    :word_count,
+                    :language, 
+                    :encoding, 
+                    :firebase_storage_path, 
+                    :checksum, 
+                    :mime_type
+                )
+            """),
+            {
+               'document_id': document_id,
+               'file_size': file_size,
+               'page_count': page_count,
+               'word_count': word_count,
+               'language': language,
+               'encoding': encoding,
+               'firebase_storage_path': firebase_storage_path,
+               'checksum': checksum,
+               'mime_type': mime_type,
+            })
+        
+        await db.commit()
+        active_document_cache.invalidate_all()
+
+        return await get_document_metadata_by_document_id(db, document_id)
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def create_document_chunks_batch(db: Session, document_id: int, chunks: list[dict]) -> Optional[Dict[str, Any]]:
+    try:
+
+        created_chunks = []
+
+        ## we take the chunk text and make index based on the size of the arr
+        for chunk_data in chunks:
+            currentResult = await db.execute(
+                text(
+                    """
+                    INSERT INTO Document_Chunk (document_id, chunk_text, chunk_index)
+                    VALUES (:document_id, :chunk_text, :chunk_index)
+                    """
+                )
+                ,{
+                    'document_id': document_id,
+                    'chunk_text': chunk_data['chunk_text'],
+                    'chunk_index': chunk_data['chunk_index']
+                })
+
+            currentChunkId = currentResult.lastrowid
+
+            chunk_value = await db.execute(
+                text(
+                    """
+                    SELECT * FROM Document_Chunk WHERE chunk_id = :chunk_id
+                    """
+                ),
+                {'chunk_id': currentChunkId}
+            )
+
+            created_chunks.append(chunk_value.mappings().first())
+        
+        await db.commit()
+
+        return created_chunks
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def insert_document_with_stored_procedure(
+    db: Session,
+    user_id: int,
+    file_name: str,
+    file_type: str,
+    pipeline_id: int,
+    file_size: int,
+    page_count: int,
+    word_count: int,
+    language: str,
+    encoding: str,
+    firebase_storage_path: str,
+    checksum: str,
+    mime_type: str,
+    chunks: List[str]
+) -> Optional[int]:
+    try:
+        chunks_json = json.dumps(chunks) # We need to convert this into Json dumps for the SQL 
+        
+        result = await db.execute(
+            text("""
+                CALL Insert_Document(
+                    :user_id,
+                    :file_name,
+                    :file_type,
+                    :pipeline_id,
+                    :file_size,
+                    :page_count,
+                    :word_count,
+                    :language,
+                    :encoding,
+                    :firebase_storage_path,
+                    :checksum,
+                    :mime_type,
+                    :chunks,
+                    @new_document_id
+                )
+            """),
+            {
+                'user_id': user_id,
+                'file_name': file_name,
+                'file_type': file_type,
+                'pipeline_id': pipeline_id,
+                'file_size': file_size,
+                'page_count': page_count,
+                'word_count': word_count,
+                'language': language,
+                'encoding': encoding,
+                'firebase_storage_path': firebase_storage_path,
+                'checksum': checksum,
+                'mime_type': mime_type,
+                'chunks': chunks_json
+            }
+        )
+        
+        document_id_result = await db.execute(text("SELECT @new_document_id AS document_id"))
+        document_id = document_id_result.scalar()
+        
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+        await invalidate_general_pipeline_document_count(db, user_id)
+        
+        return document_id
+        
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def insert_documents_with_stored_procedure(
+    db: Session,
+    user_id: int,
+    pipeline_id: int,
+    documents: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    # Bulk uploads: one CALL per document on the same connection, with the caches invalidated once.
+    # This is not a batched insert: Insert_Document commits its own transaction, so each document
+    # succeeds or fails on its own and the result for each one says which.
+    results = []
+    for document in documents:
+        try:
+            await db.execute(
+                text("""
+                    CALL Insert_Document(
+                        :user_id,
+                        :file_name,
+                        :file_type,
+                        :pipeline_id,
+                        :file_size,
+                        :page_count,
+                        :word_count,
+                        :language,
+                        :encoding,
+                        :firebase_storage_path,
+                        :checksum,
+                        :mime_type,
+                        :chunks,
+                        @new_document_id
+                    )
+                """),
+                {
+                    'user_id': user_id,
+                    'file_name': document['file_name'],
+                    'file_type': document['file_type'],
+                    'pipeline_id': pipeline_id,
+                    'file_size': document['file_size'],
+                    'page_count': document['page_count'],
+                    'word_count': document['word_count'],
+                    'language': document.get('language', 'en'),
+                    'encoding': document.get('encoding', 'utf-8'),
+                    'firebase_storage_path': document['firebase_storage_path'],
+                    'checksum': document['checksum'],
+                    'mime_type': document['mime_type'],
+                    'chunks': json.dumps(document['chunks'])
+                }
+            )
+
+            document_id_result = await db.execute(text("SELECT @new_document_id AS document_id"))
+            document_id = document_id_result.scalar()
+            await db.commit()
+            results.append({'document_id': document_id, 'error': None})
+
+        except Exception as e:
+            await db.rollback()
+            results.append({'document_id': None, 'error': str(e)})
+
+    if any(result['document_id'] is not None for result in results):
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+        await invalidate_general_pipeline_document_count(db, user_id)
+
+    return results
+
+## REPLACE A DOCUMENT'S CONTENT:
+
+async def replace_document_chunks(
+    db: Session,
+    document_id: int,
+    removed_chunk_ids: List[int],
+    moved_chunks: List[Dict[str, int]],
+    added_chunks: List[Dict[str, Any]],
+    file_name: str,
+    file_size: int,
+    page_count: int,
+    word_count: int,
+    checksum: str,
+    mime_type: str
+) -> Dict[str, int]:
+    # A new version of a document, applied in one transaction: chunks that are gone are deleted,
+    # unchanged chunks keep their rows and get their new chunk_index, and only new text is
+    # inserted. moved_chunks: [{'chunk_id', 'chunk_index'}], added_chunks: [{'chunk_text', 'chunk_index'}]
+    try:
+        # Pipeline_Stats follows through the Document_Metadata update and Document_Chunk insert/delete triggers
+        if removed_chunk_ids:
+            placeholders = ', '.join([f':id{i}' for i in range(len(removed_chunk_ids))])
+            params = {f'id{i}': chunk_id for i, chunk_id in enumerate(removed_chunk_ids)}
+            params['document_id'] = document_id
+            await db.execute(
+                text(f"DELETE FROM Document_Chunk WHERE document_id = :document_id AND chunk_id IN ({placeholders})"),
+                params
+            )
+
+        if moved_chunks:
+            # (document_id, chunk_index) is unique, so indexes are first parked at -(index + 1)
+            # and then flipped, otherwise a chunk could move onto one that hasn't moved yet
+            cases = ' '.join([f'WHEN :id{i} THEN :index{i}' for i in range(len(moved_chunks))])
+            placeholders = ', '.join([f':id{i}' for i in range(len(moved_chunks))])
+            params = {'document_id': document_id}
+            for i, chunk in enumerate(moved_chunks):
+                params[f'id{i}'] = chunk['chunk_id']
+                params[f'index{i}'] = -(chunk['chunk_index'] + 1)
+            await db.execute(
+                text(f"""
+                    UPDATE Document_Chunk
+                    SET chunk_index = CASE chunk_id {cases} END
+                    WHERE document_id = :document_id AND chunk_id IN ({placeholders})
+                """),
+                params
+            )
+            await db.execute(
+                text("""
+                    UPDATE Document_Chunk
+                    SET chunk_index = -chunk_index - 1
+                    WHERE document_id = :document_id AND chunk_index < 0
+                """),
+                {'document_id': document_id}
+            )
+
+        if added_chunks:
+            await db.execute(
+                text("""
+                    INSERT INTO Document_Chunk (document_id, chunk_text, chunk_index)
+                    VALUES (:document_id, :chunk_text, :chunk_index)
+                """),
+                [
+                    {'document_id': document_id, 'chunk_text': chunk['chunk_text'], 'chunk_index': chunk['chunk_index']}
+                    for chunk in added_chunks
+                ]
+            )
+
+        await db.execute(
+            text("UPDATE Document SET file_name = :file_name WHERE document_id = :document_id"),
+            {'document_id': document_id, 'file_name': file_name}
+        )
+        await db.execute(
+            text("""
+                UPDATE Document_Metadata
+                SET file_size = :file_size,
+                    page_count = :page_count,
+                    word_count = :word_count,
+                    checksum = :checksum,
+                    mime_type = :mime_type
+                WHERE document_id = :document_id
+            """),
+            {
+                'document_id': document_id,
+                'file_size': file_size,
+                'page_count': page_count,
+                'word_count': word_count,
+                'checksum': checksum,
+                'mime_type': mime_type
+            }
+        )
+
+        await db.commit()
+        active_document_cache.invalidate_all()
+        metadata_cache.invalidate(DOCUMENTS, document_id)
+        metadata_cache.invalidate(DOCUMENT_METADATA, document_id)
+
+        return {
+            'removed': len(removed_chunk_ids),
+            'moved': len(moved_chunks),
+            'added': len(added_chunks)
+        }
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+## READ/QUERY DOCUMENTS:
+
+async def get_document_by_document_id(db: Session, document_id: int) -> Optional[Dict[str, Any]]:
+    document, version = metadata_cache.lookup(DOCUMENTS, document_id)
+    if document is not None:
+        return document
+
+    result = await db.execute(
+        text(
+            """
+            SELECT * FROM Document WHERE document_id = :document_id;
+            """
+        ),
+        {'document_id': document_id}
+    )
+
+    document = result.mappings().first()
+    if document:
+        metadata_cache.put(DOCUMENTS, document_id, dict(document), version)
+    return document
+
+async def get_documents_by_user_id(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(text("""
+        SELECT * FROM Document WHERE user_id = :user_id"""),
+        {'user_id': user_id})
+        
+    return result.mappings().all()
+ 
+async def get_document_metadata_by_document_id(db: Session, document_id: int):
+    document_metadata, version = metadata_cache.lookup(DOCUMENT_METADATA, document_id)
+    if document_metadata is not None:
+        return document_metadata
+
+    result = await db.execute(
+        text(
+            """
+            SELECT * FROM Document_Metadata WHERE document_id = :document_id;
+            """
+        ),
+        {'document_id': document_id}
+    )
+
+    document_metadata = result.mappings().first()
+    if document_metadata:
+        metadata_cache.put(DOCUMENT_METADATA, document_id, dict(document_metadata), version)
+    return document_metadata
+
+async def get_document_file_info(db: Session, document_id: int) -> Dict[str, Any]:
+    result = await db.execute(
+        text("""
+            SELECT file_name, file_type, upload_date FROM Document WHERE document_id = :document_id
+        """),
+        {'document_id': document_id}
+    )
+
+    return result.mappings().first()
+
+async def get_all_metadata_for_user(db: Session,  user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT dm.* 
+                FROM Document_Metadata dm
+                JOIN Document d ON d.document_id = dm.document_id
+                WHERE d.user_id = :user_id
+            """
+        ),
+        {
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_user_document_averages(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT 
+                    d.user_id AS user_id,
+                    u.first_name AS first_name,
+                    u.last_name AS last_name,
+                    AVG(dm.file_size) AS average_file_size, 
+                    AVG(dm.page_count) AS average_page_count,
+                    AVG(dm.word_count) AS average_word_count
+                FROM Document_Metadata dm
+                JOIN Document d ON dm.document_id = d.document_id
+                JOIN User u ON d.user_id = u.user_id
+                WHERE u.user_id = :user_id
+                GROUP BY u.user_id
+            """
+        ),
+        {
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_all_chunks_by_user(db: Session, user_id: int) -> List[str]:
+    result = await db.execute(
+        text(
+            """
+                SELECT *
+                FROM Document_Chunk dc 
+                JOIN Document d ON dc.document_id = d.document_id
+                WHERE d.user_id = :user_id;
+            """
+        ),
+        {
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_chunk_by_id(db: Session, chunk_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * FROM Document_Chunk WHERE chunk_id = :chunk_id
+            """
+        ),
+        {
+            'chunk_id': chunk_id
+        }
+    )
+
+    return result.mappings().first()
+
+async def get_chunks_by_document(db: Session, document_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * FROM 
+                Document_Chunk WHERE document_id = :document_id
+            """
+        ),
+        {
+            'document_id': document_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_chunks_by_document_and_user(db: Session, document_id: int, user_id: int) -> List[str]:
+    result = await db.execute(
+        text(
+            """
+                SELECT dc.chunk_text
+                FROM Document_Chunk dc 
+                JOIN Document d ON dc.document_id = d.document_id
+                WHERE d.user_id = :user_id AND dc.document_id = :document_id;
+            """
+        ),
+        {
+            'document_id': document_id,
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_chunks_from_list(db: Session, listOfChunkIds: List[int]) -> List[Dict[str, Any]]:
+    if not listOfChunkIds:
+        return []
+    
+    # Create placeholders for each ID
+    placeholders = ', '.join([f':id{i}' for i in range(len(listOfChunkIds))])
+    params = {f'id{i}': chunk_id for i, chunk_id in enumerate(listOfChunkIds)}
+    
+    result = await db.execute(
+        text(f"SELECT * FROM Document_Chunk WHERE chunk_id IN ({placeholders})"),
+        params
+    )
+    
+    return result.mappings().all()
+
+def _chunk_scope_filters(user_ids: Optional[List[int]], pipeline_ids: Optional[List[int]]):
+    filters = ""
+    params = {}
+    if user_ids is not None:
+        filters += " AND d.user_id IN ({})".format(', '.join(f':user_id{i}' for i in range(len(user_ids))))
+        params.update({f'user_id{i}': user_id for i, user_id in enumerate(user_ids)})
+    if pipeline_ids is not None:
+        filters += """
+            AND EXISTS (
+                SELECT 1 FROM Pipeline_Documents pd
+                WHERE pd.document_id = dc.document_id AND pd.pipeline_id IN ({})
+            )
+        """.format(', '.join(f':pipeline_id{i}' for i in range(len(pipeline_ids))))
+        params.update({f'pipeline_id{i}': pipeline_id for i, pipeline_id in enumerate(pipeline_ids)})
+    return filters, params
+
+async def get_chunks_page(db: Session, limit: int, after_chunk_id: int = 0, user_ids: Optional[List[int]] = None,
+                    pipeline_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    # Keyset walk over every chunk in chunk_id order, for corpus-wide jobs such as re-embedding
+    if (user_ids is not None and not user_ids) or (pipeline_ids is not None and not pipeline_ids):
+        return []
+
+    filters, params = _chunk_scope_filters(user_ids, pipeline_ids)
+    params.update({'after_chunk_id': after_chunk_id, 'limit': limit})
+
+    result = await db.execute(
+        text(f"""
+            SELECT
+                dc.chunk_id,
+                dc.document_id,
+                dc.chunk_index,
+                dc.chunk_text,
+                d.user_id,
+                dm.firebase_storage_path
+            FROM Document_Chunk dc
+            JOIN Document d ON d.document_id = dc.document_id
+            LEFT JOIN Document_Metadata dm ON dm.document_id = dc.document_id
+            WHERE dc.chunk_id > :after_chunk_id{filters}
+            ORDER BY dc.chunk_id
+            LIMIT :limit
+        """),
+        params
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
+async def count_chunks(db: Session, after_chunk_id: int = 0, user_ids: Optional[List[int]] = None,
+                 pipeline_ids: Optional[List[int]] = None) -> int:
+    if (user_ids is not None and not user_ids) or (pipeline_ids is not None and not pipeline_ids):
+        return 0
+
+    filters, params = _chunk_scope_filters(user_ids, pipeline_ids)
+    params['after_chunk_id'] = after_chunk_id
+
+    result = await db.execute(
+        text(f"""
+            SELECT COUNT(*)
+            FROM Document_Chunk dc
+            JOIN Document d ON d.document_id = dc.document_id
+            WHERE dc.chunk_id > :after_chunk_id{filters}
+        """),
+        params
+    )
+
+    return result.scalar() or 0
+
+async def invalidate_general_pipeline_document_count(db: Session, user_id: int):
+    result = await db.execute(
+        text("""
+            SELECT pipeline_id
+            FROM Pipeline
+            WHERE user_id = :user_id AND pipeline_name = 'general'
+        """),
+        {'user_id': user_id}
+    )
+
+    row = result.mappings().first()
+    if row:
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, row['pipeline_id'])
+
+### DELETE DOCUMENTS:
+
+async def delete_document_by_id(db: Session, document_id: int) -> bool:
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Document WHERE document_id = :document_id
+                """
+            ),
+            {
+                'document_id': document_id
+            }
+        )
+
+        await db.commit()
+        active_document_cache.invalidate_all()
+        metadata_cache.invalidate(DOCUMENTS, document_id)
+        metadata_cache.invalidate(DOCUMENT_METADATA, document_id)
+        # Pipeline_Documents rows go with the document, in whichever pipelines it was in
+        metadata_cache.invalidate_namespace(PIPELINE_DOCUMENT_COUNTS)
+
+        return result.rowcount > 0
+    
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def delete_all_documents_for_user(db: Session, user_id: int) -> int:
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Document WHERE user_id = :user_id
+                """
+            ),
+            {
+                'user_id': user_id
+            }
+        )
+
+        await db.commit()
+        active_document_cache.invalidate_all()
+        for namespace in (DOCUMENTS, DOCUMENT_METADATA, PIPELINE_DOCUMENT_COUNTS):
+            metadata_cache.invalidate_namespace(namespace)
+
+        return result.rowcount
+    
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
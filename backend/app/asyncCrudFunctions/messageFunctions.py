@@ -0,0 +1,231 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/messageFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from ..models import SenderType
+
+## CREATE MESSAGE:
+async def create_message(db: Session, conversation_id: int, sender_type: SenderType, message_text: str) -> Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                INSERT INTO Message (conversation_id, sender_type, message_text)
+                VALUES (:conversation_id, :sender_type, :message_text)
+            """),
+            {
+                'conversation_id': conversation_id,
+                'sender_type': sender_type,
+                'message_text': message_text
+            }
+        )
+        
+        await db.commit()
+        
+        message_id = result.lastrowid
+        
+        created_message = await db.execute(
+            text("""
+                SELECT * 
+                FROM Message 
+                WHERE message_id = :message_id
+            """),
+            {'message_id': message_id}
+        )
+        
+        return created_message.mappings().first()
+        
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def create_user_message(db: Session, conversation_id: int, message_text: str) -> Optional[Dict[str, Any]]:
+    return await create_message(db, conversation_id, SenderType.USER, message_text)
+
+async def create_bot_message(db: Session, conversation_id: int, message_text: str) -> Optional[Dict[str, Any]]:
+    return await create_message(db, conversation_id, SenderType.BOT, message_text)
+
+## READ/QUERY MESSAGES
+
+async def get_all_messages_in_conversation(db: Session, conversation_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * FROM Message WHERE conversation_id = :conversation_id;
+            """
+        ),
+        {
+            'conversation_id': conversation_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_messages_page(db: Session, conversation_id: int, limit: int,
+                      after_timestamp: Optional[datetime] = None,
+                      after_message_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Oldest first, keyset on (timestamp, message_id); returns up to limit + 1 rows so the
+    # caller can tell whether there is another page
+    after_clause = ""
+    params = {'conversation_id': conversation_id, 'limit': limit + 1}
+    if after_message_id is not None:
+        after_clause = """
+            AND (timestamp > :after_timestamp
+                 OR (timestamp = :after_timestamp AND message_id > :after_message_id))
+        """
+        params['after_timestamp'] = after_timestamp
+        params['after_message_id'] = after_message_id
+
+    result = await db.execute(
+        text(
+            f"""
+                SELECT *
+                FROM Message
+                WHERE conversation_id = :conversation_id
+                {after_clause}
+                ORDER BY timestamp ASC, message_id ASC
+                LIMIT :limit
+            """
+        ),
+        params
+    )
+
+    return result.mappings().all()
+
+async def get_all_messages_from_user(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT m.*
+                FROM Message m
+                JOIN Conversation c ON c.conversation_id = m.conversation_id
+                WHERE c.user_id = :user_id;
+            """
+        ),
+        {
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_all_pipeline_messages(db: Session, pipeline_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT m.*
+                FROM Message m
+                JOIN Conversation c ON c.conversation_id = m.conversation_id
+                WHERE c.pipeline_id = :pipeline_id;
+            """
+        ),
+        {
+            'pipeline_id': pipeline_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_message_by_id(db: Session, message_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Message
+                WHERE message_id = :message_id
+            """
+        ),
+        {
+            'message_id': message_id
+        }
+    )
+
+    return result.mappings().first()
+
+async def get_recent_messages(db: Session, conversation_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Message
+                WHERE conversation_id = :conversation_id
+                ORDER BY timestamp DESC, message_id DESC
+                LIMIT :limit;
+            """
+        ),
+        {
+            'conversation_id': conversation_id,
+            'limit': limit
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_last_message_in_conversation(db: Session, conversation_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Message
+                WHERE conversation_id = :conversation_id
+                ORDER BY timestamp DESC
+                LIMIT 1;
+            """
+        ),
+        {
+            'conversation_id': conversation_id
+        }
+    )
+
+    return result.mappings().first()
+
+async def get_first_message_in_conversation(db: Session, conversation_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Message
+                WHERE conversation_id = :conversation_id
+                ORDER BY timestamp ASC
+                LIMIT 1;
+            """
+        ),
+        {
+            'conversation_id': conversation_id
+        }
+    )
+
+    return result.mappings().first()
+
+## DELETE MESSAGE
+
+async def delete_message(db: Session, message_id: int) -> bool:
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Message WHERE message_id = :message_id
+                """
+            ),{
+                'message_id': message_id
+            }
+        )
+
+        await db.commit()
+
+        return result.mappings().first() is not None
+    except Exception as e:
+        raise e
+    
+async def delete_all_messages_in_conversation(db: Session, conversation_id: int) -> int:
+    try:
+        result = await db.execute(
+            text("DELETE FROM Message WHERE conversation_id = :conversation_id"),
+            {'conversation_id': conversation_id}
+        )
+        await db.commit()
+        return result.rowcount
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
@@ -0,0 +1,353 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/pipelineDocumentFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from .documentFunctions import get_document_by_document_id
+from app.services.active_document_cache import active_document_cache
+from app.services.metadata_cache import metadata_cache, PIPELINE_DOCUMENT_COUNTS
+
+## ADD DOCUMENT TO PIPELINE:
+async def add_document_to_pipeline(db: Session, pipeline_id: int, document_id: int, is_active: bool) -> Optional[Dict[str, Any]]:
+    try:
+
+        insert_query = text("""
+            INSERT INTO Pipeline_Documents (pipeline_id, document_id, is_active)
+            VALUES (:pipeline_id, :document_id, :is_active)
+        """)
+
+        await db.execute(insert_query, {
+            'pipeline_id': pipeline_id,
+            'document_id': document_id,
+            'is_active': is_active
+        })
+
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+        
+        select_query = text("""
+            SELECT pipeline_id, document_id, is_active, added_at
+            FROM Pipeline_Documents
+            WHERE pipeline_id = :pipeline_id AND document_id = :document_id
+        """)
+
+        result = await db.execute(select_query, {
+            'pipeline_id': pipeline_id,
+            'document_id': document_id
+        })
+        
+        row = result.fetchone()
+        
+        if row:
+            return {
+                'pipeline_id': row[0],
+                'document_id': row[1],
+                'is_active': row[2],
+                'added_at': row[3]
+            }
+        
+        return None
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def get_count_of_documents_by_pipeline(db: Session, pipeline_id: int) -> int:
+    count, version = metadata_cache.lookup(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+    if count is not None:
+        return count
+
+    result = await db.execute(
+        text("""
+            SELECT total_documents
+            FROM Pipeline_Stats
+            WHERE pipeline_id = :pipeline_id;
+            """
+        ),
+        {'pipeline_id': pipeline_id}
+    )
+
+    row = result.mappings().first()
+    if row is not None:
+        count = row['total_documents']
+    else:
+        # No Pipeline_Stats row yet (see scripts/check_pipeline_stats.py)
+        result = await db.execute(
+            text("""
+                SELECT COUNT(*) as count
+                FROM Pipeline_Documents
+                WHERE pipeline_id = :pipeline_id;
+                """
+            ),
+            {'pipeline_id': pipeline_id}
+        )
+        count = result.mappings().first()['count']
+
+    metadata_cache.put(PIPELINE_DOCUMENT_COUNTS, pipeline_id, count, version)
+    return count
+
+async def add_multiple_documents_to_pipeline(db: Session, pipeline_id: int, document_ids: List[int]) -> List[Dict[str, Any]]:
+    try:
+        listOfDocuments = []
+
+        for document_id in document_ids:
+            added_document = await add_document_to_pipeline(db, pipeline_id, document_id, True)
+            if added_document:
+                listOfDocuments.append(added_document)
+
+        return listOfDocuments
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def get_documents_in_pipeline(db: Session, pipeline_id: int, is_active: bool = None) -> List[Dict[str, Any]]:
+    if is_active is None:
+        result = await db.execute(
+            text("""
+                SELECT 
+                    d.document_id,
+                    d.file_name,
+                    d.file_type,
+                    d.upload_date,
+                    pd.is_active,
+                    pd.added_at
+                FROM Pipeline_Documents pd
+                JOIN Document d ON pd.document_id = d.document_id
+                WHERE pd.pipeline_id = :pipeline_id
+                ORDER BY pd.added_at DESC
+            """),
+            {'pipeline_id': pipeline_id}
+        )
+    else:
+        result = await db.execute(
+            text("""
+                SELECT 
+                    d.document_id,
+                    d.file_name,
+                    d.file_type,
+                    d.upload_date,
+                    pd.is_active,
+                    pd.added_at
+                FROM Pipeline_Documents pd
+                JOIN Document d ON pd.document_id = d.document_id
+                WHERE pd.pipeline_id = :pipeline_id AND pd.is_active = :is_active
+                ORDER BY pd.added_at DESC
+            """),
+            {'pipeline_id': pipeline_id, 'is_active': is_active}
+        )
+
+    return [dict(row) for row in result.mappings().all()]
+
+async def get_documents_in_pipeline_page(db: Session, pipeline_id: int, limit: int, is_active: bool = None,
+                                   after_added_at: Optional[datetime] = None,
+                                   after_document_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Newest first, keyset on (added_at, document_id); returns up to limit + 1 rows so the
+    # caller can tell whether there is another page
+    filters = ""
+    params = {'pipeline_id': pipeline_id, 'limit': limit + 1}
+    if is_active is not None:
+        filters += " AND pd.is_active = :is_active"
+        params['is_active'] = is_active
+    if after_document_id is not None:
+        filters += """
+            AND (pd.added_at < :after_added_at
+                 OR (pd.added_at = :after_added_at AND pd.document_id < :after_document_id))
+        """
+        params['after_added_at'] = after_added_at
+        params['after_document_id'] = after_document_id
+
+    result = await db.execute(
+        text(f"""
+            SELECT 
+                d.document_id,
+                d.file_name,
+                d.file_type,
+                d.upload_date,
+                pd.is_active,
+                pd.added_at,
+                dm.firebase_storage_path
+            FROM Pipeline_Documents pd
+            JOIN Document d ON pd.document_id = d.document_id
+            LEFT JOIN Document_Metadata dm ON dm.document_id = d.document_id
+            WHERE pd.pipeline_id = :pipeline_id{filters}
+            ORDER BY pd.added_at DESC, pd.document_id DESC
+            LIMIT :limit
+        """),
+        params
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
+async def get_active_documents_in_pipeline(db: Session, pipeline_id: int) -> List[Dict[str, Any]]:
+    """Get only active documents in pipeline with their details"""
+    result = await db.execute(
+        text("""
+            SELECT 
+                d.document_id,
+                d.file_name,
+                d.file_type,
+                d.upload_date,
+                pd.is_active,
+                pd.added_at
+            FROM Pipeline_Documents pd
+            JOIN Document d ON pd.document_id = d.document_id
+            WHERE pd.pipeline_id = :pipeline_id AND pd.is_active = TRUE
+            ORDER BY pd.added_at DESC
+        """),
+        {'pipeline_id': pipeline_id}
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
+async def get_pipeline_document_states(db: Session, pipeline_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+            SELECT 
+                pd.document_id,
+                pd.is_active,
+                dm.firebase_storage_path
+            FROM Pipeline_Documents pd
+            LEFT JOIN Document_Metadata dm ON dm.document_id = pd.document_id
+            WHERE pd.pipeline_id = :pipeline_id
+        """),
+        {'pipeline_id': pipeline_id}
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
+async def is_document_in_pipeline(db: Session, pipeline_id: int, document_id: int) -> bool:
+    result = await db.execute(
+        text("""
+            SELECT * FROM Pipeline_Documents WHERE pipeline_id = :pipeline_id AND document_id = :document_id;
+            """
+        ),
+        {'pipeline_id': pipeline_id,
+         'document_id': document_id}
+    )
+
+    return result.first() is not None
+
+## UPDATE PIPELINE DOCUMENTS:
+async def toggle_document_active_status(db: Session, pipeline_id: int, document_id: int, is_active: bool) -> Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                UPDATE Pipeline_Documents 
+                SET is_active = :is_active 
+                WHERE pipeline_id = :pipeline_id AND document_id = :document_id
+            """),
+            {
+                'is_active': is_active,
+                'pipeline_id': pipeline_id,
+                'document_id': document_id    
+            }
+        )
+
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+
+        select_result = await db.execute(
+            text("""
+                SELECT pipeline_id, document_id, is_active, added_at
+                FROM Pipeline_Documents
+                WHERE pipeline_id = :pipeline_id AND document_id = :document_id
+            """),
+            {'pipeline_id': pipeline_id, 'document_id': document_id}
+        )
+        
+        row = select_result.fetchone()
+        
+        if row:
+            return {
+                'pipeline_id': row[0],
+                'document_id': row[1],
+                'is_active': row[2],
+                'added_at': row[3]
+            }
+        
+        return None
+    
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def activate_document_in_pipeline(db: Session, pipeline_id: int, document_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        return await toggle_document_active_status(db, pipeline_id, document_id, True)
+    except Exception as e:
+        raise e
+
+async def deactivate_document_in_pipeline(db: Session, pipeline_id: int, document_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        return await toggle_document_active_status(db, pipeline_id, document_id, False)
+    except Exception as e:
+        raise e
+
+## DELETE PIPELINE DOCUMENTS:
+async def remove_document_from_pipeline(db: Session, pipeline_id: int, document_id: int) -> bool:
+    try:
+        is_doc_in_pipeline = await is_document_in_pipeline(db, pipeline_id, document_id)
+        if not is_doc_in_pipeline:
+            return False
+
+        result = await db.execute(
+            text("""
+                DELETE FROM Pipeline_Documents
+                WHERE pipeline_id = :pipeline_id AND document_id = :document_id
+            """),
+            {'pipeline_id': pipeline_id, 'document_id': document_id}
+        )
+        
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+  
+        # Use rowcount instead of mappings()
+        return result.rowcount > 0
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def remove_all_documents_from_pipeline(db: Session, pipeline_id: int) -> int:
+    try:
+        result = await db.execute(
+            text("""
+                DELETE FROM Pipeline_Documents 
+                WHERE pipeline_id = :pipeline_id
+            """),
+            {'pipeline_id': pipeline_id}
+        )
+        
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+  
+        return result.rowcount
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def remove_inactive_documents_from_pipeline(db: Session, pipeline_id: int) -> int:
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Pipeline_Documents WHERE pipeline_id = :pipeline_id AND is_active = FALSE;
+                """
+            ),
+            {'pipeline_id': pipeline_id}
+        )
+
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+
+        return result.rowcount
+    except Exception as e:
+        raise e
+
@@ -0,0 +1,340 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/pipelineFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from .pipelineDocumentFunctions import get_count_of_documents_by_pipeline
+from .pipelineTagFunctions import get_tags_for_pipeline
+from .pipelineStatsFunctions import rebuild_pipeline_stats
+from app.services.active_document_cache import active_document_cache
+from app.services.metadata_cache import metadata_cache, PIPELINES
+from app.services.dimensionality import DEFAULT_EMBEDDING_DIMENSIONS, FULL_EMBEDDING_DIMENSIONS, validate_dimensions
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+## CREATE A PIPELINE:
+async def create_pipeline(db: Session, user_id: int, pipeline_name: str, description: str, embedding_dimensions: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text(""" 
+                INSERT INTO Pipeline (user_id, pipeline_name, description, embedding_dimensions)
+                VALUES (:user_id, :pipeline_name, :description, :embedding_dimensions)
+            """),
+            {
+                'user_id': user_id,
+                'pipeline_name': pipeline_name,
+                'description': description,
+                'embedding_dimensions': validate_dimensions(embedding_dimensions or DEFAULT_EMBEDDING_DIMENSIONS)
+            }
+        )
+        
+        await db.commit()
+        pipeline_id = result.lastrowid
+
+        created_pipeline = await db.execute(
+            text("""
+                SELECT * 
+                FROM Pipeline 
+                WHERE pipeline_id = :pipeline_id
+            """),
+            {'pipeline_id': pipeline_id}
+        )
+
+        return created_pipeline.mappings().first()
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+## READ/QUERY PIPELINES:
+
+# Get All Pipelines:
+async def get_all_pipelines(db: Session) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+            SELECT *  FROM Pipeline
+        """)
+    )
+    pipelines = result.mappings().all()
+    return pipelines
+
+# Get Pipeline by pipeline ID:
+async def get_pipeline_by_id(db: Session, pipeline_id: int, include_tags: bool = True) -> Optional[Dict[str, Any]]:
+    pipeline_by_pipeline_id, version = metadata_cache.lookup(PIPELINES, pipeline_id)
+
+    if pipeline_by_pipeline_id is None:
+        result = await db.execute(
+            text("""
+                SELECT * 
+                FROM Pipeline 
+                WHERE pipeline_id = :pipeline_id
+            """),
+            {'pipeline_id': pipeline_id})
+
+        pipeline_by_pipeline_id = result.mappings().first()
+        if pipeline_by_pipeline_id:
+            metadata_cache.put(PIPELINES, pipeline_id, dict(pipeline_by_pipeline_id), version)
+
+    if pipeline_by_pipeline_id:
+        pipeline_dict = dict(pipeline_by_pipeline_id)
+
+        if include_tags and pipeline_dict.get('pipeline_name') != 'general':
+            tags = await get_tags_for_pipeline(db, pipeline_id)
+            pipeline_dict['pipeline_tags'] = [dict(tag) for tag in tags]
+        else:
+            pipeline_dict['pipeline_tags'] = []
+        
+        return pipeline_dict
+
+    return None
+
+# Get Pipelines by User ID:
+async def get_pipelines_by_user_id(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+            SELECT * 
+            FROM Pipeline 
+            WHERE user_id = :user_id
+        """),
+        {'user_id': user_id})
+
+    pipeline_by_user_id = result.mappings().all()
+
+    return pipeline_by_user_id
+
+async def get_non_general_pipelines_by_user_id(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                SELECT 
+                    p.pipeline_id,
+                    p.user_id,
+                    p.pipeline_name,
+                    p.description,
+                    p.created_at,
+                    COALESCE(ps.active_documents, 0) as number_of_documents
+                FROM Pipeline p
+                LEFT JOIN Pipeline_Stats ps ON ps.pipeline_id = p.pipeline_id
+                WHERE p.user_id = :user_id AND p.pipeline_name != 'general'
+                ORDER BY p.created_at DESC
+            """),
+            {'user_id': user_id}
+        )
+        
+        pipelines_list = []
+        
+        all_pipelines = result.mappings().all()
+        
+        for pipeline in all_pipelines:
+            pipeline_dict = dict(pipeline)
+            
+            try:
+                tags_result = await db.execute(
+                    text("""
+                        SELECT t.tag_id, t.user_id, t.name, t.color, t.tag_type, t.created_at
+                        FROM Tag t
+                        JOIN Pipeline_Tag pt ON t.tag_id = pt.tag_id
+                        WHERE pt.pipeline_id = :pipeline_id
+                    """),
+                    {'pipeline_id': pipeline_dict['pipeline_id']}
+                )
+                
+                tags = tags_result.mappings().all()
+                pipeline_dict['pipeline_tags'] = [dict(tag) for tag in tags]
+                
+            except Exception as tag_error:
+                logger.warning("Error fetching tags for pipeline %s: %s", pipeline_dict['pipeline_id'], tag_error)
+                pipeline_dict['pipeline_tags'] = []
+            
+            pipelines_list.append(pipeline_dict)
+        
+        return pipelines_list
+        
+    except Exception as e:
+        logger.exception("Error in get_non_general_pipelines_by_user_id")
+        raise e
+
+async def get_pipelines_with_stats_by_user_id(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    # Every pipeline of the user, general included, with its Pipeline_Stats counts in one query
+    result = await db.execute(
+        text("""
+            SELECT
+                p.*,
+                COALESCE(ps.total_documents, 0) AS total_documents,
+                COALESCE(ps.active_documents, 0) AS active_documents
+            FROM Pipeline p
+            LEFT JOIN Pipeline_Stats ps ON ps.pipeline_id = p.pipeline_id
+            WHERE p.user_id = :user_id
+            ORDER BY p.created_at DESC
+        """),
+        {'user_id': user_id}
+    )
+
+    return result.mappings().all()
+
+
+async def get_pipeline_name_description(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+            SELECT pipeline_name, description
+            FROM Pipeline
+            WHERE user_id = :user_id
+        """),
+        {'user_id': user_id}
+    )
+
+    return result.mappings().first()
+
+
+async def get_general_pipeline_id(db: Session, user_id: int) -> Optional[int]:
+    result = await db.execute(
+        text("""
+            SELECT pipeline_id
+            FROM Pipeline
+            WHERE user_id = :user_id AND pipeline_name = 'general'
+        """),
+        {'user_id': user_id}
+    )
+
+    row = result.mappings().first()
+    return row['pipeline_id'] if row else None
+
+async def get_pipeline_embedding_dimensions(db: Session, pipeline_id: Optional[int]) -> int:
+    if pipeline_id is None:
+        return FULL_EMBEDDING_DIMENSIONS
+
+    row = await get_pipeline_by_id(db, pipeline_id, include_tags=False)
+    return row['embedding_dimensions'] if row and row.get('embedding_dimensions') else FULL_EMBEDDING_DIMENSIONS
+
+## UPDATE A PIPELINE:
+
+# Update a pipeline using pipeline_id:
+async def update_pipeline(db: Session, pipeline_id: int, 
+                    pipeline_name: Optional[str] = None, 
+                    description: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    try:
+        db_pipeline = await get_pipeline_by_id(db, pipeline_id, False)
+
+        if not db_pipeline:
+            return None
+
+        update_fields = []
+        params = {'pipeline_id': pipeline_id}
+
+        if pipeline_name is not None:
+            update_fields.append("pipeline_name = :pipeline_name")
+            params['pipeline_name'] = pipeline_name
+
+        if description is not None:
+            update_fields.append("description = :description")
+            params['description'] = description
+
+        if not update_fields:
+            return db_pipeline
+        
+        await db.execute(
+            text(f"""
+                 UPDATE Pipeline 
+                 SET {', '.join(update_fields)}
+                 WHERE pipeline_id = :pipeline_id
+            """),
+            params
+        )
+        
+        await db.commit()
+        metadata_cache.invalidate(PIPELINES, pipeline_id)
+        return await get_pipeline_by_id(db, pipeline_id, True)
+    
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+# Switch pipelines to another embedding size once their chunks have been re-embedded at it (all pipelines if None):
+async def update_pipeline_embedding_dimensions(db: Session, pipeline_ids: Optional[List[int]], embedding_dimensions: int) -> int:
+    if pipeline_ids is not None and not pipeline_ids:
+        return 0
+
+    try:
+        where = ""
+        params = {'embedding_dimensions': validate_dimensions(embedding_dimensions)}
+        if pipeline_ids is not None:
+            where = "WHERE pipeline_id IN ({})".format(', '.join(f':pipeline_id{i}' for i in range(len(pipeline_ids))))
+            params.update({f'pipeline_id{i}': pipeline_id for i, pipeline_id in enumerate(pipeline_ids)})
+
+        result = await db.execute(
+            text(f"""
+                UPDATE Pipeline
+                SET embedding_dimensions = :embedding_dimensions
+                {where}
+            """),
+            params
+        )
+
+        await db.commit()
+        if pipeline_ids is None:
+            metadata_cache.invalidate_namespace(PIPELINES)
+        else:
+            for pipeline_id in pipeline_ids:
+                metadata_cache.invalidate(PIPELINES, pipeline_id)
+        return result.rowcount
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## DELETE A PIPELINE:
+async def delete_pipeline_with_procedure(db: Session, pipeline_id: int) -> bool:
+    try:
+        db_pipeline = await get_pipeline_by_id(db, pipeline_id)
+
+        if not db_pipeline:
+            return False
+        
+        await db.execute(
+            text("CALL Delete_Pipeline(:pipeline_id)"),
+            {'pipeline_id': pipeline_id}
+        )
+
+        await db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate_pipeline(pipeline_id)
+        return True
+    
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## CUSTOM QUERIES:
+async def get_pipeline_stats(db: Session, pipeline_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        query = text("""
+            SELECT
+                p.pipeline_id,
+                p.pipeline_name,
+                ps.total_documents,
+                ps.active_documents,
+                ps.inactive_documents,
+                ps.total_word_count,
+                COALESCE(ps.total_word_count / NULLIF(ps.total_documents, 0), 0) AS average_word_count,
+                COALESCE(ps.total_file_size / NULLIF(ps.total_documents, 0), 0) AS average_file_size,
+                ps.total_chunks,
+                ps.last_upload_at AS most_recent_upload_date
+            FROM Pipeline_Stats ps
+            JOIN Pipeline p ON p.pipeline_id = ps.pipeline_id
+            WHERE ps.pipeline_id = :pipeline_id
+        """)
+
+        result = await db.execute(query, {'pipeline_id': pipeline_id})
+        stats = result.mappings().first()
+
+        if stats is None:
+            # Pipelines created before Pipeline_Stats existed get their row on first read
+            if await rebuild_pipeline_stats(db, [pipeline_id]) == 0:
+                return None
+            stats = (await db.execute(query, {'pipeline_id': pipeline_id})).mappings().first()
+
+        return stats
+
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
@@ -0,0 +1,115 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/pipelineStatsFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+
+# Pipeline_Stats is maintained by the triggers in scripts/create_triggers.py; these functions
+# read it and recompute it from the base tables when it drifts.
+
+STATS_COLUMNS = (
+    'total_documents',
+    'active_documents',
+    'inactive_documents',
+    'total_word_count',
+    'total_file_size',
+    'total_chunks',
+    'last_upload_at',
+)
+
+# What Pipeline_Stats should hold, aggregated from Pipeline_Documents, Document,
+# Document_Metadata and Document_Chunk
+EXPECTED_PIPELINE_STATS_QUERY = """
+    SELECT
+        p.pipeline_id,
+        COUNT(pd.document_id) AS total_documents,
+        COALESCE(SUM(CASE WHEN pd.document_id IS NOT NULL AND pd.is_active THEN 1 ELSE 0 END), 0) AS active_documents,
+        COALESCE(SUM(CASE WHEN pd.document_id IS NOT NULL AND NOT COALESCE(pd.is_active, FALSE) THEN 1 ELSE 0 END), 0) AS inactive_documents,
+        COALESCE(SUM(dm.word_count), 0) AS total_word_count,
+        COALESCE(SUM(dm.file_size), 0) AS total_file_size,
+        COALESCE(SUM(dc.chunk_count), 0) AS total_chunks,
+        MAX(d.upload_date) AS last_upload_at
+    FROM Pipeline p
+    LEFT JOIN Pipeline_Documents pd ON pd.pipeline_id = p.pipeline_id
+    LEFT JOIN Document d ON d.document_id = pd.document_id
+    LEFT JOIN Document_Metadata dm ON dm.document_id = pd.document_id
+    LEFT JOIN (
+        SELECT document_id, COUNT(*) AS chunk_count
+        FROM Document_Chunk
+        GROUP BY document_id
+    ) dc ON dc.document_id = pd.document_id
+    {where}
+    GROUP BY p.pipeline_id
+"""
+
+def _pipeline_filter(pipeline_ids: Optional[List[int]]):
+    if pipeline_ids is None:
+        return "", {}
+    placeholders = ', '.join(f':pipeline_id_{i}' for i in range(len(pipeline_ids)))
+    params = {f'pipeline_id_{i}': pipeline_id for i, pipeline_id in enumerate(pipeline_ids)}
+    return f"WHERE p.pipeline_id IN ({placeholders})", params
+
+## READ/QUERY PIPELINE STATS
+async def get_pipeline_stats_row(db: Session, pipeline_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+            SELECT *
+            FROM Pipeline_Stats
+            WHERE pipeline_id = :pipeline_id
+        """),
+        {'pipeline_id': pipeline_id}
+    )
+
+    return result.mappings().first()
+
+async def get_expected_pipeline_stats(db: Session, pipeline_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    if pipeline_ids is not None and not pipeline_ids:
+        return []
+
+    where, params = _pipeline_filter(pipeline_ids)
+
+    result = await db.execute(text(EXPECTED_PIPELINE_STATS_QUERY.format(where=where)), params)
+    return result.mappings().all()
+
+async def find_pipeline_stats_drift(db: Session) -> List[Dict[str, Any]]:
+    # Pipelines whose Pipeline_Stats row is missing or differs from the base tables
+    stored = {
+        row['pipeline_id']: row
+        for row in (await db.execute(text("SELECT * FROM Pipeline_Stats"))).mappings().all()
+    }
+
+    drift = []
+    for expected in await get_expected_pipeline_stats(db):
+        actual = stored.get(expected['pipeline_id'])
+        differences = {
+            column: {'expected': expected[column], 'actual': actual[column] if actual else None}
+            for column in STATS_COLUMNS
+            if actual is None or expected[column] != actual[column]
+        }
+        if differences:
+            drift.append({'pipeline_id': expected['pipeline_id'], 'missing': actual is None, 'differences': differences})
+
+    return drift
+
+## UPDATE PIPELINE STATS
+async def rebuild_pipeline_stats(db: Session, pipeline_ids: Optional[List[int]] = None) -> int:
+    if pipeline_ids is not None and not pipeline_ids:
+        return 0
+
+    try:
+        where, params = _pipeline_filter(pipeline_ids)
+
+        result = await db.execute(
+            text(f"""
+                REPLACE INTO Pipeline_Stats (pipeline_id, {', '.join(STATS_COLUMNS)})
+                {EXPECTED_PIPELINE_STATS_QUERY.format(where=where)}
+            """),
+            params
+        )
+
+        await db.commit()
+        return result.rowcount
+
+    except Exception as e:
+        await db.rollback()
+        raise e
@@ -0,0 +1,216 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/pipelineTagFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from app.services.metadata_cache import metadata_cache, PIPELINE_TAGS
+
+
+## CREATE PIPELINE TAG
+async def add_tag_to_pipeline(db, pipeline_id, tag_id) -> Optional[Dict[str, Any]]:
+    try:
+        is_tag_in_pipeline = await does_tag_in_pipeline_exist(db, pipeline_id, tag_id)
+        
+        if not is_tag_in_pipeline:
+            result = await db.execute(
+                text(
+                    """
+                        INSERT INTO Pipeline_Tag (pipeline_id, tag_id)
+                        VALUES (:pipeline_id, :tag_id)
+                    """
+                ),
+                {
+                    'pipeline_id': pipeline_id,
+                    'tag_id': tag_id
+                }
+            )
+
+            await db.commit()
+            metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
+
+            return result
+        
+        return None
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def add_multiple_tags_to_pipeline(db, pipeline_id, tag_ids: List[int]) -> List[Dict[str, Any]]:
+    listOfTags = []
+    try:
+        for tag_id in tag_ids:
+            if not await does_tag_in_pipeline_exist(db, pipeline_id, tag_id):
+                result = await db.execute(
+                    text(
+                        """
+                            INSERT INTO Pipeline_Tag (pipeline_id, tag_id)
+                            VALUES (:pipeline_id, :tag_id)
+                        """
+                    ),
+                    {
+                        'pipeline_id': pipeline_id,
+                        'tag_id': tag_id
+                    }
+                )
+
+                listOfTags.append({'pipeline_id': pipeline_id, 'tag_id': tag_id})
+
+        await db.commit()
+        metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
+        return listOfTags
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## READ/QUERY PIPELINE TAGS
+async def get_tags_for_pipeline(db, pipeline_id) -> Optional[Dict[str, Any]]:
+    tags, version = metadata_cache.lookup(PIPELINE_TAGS, pipeline_id)
+    if tags is not None:
+        return tags
+
+    result = await db.execute(
+        text(
+            """
+                SELECT t.* 
+                FROM Tag t
+                WHERE t.tag_id IN(
+                    SELECT pt.tag_id 
+                    FROM Pipeline_Tag pt
+                    WHERE pt.pipeline_id = :pipeline_id
+                )
+            """
+        ),
+        {
+            'pipeline_id': pipeline_id
+        }
+    )
+
+    tags = [dict(tag) for tag in result.mappings().all()]
+    metadata_cache.put(PIPELINE_TAGS, pipeline_id, tags, version)
+    return tags
+
+async def get_pipelines_with_tag(db, tag_id) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT p.* 
+                FROM Pipeline p
+                WHERE p.pipeline_id IN(
+                    SELECT pt.pipeline_id 
+                    FROM Pipeline_Tag pt
+                    WHERE pt.tag_id = :tag_id
+                )
+            """
+        ),
+        {
+            'tag_id': tag_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_tags_for_user_pipelines(db: Session, user_id: int) -> Dict[int, List[Dict[str, Any]]]:
+    # Tags of all of a user's pipelines in one query, keyed by pipeline_id
+    result = await db.execute(
+        text(
+            """
+                SELECT pt.pipeline_id, t.*
+                FROM Pipeline_Tag pt
+                JOIN Pipeline p ON p.pipeline_id = pt.pipeline_id
+                JOIN Tag t ON t.tag_id = pt.tag_id
+                WHERE p.user_id = :user_id
+            """
+        ),
+        {
+            'user_id': user_id
+        }
+    )
+
+    tags_by_pipeline: Dict[int, List[Dict[str, Any]]] = {}
+    for row in result.mappings().all():
+        tag = dict(row)
+        tags_by_pipeline.setdefault(tag.pop('pipeline_id'), []).append(tag)
+    return tags_by_pipeline
+
+async def does_tag_in_pipeline_exist(db: Session, pipeline_id: int, tag_id: int) -> bool:
+    result = await db.execute(
+        text("""
+            SELECT 1
+            FROM Pipeline_Tag
+            WHERE pipeline_id = :pipeline_id AND tag_id = :tag_id
+            LIMIT 1
+        """),
+        {'pipeline_id': pipeline_id, 'tag_id': tag_id}
+    )
+    return result.first() is not None
+
+## DELETE PIPELINE TAGS
+
+async def remove_tag_from_pipeline(db, pipeline_id, tag_id) -> bool: 
+    try:
+        is_tag_in_pipeline = await does_tag_in_pipeline_exist(db, pipeline_id, tag_id)
+
+        if is_tag_in_pipeline:
+            result = await db.execute(
+                text(
+                    """
+                        DELETE FROM Pipeline_Tag WHERE pipeline_id = :pipeline_id AND tag_id = :tag_id
+                    """
+                ),
+                {
+                    'pipeline_id': pipeline_id,
+                    'tag_id': tag_id
+                }
+            )
+
+            await db.commit()
+            metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
+
+            return result.mappings().first() is not None
+        
+        return False
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def remove_system_tag_from_pipeline(db, pipeline_id) -> bool: 
+    try:
+        result = await db.execute(
+            text("""
+                DELETE pt FROM Pipeline_Tag pt
+                JOIN Tag t ON pt.tag_id = t.tag_id
+                WHERE pt.pipeline_id = :pipeline_id AND t.tag_type = 'system'
+            """),
+            {'pipeline_id': pipeline_id}
+        )
+
+        await db.commit()
+        metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
+        return result.rowcount > 0
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+async def remove_all_tags_from_pipeline(db, pipeline_id) -> int:
+    try:
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Pipeline_Tag WHERE pipeline_id = :pipeline_id
+                """
+            ),
+            {
+                'pipeline_id': pipeline_id,
+            }
+        )
+
+        await db.commit()
+        metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
+        return result.rowcount
+
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
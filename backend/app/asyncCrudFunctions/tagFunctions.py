@@ -0,0 +1,250 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/tagFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from ..models import TagType
+from app.services.metadata_cache import metadata_cache, PIPELINE_TAGS, SYSTEM_TAGS
+
+## CREATE TAG:
+async def create_system_tag(db: Session, name: str, color: str) ->  Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                INSERT INTO Tag (user_id, name, color, tag_type)
+                VALUES (NULL, :name, :color, :tag_type)
+            """),
+            {
+                'name': name,
+                'color': color,
+                'tag_type': TagType.SYSTEM.value
+            }
+        )
+        
+        await db.commit()
+        metadata_cache.invalidate_namespace(SYSTEM_TAGS)
+        
+        tag_id = result.lastrowid
+        
+        created_tag = await db.execute(
+            text("""
+                SELECT * 
+                FROM Tag 
+                WHERE tag_id = :tag_id
+            """),
+            {'tag_id': tag_id}
+        )
+        
+        return created_tag.mappings().first()
+        
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def create_custom_tag(db: Session, user_id: int, name: str, color: str) ->  Optional[Dict[str, Any]]:
+    try:
+        result = await db.execute(
+            text("""
+                INSERT INTO Tag (user_id, name, color, tag_type)
+                VALUES (:user_id, :name, :color, :tag_type)
+            """),
+            {
+                'user_id': user_id,
+                'name': name,
+                'color': color,
+                'tag_type': TagType.CUSTOM.value
+            }
+        )
+        
+        await db.commit()
+        
+        tag_id = result.lastrowid
+        
+        created_tag = await db.execute(
+            text("""
+                SELECT * 
+                FROM Tag 
+                WHERE tag_id = :tag_id
+            """),
+            {'tag_id': tag_id}
+        )
+        
+        return created_tag.mappings().first()
+        
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## READ/QUERY TAG
+async def get_tag_by_id(db: Session, tag_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Tag 
+                WHERE tag_id = :tag_id
+            """
+        ),
+        {
+            'tag_id': tag_id
+        }
+    )
+
+    return result.mappings().first()
+
+async def get_all_system_tags(db: Session) -> List[Dict[str, Any]]:
+    system_tags, version = metadata_cache.lookup(SYSTEM_TAGS)
+    if system_tags is not None:
+        return system_tags
+
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Tag 
+                WHERE tag_type = :tag_type;
+            """
+        ),
+        {
+            'tag_type': TagType.SYSTEM.value
+        }
+    )
+
+    system_tags = [dict(tag) for tag in result.mappings().all()]
+    metadata_cache.put(SYSTEM_TAGS, None, system_tags, version)
+    return system_tags
+
+async def get_custom_tags_by_user(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT * 
+                FROM Tag 
+                WHERE tag_type = :tag_type AND user_id = :user_id;
+            """
+        ),
+        {
+            'tag_type': TagType.CUSTOM.value,
+            'user_id': user_id
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_all_tags_for_user(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT t1.* 
+                FROM Tag t1
+                WHERE t1.user_id = :user_id
+
+                UNION
+
+                SELECT t2.*
+                FROM Tag t2
+                WHERE t2.tag_type = :tag_type
+            """
+        ),
+        {
+            'user_id': user_id,
+            'tag_type': TagType.SYSTEM.value
+        }
+    )
+
+    return result.mappings().all()
+
+async def get_tag_by_name_and_user(db: Session, user_id: int, name: str) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text(
+            """
+                SELECT *
+                FROM Tag
+                WHERE user_id = :user_id AND name = :name
+            """
+        ),
+        {
+            'user_id': user_id,
+            'name': name
+        }
+    )
+
+    return result.mappings().first()
+
+
+## UPDATE TAG:
+
+def _invalidate_cached_tag_lists(tag: Dict[str, Any]):
+    # A tag can be attached to any number of pipelines, so every cached pipeline tag list goes
+    metadata_cache.invalidate_namespace(PIPELINE_TAGS)
+    if tag['tag_type'] == TagType.SYSTEM.value:
+        metadata_cache.invalidate_namespace(SYSTEM_TAGS)
+
+async def update_tag(db: Session, 
+               tag_id: int, 
+               name:Optional[str]=None, 
+               color:Optional[str]=None) -> Optional[Dict[str, Any]]:
+    try:
+        tag = await get_tag_by_id(db, tag_id)
+
+        if not tag:
+            return None
+        
+        update_fields = []
+        params = {'tag_id': tag_id}
+        
+        if name is not None:
+            update_fields.append("name = :name")
+            params['name'] = name
+        if color is not None:
+            update_fields.append("color = :color")
+            params['color'] = color
+
+        if not update_fields:
+            return tag
+
+        await db.execute(
+            text(f"""
+                 UPDATE Tag 
+                 SET {', '.join(update_fields)}
+                 WHERE tag_id = :tag_id
+            """),
+            params
+        )
+        
+        await db.commit()
+        _invalidate_cached_tag_lists(tag)
+
+        return await get_tag_by_id(db, tag_id)
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## DELETE TAG:
+async def delete_tag(db: Session, tag_id: int) -> bool:
+    try:
+        tag = await get_tag_by_id(db, tag_id)
+
+        if not tag:
+            return False
+        
+        result = await db.execute(
+            text(
+                """
+                    DELETE FROM Tag where tag_id = :tag_id
+                """
+            ),
+            {
+                'tag_id': tag_id
+            }
+        )
+
+        await db.commit()
+        _invalidate_cached_tag_lists(tag)
+
+        return result.rowcount > 0
+
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
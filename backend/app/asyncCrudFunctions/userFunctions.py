@@ -0,0 +1,277 @@
+### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/userFunctions.py - do not edit by hand.
+# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.
+from sqlalchemy.ext.asyncio import AsyncSession as Session
+from typing import Optional, List, Dict, Any
+from sqlalchemy.sql import text
+from app.metrics import time_stage
+from app.services.metadata_cache import metadata_cache
+
+## CREATE A USER:
+async def create_user(db: Session, firebase_uid: str, first_name: str, last_name: str, email: str) -> Optional[Dict[str, Any]]:
+    try:
+        does_user_exist = await find_user(db, firebase_uid)
+        if does_user_exist:
+            return None
+        result = await db.execute(
+            text("""
+                INSERT INTO User (firebase_uid, first_name, last_name, email)
+                VALUES (:firebase_uid, :first_name, :last_name, :email)
+            """),
+            {
+                'firebase_uid': firebase_uid,
+                'first_name': first_name,
+                'last_name': last_name,
+                'email': email
+            }
+        )
+        
+        await db.commit()
+        
+        user_id = result.lastrowid
+        
+        created_user = await db.execute(
+            text("""
+                SELECT * 
+                FROM User 
+                WHERE user_id = :user_id
+            """),
+            {'user_id': user_id}
+        )
+        
+        return created_user.mappings().first()
+        
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+async def find_user(db: Session, firebase_uid: str) -> bool:
+    user_exists = await db.execute(
+        text("""
+            SELECT 1 FROM User
+            WHERE firebase_uid = :firebase_uid
+            LIMIT 1
+        """),
+        {
+            'firebase_uid': firebase_uid,
+        }
+    )
+
+    return user_exists.first() is not None # if the user's row is greater than 0 then our user exists, which we don't want when creating a user
+
+async def get_user_by_firebase_uid(db: Session, firebase_uid: str) -> Optional[Dict[str, Any]]:
+    with time_stage("user_lookup"):
+        user = await db.execute(
+            text(
+                """
+                    SELECT * FROM User
+                    WHERE firebase_uid = :firebase_uid
+                """
+            ),
+            {'firebase_uid': firebase_uid}
+        )
+
+        return user.mappings().first()
+
+async def get_or_create_user_from_firebase(db: Session, firebase_uid: str, email: str) -> Dict[str, Any]:
+    try:
+        existing_user = await get_user_by_firebase_uid(db, firebase_uid)
+        if existing_user:
+            if not existing_user["first_name"]:
+                return {
+                    "user": existing_user,
+                    "created_user": False,
+                    "needs_name": True
+                }
+            
+            return {
+                'user': dict(existing_user),
+                'created_user': False,
+                'needs_name': False
+            }
+    
+        new_user = await create_user(
+            db,
+            firebase_uid,
+            "",
+            "",
+            email
+        )
+
+        return {
+            'user': dict(new_user),
+            'created_user': True,
+            'needs_name': True,
+        }
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## READ/QUERY USERS:
+
+# Get All User:
+async def get_all_users(db: Session) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+             SELECT *
+             FROM User 
+             """)
+    )
+    users = result.mappings().all()
+    return users
+
+
+# Get User by ID:
+async def get_user_by_id(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+             SELECT * 
+             FROM User 
+             WHERE user_id = :user_id
+             """), 
+        {'user_id': user_id}
+    )
+    user_by_id = result.mappings().first()
+    return user_by_id
+
+# Get User by Email:
+async def get_user_by_email(db: Session, email: str) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+             SELECT *
+             FROM User
+             WHERE email = :email
+             """), 
+        {'email': email}
+    )
+    user_by_email = result.mappings().first()
+    return user_by_email
+
+# Get User by First or Last Name:
+async def get_user_by_name(db: Session, name: str) -> Optional[Dict[str, Any]]:
+    search_pattern = f"%{name}%"
+    result = await db.execute(
+        text("""
+             SELECT * 
+             FROM User 
+             WHERE first_name LIKE :pattern 
+                OR last_name LIKE :pattern 
+                OR CONCAT(first_name, ' ', last_name) LIKE :pattern
+             """),
+        {'pattern': search_pattern}
+    )
+    return result.mappings().all()
+
+async def get_users_name(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(
+        text("""
+            SELECT first_name, last_name
+            FROM User
+            WHERE user_id = :user_id
+        """),
+        {'user_id': user_id}
+    )
+    return result.mappings().first()
+
+async def get_pipeline_count_by_user(db: Session, user_id: int) -> int:
+    result = await db.execute(
+        text("""
+            SELECT COUNT(*) AS pipeline_count
+            FROM Pipeline 
+            WHERE user_id = :user_id
+        """),
+        {'user_id': user_id}
+    )
+
+    return result.mappings().first()['pipeline_count']
+
+## UPDATE A USER:
+
+# Update a user by user_id:
+async def update_user(db: Session, user_id: int, 
+                first_name: Optional[str] = None, 
+                last_name: Optional[str] = None, 
+                email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    try:
+        db_user = await get_user_by_id(db, user_id)
+
+        if not db_user:
+            return None
+        
+        update_fields = []
+        params = {'user_id': user_id}
+        
+        if first_name is not None:
+            update_fields.append("first_name = :first_name")
+            params['first_name'] = first_name
+        if last_name is not None:
+            update_fields.append("last_name = :last_name")
+            params['last_name'] = last_name
+        if email is not None:
+            update_fields.append("email = :email")
+            params['email'] = email
+            
+        if not update_fields:
+            return db_user
+
+        await db.execute(
+            text(f"""
+                 UPDATE User 
+                 SET {', '.join(update_fields)}
+                 WHERE user_id = :user_id
+            """),
+            params
+        )
+        
+        await db.commit()
+        
+
+        return await get_user_by_id(db, user_id)
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+
+## DELETE A USER:
+async def delete_user_by_id(db: Session, user_id: int) -> bool:
+    try:
+
+        db_user = await get_user_by_id(db, user_id)
+        if not db_user:
+            return False
+
+
+        result = await db.execute(
+            text("""
+                DELETE FROM User 
+                WHERE user_id = :user_id
+            """),
+            {'user_id': user_id}
+        )
+        
+        await db.commit()
+        # Cascades to the user's pipelines, documents and tags
+        metadata_cache.invalidate_all()
+  
+        return result.rowcount > 0
+
+    except Exception as e:
+        await db.rollback()
+        raise e
+    
+## CUSTOM QUERIES: 
+
+# Get the total number of users:
+async def get_user_count(db: Session) -> int:
+    try:
+        result = await db.execute(
+            text("""
+                SELECT COUNT(*) AS user_count 
+                FROM User
+            """)
+        )
+        count = result.mappings().first()['user_count']
+        return count
+
+    except Exception as e:
+        await db.rollback()
+        raise e
\ No newline at end of file
@@ -0,0 +1,80 @@
+### Async MySQL engine for app/asyncCrudFunctions
+# The Cloud SQL Python Connector only supports asyncpg for async connections, so aiomysql
+# connects through the unix socket Cloud Run mounts at /cloudsql/<INSTANCE_CONNECTION_NAME>
+# (or the Cloud SQL Auth Proxy locally), or through ASYNC_DATABASE_URL / DATABASE_URL.
+
+import os
+import threading
+from typing import AsyncIterator, Optional
+from urllib.parse import quote_plus
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from dotenv import load_dotenv
+from app.database import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    db_name,
+    db_user,
+    instance_connection_name,
+    instance_password,
+)
+
+load_dotenv()
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+CLOUD_SQL_SOCKET_DIR = os.getenv("CLOUD_SQL_SOCKET_DIR", "/cloudsql")
+
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
+_engine_lock = threading.Lock()
+
+def async_database_url() -> str:
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    if DATABASE_URL:
+        # Same server as the sync engine, through the async driver
+        return DATABASE_URL.replace("mysql+pymysql://", "mysql+aiomysql://", 1)
+    return (
+        f"mysql+aiomysql://{quote_plus(db_user or '')}:{quote_plus(instance_password or '')}@/{db_name}"
+        f"?unix_socket={CLOUD_SQL_SOCKET_DIR}/{instance_connection_name}"
+    )
+
+def get_async_engine() -> AsyncEngine:
+    # Created on first use so importing this module doesn't require aiomysql
+    global _engine, _session_factory
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_async_engine(
+                async_database_url(),
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING,
+            )
+            _session_factory = async_sessionmaker(_engine, autoflush=False, expire_on_commit=False)
+        return _engine
+
+def async_session() -> AsyncSession:
+    get_async_engine()
+    return _session_factory()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    db = async_session()
+    try:
+        yield db
+    except:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+async def dispose_async_engine():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _session_factory = None
@@ -1,3 +1,4 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
@@ -89,7 +90,54 @@ def get_conversations_by_pipeline(db: Session, pipeline_id: int) -> List[Dict[st
     )
 
     return result.mappings().all()
-    
+
+
+def get_conversations_by_pipeline_page(db: Session, pipeline_id: int, limit: int,
+                                       after_last_message_at: Optional[datetime] = None,
+                                       after_conversation_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Most recent first with never-used conversations last, like get_conversations_by_pipeline.
+    # MySQL sorts NULL below every timestamp, so last_message_at DESC already puts them last and
+    # the (pipeline_id, last_message_at, conversation_id) index serves the order directly.
+    # Returns up to limit + 1 rows so the caller can tell whether there is another page.
+    after_clause = ""
+    params = {'pipeline_id': pipeline_id, 'limit': limit + 1}
+    if after_conversation_id is not None:
+        params['after_conversation_id'] = after_conversation_id
+        if after_last_message_at is not None:
+            after_clause = """
+                AND (c.last_message_at < :after_last_message_at
+                     OR (c.last_message_at = :after_last_message_at AND c.conversation_id < :after_conversation_id)
+                     OR c.last_message_at IS NULL)
+            """
+            params['after_last_message_at'] = after_last_message_at
+        else:
+            after_clause = """
+                AND c.last_message_at IS NULL AND c.conversation_id < :after_conversation_id
+            """
+
+    result = db.execute(
+        text(
+            f"""
+                SELECT
+                    c.*,
+                    (
+                        SELECT m.message_text
+                        FROM Message m
+                        WHERE m.conversation_id = c.conversation_id
+                        ORDER BY m.timestamp ASC, m.message_id ASC
+                        LIMIT 1
+                    ) AS first_message_content
+                FROM Conversation c
+                WHERE c.pipeline_id = :pipeline_id
+                {after_clause}
+                ORDER BY c.last_message_at DESC, c.conversation_id DESC
+                LIMIT :limit
+            """
+        ),
+        params
+    )
+
+    return result.mappings().all()
 
 def get_general_conversations_for_user(db: Session, user_id: int) -> List[Dict[str, Any]]:
     result = db.execute(
@@ -124,6 +172,46 @@ def get_recent_conversations(db: Session, user_id: int, limit=10) -> List[Dict[s
 
     return result.mappings().all()
 
+def get_recent_conversations_per_pipeline(db: Session, user_id: int, per_pipeline: int = 10) -> List[Dict[str, Any]]:
+    # The most recent conversations of every pipeline (and of pipeline-less chats), each with
+    # its first message, in one query; ordered like get_conversations_by_pipeline
+    result = db.execute(
+        text(
+            """
+                SELECT ranked.*
+                FROM (
+                    SELECT
+                        c.*,
+                        (
+                            SELECT m.message_text
+                            FROM Message m
+                            WHERE m.conversation_id = c.conversation_id
+                            ORDER BY m.timestamp ASC, m.message_id ASC
+                            LIMIT 1
+                        ) AS first_message_content,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY c.pipeline_id
+                            ORDER BY
+                                CASE WHEN c.last_message_at IS NULL THEN 1 ELSE 0 END,
+                                c.last_message_at DESC,
+                                c.conversation_id DESC
+                        ) AS pipeline_rank
+                    FROM Conversation c
+                    WHERE c.user_id = :user_id
+                ) ranked
+                WHERE ranked.pipeline_rank <= :per_pipeline
+                ORDER BY
+                    ranked.pipeline_id,
+                    ranked.pipeline_rank
+            """
+        ),{
+            'user_id': user_id,
+            'per_pipeline': per_pipeline
+        }
+    )
+
+    return result.mappings().all()
+
 def get_conversation_count_by_user(db: Session, user_id: int) -> int:
     result = db.execute(
         text(
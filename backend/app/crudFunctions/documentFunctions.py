@@ -2,6 +2,8 @@ import json
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any, Union
 from sqlalchemy.sql import text
+from app.services.active_document_cache import active_document_cache
+from app.services.metadata_cache import metadata_cache, DOCUMENTS, DOCUMENT_METADATA, PIPELINE_DOCUMENT_COUNTS
 
 
 ## CREATE A DOCUMENT:
@@ -19,6 +21,8 @@ def create_document(db: Session, user_id: int, file_name: str, file_type: str) -
             })
         
         db.commit()
+        # The Add_Document_To_General_Pipeline trigger also added it to the general pipeline
+        invalidate_general_pipeline_document_count(db, user_id)
 
         return get_document_by_document_id(db, result.lastrowid)
             
@@ -75,6 +79,7 @@ def create_document_metadata(db: Session,
             })
         
         db.commit()
+        active_document_cache.invalidate_all()
 
         return get_document_metadata_by_document_id(db, document_id)
     except Exception as e:
@@ -180,6 +185,9 @@ def insert_document_with_stored_procedure(
         document_id = document_id_result.scalar()
         
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+        invalidate_general_pipeline_document_count(db, user_id)
         
         return document_id
         
@@ -187,9 +195,182 @@ def insert_document_with_stored_procedure(
         db.rollback()
         raise e
     
+def insert_documents_with_stored_procedure(
+    db: Session,
+    user_id: int,
+    pipeline_id: int,
+    documents: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    # Bulk uploads: one CALL per document on the same connection, with the caches invalidated once.
+    # This is not a batched insert: Insert_Document commits its own transaction, so each document
+    # succeeds or fails on its own and the result for each one says which.
+    results = []
+    for document in documents:
+        try:
+            db.execute(
+                text("""
+                    CALL Insert_Document(
+                        :user_id,
+                        :file_name,
+                        :file_type,
+                        :pipeline_id,
+                        :file_size,
+                        :page_count,
+                        :word_count,
+                        :language,
+                        :encoding,
+                        :firebase_storage_path,
+                        :checksum,
+                        :mime_type,
+                        :chunks,
+                        @new_document_id
+                    )
+                """),
+                {
+                    'user_id': user_id,
+                    'file_name': document['file_name'],
+                    'file_type': document['file_type'],
+                    'pipeline_id': pipeline_id,
+                    'file_size': document['file_size'],
+                    'page_count': document['page_count'],
+                    'word_count': document['word_count'],
+                    'language': document.get('language', 'en'),
+                    'encoding': document.get('encoding', 'utf-8'),
+                    'firebase_storage_path': document['firebase_storage_path'],
+                    'checksum': document['checksum'],
+                    'mime_type': document['mime_type'],
+                    'chunks': json.dumps(document['chunks'])
+                }
+            )
+
+            document_id_result = db.execute(text("SELECT @new_document_id AS document_id"))
+            document_id = document_id_result.scalar()
+            db.commit()
+            results.append({'document_id': document_id, 'error': None})
+
+        except Exception as e:
+            db.rollback()
+            results.append({'document_id': None, 'error': str(e)})
+
+    if any(result['document_id'] is not None for result in results):
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+        invalidate_general_pipeline_document_count(db, user_id)
+
+    return results
+
+## REPLACE A DOCUMENT'S CONTENT:
+
+def replace_document_chunks(
+    db: Session,
+    document_id: int,
+    removed_chunk_ids: List[int],
+    moved_chunks: List[Dict[str, int]],
+    added_chunks: List[Dict[str, Any]],
+    file_name: str,
+    file_size: int,
+    page_count: int,
+    word_count: int,
+    checksum: str,
+    mime_type: str
+) -> Dict[str, int]:
+    # A new version of a document, applied in one transaction: chunks that are gone are deleted,
+    # unchanged chunks keep their rows and get their new chunk_index, and only new text is
+    # inserted. moved_chunks: [{'chunk_id', 'chunk_index'}], added_chunks: [{'chunk_text', 'chunk_index'}]
+    try:
+        # Pipeline_Stats follows through the Document_Metadata update and Document_Chunk insert/delete triggers
+        if removed_chunk_ids:
+            placeholders = ', '.join([f':id{i}' for i in range(len(removed_chunk_ids))])
+            params = {f'id{i}': chunk_id for i, chunk_id in enumerate(removed_chunk_ids)}
+            params['document_id'] = document_id
+            db.execute(
+                text(f"DELETE FROM Document_Chunk WHERE document_id = :document_id AND chunk_id IN ({placeholders})"),
+                params
+            )
+
+        if moved_chunks:
+            # (document_id, chunk_index) is unique, so indexes are first parked at -(index + 1)
+            # and then flipped, otherwise a chunk could move onto one that hasn't moved yet
+            cases = ' '.join([f'WHEN :id{i} THEN :index{i}' for i in range(len(moved_chunks))])
+            placeholders = ', '.join([f':id{i}' for i in range(len(moved_chunks))])
+            params = {'document_id': document_id}
+            for i, chunk in enumerate(moved_chunks):
+                params[f'id{i}'] = chunk['chunk_id']
+                params[f'index{i}'] = -(chunk['chunk_index'] + 1)
+            db.execute(
+                text(f"""
+                    UPDATE Document_Chunk
+                    SET chunk_index = CASE chunk_id {cases} END
+                    WHERE document_id = :document_id AND chunk_id IN ({placeholders})
+                """),
+                params
+            )
+            db.execute(
+                text("""
+                    UPDATE Document_Chunk
+                    SET chunk_index = -chunk_index - 1
+                    WHERE document_id = :document_id AND chunk_index < 0
+                """),
+                {'document_id': document_id}
+            )
+
+        if added_chunks:
+            db.execute(
+                text("""
+                    INSERT INTO Document_Chunk (document_id, chunk_text, chunk_index)
+                    VALUES (:document_id, :chunk_text, :chunk_index)
+                """),
+                [
+                    {'document_id': document_id, 'chunk_text': chunk['chunk_text'], 'chunk_index': chunk['chunk_index']}
+                    for chunk in added_chunks
+                ]
+            )
+
+        db.execute(
+            text("UPDATE Document SET file_name = :file_name WHERE document_id = :document_id"),
+            {'document_id': document_id, 'file_name': file_name}
+        )
+        db.execute(
+            text("""
+                UPDATE Document_Metadata
+                SET file_size = :file_size,
+                    page_count = :page_count,
+                    word_count = :word_count,
+                    checksum = :checksum,
+                    mime_type = :mime_type
+                WHERE document_id = :document_id
+            """),
+            {
+                'document_id': document_id,
+                'file_size': file_size,
+                'page_count': page_count,
+                'word_count': word_count,
+                'checksum': checksum,
+                'mime_type': mime_type
+            }
+        )
+
+        db.commit()
+        active_document_cache.invalidate_all()
+        metadata_cache.invalidate(DOCUMENTS, document_id)
+        metadata_cache.invalidate(DOCUMENT_METADATA, document_id)
+
+        return {
+            'removed': len(removed_chunk_ids),
+            'moved': len(moved_chunks),
+            'added': len(added_chunks)
+        }
+    except Exception as e:
+        db.rollback()
+        raise e
+    
 ## READ/QUERY DOCUMENTS:
 
 def get_document_by_document_id(db: Session, document_id: int) -> Optional[Dict[str, Any]]:
+    document, version = metadata_cache.lookup(DOCUMENTS, document_id)
+    if document is not None:
+        return document
+
     result = db.execute(
         text(
             """
@@ -199,7 +380,10 @@ def get_document_by_document_id(db: Session, document_id: int) -> Optional[Dict[
         {'document_id': document_id}
     )
 
-    return result.mappings().first()
+    document = result.mappings().first()
+    if document:
+        metadata_cache.put(DOCUMENTS, document_id, dict(document), version)
+    return document
 
 def get_documents_by_user_id(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
     result = db.execute(text("""
@@ -209,6 +393,10 @@ def get_documents_by_user_id(db: Session, user_id: int) -> Optional[Dict[str, An
     return result.mappings().all()
  
 def get_document_metadata_by_document_id(db: Session, document_id: int):
+    document_metadata, version = metadata_cache.lookup(DOCUMENT_METADATA, document_id)
+    if document_metadata is not None:
+        return document_metadata
+
     result = db.execute(
         text(
             """
@@ -218,7 +406,10 @@ def get_document_metadata_by_document_id(db: Session, document_id: int):
         {'document_id': document_id}
     )
 
-    return result.mappings().first()
+    document_metadata = result.mappings().first()
+    if document_metadata:
+        metadata_cache.put(DOCUMENT_METADATA, document_id, dict(document_metadata), version)
+    return document_metadata
 
 def get_document_file_info(db: Session, document_id: int) -> Dict[str, Any]:
     result = db.execute(
@@ -351,6 +542,86 @@ def get_chunks_from_list(db: Session, listOfChunkIds: List[int]) -> List[Dict[st
     
     return result.mappings().all()
 
+def _chunk_scope_filters(user_ids: Optional[List[int]], pipeline_ids: Optional[List[int]]):
+    filters = ""
+    params = {}
+    if user_ids is not None:
+        filters += " AND d.user_id IN ({})".format(', '.join(f':user_id{i}' for i in range(len(user_ids))))
+        params.update({f'user_id{i}': user_id for i, user_id in enumerate(user_ids)})
+    if pipeline_ids is not None:
+        filters += """
+            AND EXISTS (
+                SELECT 1 FROM Pipeline_Documents pd
+                WHERE pd.document_id = dc.document_id AND pd.pipeline_id IN ({})
+            )
+        """.format(', '.join(f':pipeline_id{i}' for i in range(len(pipeline_ids))))
+        params.update({f'pipeline_id{i}': pipeline_id for i, pipeline_id in enumerate(pipeline_ids)})
+    return filters, params
+
+def get_chunks_page(db: Session, limit: int, after_chunk_id: int = 0, user_ids: Optional[List[int]] = None,
+                    pipeline_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    # Keyset walk over every chunk in chunk_id order, for corpus-wide jobs such as re-embedding
+    if (user_ids is not None and not user_ids) or (pipeline_ids is not None and not pipeline_ids):
+        return []
+
+    filters, params = _chunk_scope_filters(user_ids, pipeline_ids)
+    params.update({'after_chunk_id': after_chunk_id, 'limit': limit})
+
+    result = db.execute(
+        text(f"""
+            SELECT
+                dc.chunk_id,
+                dc.document_id,
+                dc.chunk_index,
+                dc.chunk_text,
+                d.user_id,
+                dm.firebase_storage_path
+            FROM Document_Chunk dc
+            JOIN Document d ON d.document_id = dc.document_id
+            LEFT JOIN Document_Metadata dm ON dm.document_id = dc.document_id
+            WHERE dc.chunk_id > :after_chunk_id{filters}
+            ORDER BY dc.chunk_id
+            LIMIT :limit
+        """),
+        params
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
+def count_chunks(db: Session, after_chunk_id: int = 0, user_ids: Optional[List[int]] = None,
+                 pipeline_ids: Optional[List[int]] = None) -> int:
+    if (user_ids is not None and not user_ids) or (pipeline_ids is not None and not pipeline_ids):
+        return 0
+
+    filters, params = _chunk_scope_filters(user_ids, pipeline_ids)
+    params['after_chunk_id'] = after_chunk_id
+
+    result = db.execute(
+        text(f"""
+            SELECT COUNT(*)
+            FROM Document_Chunk dc
+            JOIN Document d ON d.document_id = dc.document_id
+            WHERE dc.chunk_id > :after_chunk_id{filters}
+        """),
+        params
+    )
+
+    return result.scalar() or 0
+
+def invalidate_general_pipeline_document_count(db: Session, user_id: int):
+    result = db.execute(
+        text("""
+            SELECT pipeline_id
+            FROM Pipeline
+            WHERE user_id = :user_id AND pipeline_name = 'general'
+        """),
+        {'user_id': user_id}
+    )
+
+    row = result.mappings().first()
+    if row:
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, row['pipeline_id'])
+
 ### DELETE DOCUMENTS:
 
 def delete_document_by_id(db: Session, document_id: int) -> bool:
@@ -367,6 +638,11 @@ def delete_document_by_id(db: Session, document_id: int) -> bool:
         )
 
         db.commit()
+        active_document_cache.invalidate_all()
+        metadata_cache.invalidate(DOCUMENTS, document_id)
+        metadata_cache.invalidate(DOCUMENT_METADATA, document_id)
+        # Pipeline_Documents rows go with the document, in whichever pipelines it was in
+        metadata_cache.invalidate_namespace(PIPELINE_DOCUMENT_COUNTS)
 
         return result.rowcount > 0
     
@@ -388,6 +664,9 @@ def delete_all_documents_for_user(db: Session, user_id: int) -> int:
         )
 
         db.commit()
+        active_document_cache.invalidate_all()
+        for namespace in (DOCUMENTS, DOCUMENT_METADATA, PIPELINE_DOCUMENT_COUNTS):
+            metadata_cache.invalidate_namespace(namespace)
 
         return result.rowcount
     
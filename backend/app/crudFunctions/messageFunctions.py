@@ -1,3 +1,4 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
@@ -59,6 +60,37 @@ def get_all_messages_in_conversation(db: Session, conversation_id: int) -> Optio
 
     return result.mappings().all()
 
+def get_messages_page(db: Session, conversation_id: int, limit: int,
+                      after_timestamp: Optional[datetime] = None,
+                      after_message_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Oldest first, keyset on (timestamp, message_id); returns up to limit + 1 rows so the
+    # caller can tell whether there is another page
+    after_clause = ""
+    params = {'conversation_id': conversation_id, 'limit': limit + 1}
+    if after_message_id is not None:
+        after_clause = """
+            AND (timestamp > :after_timestamp
+                 OR (timestamp = :after_timestamp AND message_id > :after_message_id))
+        """
+        params['after_timestamp'] = after_timestamp
+        params['after_message_id'] = after_message_id
+
+    result = db.execute(
+        text(
+            f"""
+                SELECT *
+                FROM Message
+                WHERE conversation_id = :conversation_id
+                {after_clause}
+                ORDER BY timestamp ASC, message_id ASC
+                LIMIT :limit
+            """
+        ),
+        params
+    )
+
+    return result.mappings().all()
+
 def get_all_messages_from_user(db: Session, user_id: int) -> Optional[Dict[str, Any]]:
     result = db.execute(
         text(
@@ -116,7 +148,7 @@ def get_recent_messages(db: Session, conversation_id: int, limit: int = 10) -> L
                 SELECT * 
                 FROM Message
                 WHERE conversation_id = :conversation_id
-                ORDER BY timestamp DESC
+                ORDER BY timestamp DESC, message_id DESC
                 LIMIT :limit;
             """
         ),
@@ -1,7 +1,10 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
 from .documentFunctions import get_document_by_document_id
+from app.services.active_document_cache import active_document_cache
+from app.services.metadata_cache import metadata_cache, PIPELINE_DOCUMENT_COUNTS
 
 ## ADD DOCUMENT TO PIPELINE:
 def add_document_to_pipeline(db: Session, pipeline_id: int, document_id: int, is_active: bool) -> Optional[Dict[str, Any]]:
@@ -19,6 +22,8 @@ def add_document_to_pipeline(db: Session, pipeline_id: int, document_id: int, is
         })
 
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
         
         select_query = text("""
             SELECT pipeline_id, document_id, is_active, added_at
@@ -48,17 +53,38 @@ def add_document_to_pipeline(db: Session, pipeline_id: int, document_id: int, is
         raise e
     
 def get_count_of_documents_by_pipeline(db: Session, pipeline_id: int) -> int:
+    count, version = metadata_cache.lookup(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
+    if count is not None:
+        return count
+
     result = db.execute(
         text("""
-            SELECT COUNT(*) as count
-            FROM Pipeline_Documents
+            SELECT total_documents
+            FROM Pipeline_Stats
             WHERE pipeline_id = :pipeline_id;
             """
         ),
         {'pipeline_id': pipeline_id}
     )
 
-    return result.mappings().first()['count']
+    row = result.mappings().first()
+    if row is not None:
+        count = row['total_documents']
+    else:
+        # No Pipeline_Stats row yet (see scripts/check_pipeline_stats.py)
+        result = db.execute(
+            text("""
+                SELECT COUNT(*) as count
+                FROM Pipeline_Documents
+                WHERE pipeline_id = :pipeline_id;
+                """
+            ),
+            {'pipeline_id': pipeline_id}
+        )
+        count = result.mappings().first()['count']
+
+    metadata_cache.put(PIPELINE_DOCUMENT_COUNTS, pipeline_id, count, version)
+    return count
 
 def add_multiple_documents_to_pipeline(db: Session, pipeline_id: int, document_ids: List[int]) -> List[Dict[str, Any]]:
     try:
@@ -113,6 +139,46 @@ def get_documents_in_pipeline(db: Session, pipeline_id: int, is_active: bool = N
 
     return [dict(row) for row in result.mappings().all()]
 
+def get_documents_in_pipeline_page(db: Session, pipeline_id: int, limit: int, is_active: bool = None,
+                                   after_added_at: Optional[datetime] = None,
+                                   after_document_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    # Newest first, keyset on (added_at, document_id); returns up to limit + 1 rows so the
+    # caller can tell whether there is another page
+    filters = ""
+    params = {'pipeline_id': pipeline_id, 'limit': limit + 1}
+    if is_active is not None:
+        filters += " AND pd.is_active = :is_active"
+        params['is_active'] = is_active
+    if after_document_id is not None:
+        filters += """
+            AND (pd.added_at < :after_added_at
+                 OR (pd.added_at = :after_added_at AND pd.document_id < :after_document_id))
+        """
+        params['after_added_at'] = after_added_at
+        params['after_document_id'] = after_document_id
+
+    result = db.execute(
+        text(f"""
+            SELECT 
+                d.document_id,
+                d.file_name,
+                d.file_type,
+                d.upload_date,
+                pd.is_active,
+                pd.added_at,
+                dm.firebase_storage_path
+            FROM Pipeline_Documents pd
+            JOIN Document d ON pd.document_id = d.document_id
+            LEFT JOIN Document_Metadata dm ON dm.document_id = d.document_id
+            WHERE pd.pipeline_id = :pipeline_id{filters}
+            ORDER BY pd.added_at DESC, pd.document_id DESC
+            LIMIT :limit
+        """),
+        params
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
 def get_active_documents_in_pipeline(db: Session, pipeline_id: int) -> List[Dict[str, Any]]:
     """Get only active documents in pipeline with their details"""
     result = db.execute(
@@ -134,6 +200,22 @@ def get_active_documents_in_pipeline(db: Session, pipeline_id: int) -> List[Dict
 
     return [dict(row) for row in result.mappings().all()]
 
+def get_pipeline_document_states(db: Session, pipeline_id: int) -> List[Dict[str, Any]]:
+    result = db.execute(
+        text("""
+            SELECT 
+                pd.document_id,
+                pd.is_active,
+                dm.firebase_storage_path
+            FROM Pipeline_Documents pd
+            LEFT JOIN Document_Metadata dm ON dm.document_id = pd.document_id
+            WHERE pd.pipeline_id = :pipeline_id
+        """),
+        {'pipeline_id': pipeline_id}
+    )
+
+    return [dict(row) for row in result.mappings().all()]
+
 def is_document_in_pipeline(db: Session, pipeline_id: int, document_id: int) -> bool:
     result = db.execute(
         text("""
@@ -163,6 +245,7 @@ def toggle_document_active_status(db: Session, pipeline_id: int, document_id: in
         )
 
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
 
         select_result = db.execute(
             text("""
@@ -217,6 +300,8 @@ def remove_document_from_pipeline(db: Session, pipeline_id: int, document_id: in
         )
         
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
   
         # Use rowcount instead of mappings()
         return result.rowcount > 0
@@ -236,6 +321,8 @@ def remove_all_documents_from_pipeline(db: Session, pipeline_id: int) -> int:
         )
         
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
   
         return result.rowcount
 
@@ -255,6 +342,8 @@ def remove_inactive_documents_from_pipeline(db: Session, pipeline_id: int) -> in
         )
 
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate(PIPELINE_DOCUMENT_COUNTS, pipeline_id)
 
         return result.rowcount
     except Exception as e:
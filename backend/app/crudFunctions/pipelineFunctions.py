@@ -3,19 +3,27 @@ from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
 from .pipelineDocumentFunctions import get_count_of_documents_by_pipeline
 from .pipelineTagFunctions import get_tags_for_pipeline
+from .pipelineStatsFunctions import rebuild_pipeline_stats
+from app.services.active_document_cache import active_document_cache
+from app.services.metadata_cache import metadata_cache, PIPELINES
+from app.services.dimensionality import DEFAULT_EMBEDDING_DIMENSIONS, FULL_EMBEDDING_DIMENSIONS, validate_dimensions
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
 
 ## CREATE A PIPELINE:
-def create_pipeline(db: Session, user_id: int, pipeline_name: str, description: str) -> Optional[Dict[str, Any]]:
+def create_pipeline(db: Session, user_id: int, pipeline_name: str, description: str, embedding_dimensions: Optional[int] = None) -> Optional[Dict[str, Any]]:
     try:
         result = db.execute(
             text(""" 
-                INSERT INTO Pipeline (user_id, pipeline_name, description)
-                VALUES (:user_id, :pipeline_name, :description)
+                INSERT INTO Pipeline (user_id, pipeline_name, description, embedding_dimensions)
+                VALUES (:user_id, :pipeline_name, :description, :embedding_dimensions)
             """),
             {
                 'user_id': user_id,
                 'pipeline_name': pipeline_name,
-                'description': description
+                'description': description,
+                'embedding_dimensions': validate_dimensions(embedding_dimensions or DEFAULT_EMBEDDING_DIMENSIONS)
             }
         )
         
@@ -50,15 +58,20 @@ def get_all_pipelines(db: Session) -> List[Dict[str, Any]]:
 
 # Get Pipeline by pipeline ID:
 def get_pipeline_by_id(db: Session, pipeline_id: int, include_tags: bool = True) -> Optional[Dict[str, Any]]:
-    result = db.execute(
-        text("""
-            SELECT * 
-            FROM Pipeline 
-            WHERE pipeline_id = :pipeline_id
-        """),
-        {'pipeline_id': pipeline_id})
+    pipeline_by_pipeline_id, version = metadata_cache.lookup(PIPELINES, pipeline_id)
+
+    if pipeline_by_pipeline_id is None:
+        result = db.execute(
+            text("""
+                SELECT * 
+                FROM Pipeline 
+                WHERE pipeline_id = :pipeline_id
+            """),
+            {'pipeline_id': pipeline_id})
 
-    pipeline_by_pipeline_id = result.mappings().first()
+        pipeline_by_pipeline_id = result.mappings().first()
+        if pipeline_by_pipeline_id:
+            metadata_cache.put(PIPELINES, pipeline_id, dict(pipeline_by_pipeline_id), version)
 
     if pipeline_by_pipeline_id:
         pipeline_dict = dict(pipeline_by_pipeline_id)
@@ -97,11 +110,10 @@ def get_non_general_pipelines_by_user_id(db: Session, user_id: int) -> List[Dict
                     p.pipeline_name,
                     p.description,
                     p.created_at,
-                    COUNT(DISTINCT pd.document_id) as number_of_documents
+                    COALESCE(ps.active_documents, 0) as number_of_documents
                 FROM Pipeline p
-                LEFT JOIN Pipeline_Documents pd ON p.pipeline_id = pd.pipeline_id AND pd.is_active = TRUE
+                LEFT JOIN Pipeline_Stats ps ON ps.pipeline_id = p.pipeline_id
                 WHERE p.user_id = :user_id AND p.pipeline_name != 'general'
-                GROUP BY p.pipeline_id, p.user_id, p.pipeline_name, p.description, p.created_at
                 ORDER BY p.created_at DESC
             """),
             {'user_id': user_id}
@@ -129,7 +141,7 @@ def get_non_general_pipelines_by_user_id(db: Session, user_id: int) -> List[Dict
                 pipeline_dict['pipeline_tags'] = [dict(tag) for tag in tags]
                 
             except Exception as tag_error:
-                print(f"Error fetching tags for pipeline {pipeline_dict['pipeline_id']}: {tag_error}")
+                logger.warning("Error fetching tags for pipeline %s: %s", pipeline_dict['pipeline_id'], tag_error)
                 pipeline_dict['pipeline_tags'] = []
             
             pipelines_list.append(pipeline_dict)
@@ -137,11 +149,27 @@ def get_non_general_pipelines_by_user_id(db: Session, user_id: int) -> List[Dict
         return pipelines_list
         
     except Exception as e:
-        print(f"Error in get_non_general_pipelines_by_user_id: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_non_general_pipelines_by_user_id")
         raise e
 
+def get_pipelines_with_stats_by_user_id(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    # Every pipeline of the user, general included, with its Pipeline_Stats counts in one query
+    result = db.execute(
+        text("""
+            SELECT
+                p.*,
+                COALESCE(ps.total_documents, 0) AS total_documents,
+                COALESCE(ps.active_documents, 0) AS active_documents
+            FROM Pipeline p
+            LEFT JOIN Pipeline_Stats ps ON ps.pipeline_id = p.pipeline_id
+            WHERE p.user_id = :user_id
+            ORDER BY p.created_at DESC
+        """),
+        {'user_id': user_id}
+    )
+
+    return result.mappings().all()
+
 
 def get_pipeline_name_description(db: Session, user_id: int) -> List[Dict[str, Any]]:
     result = db.execute(
@@ -169,6 +197,13 @@ def get_general_pipeline_id(db: Session, user_id: int) -> Optional[int]:
     row = result.mappings().first()
     return row['pipeline_id'] if row else None
 
+def get_pipeline_embedding_dimensions(db: Session, pipeline_id: Optional[int]) -> int:
+    if pipeline_id is None:
+        return FULL_EMBEDDING_DIMENSIONS
+
+    row = get_pipeline_by_id(db, pipeline_id, include_tags=False)
+    return row['embedding_dimensions'] if row and row.get('embedding_dimensions') else FULL_EMBEDDING_DIMENSIONS
+
 ## UPDATE A PIPELINE:
 
 # Update a pipeline using pipeline_id:
@@ -205,12 +240,46 @@ def update_pipeline(db: Session, pipeline_id: int,
         )
         
         db.commit()
+        metadata_cache.invalidate(PIPELINES, pipeline_id)
         return get_pipeline_by_id(db, pipeline_id, True)
     
     except Exception as e:
         db.rollback()
         raise e
 
+# Switch pipelines to another embedding size once their chunks have been re-embedded at it (all pipelines if None):
+def update_pipeline_embedding_dimensions(db: Session, pipeline_ids: Optional[List[int]], embedding_dimensions: int) -> int:
+    if pipeline_ids is not None and not pipeline_ids:
+        return 0
+
+    try:
+        where = ""
+        params = {'embedding_dimensions': validate_dimensions(embedding_dimensions)}
+        if pipeline_ids is not None:
+            where = "WHERE pipeline_id IN ({})".format(', '.join(f':pipeline_id{i}' for i in range(len(pipeline_ids))))
+            params.update({f'pipeline_id{i}': pipeline_id for i, pipeline_id in enumerate(pipeline_ids)})
+
+        result = db.execute(
+            text(f"""
+                UPDATE Pipeline
+                SET embedding_dimensions = :embedding_dimensions
+                {where}
+            """),
+            params
+        )
+
+        db.commit()
+        if pipeline_ids is None:
+            metadata_cache.invalidate_namespace(PIPELINES)
+        else:
+            for pipeline_id in pipeline_ids:
+                metadata_cache.invalidate(PIPELINES, pipeline_id)
+        return result.rowcount
+
+    except Exception as e:
+        db.rollback()
+        raise e
+
 ## DELETE A PIPELINE:
 def delete_pipeline_with_procedure(db: Session, pipeline_id: int) -> bool:
     try:
@@ -225,6 +294,8 @@ def delete_pipeline_with_procedure(db: Session, pipeline_id: int) -> bool:
         )
 
         db.commit()
+        active_document_cache.invalidate(pipeline_id)
+        metadata_cache.invalidate_pipeline(pipeline_id)
         return True
     
     except Exception as e:
@@ -234,12 +305,33 @@ def delete_pipeline_with_procedure(db: Session, pipeline_id: int) -> bool:
 ## CUSTOM QUERIES:
 def get_pipeline_stats(db: Session, pipeline_id: int) -> Optional[Dict[str, Any]]:
     try:
-        result = db.execute(
-            text("CALL get_pipeline_stats(:pipeline_id)"),
-            {'pipeline_id': pipeline_id}
-        )
+        query = text("""
+            SELECT
+                p.pipeline_id,
+                p.pipeline_name,
+                ps.total_documents,
+                ps.active_documents,
+                ps.inactive_documents,
+                ps.total_word_count,
+                COALESCE(ps.total_word_count / NULLIF(ps.total_documents, 0), 0) AS average_word_count,
+                COALESCE(ps.total_file_size / NULLIF(ps.total_documents, 0), 0) AS average_file_size,
+                ps.total_chunks,
+                ps.last_upload_at AS most_recent_upload_date
+            FROM Pipeline_Stats ps
+            JOIN Pipeline p ON p.pipeline_id = ps.pipeline_id
+            WHERE ps.pipeline_id = :pipeline_id
+        """)
+
+        result = db.execute(query, {'pipeline_id': pipeline_id})
+        stats = result.mappings().first()
+
+        if stats is None:
+            # Pipelines created before Pipeline_Stats existed get their row on first read
+            if rebuild_pipeline_stats(db, [pipeline_id]) == 0:
+                return None
+            stats = db.execute(query, {'pipeline_id': pipeline_id}).mappings().first()
 
-        return result.mappings().first()
+        return stats
 
     except Exception as e:
         db.rollback()
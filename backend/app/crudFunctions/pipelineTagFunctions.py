@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
+from app.services.metadata_cache import metadata_cache, PIPELINE_TAGS
 
 
 ## CREATE PIPELINE TAG
@@ -23,6 +24,7 @@ def add_tag_to_pipeline(db, pipeline_id, tag_id) -> Optional[Dict[str, Any]]:
             )
 
             db.commit()
+            metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
 
             return result
         
@@ -52,6 +54,7 @@ def add_multiple_tags_to_pipeline(db, pipeline_id, tag_ids: List[int]) -> List[D
                 listOfTags.append({'pipeline_id': pipeline_id, 'tag_id': tag_id})
 
         db.commit()
+        metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
         return listOfTags
 
     except Exception as e:
@@ -60,6 +63,10 @@ def add_multiple_tags_to_pipeline(db, pipeline_id, tag_ids: List[int]) -> List[D
 
 ## READ/QUERY PIPELINE TAGS
 def get_tags_for_pipeline(db, pipeline_id) -> Optional[Dict[str, Any]]:
+    tags, version = metadata_cache.lookup(PIPELINE_TAGS, pipeline_id)
+    if tags is not None:
+        return tags
+
     result = db.execute(
         text(
             """
@@ -77,7 +84,9 @@ def get_tags_for_pipeline(db, pipeline_id) -> Optional[Dict[str, Any]]:
         }
     )
 
-    return result.mappings().all()
+    tags = [dict(tag) for tag in result.mappings().all()]
+    metadata_cache.put(PIPELINE_TAGS, pipeline_id, tags, version)
+    return tags
 
 def get_pipelines_with_tag(db, tag_id) -> List[Dict[str, Any]]:
     result = db.execute(
@@ -99,6 +108,29 @@ def get_pipelines_with_tag(db, tag_id) -> List[Dict[str, Any]]:
 
     return result.mappings().all()
 
+def get_tags_for_user_pipelines(db: Session, user_id: int) -> Dict[int, List[Dict[str, Any]]]:
+    # Tags of all of a user's pipelines in one query, keyed by pipeline_id
+    result = db.execute(
+        text(
+            """
+                SELECT pt.pipeline_id, t.*
+                FROM Pipeline_Tag pt
+                JOIN Pipeline p ON p.pipeline_id = pt.pipeline_id
+                JOIN Tag t ON t.tag_id = pt.tag_id
+                WHERE p.user_id = :user_id
+            """
+        ),
+        {
+            'user_id': user_id
+        }
+    )
+
+    tags_by_pipeline: Dict[int, List[Dict[str, Any]]] = {}
+    for row in result.mappings().all():
+        tag = dict(row)
+        tags_by_pipeline.setdefault(tag.pop('pipeline_id'), []).append(tag)
+    return tags_by_pipeline
+
 def does_tag_in_pipeline_exist(db: Session, pipeline_id: int, tag_id: int) -> bool:
     result = db.execute(
         text("""
@@ -131,6 +163,7 @@ def remove_tag_from_pipeline(db, pipeline_id, tag_id) -> bool:
             )
 
             db.commit()
+            metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
 
             return result.mappings().first() is not None
         
@@ -152,6 +185,7 @@ def remove_system_tag_from_pipeline(db, pipeline_id) -> bool:
         )
 
         db.commit()
+        metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
         return result.rowcount > 0
 
     except Exception as e:
@@ -172,6 +206,7 @@ def remove_all_tags_from_pipeline(db, pipeline_id) -> int:
         )
 
         db.commit()
+        metadata_cache.invalidate(PIPELINE_TAGS, pipeline_id)
         return result.rowcount
 
     except Exception as e:
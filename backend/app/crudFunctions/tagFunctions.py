@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
 from ..models import TagType
+from app.services.metadata_cache import metadata_cache, PIPELINE_TAGS, SYSTEM_TAGS
 
 ## CREATE TAG:
 def create_system_tag(db: Session, name: str, color: str) ->  Optional[Dict[str, Any]]:
@@ -19,6 +20,7 @@ def create_system_tag(db: Session, name: str, color: str) ->  Optional[Dict[str,
         )
         
         db.commit()
+        metadata_cache.invalidate_namespace(SYSTEM_TAGS)
         
         tag_id = result.lastrowid
         
@@ -89,6 +91,10 @@ def get_tag_by_id(db: Session, tag_id: int) -> Optional[Dict[str, Any]]:
     return result.mappings().first()
 
 def get_all_system_tags(db: Session) -> List[Dict[str, Any]]:
+    system_tags, version = metadata_cache.lookup(SYSTEM_TAGS)
+    if system_tags is not None:
+        return system_tags
+
     result = db.execute(
         text(
             """
@@ -102,7 +108,9 @@ def get_all_system_tags(db: Session) -> List[Dict[str, Any]]:
         }
     )
 
-    return result.mappings().all()
+    system_tags = [dict(tag) for tag in result.mappings().all()]
+    metadata_cache.put(SYSTEM_TAGS, None, system_tags, version)
+    return system_tags
 
 def get_custom_tags_by_user(db: Session, user_id: int) -> List[Dict[str, Any]]:
     result = db.execute(
@@ -164,6 +172,12 @@ def get_tag_by_name_and_user(db: Session, user_id: int, name: str) -> Optional[D
 
 ## UPDATE TAG:
 
+def _invalidate_cached_tag_lists(tag: Dict[str, Any]):
+    # A tag can be attached to any number of pipelines, so every cached pipeline tag list goes
+    metadata_cache.invalidate_namespace(PIPELINE_TAGS)
+    if tag['tag_type'] == TagType.SYSTEM.value:
+        metadata_cache.invalidate_namespace(SYSTEM_TAGS)
+
 def update_tag(db: Session, 
                tag_id: int, 
                name:Optional[str]=None, 
@@ -197,7 +211,7 @@ def update_tag(db: Session,
         )
         
         db.commit()
-        
+        _invalidate_cached_tag_lists(tag)
 
         return get_tag_by_id(db, tag_id)
 
@@ -225,6 +239,7 @@ def delete_tag(db: Session, tag_id: int) -> bool:
         )
 
         db.commit()
+        _invalidate_cached_tag_lists(tag)
 
         return result.rowcount > 0
 
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 from sqlalchemy.sql import text
+from app.metrics import time_stage
+from app.services.metadata_cache import metadata_cache
 
 ## CREATE A USER:
 def create_user(db: Session, firebase_uid: str, first_name: str, last_name: str, email: str) -> Optional[Dict[str, Any]]:
@@ -55,17 +57,18 @@ def find_user(db: Session, firebase_uid: str) -> bool:
     return user_exists.first() is not None # if the user's row is greater than 0 then our user exists, which we don't want when creating a user
 
 def get_user_by_firebase_uid(db: Session, firebase_uid: str) -> Optional[Dict[str, Any]]:
-    user = db.execute(
-        text(
-            """
-                SELECT * FROM User
-                WHERE firebase_uid = :firebase_uid
-            """
-        ),
-        {'firebase_uid': firebase_uid}
-    )
+    with time_stage("user_lookup"):
+        user = db.execute(
+            text(
+                """
+                    SELECT * FROM User
+                    WHERE firebase_uid = :firebase_uid
+                """
+            ),
+            {'firebase_uid': firebase_uid}
+        )
 
-    return user.mappings().first()
+        return user.mappings().first()
 
 def get_or_create_user_from_firebase(db: Session, firebase_uid: str, email: str) -> Dict[str, Any]:
     try:
@@ -244,6 +247,8 @@ def delete_user_by_id(db: Session, user_id: int) -> bool:
         )
         
         db.commit()
+        # Cascades to the user's pipelines, documents and tags
+        metadata_cache.invalidate_all()
   
         return result.rowcount > 0
 
@@ -1,36 +1,135 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
-from google.cloud.sql.connector import Connector
+from app.metrics import REGISTRY, db_checkout_wait, db_connect_latency, db_connections_in_use, db_overflow_connections, db_pool_timeouts
+from app.logging_config import get_logger
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 instance_connection_name = os.getenv("INSTANCE_CONNECTION_NAME")
 instance_password = os.getenv("INSTANCE_PASSWORD")
 db_name = os.getenv("DATABASE_NAME")
 db_user = os.getenv("DB_USER")
 
-connector = Connector()
+# Direct SQLAlchemy URL (e.g. mysql+pymysql://root:pw@localhost/hoos) for local development and
+# benchmarking; when set, the Cloud SQL connector is never started
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+## POOL SETTINGS
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Connections opened at startup so the first requests don't pay for the connector handshake
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "0"))
+
+_connector = None
+_connector_lock = threading.Lock()
+
+def get_connector():
+    # Connector() starts a background event loop and refresh tasks, so it is only created
+    # when the first connection is actually needed rather than at import time
+    global _connector
+    with _connector_lock:
+        if _connector is None:
+            from google.cloud.sql.connector import Connector
+            _connector = Connector()
+        return _connector
 
 def getconn():
-    conn = connector.connect(
-        instance_connection_name,  
+    started = time.perf_counter()
+    conn = get_connector().connect(
+        instance_connection_name,
         "pymysql",
         user=db_user,
         password=instance_password,
         db=db_name
     )
+    db_connect_latency.observe(time.perf_counter() - started)
     return conn
 
-engine = create_engine(
-    "mysql+pymysql://",
-    creator=getconn,
-    pool_pre_ping=True,
-    pool_recycle=3600,
+
+class InstrumentedQueuePool(QueuePool):
+    # Times every checkout, which covers both waiting for a free connection and opening a new one
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_timeouts.inc()
+            raise
+        finally:
+            db_checkout_wait.observe(time.perf_counter() - started)
+
+
+pool_settings = dict(
+    poolclass=InstrumentedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
 )
 
+if DATABASE_URL:
+    engine = create_engine(DATABASE_URL, **pool_settings)
+
+    @event.listens_for(engine, "do_connect")
+    def _time_direct_connect(dialect, conn_rec, cargs, cparams):
+        started = time.perf_counter()
+        connection = dialect.connect(*cargs, **cparams)
+        db_connect_latency.observe(time.perf_counter() - started)
+        return connection
+else:
+    engine = create_engine(
+        "mysql+pymysql://",
+        creator=getconn,
+        **pool_settings
+    )
+
+def _update_pool_gauges():
+    # Read from the pool on scrape; checkin events fire before the connection is back in the
+    # queue, so counting from events would lag by one
+    pool = engine.pool
+    db_connections_in_use.set(pool.checkedout())
+    db_overflow_connections.set(max(0, pool.overflow()))
+
+REGISTRY.add_collector(_update_pool_gauges)
+
+def prewarm_pool(count: int = DB_POOL_PREWARM) -> int:
+    # Opens connections in parallel, then returns them all to the pool idle
+    count = min(count, DB_POOL_SIZE)
+    if count <= 0:
+        return 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        connections = list(executor.map(lambda _: engine.connect(), range(count)))
+    for connection in connections:
+        connection.close()
+
+    logger.info("Pre-warmed %d MySQL connections in %.2fs", count, time.perf_counter() - started)
+    return count
+
+def dispose_engine():
+    global _connector
+    engine.dispose()
+    with _connector_lock:
+        if _connector is not None:
+            _connector.close()
+            _connector = None
+
 localSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -42,4 +141,4 @@ def get_db():
         db.rollback()
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
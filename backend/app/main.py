@@ -1,9 +1,36 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import upload, auth, pipelines, documents, conversations, tags, chat
+from fastapi.responses import JSONResponse
+from app.logging_config import configure_logging, get_logger, RequestIdMiddleware
+from app.database import dispose_engine
+from app.async_database import dispose_async_engine
+from app.services.metadata_cache import stop_invalidation_channel
+from app.services.bulk_upload import shutdown_extraction_pool
+from app.warmup import STARTUP_WARMUP, warmup
+from app.routers import upload, auth, pipelines, documents, conversations, tags, chat, metrics, dashboard
 
-app = FastAPI()
+configure_logging()
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pool pre-warming, the cache invalidation channel and the cloud clients are started by
+    # app/warmup.py; a step that fails is logged and the app serves without it
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup.run))
+    if STARTUP_WARMUP == 'blocking':
+        await warmup_task
+    yield
+    # Warm-up threads can't be interrupted, so let them finish before closing what they opened
+    await warmup_task
+    await asyncio.to_thread(stop_invalidation_channel)
+    await asyncio.to_thread(shutdown_extraction_pool)
+    await dispose_async_engine()
+    await asyncio.to_thread(dispose_engine)
+
+app = FastAPI(lifespan=lifespan)
 
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
 
@@ -18,7 +45,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "ETag", "X-Next-Cursor"],
 )
+app.add_middleware(RequestIdMiddleware)
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(upload.router, prefix="/api", tags=["upload"])
@@ -27,7 +56,14 @@ app.include_router(documents.router, prefix="/api/document", tags=["document"])
 app.include_router(conversations.router, prefix="/api/conversation", tags=["conversation"])
 app.include_router(tags.router, prefix="/api/tag", tags=["tag"] )
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(metrics.router, tags=["metrics"])
 
 @app.get("/")
 async def root():
     return {"message": "Hello from FastAPI!"}
+
+@app.get("/ready")
+async def readiness():
+    # For startup probes and load balancer health checks; / stays the liveness check
+    return JSONResponse(status_code=200 if warmup.is_ready else 503, content=warmup.report())
@@ -0,0 +1,357 @@
+### In-process metrics rendered in the Prometheus text exposition format at GET /metrics
+# Label values are declared up front so cardinality stays bounded, and recording is a
+# bisect plus an add under a lock, so it is cheap enough for the upload and chat hot paths.
+# Each uvicorn worker keeps its own registry; Prometheus sums them per scrape target.
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+STAGES = (
+    "token_verify",
+    "user_lookup",
+    "checksum",
+    "storage_upload",
+    "text_extraction",
+    "chunking",
+    "embedding_batch",
+    "firestore_write",
+    "stored_procedure",
+    "upload_critical_path",
+    "upload_total",
+    "bulk_upload_total",
+    "replace_total",
+    "query_embed",
+    "vector_search",
+    "llm_first_token",
+    "llm_total",
+)
+
+ENDPOINTS = ("upload", "bulk_upload", "chat")
+
+CACHE_NAMESPACES = (
+    "pipeline",
+    "pipeline_tags",
+    "pipeline_document_count",
+    "system_tags",
+    "document",
+    "document_metadata",
+)
+
+WARMUP_STEPS = (
+    "database_pool",
+    "cache_invalidation",
+    "firebase_auth",
+    "document_extractors",
+    "embedding_service",
+    "firestore_service",
+    "storage_service",
+    "chat_llm",
+)
+
+APIS = ("embedding", "llm")
+
+API_QUEUES = tuple(f"{api}_{priority}" for api in APIS for priority in ("interactive", "background"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_name: Optional[str] = None, label_values: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.label_values = tuple(label_values) if label_name else ("",)
+        self._lock = threading.Lock()
+
+    def _check_label(self, label: str) -> str:
+        if self.label_name is None:
+            return ""
+        if label not in self.label_values:
+            raise ValueError(f"Unknown {self.label_name} '{label}' for metric {self.name}")
+        return label
+
+    def _labels(self, label: str) -> List[Tuple[str, str]]:
+        return [(self.label_name, label)] if self.label_name else []
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[str, float] = {label: 0.0 for label in self.label_values}
+
+    def inc(self, amount: float = 1.0, label: str = ""):
+        label = self._check_label(label)
+        with self._lock:
+            self._values[label] += amount
+
+    def value(self, label: str = "") -> float:
+        return self._values[self._check_label(label)]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = dict(self._values)
+        for label in self.label_values:
+            lines.append(f"{self.name}_total{_format_labels(self._labels(label))} {_format_number(values[label])}")
+        return lines
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[str, float] = {label: 0.0 for label in self.label_values}
+
+    def set(self, value: float, label: str = ""):
+        label = self._check_label(label)
+        with self._lock:
+            self._values[label] = value
+
+    def inc(self, amount: float = 1.0, label: str = ""):
+        label = self._check_label(label)
+        with self._lock:
+            self._values[label] += amount
+
+    def dec(self, amount: float = 1.0, label: str = ""):
+        self.inc(-amount, label)
+
+    def value(self, label: str = "") -> float:
+        return self._values[self._check_label(label)]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = dict(self._values)
+        for label in self.label_values:
+            lines.append(f"{self.name}{_format_labels(self._labels(label))} {_format_number(values[label])}")
+        return lines
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[str, List[int]] = {label: [0] * (len(self.buckets) + 1) for label in self.label_values}
+        self._sums: Dict[str, float] = {label: 0.0 for label in self.label_values}
+
+    def observe(self, value: float, label: str = ""):
+        label = self._check_label(label)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[label][position] += 1
+            self._sums[label] += value
+
+    def count(self, label: str = "") -> int:
+        return sum(self._counts[self._check_label(label)])
+
+    @contextmanager
+    def time(self, label: str = ""):
+        label = self._check_label(label)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, label)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            counts = {label: list(values) for label, values in self._counts.items()}
+            sums = dict(self._sums)
+
+        for label in self.label_values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts[label]):
+                cumulative += bucket_count
+                bucket_labels = self._labels(label) + [("le", _format_number(bound))]
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self._labels(label))} {_format_number(sums[label])}")
+            lines.append(f"{self.name}_count{_format_labels(self._labels(label))} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label_name: Optional[str] = None, label_values: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_name, label_values))
+
+    def gauge(self, name: str, documentation: str, label_name: Optional[str] = None, label_values: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_name, label_values))
+
+    def histogram(self, name: str, documentation: str, label_name: Optional[str] = None, label_values: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_name, label_values, buckets=buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        # Called before every render, for gauges that are cheaper to read on scrape than to track
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+stage_latency = REGISTRY.histogram(
+    "hoos_stage_duration_seconds",
+    "Latency of each upload and chat stage in seconds",
+    "stage",
+    STAGES
+)
+chunks_processed = REGISTRY.counter(
+    "hoos_chunks",
+    "Document chunks embedded during uploads",
+)
+llm_tokens = REGISTRY.counter(
+    "hoos_llm_tokens",
+    "Tokens sent to and received from the chat LLM",
+    "direction",
+    ("prompt", "completion")
+)
+prompt_tokens_saved = REGISTRY.histogram(
+    "hoos_prompt_tokens_saved",
+    "Estimated context tokens per chat request kept out of the prompt, compared with always sending the top 5 chunks",
+    "path",
+    ("retrieval", "no_relevant_context", "small_talk"),
+    buckets=(0, 25, 50, 100, 250, 500, 750, 1000)
+)
+request_errors = REGISTRY.counter(
+    "hoos_request_errors",
+    "Upload and chat requests that failed with a server error",
+    "endpoint",
+    ENDPOINTS
+)
+
+db_checkout_wait = REGISTRY.histogram(
+    "hoos_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled MySQL connection, including opening a new one",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+db_connect_latency = REGISTRY.histogram(
+    "hoos_db_connect_duration_seconds",
+    "Time to open a new MySQL connection (Cloud SQL connector handshake or direct connect)"
+)
+db_connections_in_use = REGISTRY.gauge(
+    "hoos_db_pool_connections_in_use",
+    "MySQL connections currently checked out of the pool"
+)
+db_overflow_connections = REGISTRY.gauge(
+    "hoos_db_pool_overflow_connections",
+    "MySQL connections open beyond DB_POOL_SIZE"
+)
+db_pool_timeouts = REGISTRY.counter(
+    "hoos_db_pool_timeouts",
+    "Checkouts that gave up after DB_POOL_TIMEOUT seconds"
+)
+
+metadata_cache_hits = REGISTRY.counter(
+    "hoos_metadata_cache_hits",
+    "Pipeline, tag and document lookups served from the per-process metadata cache",
+    "namespace",
+    CACHE_NAMESPACES
+)
+metadata_cache_misses = REGISTRY.counter(
+    "hoos_metadata_cache_misses",
+    "Pipeline, tag and document lookups that had to query MySQL",
+    "namespace",
+    CACHE_NAMESPACES
+)
+
+signed_url_requests = REGISTRY.counter(
+    "hoos_signed_url_requests",
+    "Download URLs handed out, served from the signed URL cache or freshly signed",
+    "result",
+    ("cached", "signed")
+)
+
+chat_coalescing = REGISTRY.counter(
+    "hoos_chat_coalescing",
+    "Chat queries by coalescing outcome: ran as leader, shared a leader's answer, or ran alone after the leader timed out or failed",
+    "outcome",
+    ("leader", "shared", "timeout", "leader_failed")
+)
+
+api_queue_depth = REGISTRY.gauge(
+    "hoos_api_queue_depth",
+    "Calls waiting for a Vertex AI or OpenAI rate limit token, by API and priority",
+    "queue",
+    API_QUEUES
+)
+api_queue_wait = REGISTRY.histogram(
+    "hoos_api_queue_wait_seconds",
+    "Time calls waited for a rate limit token, by API and priority",
+    "queue",
+    API_QUEUES
+)
+api_rate_limited = REGISTRY.counter(
+    "hoos_api_rate_limited",
+    "Calls rejected with 429 / RESOURCE_EXHAUSTED",
+    "api",
+    APIS
+)
+api_request_rate = REGISTRY.gauge(
+    "hoos_api_request_rate_per_minute",
+    "Requests per minute the scheduler currently allows, after backing off from 429s",
+    "api",
+    APIS
+)
+
+warmup_step_duration = REGISTRY.gauge(
+    "hoos_warmup_step_duration_seconds",
+    "How long each startup warm-up step took in this worker",
+    "step",
+    WARMUP_STEPS
+)
+ready = REGISTRY.gauge(
+    "hoos_ready",
+    "1 once startup warm-up has finished and GET /ready answers 200"
+)
+
+
+def time_stage(stage: str):
+    return stage_latency.time(stage)
+
+def render_metrics() -> str:
+    return REGISTRY.render()
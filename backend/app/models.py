@@ -33,6 +33,7 @@ class Pipeline(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey('User.user_id', ondelete='CASCADE', onupdate='CASCADE'), nullable=False)
     pipeline_name: Mapped[str] = mapped_column(String(50), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
+    embedding_dimensions: Mapped[int] = mapped_column(nullable=False, server_default='768')
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
 
 class Document(Base):
@@ -0,0 +1,56 @@
+### Keyset pagination for the list endpoints
+# Pages are ordered by (timestamp, id) and the next page starts strictly after the last row's
+# key, so every page costs one index range scan no matter how deep the client has paged.
+# Cursors are opaque to clients: base64url JSON naming the list they belong to and the key.
+
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# Set on paginated responses when there is another page; absent on the last one
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# (sort timestamp or None, row id)
+CursorKey = Tuple[Optional[datetime], int]
+
+def encode_cursor(kind: str, sort_value: Optional[datetime], row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps(
+        {'k': kind, 't': sort_value, 'id': int(row_id)},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str], kind: str) -> Optional[CursorKey]:
+    # Raises a 400 for cursors that weren't issued for this list
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload['k'] != kind:
+            raise KeyError('k')
+        sort_value = datetime.fromisoformat(payload['t']) if payload['t'] is not None else None
+        return sort_value, int(payload['id'])
+    except (binascii.Error, UnicodeError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def split_page(rows: Sequence[Any], limit: int, kind: str,
+               key: Callable[[Any], CursorKey]) -> Tuple[List[Any], Optional[str]]:
+    # Page queries fetch limit + 1 rows; the extra row only says whether another page exists
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    sort_value, row_id = key(page[-1])
+    return page, encode_cursor(kind, sort_value, row_id)
@@ -5,10 +5,14 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.services.firebase_auth import verify_firebase_token
 from app.services.rag_service import RAGService
-from app.crudFunctions import userFunctions, conversationFunctions, messageFunctions
+from app.services.active_document_cache import active_document_cache
+from app.metrics import request_errors
+from app.crudFunctions import userFunctions, conversationFunctions, messageFunctions, pipelineDocumentFunctions, pipelineFunctions
 from app.database import get_db
+from app.logging_config import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 def get_rag_service():
     try:
@@ -79,7 +83,8 @@ async def send_chat_message(
 
         conversation_history = []
         if request.conversation_id:
-            messages = messageFunctions.get_all_messages_in_conversation(db, conversation_id)
+            # The RAG prompt only uses the last 10 turns, the new user message included
+            messages = reversed(messageFunctions.get_recent_messages(db, conversation_id, limit=10))
             for msg in messages:
                 role = "user" if msg["sender_type"] == "user" else "bot"
                 conversation_history.append({
@@ -87,12 +92,21 @@ async def send_chat_message(
                     "content": msg["message_text"]
                 })
 
+        active_documents = None
+        if pipeline_id is not None:
+            active_documents = active_document_cache.get(
+                pipeline_id,
+                lambda: pipelineDocumentFunctions.get_pipeline_document_states(db, pipeline_id)
+            )
+
         rag_service = get_rag_service()
-        rag_response = rag_service.chat(
+        # Identical questions in flight are coalesced on the event loop; only the first one's work runs on a thread
+        rag_response = await rag_service.chat(
             query=request.message_text,
             pipeline_id=pipeline_id,
             conversation_history=conversation_history,
-            top_k=5
+            active_documents=active_documents,
+            embedding_dimensions=pipelineFunctions.get_pipeline_embedding_dimensions(db, pipeline_id)
         )
 
         bot_message = messageFunctions.create_bot_message(
@@ -116,10 +130,8 @@ async def send_chat_message(
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"ERROR IN send_chat_message: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        request_errors.inc(label="chat")
+        logger.exception("Error in send_chat_message")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.post("/conversation/{pipeline_id}/new")
@@ -155,7 +167,7 @@ async def create_new_conversation(
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
-        print("ERROR IN create_new_conversation:", e)
+        logger.exception("Error in create_new_conversation")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/conversation/{conversation_id}")
@@ -195,5 +207,5 @@ async def delete_conversation(
     except HTTPException:
         raise
     except Exception as e:
-        print("ERROR IN delete_conversation:", e)
+        logger.exception("Error in delete_conversation")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
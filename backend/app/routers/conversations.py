@@ -1,13 +1,16 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.services.firebase_auth import verify_firebase_token
 from app.crudFunctions import userFunctions, pipelineFunctions, conversationFunctions, messageFunctions
 from app.database import get_db
+from app.logging_config import get_logger
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, split_page
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 class ConversationResponse(BaseModel):
     conversation_id: int
@@ -27,9 +30,13 @@ class MessageResponse(BaseModel):
 @router.get("/pipeline/{pipeline_id}/conversations", response_model=List[ConversationResponse])
 async def getConversations(
     pipeline_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
+    after = decode_cursor(cursor, "conversations")
     try:
         if not authorization or not authorization.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing authorization")
@@ -49,55 +56,51 @@ async def getConversations(
         if pipeline["user_id"] != user["user_id"]:
             raise HTTPException(status_code=403, detail="Unauthorized")
 
-        list_of_conversations_unformatted = conversationFunctions.get_conversations_by_pipeline(
+        # The page query includes each conversation's first message
+        list_of_conversations_unformatted = conversationFunctions.get_conversations_by_pipeline_page(
             db,
-            pipeline_id=pipeline_id
+            pipeline_id=pipeline_id,
+            limit=limit,
+            after_last_message_at=after[0] if after else None,
+            after_conversation_id=after[1] if after else None
         )
 
+        page, next_cursor = split_page(
+            list_of_conversations_unformatted,
+            limit,
+            "conversations",
+            lambda conversation: (conversation["last_message_at"], conversation["conversation_id"])
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
         list_of_conversations = []
 
-        for eachConversation in list_of_conversations_unformatted:
+        for eachConversation in page:
             conversation_dict = dict(eachConversation)
-            
-            conversation_id = conversation_dict.get("conversation_id")
-            
-            if conversation_id:
-                try:
-                    first_message = messageFunctions.get_first_message_in_conversation(
-                        db, 
-                        conversation_id
-                    )
-                    
-                    if first_message:
-                        conversation_dict["first_message_content"] = first_message.get("message_text", "No messages yet")
-                    else:
-                        conversation_dict["first_message_content"] = "No messages yet"
-                        
-                except Exception as msg_error:
-                    print(f"Error getting first message for conversation {conversation_id}: {msg_error}")
-                    conversation_dict["first_message_content"] = "No messages yet"
-            else:
+            if conversation_dict.get("first_message_content") is None:
                 conversation_dict["first_message_content"] = "No messages yet"
-            
             list_of_conversations.append(conversation_dict)
         
         return list_of_conversations
 
     except ValueError as e:
-        print(f"ValueError in getConversations: {str(e)}")
+        logger.info("ValueError in getConversations: %s", e)
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
-        print(f"ERROR IN getConversations: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in getConversations")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/conversation/{conversation_id}/messages", response_model=List[MessageResponse])
 async def getMessagesFromConversation(
     conversation_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
+    after = decode_cursor(cursor, "messages")
     try:
         if not authorization or not authorization.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing authorization")
@@ -117,15 +120,27 @@ async def getMessagesFromConversation(
         if conversation["user_id"] != user["user_id"]:
             raise HTTPException(status_code=403, detail="Unauthorized")
 
-        list_of_messages = messageFunctions.get_all_messages_in_conversation(
+        list_of_messages = messageFunctions.get_messages_page(
             db,
-            conversation_id=conversation_id
+            conversation_id=conversation_id,
+            limit=limit,
+            after_timestamp=after[0] if after else None,
+            after_message_id=after[1] if after else None
+        )
+
+        page, next_cursor = split_page(
+            list_of_messages,
+            limit,
+            "messages",
+            lambda message: (message["timestamp"], message["message_id"])
         )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
-        return list_of_messages if list_of_messages else []
+        return page
 
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
-        print("ERROR IN getMessagesFromConversation:", e)
+        logger.exception("Error in getMessagesFromConversation")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,142 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.services.firebase_auth import verify_firebase_token
+from app.crudFunctions import userFunctions, pipelineFunctions, tagFunctions, pipelineTagFunctions, conversationFunctions
+from app.database import get_db
+from app.logging_config import get_logger
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+class UserResponse(BaseModel):
+    user_id: int
+    firebase_uid: str
+    first_name: str
+    last_name: str
+    email: str
+
+class TagResponse(BaseModel):
+    tag_id: int
+    user_id: Optional[int]
+    name: str
+    color: str
+    tag_type: str
+    created_at: datetime
+
+class PipelineResponse(BaseModel):
+    pipeline_id: int
+    user_id: int
+    pipeline_name: str
+    description: str
+    created_at: datetime
+    number_of_documents: Optional[int]
+    pipeline_tags: List[TagResponse] = []
+
+class ConversationResponse(BaseModel):
+    conversation_id: int
+    pipeline_id: Optional[int]
+    user_id: int
+    created_at: datetime
+    last_message_at: Optional[datetime]
+    first_message_content: Optional[str]
+
+class BootstrapResponse(BaseModel):
+    user: UserResponse
+    general_pipeline: Optional[PipelineResponse]
+    pipelines: List[PipelineResponse]
+    system_tags: List[TagResponse]
+    recent_conversations: List[ConversationResponse]
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Proxies may hand back a weak version of our strong tag
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+@router.get("/bootstrap", response_model=BootstrapResponse)
+async def getDashboardBootstrap(
+    conversations_per_pipeline: int = Query(10, ge=0, le=50),
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    # Everything the landing view needs in one request: the user, their pipelines with tags
+    # and document counts, the system tags and recent conversations, in at most five queries
+    try:
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+
+        token = authorization.replace("Bearer ", "")
+        firebase_user = verify_firebase_token(token)
+        firebase_uid = firebase_user.get("uid")
+
+        user = userFunctions.get_user_by_firebase_uid(db, firebase_uid)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        user_id = user["user_id"]
+
+        pipeline_rows = pipelineFunctions.get_pipelines_with_stats_by_user_id(db, user_id)
+        tags_by_pipeline = pipelineTagFunctions.get_tags_for_user_pipelines(db, user_id)
+        system_tags = tagFunctions.get_all_system_tags(db)
+        recent_conversations = conversationFunctions.get_recent_conversations_per_pipeline(
+            db,
+            user_id,
+            conversations_per_pipeline
+        ) if conversations_per_pipeline else []
+
+        general_pipeline = None
+        pipelines = []
+        for row in pipeline_rows:
+            pipeline_dict = dict(row)
+            if pipeline_dict["pipeline_name"] == "general":
+                # Same shape as /get-default-pipeline: every document, no tags
+                pipeline_dict["number_of_documents"] = pipeline_dict["total_documents"]
+                pipeline_dict["pipeline_tags"] = []
+                general_pipeline = pipeline_dict
+            else:
+                # Same shape as /get-non-default-pipelines: active documents only
+                pipeline_dict["number_of_documents"] = pipeline_dict["active_documents"]
+                pipeline_dict["pipeline_tags"] = tags_by_pipeline.get(pipeline_dict["pipeline_id"], [])
+                pipelines.append(pipeline_dict)
+
+        conversations = []
+        for conversation in recent_conversations:
+            conversation_dict = dict(conversation)
+            if conversation_dict.get("first_message_content") is None:
+                conversation_dict["first_message_content"] = "No messages yet"
+            conversations.append(conversation_dict)
+
+        bootstrap = BootstrapResponse(
+            user=dict(user),
+            general_pipeline=general_pipeline,
+            pipelines=pipelines,
+            system_tags=[dict(tag) for tag in system_tags],
+            recent_conversations=conversations
+        )
+
+        content = bootstrap.model_dump(mode="json")
+        body = json.dumps(content, sort_keys=True, separators=(",", ":"))
+        etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+        # The browser revalidates every time and gets a 304 with no body when nothing changed
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        return JSONResponse(content=content, headers=headers)
+
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error in getDashboardBootstrap")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -4,12 +4,15 @@ from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.services.firebase_auth import verify_firebase_token
-from app.services.firestore_service import FirestoreService
+from app.services.service_factory import shared_firestore_service
+from app.services.signed_urls import signed_url_service
 from app.crudFunctions import userFunctions, documentFunctions, pipelineDocumentFunctions
 from app.database import get_db
+from app.logging_config import get_logger
 from sqlalchemy import text
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 class TokenRequest(BaseModel):
     token: str
@@ -24,6 +27,7 @@ class DocumentMetadataResponse(BaseModel):
     encoding: str
     firebase_storage_path: str
     firebase_download_url: str
+    firebase_download_url_expires_at: Optional[datetime]
     checksum: str
     mime_type: str
     created_at: datetime
@@ -65,6 +69,13 @@ async def get_document_metadata(
                 detail="Document metadata not found"
             )
 
+        # The URL stored at upload time has long expired, so hand out a fresh (cached) one
+        storage_path = document_metadata.get("firebase_storage_path")
+        if storage_path:
+            signed = signed_url_service.get(storage_path)
+            document_metadata["firebase_download_url"] = signed.url
+            document_metadata["firebase_download_url_expires_at"] = signed.expires_at
+
         return document_metadata
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -102,9 +113,9 @@ async def deleteDocument(
         
         file_name = document.get("file_name")
         
-        firestore_service = FirestoreService()
+        firestore_service = shared_firestore_service()
         deleted_embeddings = firestore_service.delete_embeddings_by_file(file_name, pipeline_id)
-        print(f"Deleted {deleted_embeddings} embeddings from Firestore for document {document_id}")
+        logger.info("Deleted %d embeddings from Firestore for document %s", deleted_embeddings, document_id)
     
         success = pipelineDocumentFunctions.remove_document_from_pipeline(
             db,
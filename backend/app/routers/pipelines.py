@@ -1,15 +1,20 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, Header
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from pydantic import BaseModel, field_validator
 from sqlalchemy.orm import Session
 from app.services.firebase_auth import verify_firebase_token
+from app.services.signed_urls import signed_url_service
+from app.services.dimensionality import validate_dimensions
 from app.crudFunctions import userFunctions, pipelineFunctions, pipelineDocumentFunctions, tagFunctions, pipelineTagFunctions
 from app.database import get_db
+from app.logging_config import get_logger
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, split_page
 from sqlalchemy import text
 
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 class TokenRequest(BaseModel):
     token: str
@@ -42,6 +47,13 @@ class CreatePipelineRequest(BaseModel):
     pipeline_name: str
     pipeline_description: str
     system_tag_id: int
+    embedding_dimensions: Optional[int] = None
+
+    # Checked here so an unsupported size is a 422, not a failure inside the route
+    @field_validator('embedding_dimensions')
+    @classmethod
+    def check_embedding_dimensions(cls, value: Optional[int]) -> Optional[int]:
+        return validate_dimensions(value) if value is not None else None
 
 class EditPipelineRequest(BaseModel):
     pipeline_id: int
@@ -150,7 +162,7 @@ async def getNonDefaultPipelines(
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
-        print("ERROR IN getNonDefaultPipelines:", e)
+        logger.exception("Error in getNonDefaultPipelines")
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.post("/create-new-pipeline", response_model=PipelineResponse)
@@ -191,7 +203,8 @@ async def createNewPipeline(
             db,
             user_id,
             request.pipeline_name,
-            request.pipeline_description
+            request.pipeline_description,
+            request.embedding_dimensions
         )
 
         if not created_pipeline:
@@ -210,7 +223,7 @@ async def createNewPipeline(
                 tag_id=request.system_tag_id
             )
         except Exception as tag_error:
-            print(f"Failed to add system tag, rolling back pipeline creation: {tag_error}")
+            logger.warning("Failed to add system tag, rolling back pipeline creation: %s", tag_error)
             pipelineFunctions.delete_pipeline_with_procedure(db, pipeline_id)
             raise HTTPException(
                 status_code=500,
@@ -297,9 +310,13 @@ async def deletePipeline(
 @router.get("/{pipeline_id}/documents")
 async def get_pipeline_documents(
     pipeline_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
     authorization: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
+    after = decode_cursor(cursor, "pipeline_documents")
     try:
         if not authorization or not authorization.startswith("Bearer "):
             raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
@@ -333,16 +350,36 @@ async def get_pipeline_documents(
                 detail="You don't have permission to delete this pipeline"
             )
         
-        documents = pipelineDocumentFunctions.get_documents_in_pipeline(
+        documents = pipelineDocumentFunctions.get_documents_in_pipeline_page(
             db,
             pipeline_id,
-            is_active=True
+            limit,
+            is_active=True,
+            after_added_at=after[0] if after else None,
+            after_document_id=after[1] if after else None
         )
 
+        page, next_cursor = split_page(
+            documents,
+            limit,
+            "pipeline_documents",
+            lambda document: (document["added_at"], document["document_id"])
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+        # One batch for the whole page; most URLs come straight from the cache
+        signed_urls = signed_url_service.get_many(document["firebase_storage_path"] for document in page)
+        for document in page:
+            signed = signed_urls.get(document["firebase_storage_path"])
+            document["download_url"] = signed.url if signed else None
+            document["download_url_expires_at"] = signed.expires_at if signed else None
+
         return {
             "success": True,
             "pipeline_id": pipeline_id,
-            "documents": documents
+            "documents": page,
+            "next_cursor": next_cursor
         }
 
     except Exception as e:
@@ -402,7 +439,7 @@ async def editPipeline(
                 db.commit()
 
             except Exception as e:
-                print("Error in removing old system tag: {e}")
+                logger.warning("Error in removing old system tag: %s", e)
 
             pipelineTagFunctions.add_tag_to_pipeline(
                 db=db,
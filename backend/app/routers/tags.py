@@ -6,10 +6,12 @@ from sqlalchemy.orm import Session
 from app.services.firebase_auth import verify_firebase_token
 from app.crudFunctions import userFunctions, pipelineFunctions, tagFunctions, pipelineTagFunctions
 from app.database import get_db
+from app.logging_config import get_logger
 from sqlalchemy import text
 
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 class TokenRequest(BaseModel):
     token: str
@@ -70,7 +72,7 @@ async def getNonDefaultPipelines(
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
-        print("ERROR IN getNonDefaultPipelines:", e)
+        logger.exception("Error in getNonDefaultPipelines")
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.post("/create-custom-tag", response_model=TagResponse)
@@ -114,7 +116,7 @@ async def createCustomTag(
                 tag_id=tag_id
             )
         except Exception as tag_error:
-            print(f"Failed to add custom tag, rolling back custom tag creation: {tag_error}")
+            logger.warning("Failed to add custom tag, rolling back custom tag creation: %s", tag_error)
             tagFunctions.delete_tag(db, tag_id)
             raise HTTPException(
                 status_code=500,
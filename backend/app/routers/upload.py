@@ -1,12 +1,15 @@
-import hashlib
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Header
 from sqlalchemy.orm import Session
 from app.services.firebase_auth import verify_firebase_token
-from app.services.document_processor import DocumentProcessor
-from app.services.firebase_storage import FirebaseStorageService
-from app.services.embedding_service import EmbeddingService
-from app.services.firestore_service import FirestoreService
+from app.services.document_processor import DocumentProcessor, file_sha256
+from app.services.service_factory import pipeline_embedding, shared_storage_service, shared_firestore_service
+from app.metrics import time_stage, stage_latency, chunks_processed, request_errors
+from app.services.stage_dag import Stage, StageDAG
+from app.services.bulk_upload import BULK_UPLOAD_MAX_FILES, BulkUploader, BulkUploadFile
+from app.services.document_replacement import DocumentReplacer
+from app.logging_config import get_logger
+import logging
 import tempfile
 import os
 import uuid
@@ -16,13 +19,7 @@ from app.crudFunctions import userFunctions, pipelineFunctions, pipelineDocument
 from app.database import get_db
 
 router = APIRouter()
-
-def calculate_checksum(file_path: str) -> str:
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+logger = get_logger(__name__)
 
 @router.post("/upload-simple")
 async def upload_document_simple(
@@ -80,31 +77,44 @@ async def upload_document_simple(
         
         try:
             file_size = os.path.getsize(tmp_file_path)
-            checksum = calculate_checksum(tmp_file_path)
-
-            storage_service = FirebaseStorageService()
-            firebase_storage_path, download_url = storage_service.upload_file(
-                file_path=tmp_file_path,
-                firebase_uid=firebase_uid,
-                file_name=file.filename
-            )
-            
             processor = DocumentProcessor()
             file_type = processor.get_file_type_from_path(file.filename)
-            text, metadata = processor.extract_text(tmp_file_path, file_type)
-            chunks = processor.chunk_text(text)
+            mime_type = file.content_type or "application/pdf"
+            embedding_service, embedding_dimensions = pipeline_embedding(pipeline_id, pipeline.get("embedding_dimensions"))
 
-            word_count = len(text.split())
-            page_count = metadata.get("page_count", 1) if metadata else 1
-            
-            embedding_service = EmbeddingService()
-            embeddings = embedding_service.generate_embeddings(chunks)
-            
-            chunk_ids = [f"{firebase_uid}_{uuid.uuid4()}_{i}" for i in range(len(chunks))]
-            
-            firestore_service = FirestoreService()
-            stored_count = 0
-            if len(embeddings) > 0:
+            storage_service = shared_storage_service()
+            firestore_service = shared_firestore_service()
+            # Chosen up front so the Firestore chunks can reference the blob while it is still uploading
+            firebase_storage_path = storage_service.new_storage_path(firebase_uid, file.filename)
+            chunk_ids = []
+
+            def upload_to_storage(_):
+                _, download_url = storage_service.upload_file(
+                    file_path=tmp_file_path,
+                    firebase_uid=firebase_uid,
+                    file_name=file.filename,
+                    storage_path=firebase_storage_path
+                )
+                return download_url
+
+            def extract_text(_):
+                return processor.extract_text(tmp_file_path, file_type)
+
+            def chunk_text(results):
+                text, _ = results["text_extraction"]
+                return processor.chunk_text(text)
+
+            def embed_chunks(results):
+                chunks = results["chunking"]
+                embeddings = embedding_service.generate_embeddings(chunks, output_dimensionality=embedding_dimensions)
+                chunks_processed.inc(len(chunks))
+                return embeddings
+
+            def write_embeddings(results):
+                chunks, embeddings = results["chunking"], results["embedding"]
+                if len(embeddings) == 0:
+                    return 0
+                chunk_ids.extend(f"{firebase_uid}_{uuid.uuid4()}_{i}" for i in range(len(chunks)))
                 vector_metadata = [
                     {
                         "storage_path": firebase_storage_path,
@@ -116,36 +126,64 @@ async def upload_document_simple(
                     }
                     for i in range(len(chunks))
                 ]
-                stored_count = firestore_service.add_embeddings_batch(embeddings, chunk_ids, chunks, vector_metadata)
-            
-            print(f"\n{'=' * 50}")
-            print(f"EMBEDDINGS GENERATED AND STORED FOR: {file.filename}")
-            print(f"{'=' * 50}")
-            print(f"Total chunks: {len(chunks)}")
-            print(f"Total embeddings: {len(embeddings)}")
-            print(f"Embeddings stored in Firestore: {stored_count}")
-            for i, embedding in enumerate(embeddings):
-                print(f"\n--- Embedding {i} (ID: {chunk_ids[i]}) ---")
-                print(f"Shape: {embedding.shape}")
-                print(f"Min: {embedding.min():.4f}, Max: {embedding.max():.4f}, Mean: {embedding.mean():.4f}")
-            print(f"{'=' * 50}\n")
-
-            document_id = documentFunctions.insert_document_with_stored_procedure(
-                db=db,
-                user_id=user_id,
-                file_name=file.filename,
-                file_type=file_type,
-                pipeline_id=pipeline_id,
-                file_size=file_size,
-                page_count=page_count,
-                word_count=word_count,
-                language="en",
-                encoding="utf-8",
-                firebase_storage_path=firebase_storage_path,
-                checksum=checksum,
-                mime_type=file.content_type or "application/pdf",
-                chunks=chunks
+                return firestore_service.add_embeddings_batch(embeddings, chunk_ids, chunks, vector_metadata)
+
+            def insert_document(results):
+                text, metadata = results["text_extraction"]
+                return documentFunctions.insert_document_with_stored_procedure(
+                    db=db,
+                    user_id=user_id,
+                    file_name=file.filename,
+                    file_type=file_type,
+                    pipeline_id=pipeline_id,
+                    file_size=file_size,
+                    page_count=metadata.get("page_count", 1) if metadata else 1,
+                    word_count=len(text.split()),
+                    language="en",
+                    encoding="utf-8",
+                    firebase_storage_path=firebase_storage_path,
+                    checksum=results["checksum"],
+                    mime_type=mime_type,
+                    chunks=results["chunking"]
+                )
+
+            # The Storage upload overlaps extraction and embedding, and the Firestore and MySQL writes
+            # overlap each other. The MySQL row is what makes the document visible, so it waits for the
+            # blob. If any stage fails, the blob, chunks and row already written are removed again.
+            dag = StageDAG([
+                Stage("checksum", lambda _: file_sha256(tmp_file_path)),
+                Stage("storage_upload", upload_to_storage,
+                      compensate=lambda _: storage_service.delete_file(firebase_storage_path)),
+                Stage("text_extraction", extract_text),
+                Stage("chunking", chunk_text, depends_on=("text_extraction",)),
+                Stage("embedding", embed_chunks, depends_on=("chunking",)),
+                Stage("firestore_write", write_embeddings, depends_on=("chunking", "embedding"),
+                      compensate=lambda _: firestore_service.delete_embeddings(chunk_ids, pipeline_id, [firebase_storage_path]),
+                      compensate_on_failure=True),
+                Stage("stored_procedure", insert_document, depends_on=("checksum", "storage_upload", "text_extraction", "chunking"),
+                      compensate=lambda document_id: documentFunctions.delete_document_by_id(db, document_id)),
+            ])
+            with time_stage("upload_total"):
+                run = await dag.run()
+            stage_latency.observe(run.critical_path_s, label="upload_critical_path")
+
+            chunks, embeddings = run.results["chunking"], run.results["embedding"]
+            stored_count = run.results["firestore_write"]
+            document_id = run.results["stored_procedure"]
+            download_url = run.results["storage_upload"]
+
+            logger.info(
+                "Embeddings generated and stored",
+                extra={"file_name": file.filename, "chunks": len(chunks), "embeddings": len(embeddings), "stored": stored_count,
+                       "stages": run.summary()}
             )
+            # Per-embedding stats touch every vector, so only compute them when someone asked for debug logs
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, embedding in enumerate(embeddings):
+                    logger.debug(
+                        "Embedding %d (ID: %s) shape=%s min=%.4f max=%.4f mean=%.4f",
+                        i, chunk_ids[i], embedding.shape, embedding.min(), embedding.max(), embedding.mean()
+                    )
 
             document = documentFunctions.get_document_by_document_id(db, document_id)
 
@@ -167,6 +205,166 @@ async def upload_document_simple(
                 os.unlink(tmp_file_path)
     
     except Exception as e:
+        if not isinstance(e, HTTPException):
+            request_errors.inc(label="upload")
+            logger.exception("Upload failed for %s", file.filename)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/replace-document/{pipeline_id}/{document_id}")
+async def replace_document(
+    pipeline_id: int,
+    document_id: int,
+    file: UploadFile = File(...),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    try:
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+        
+        token = authorization.replace("Bearer ", "")
+        firebase_user = verify_firebase_token(token)
+        firebase_uid = firebase_user.get("uid")
+        
+        if not firebase_uid:
+            raise HTTPException(status_code=401, detail="Invalid token: no UID found")
+        
+        user = userFunctions.get_user_by_firebase_uid(db, firebase_uid)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        user_id = user["user_id"]
+
+        pipeline = pipelineFunctions.get_pipeline_by_id(db, pipeline_id)
+        if not pipeline:
+            raise HTTPException(status_code=404, detail="Pipeline not found")
+        
+        if pipeline["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="You don't have permission to modify this pipeline")
+
+        document = documentFunctions.get_document_by_document_id(db, document_id)
+        if not document or not pipelineDocumentFunctions.is_document_in_pipeline(db, pipeline_id, document_id):
+            raise HTTPException(status_code=404, detail="Document not found in this pipeline")
+
+        if document["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="You don't have permission to replace this document")
+
+        document_metadata = documentFunctions.get_document_metadata_by_document_id(db, document_id)
+        if not document_metadata or not document_metadata.get("firebase_storage_path"):
+            raise HTTPException(status_code=404, detail="Document metadata not found")
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+            tmp_file.write(await file.read())
+            tmp_file_path = tmp_file.name
+
+        try:
+            # Keeps the document_id, storage path and the vectors of every chunk whose text didn't change
+            replacer = DocumentReplacer(
+                db, user_id, firebase_uid, pipeline_id, document_id,
+                document_metadata["firebase_storage_path"], pipeline.get("embedding_dimensions")
+            )
+            with time_stage("replace_total"):
+                result = await replacer.run(
+                    tmp_file_path, file.filename, file.content_type or "application/pdf", document_metadata.get("checksum")
+                )
+            logger.info("Document replaced", extra={"document_id": document_id, "file_name": file.filename, **result})
+
+            return {
+                "success": True,
+                "document_id": document_id,
+                "pipeline_id": pipeline_id,
+                "file_name": file.filename,
+                "storage_path": document_metadata["firebase_storage_path"],
+                **result
+            }
+        finally:
+            if os.path.exists(tmp_file_path):
+                os.unlink(tmp_file_path)
+
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        request_errors.inc(label="upload")
+        logger.exception("Replacing document %s with %s failed", document_id, file.filename)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload-bulk")
+async def upload_documents_bulk(
+    files: List[UploadFile] = File(...),
+    pipeline_id: int = Form(...),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    if len(files) > BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_UPLOAD_MAX_FILES} files can be uploaded at once")
+
+    try:
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+        
+        token = authorization.replace("Bearer ", "")
+        firebase_user = verify_firebase_token(token)
+        firebase_uid = firebase_user.get("uid")
+        
+        if not firebase_uid:
+            raise HTTPException(status_code=401, detail="Invalid token: no UID found")
+        
+        user = userFunctions.get_user_by_firebase_uid(db, firebase_uid)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        user_id = user["user_id"]
+
+        pipeline = pipelineFunctions.get_pipeline_by_id(db, pipeline_id)
+        if not pipeline:
+            raise HTTPException(status_code=404, detail="Pipeline not found")
+        
+        if pipeline["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="You don't have permission to upload to this pipeline")
+
+        # In the order the files were sent; rejected files never reach the uploader
+        results: List[BulkUploadFile] = []
+        bulk_files: List[BulkUploadFile] = []
+        try:
+            for file in files:
+                if not file.filename.endswith('.pdf'):
+                    results.append(BulkUploadFile(file_name=file.filename, file_path="", error="Only PDF files are supported"))
+                    continue
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+                    tmp_file.write(await file.read())
+                bulk_files.append(BulkUploadFile(
+                    file_name=file.filename,
+                    file_path=tmp_file.name,
+                    mime_type=file.content_type or "application/pdf"
+                ))
+                results.append(bulk_files[-1])
+
+            uploader = BulkUploader(db, user_id, firebase_uid, pipeline_id, pipeline.get("embedding_dimensions"))
+            await uploader.run(bulk_files)
+            logger.info("Bulk upload finished", extra=uploader.summary(bulk_files))
+
+            succeeded = sum(1 for f in results if f.error is None)
+            return {
+                "success": succeeded == len(results),
+                "pipeline_id": pipeline_id,
+                "uploaded": succeeded,
+                "failed": len(results) - succeeded,
+                "files": [f.result() for f in results]
+            }
+        finally:
+            for f in bulk_files:
+                if os.path.exists(f.file_path):
+                    os.unlink(f.file_path)
     
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        request_errors.inc(label="bulk_upload")
+        logger.exception("Bulk upload of %d files failed", len(files))
+        raise HTTPException(status_code=500, detail=str(e))
 
@@ -21,6 +21,7 @@ CREATE_PIPELINE_TABLE = """
         user_id INT NOT NULL,
         pipeline_name VARCHAR(50) NOT NULL,
         description TEXT,
+        embedding_dimensions INT NOT NULL DEFAULT 768,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         PRIMARY KEY (pipeline_id),
         FOREIGN KEY (user_id) REFERENCES `User` (user_id)
@@ -86,6 +87,7 @@ CREATE_PIPELINE_DOCUMENTS_TABLE = """
         added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         is_active BOOLEAN DEFAULT TRUE,
         PRIMARY KEY (pipeline_id, document_id),
+        INDEX idx_pipeline_documents_added (pipeline_id, added_at, document_id),
         FOREIGN KEY (pipeline_id) REFERENCES `Pipeline` (pipeline_id)
             ON DELETE CASCADE
             ON UPDATE CASCADE,
@@ -103,6 +105,7 @@ CREATE_CONVERSATION_TABLE = """
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         last_message_at TIMESTAMP,
         PRIMARY KEY (conversation_id),
+        INDEX idx_conversation_pipeline_recent (pipeline_id, last_message_at, conversation_id),
         FOREIGN KEY (user_id) REFERENCES `User` (user_id)
             ON DELETE CASCADE
             ON UPDATE CASCADE,
@@ -120,6 +123,7 @@ CREATE_MESSAGE_TABLE = """
         message_text TEXT NOT NULL,
         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         PRIMARY KEY (message_id),
+        INDEX idx_message_conversation_time (conversation_id, timestamp, message_id),
         FOREIGN KEY (conversation_id) REFERENCES `Conversation` (conversation_id)
             ON DELETE CASCADE
             ON UPDATE CASCADE
@@ -155,6 +159,38 @@ CREATE_PIPELINE_TAG_TABLE = """
     );
 """
 
+# One row per pipeline, kept current by the triggers in scripts/create_triggers.py and
+# checked / rebuilt by scripts/check_pipeline_stats.py
+CREATE_PIPELINE_STATS_TABLE = """
+    CREATE TABLE `Pipeline_Stats` (
+        pipeline_id INT NOT NULL,
+        total_documents INT NOT NULL DEFAULT 0,
+        active_documents INT NOT NULL DEFAULT 0,
+        inactive_documents INT NOT NULL DEFAULT 0,
+        total_word_count BIGINT NOT NULL DEFAULT 0,
+        total_file_size BIGINT NOT NULL DEFAULT 0,
+        total_chunks INT NOT NULL DEFAULT 0,
+        last_upload_at TIMESTAMP NULL DEFAULT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (pipeline_id),
+        FOREIGN KEY (pipeline_id) REFERENCES `Pipeline` (pipeline_id)
+            ON DELETE CASCADE
+            ON UPDATE CASCADE
+    );
+"""
+
+# Append-only log of metadata cache invalidations, polled by every worker when
+# METADATA_CACHE_INVALIDATION=mysql (see app/services/metadata_cache.py)
+CREATE_CACHE_INVALIDATION_TABLE = """
+    CREATE TABLE `Cache_Invalidation` (
+        invalidation_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        namespace VARCHAR(64) NOT NULL,
+        cache_key VARCHAR(64) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_cache_invalidation_created_at (created_at)
+    );
+"""
+
 ALL_TABLES = [
     CREATE_USER_TABLE,
     CREATE_PIPELINE_TABLE,
@@ -165,5 +201,39 @@ ALL_TABLES = [
     CREATE_CONVERSATION_TABLE,
     CREATE_MESSAGE_TABLE,
     CREATE_TAG_TABLE,
-    CREATE_PIPELINE_TAG_TABLE
-]
\ No newline at end of file
+    CREATE_PIPELINE_TAG_TABLE,
+    CREATE_CACHE_INVALIDATION_TABLE,
+    CREATE_PIPELINE_STATS_TABLE
+]
+
+"""
+Migrations for databases created before a column or table was added to the schema above
+"""
+
+ADD_PIPELINE_EMBEDDING_DIMENSIONS = """
+    ALTER TABLE `Pipeline`
+        ADD COLUMN embedding_dimensions INT NOT NULL DEFAULT 768 AFTER description;
+"""
+
+# Composite indexes behind the keyset-paginated list endpoints (app/pagination.py)
+ADD_PIPELINE_DOCUMENTS_ADDED_INDEX = """
+    CREATE INDEX idx_pipeline_documents_added ON `Pipeline_Documents` (pipeline_id, added_at, document_id);
+"""
+
+ADD_CONVERSATION_PIPELINE_RECENT_INDEX = """
+    CREATE INDEX idx_conversation_pipeline_recent ON `Conversation` (pipeline_id, last_message_at, conversation_id);
+"""
+
+ADD_MESSAGE_CONVERSATION_TIME_INDEX = """
+    CREATE INDEX idx_message_conversation_time ON `Message` (conversation_id, timestamp, message_id);
+"""
+
+ALL_MIGRATIONS = [
+    ("add_pipeline_embedding_dimensions", ADD_PIPELINE_EMBEDDING_DIMENSIONS),
+    ("create_cache_invalidation_table", CREATE_CACHE_INVALIDATION_TABLE),
+    # Then run scripts/create_triggers.py and scripts/check_pipeline_stats.py --fix to fill it
+    ("create_pipeline_stats_table", CREATE_PIPELINE_STATS_TABLE),
+    ("add_pipeline_documents_added_index", ADD_PIPELINE_DOCUMENTS_ADDED_INDEX),
+    ("add_conversation_pipeline_recent_index", ADD_CONVERSATION_PIPELINE_RECENT_INDEX),
+    ("add_message_conversation_time_index", ADD_MESSAGE_CONVERSATION_TIME_INDEX)
+]
@@ -0,0 +1,104 @@
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ACTIVE_SET_TTL_SECONDS = float(os.getenv('ACTIVE_SET_TTL_SECONDS', '300'))
+
+# Firestore rejects find_nearest limits above 1000
+MAX_VECTOR_QUERY_LIMIT = 1000
+
+class ActiveDocumentSet:
+
+    def __init__(self, pipeline_id: int, version: int, rows: Iterable[Dict[str, Any]]):
+        self.pipeline_id = pipeline_id
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.document_ids: Set[int] = set()
+        self.storage_paths: Set[str] = set()
+        self.total_count = 0
+
+        for row in rows:
+            self.total_count += 1
+            if row['is_active']:
+                self.document_ids.add(int(row['document_id']))
+                if row.get('firebase_storage_path'):
+                    self.storage_paths.add(row['firebase_storage_path'])
+
+    @property
+    def active_count(self) -> int:
+        return len(self.document_ids)
+
+    @property
+    def inactive_count(self) -> int:
+        return self.total_count - self.active_count
+
+    def contains(self, document_id: Optional[int] = None, storage_path: Optional[str] = None) -> bool:
+        # Embeddings written by /upload-simple only carry the storage path, since the
+        # MySQL document_id does not exist yet when the vectors are stored.
+        if document_id is not None and int(document_id) in self.document_ids:
+            return True
+        return storage_path is not None and storage_path in self.storage_paths
+
+    def overfetch_limit(self, top_k: int, max_limit: int = MAX_VECTOR_QUERY_LIMIT) -> int:
+        if self.active_count == 0:
+            return 0
+        if self.inactive_count == 0:
+            return min(top_k, max_limit)
+
+        # Assume the nearest neighbours are spread over documents like the documents
+        # themselves, and keep a 25% margin for skew between documents.
+        limit = math.ceil(top_k * (self.total_count / self.active_count) * 1.25)
+        return min(max(limit, top_k), max_limit)
+
+
+class ActiveDocumentCache:
+
+    def __init__(self, ttl_seconds: float = ACTIVE_SET_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._global_version = 0
+        self._versions: Dict[int, int] = {}
+        self._entries: Dict[int, ActiveDocumentSet] = {}
+
+    def _current_version(self, pipeline_id: int) -> int:
+        # Both counters only ever grow, so any bump changes the sum
+        return self._global_version + self._versions.get(pipeline_id, 0)
+
+    def version(self, pipeline_id: int) -> int:
+        with self._lock:
+            return self._current_version(pipeline_id)
+
+    def get(self, pipeline_id: int, loader: Callable[[], Iterable[Dict[str, Any]]]) -> ActiveDocumentSet:
+        with self._lock:
+            entry = self._entries.get(pipeline_id)
+            version = self._current_version(pipeline_id)
+
+        if entry and entry.version == version and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+            return entry
+
+        entry = ActiveDocumentSet(pipeline_id, version, loader())
+
+        with self._lock:
+            # Don't cache a set that was invalidated while it was loading
+            if self._current_version(pipeline_id) == version:
+                self._entries[pipeline_id] = entry
+
+        return entry
+
+    def invalidate(self, pipeline_id: int):
+        with self._lock:
+            self._versions[pipeline_id] = self._versions.get(pipeline_id, 0) + 1
+            self._entries.pop(pipeline_id, None)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._global_version += 1
+            self._entries.clear()
+
+
+active_document_cache = ActiveDocumentCache()
@@ -0,0 +1,143 @@
+### Process-wide scheduling of calls to the rate-limited APIs: Vertex AI embeddings and OpenAI chat
+# Each API gets a token bucket sized to this process's share of the quota, and callers wait for a
+# token in one of two priority classes. Interactive work (a student's query embedding and the chat
+# answer) is always served before background ingestion. Ingestion also can't take the last
+# API_INTERACTIVE_RESERVE of the bucket, so a large upload never leaves chat waiting for a refill.
+# A 429 / RESOURCE_EXHAUSTED halves the rate and pauses the bucket; successes then win the rate
+# back a step at a time (AIMD), so the process settles just under the quota it actually has.
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from app.metrics import api_queue_depth, api_queue_wait, api_rate_limited, api_request_rate
+
+load_dotenv()
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# This process's share of the project quotas; divide by the number of instances that share them
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv('EMBEDDING_REQUESTS_PER_MINUTE', '600'))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '500'))
+# Bucket capacity, in seconds of quota that can be spent at once after an idle period
+API_BURST_SECONDS = float(os.getenv('API_BURST_SECONDS', '2'))
+API_INTERACTIVE_RESERVE = float(os.getenv('API_INTERACTIVE_RESERVE', '0.2'))
+API_RATE_LIMIT_RETRIES = int(os.getenv('API_RATE_LIMIT_RETRIES', '4'))
+
+# After a 429 the rate never drops below this fraction of the configured one
+MIN_RATE_FRACTION = 0.1
+# Each success recovers this fraction of the configured rate
+RECOVERY_FRACTION = 0.05
+MAX_PAUSE_SECONDS = 30.0
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    # Matched by shape so neither google-api-core nor openai has to be imported here
+    if type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'RateLimitError'):
+        return True
+    if getattr(error, 'status_code', None) == 429 or getattr(error, 'code', None) == 429:
+        return True
+    return 'RESOURCE_EXHAUSTED' in str(error) or '429' in str(error).split(' ', 1)[0]
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after')) if headers.get('retry-after') else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedApi:
+
+    def __init__(self, name: str, requests_per_minute: float, burst_seconds: float = API_BURST_SECONDS,
+                 interactive_reserve: float = API_INTERACTIVE_RESERVE, retries: int = API_RATE_LIMIT_RETRIES):
+        self.name = name
+        self.configured_rate = max(requests_per_minute, 1.0) / 60.0
+        self.rate = self.configured_rate
+        self.capacity = max(1.0, self.configured_rate * burst_seconds)
+        self.reserve = min(max(interactive_reserve, 0.0), 1.0) * self.capacity
+        # Background callers need a whole token above the reserve, so a small bucket grows to hold one
+        self.capacity = max(self.capacity, self.reserve + 1)
+        self.retries = retries
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.consecutive_limits = 0
+        self.waiting: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        api_request_rate.set(self.rate * 60, label=name)
+
+    def _refill(self, now: float):
+        # updated_at is in the future while paused, so nothing accrues until the pause ends
+        self.tokens = min(self.capacity, self.tokens + max(now - self.updated_at, 0.0) * self.rate)
+        self.updated_at = max(self.updated_at, now)
+
+    def acquire(self, priority: str = BACKGROUND):
+        if priority not in self.waiting:
+            raise ValueError(f"Unknown priority {priority}")
+        queue = f"{self.name}_{priority}"
+        started = time.monotonic()
+        with self._condition:
+            self.waiting[priority] += 1
+            api_queue_depth.inc(label=queue)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self.paused_until:
+                        wait = self.paused_until - now
+                    else:
+                        # Background callers leave the reserve, and wait while chat is queued
+                        floor = self.reserve if priority == BACKGROUND else 0.0
+                        blocked = priority == BACKGROUND and self.waiting[INTERACTIVE] > 0
+                        if not blocked and self.tokens >= floor + 1:
+                            self.tokens -= 1
+                            break
+                        wait = max((floor + 1 - self.tokens) / self.rate, 0.001)
+                    self._condition.wait(timeout=wait)
+            finally:
+                self.waiting[priority] -= 1
+                api_queue_depth.dec(label=queue)
+                self._condition.notify_all()
+        api_queue_wait.observe(time.monotonic() - started, label=queue)
+
+    def rate_limited(self, retry_after: Optional[float] = None):
+        with self._condition:
+            self.consecutive_limits += 1
+            self.rate = max(self.configured_rate * MIN_RATE_FRACTION, self.rate / 2)
+            pause = retry_after if retry_after is not None else min(2 ** (self.consecutive_limits - 1), MAX_PAUSE_SECONDS)
+            # Jitter, so callers released together don't hit the quota together again
+            self.paused_until = max(self.paused_until, time.monotonic() + pause * random.uniform(1.0, 1.25))
+            self.tokens = 0.0
+            self.updated_at = self.paused_until
+            api_request_rate.set(self.rate * 60, label=self.name)
+        api_rate_limited.inc(label=self.name)
+
+    def succeeded(self):
+        with self._condition:
+            self.consecutive_limits = 0
+            if self.rate < self.configured_rate:
+                self.rate = min(self.configured_rate, self.rate + self.configured_rate * RECOVERY_FRACTION)
+                api_request_rate.set(self.rate * 60, label=self.name)
+
+    def call(self, priority: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        for attempt in range(self.retries + 1):
+            self.acquire(priority)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.retries:
+                    raise
+                self.rate_limited(retry_after_seconds(e))
+                continue
+            self.succeeded()
+            return result
+
+
+embedding_api = RateLimitedApi("embedding", EMBEDDING_REQUESTS_PER_MINUTE)
+llm_api = RateLimitedApi("llm", LLM_REQUESTS_PER_MINUTE)
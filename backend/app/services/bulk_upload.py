@@ -0,0 +1,301 @@
+### Bulk uploads: many files into one pipeline, with the expensive work shared across them
+# Text extraction runs on a process pool (pypdf is pure Python, so threads would queue on the GIL)
+# while the checksums and Storage uploads run on threads. Chunks from every file are then packed
+# into shared embedding requests. The Firestore chunks are written in batches of whole files (up to
+# 500 writes), so a failed batch only touches the files in it, and those are retried one by one.
+# Each document is then inserted with its own Insert_Document call and commit. Each file succeeds
+# or fails on its own, and whatever was already written for a failed file is removed again.
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from app.crudFunctions import documentFunctions
+from app.logging_config import get_logger
+from app.metrics import chunks_processed, time_stage
+from app.services.document_processor import DocumentProcessor, file_sha256
+from app.services.service_factory import pipeline_embedding, shared_firestore_service, shared_storage_service
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+BULK_EXTRACT_WORKERS = max(1, int(os.getenv('BULK_EXTRACT_WORKERS', str(os.cpu_count() or 1))))
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '50'))
+# Firestore rejects batches of more than 500 writes
+FIRESTORE_BATCH_WRITES = 500
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+_extraction_pool_lock = threading.Lock()
+
+
+def extraction_pool() -> ProcessPoolExecutor:
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # spawn, not fork: the parent has gRPC and database threads that a forked child would inherit mid-call
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=BULK_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _extraction_pool
+
+def discard_extraction_pool(pool: ProcessPoolExecutor):
+    # A worker that dies (e.g. killed for memory on a huge PDF) breaks the whole pool, so the
+    # next bulk upload starts a new one
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is pool:
+            _extraction_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_extraction_pool():
+    global _extraction_pool
+    with _extraction_pool_lock:
+        pool, _extraction_pool = _extraction_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def extract_and_chunk(file_path: str, file_type: str) -> Tuple[List[str], int, int]:
+    # Runs in a pool process, so only the chunks and counts travel back
+    processor = DocumentProcessor()
+    text, metadata = processor.extract_text(file_path, file_type)
+    page_count = metadata.get("page_count", 1) if metadata else 1
+    return processor.chunk_text(text), page_count, len(text.split())
+
+
+@dataclass
+class BulkUploadFile:
+    file_name: str
+    file_path: str
+    mime_type: str = "application/pdf"
+    file_type: str = ""
+    file_size: int = 0
+    checksum: Optional[str] = None
+    storage_path: Optional[str] = None
+    download_url: Optional[str] = None
+    chunks: List[str] = field(default_factory=list)
+    page_count: int = 1
+    word_count: int = 0
+    embeddings: List[np.ndarray] = field(default_factory=list)
+    chunk_ids: List[str] = field(default_factory=list)
+    document_id: Optional[int] = None
+    error: Optional[str] = None
+    # What has been written so far, so a failure removes exactly that
+    uploaded: bool = False
+    stored_chunks: bool = False
+
+    def fail(self, error: str):
+        if self.error is None:
+            self.error = error
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "file_name": self.file_name,
+            "success": self.error is None,
+            "error": self.error,
+            "document_id": self.document_id,
+            "storage_path": self.storage_path if self.error is None else None,
+            "download_url": self.download_url if self.error is None else None,
+            "chunk_count": len(self.chunks),
+            "embedding_count": len(self.embeddings),
+        }
+
+
+class BulkUploader:
+
+    def __init__(self, db: Session, user_id: int, firebase_uid: str, pipeline_id: int,
+                 embedding_dimensions: Optional[int] = None):
+        self.db = db
+        self.user_id = user_id
+        self.firebase_uid = firebase_uid
+        self.pipeline_id = pipeline_id
+        self.embedding_service, self.embedding_dimensions = pipeline_embedding(pipeline_id, embedding_dimensions)
+        self.storage_service = shared_storage_service()
+        self.firestore_service = shared_firestore_service()
+        self.timings: Dict[str, float] = {}
+
+    async def run(self, files: List[BulkUploadFile]) -> List[BulkUploadFile]:
+        started = time.perf_counter()
+        with time_stage("bulk_upload_total"):
+            await self._timed("prepare", self._prepare(files))
+            await self._timed("embedding", self._embed([f for f in files if f.error is None]))
+            await self._timed("firestore_write", asyncio.to_thread(self._write_chunks, [f for f in files if f.error is None]))
+            await self._timed("stored_procedure", asyncio.to_thread(self._insert_documents, [f for f in files if f.error is None]))
+            await asyncio.gather(*(asyncio.to_thread(self._compensate, f) for f in files if f.error is not None))
+        self.timings["total"] = round(time.perf_counter() - started, 4)
+        return files
+
+    async def _timed(self, name: str, awaitable):
+        started = time.perf_counter()
+        await awaitable
+        self.timings[name] = round(time.perf_counter() - started, 4)
+
+    ## EXTRACTION ON THE PROCESS POOL, CHECKSUM AND STORAGE UPLOAD ON THREADS
+    async def _prepare(self, files: List[BulkUploadFile]):
+        loop = asyncio.get_running_loop()
+        pool = extraction_pool()
+        processor = DocumentProcessor()
+
+        async def prepare_file(f: BulkUploadFile):
+            f.file_type = processor.get_file_type_from_path(f.file_name)
+            f.file_size = os.path.getsize(f.file_path)
+            f.storage_path = self.storage_service.new_storage_path(self.firebase_uid, f.file_name)
+
+            extraction, upload = await asyncio.gather(
+                loop.run_in_executor(pool, extract_and_chunk, f.file_path, f.file_type),
+                asyncio.to_thread(self._checksum_and_upload, f),
+                return_exceptions=True
+            )
+            if isinstance(upload, BaseException):
+                f.fail(f"Storage upload failed: {upload}")
+            if isinstance(extraction, BrokenProcessPool):
+                discard_extraction_pool(pool)
+            if isinstance(extraction, BaseException):
+                f.fail(f"Text extraction failed: {extraction}")
+            else:
+                f.chunks, f.page_count, f.word_count = extraction
+
+        await asyncio.gather(*(prepare_file(f) for f in files))
+
+    def _checksum_and_upload(self, f: BulkUploadFile):
+        f.checksum = file_sha256(f.file_path)
+        with time_stage("storage_upload"):
+            _, f.download_url = self.storage_service.upload_file(
+                file_path=f.file_path,
+                firebase_uid=self.firebase_uid,
+                file_name=f.file_name,
+                storage_path=f.storage_path
+            )
+        f.uploaded = True
+
+    ## ONE SET OF EMBEDDING REQUESTS FOR THE CHUNKS OF EVERY FILE
+    async def _embed(self, files: List[BulkUploadFile]):
+        packed = [chunk for f in files for chunk in f.chunks]
+        if not packed:
+            return
+        try:
+            embeddings = await asyncio.to_thread(
+                self.embedding_service.generate_embeddings, packed, self.embedding_dimensions
+            )
+        except Exception as e:
+            logger.exception("Embedding failed for a bulk upload of %d files", len(files))
+            for f in files:
+                f.fail(f"Embedding failed: {e}")
+            return
+
+        chunks_processed.inc(len(packed))
+        offset = 0
+        for f in files:
+            f.embeddings = embeddings[offset:offset + len(f.chunks)]
+            offset += len(f.chunks)
+
+    ## FIRESTORE WRITES IN BATCHES OF WHOLE FILES
+    def _write_chunks(self, files: List[BulkUploadFile]):
+        groups, group, writes = [], [], 0
+        for f in files:
+            f.chunk_ids = [f"{self.firebase_uid}_{uuid.uuid4()}_{i}" for i in range(len(f.chunks))]
+            if not f.chunk_ids:
+                continue
+            # A file never straddles two groups; one with over 500 chunks is a group of its own
+            if group and writes + len(f.chunk_ids) > FIRESTORE_BATCH_WRITES:
+                groups.append(group)
+                group, writes = [], 0
+            group.append(f)
+            writes += len(f.chunk_ids)
+        if group:
+            groups.append(group)
+
+        for group in groups:
+            try:
+                self._write_files(group)
+            except Exception as e:
+                if len(group) == 1:
+                    self._fail_write(group[0], e)
+                    continue
+                # Retried one file at a time, so only the files that fail on their own are reported
+                logger.warning("Firestore write failed for a batch of %d files; retrying each file", len(group))
+                for f in group:
+                    try:
+                        self._write_files([f])
+                    except Exception as e:
+                        self._fail_write(f, e)
+
+    def _write_files(self, files: List[BulkUploadFile]):
+        embeddings, chunk_ids, texts, metadata = [], [], [], []
+        for f in files:
+            # Set first: a write of over 500 chunks commits in several batches, so some may exist on failure
+            f.stored_chunks = True
+            for i, (chunk_id, chunk, embedding) in enumerate(zip(f.chunk_ids, f.chunks, f.embeddings)):
+                chunk_ids.append(chunk_id)
+                texts.append(chunk)
+                embeddings.append(embedding)
+                metadata.append({
+                    "storage_path": f.storage_path,
+                    "chunk_index": i,
+                    "file_name": f.file_name,
+                    "pipeline_id": self.pipeline_id,
+                    "user_id": self.user_id,
+                    "firebase_uid": self.firebase_uid
+                })
+        self.firestore_service.add_embeddings_batch(embeddings, chunk_ids, texts, metadata)
+
+    def _fail_write(self, f: BulkUploadFile, error: Exception):
+        logger.exception("Firestore write failed for %s in a bulk upload", f.file_name)
+        f.fail(f"Storing embeddings failed: {error}")
+
+    ## MYSQL INSERTS, ONE CALL AND COMMIT PER DOCUMENT
+    def _insert_documents(self, files: List[BulkUploadFile]):
+        if not files:
+            return
+        results = documentFunctions.insert_documents_with_stored_procedure(
+            self.db,
+            user_id=self.user_id,
+            pipeline_id=self.pipeline_id,
+            documents=[
+                {
+                    'file_name': f.file_name,
+                    'file_type': f.file_type,
+                    'file_size': f.file_size,
+                    'page_count': f.page_count,
+                    'word_count': f.word_count,
+                    'firebase_storage_path': f.storage_path,
+                    'checksum': f.checksum,
+                    'mime_type': f.mime_type,
+                    'chunks': f.chunks,
+                }
+                for f in files
+            ]
+        )
+        for f, result in zip(files, results):
+            if result['error'] is not None:
+                f.fail(f"Saving document failed: {result['error']}")
+            else:
+                f.document_id = result['document_id']
+
+    def _compensate(self, f: BulkUploadFile):
+        try:
+            if f.stored_chunks and f.chunk_ids:
+                self.firestore_service.delete_embeddings(f.chunk_ids, self.pipeline_id, [f.storage_path])
+            if f.uploaded:
+                self.storage_service.delete_file(f.storage_path)
+        except Exception:
+            # Leaves an orphan behind; logged so it can be cleaned up by hand
+            logger.exception("Failed to clean up after bulk upload of %s", f.file_name)
+
+    def summary(self, files: List[BulkUploadFile]) -> Dict[str, Any]:
+        return {
+            "files": len(files),
+            "failed": sum(1 for f in files if f.error is not None),
+            "chunks": sum(len(f.chunks) for f in files),
+            "timings": self.timings,
+        }
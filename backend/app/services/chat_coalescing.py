@@ -0,0 +1,73 @@
+### Single-flight coalescing of identical chat queries that arrive at the same time
+# When a class is told to ask a pipeline the same question, dozens of identical requests arrive
+# within seconds. The first one (the leader) runs the query embedding, vector search and LLM call.
+# Duplicates that arrive while it is in flight wait for its result instead of repeating the work.
+# Requests count as duplicates when the pipeline, its content version, the normalized query and
+# the history that reaches the prompt all match. A follower waits at most
+# CHAT_COALESCE_WAIT_SECONDS. If the leader is slower than that, or fails, the follower runs the
+# query itself. Only in-flight work is shared: nothing is cached once the leader finishes.
+# Coalescing happens on the event loop: only the leader's work runs on a worker thread, and
+# followers await it without holding one, so a burst of duplicates can't exhaust the thread pool.
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from dotenv import load_dotenv
+from app.metrics import chat_coalescing
+
+load_dotenv()
+
+CHAT_COALESCE_WAIT_SECONDS = float(os.getenv('CHAT_COALESCE_WAIT_SECONDS', '20'))
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r'\s+', ' ', query).strip().casefold()
+
+def history_hash(history: List[Tuple[str, str]]) -> str:
+    return hashlib.sha256(json.dumps(history, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+
+    def __init__(self, wait_seconds: float = CHAT_COALESCE_WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        # (event loop, key) -> the leader's task; a task can only be awaited on its own loop
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        flight_key = (asyncio.get_running_loop(), key)
+        flight = self._flights.get(flight_key)
+
+        if flight is None:
+            chat_coalescing.inc(label="leader")
+            flight = self._flights[flight_key] = asyncio.ensure_future(asyncio.to_thread(func))
+            flight.add_done_callback(lambda done: self._land(flight_key, done))
+            # Shielded, so a leader whose client disconnects still finishes the answer for its followers
+            return await asyncio.shield(flight)
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(flight), self.wait_seconds)
+        except asyncio.TimeoutError:
+            chat_coalescing.inc(label="timeout")
+        except Exception:
+            chat_coalescing.inc(label="leader_failed")
+        else:
+            chat_coalescing.inc(label="shared")
+            return result
+        return await asyncio.to_thread(func)
+
+    def _land(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], flight: asyncio.Future):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        if not flight.cancelled():
+            # Retrieved here so a failure nobody awaited isn't reported as never retrieved
+            flight.exception()
+
+
+chat_single_flight = SingleFlight()
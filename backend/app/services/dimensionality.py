@@ -0,0 +1,91 @@
+### Embedding dimensionality: model-native output sizes, a PCA fallback, and per-size vector fields
+
+import io
+import os
+import numpy as np
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FULL_EMBEDDING_DIMENSIONS = 768
+
+# Dimensionality given to newly created pipelines. Existing pipelines keep what they were created with.
+DEFAULT_EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', str(FULL_EMBEDDING_DIMENSIONS)))
+
+SUPPORTED_EMBEDDING_DIMENSIONS = (256, 384, 512, 768)
+
+# Models that accept output_dimensionality and return a truncated, renormalized vector
+NATIVE_DIMENSIONALITY_MODELS = {
+    "text-embedding-004",
+    "text-embedding-005",
+    "text-multilingual-embedding-002",
+    "gemini-embedding-001",
+}
+
+# Where fitted PCA projections live in the storage bucket, one per model and size, so every worker
+# reads the same projection and a model switch never picks up another model's
+EMBEDDING_PROJECTION_PREFIX = os.getenv('EMBEDDING_PROJECTION_PREFIX', 'embedding_projections')
+
+
+def validate_dimensions(dimensions: int) -> int:
+    dimensions = int(dimensions)
+    if dimensions not in SUPPORTED_EMBEDDING_DIMENSIONS:
+        raise ValueError(f"Unsupported embedding dimensionality {dimensions}. Use one of {SUPPORTED_EMBEDDING_DIMENSIONS}")
+    return dimensions
+
+def vector_field_for_dimensions(dimensions: Optional[int]) -> str:
+    # Each size gets its own Firestore field (and its own vector index), so vectors of
+    # different sizes can never be compared by the same find_nearest query
+    if not dimensions or int(dimensions) == FULL_EMBEDDING_DIMENSIONS:
+        return 'embedding'
+    return f'embedding_{int(dimensions)}'
+
+def projection_path(model_name: str, dimensions: int) -> str:
+    return f"{EMBEDDING_PROJECTION_PREFIX}/{model_name}/pca_{FULL_EMBEDDING_DIMENSIONS}_to_{int(dimensions)}.npz"
+
+
+class PCAProjection:
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+
+    @property
+    def input_dimensions(self) -> int:
+        return self.components.shape[1]
+
+    @property
+    def output_dimensions(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dimensions: int) -> "PCAProjection":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[0] < dimensions:
+            raise ValueError(f"Need at least {dimensions} vectors to fit a {dimensions}-dimension projection, got {vectors.shape[0]}")
+
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls(mean, vt[:dimensions])
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        projected = (np.atleast_2d(np.asarray(vectors, dtype=np.float32)) - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return projected / norms
+
+    def save(self, bucket, model_name: str) -> str:
+        buffer = io.BytesIO()
+        np.savez(buffer, mean=self.mean, components=self.components)
+        path = projection_path(model_name, self.output_dimensions)
+        bucket.blob(path).upload_from_string(buffer.getvalue(), content_type='application/octet-stream')
+        return path
+
+    @classmethod
+    def load(cls, bucket, model_name: str, dimensions: int) -> Optional["PCAProjection"]:
+        blob = bucket.blob(projection_path(model_name, dimensions))
+        if not blob.exists():
+            return None
+        with np.load(io.BytesIO(blob.download_as_bytes())) as data:
+            return cls(data['mean'], data['components'])
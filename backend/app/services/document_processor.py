@@ -1,44 +1,85 @@
 ### This processor handles file upload, text extraction, chunking, and storage
 
 from typing import List, Dict, Any, Optional, Tuple
-from pypdf import PdfReader
-from docx import Document as DocxDocument
-from langdetect import detect, LangDetectException
 import hashlib
 import mimetypes
 from sqlalchemy.orm import Session
-import firebase_admin
-from firebase_admin import credentials, storage
 from app.crudFunctions import documentFunctions, pipelineDocumentFunctions
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from dotenv import load_dotenv
+from app.logging_config import get_logger
+from app.services.service_factory import get_storage_bucket
+from app.services.signed_urls import signed_url_service
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
+# pypdf, python-docx, langdetect and firebase_admin are imported where they are used, so importing
+# this module (and the upload router) stays cheap; warm_extractors() loads them ahead of traffic
+
+def detect_language(text: str) -> str:
+    from langdetect import detect, LangDetectException
+    try:
+        return detect(text) if text.strip() else 'unknown'
+    except LangDetectException:
+        return 'unknown'
+
+def file_sha256(file_path: str) -> str:
+    # The checksum stored with uploaded documents
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for byte_block in iter(lambda: f.read(4096), b""):
+            sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+def warm_extractors():
+    import pypdf
+    import docx
+    from langdetect.detector_factory import init_factory
+    # langdetect reads its language profiles from disk on the first detect() call
+    init_factory()
+
 class DocumentProcessor:
 
     ## CONSTRUCTOR
     def __init__(self):
-        firebase_credentials_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
-        if not firebase_credentials_path:
-            raise ValueError("FIREBASE_CREDENTIALS_PATH environment variable is not set")
-        
-        firebase_storage_bucket = os.getenv('FIREBASE_STORAGE_BUCKET', 'hoosstudying-ab036.firebasestorage.app')
-        
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(firebase_credentials_path)
-            firebase_admin.initialize_app(cred, {
-                'storageBucket': firebase_storage_bucket
-            })
-
-        self.bucket = storage.bucket(firebase_storage_bucket)
+        # Extraction and chunking never touch Storage, so Firebase is only
+        # initialized the first time the bucket is actually used
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            firebase_storage_bucket = os.getenv('FIREBASE_STORAGE_BUCKET', 'hoosstudying-ab036.firebasestorage.app')
+
+            self._bucket = get_storage_bucket(firebase_storage_bucket)
+            if self._bucket is not None:
+                return self._bucket
+
+            firebase_credentials_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
+            if not firebase_credentials_path:
+                raise ValueError("FIREBASE_CREDENTIALS_PATH environment variable is not set")
+
+            import firebase_admin
+            from firebase_admin import credentials, storage
+
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(firebase_credentials_path)
+                firebase_admin.initialize_app(cred, {
+                    'storageBucket': firebase_storage_bucket
+                })
+
+            self._bucket = storage.bucket(firebase_storage_bucket)
+        return self._bucket
     
     ## EXTRACT TEXT FROM PDF FILE
     def extract_text_from_pdf(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
 
         try:
             with open(file_path, 'rb') as file:
+                from pypdf import PdfReader
                 pdf_reader = PdfReader(file)
                 fullText = ""
                 language = ""
@@ -48,10 +89,7 @@ class DocumentProcessor:
 
                 fullText = fullText.strip()
 
-                try:
-                    language = detect(fullText) if fullText.strip() else 'unknown'
-                except LangDetectException:
-                    language = 'unknown'
+                language = detect_language(fullText)
 
                 metadata = {
                     'page_count': len(pdf_reader.pages),
@@ -69,15 +107,13 @@ class DocumentProcessor:
     ## EXTRACT TEXT FROM DOCX FILE
     def extract_text_from_docx(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
         try:
+            from docx import Document as DocxDocument
             doc = DocxDocument(file_path)
 
             fullText = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             fullText = fullText.strip()
 
-            try:
-                language = detect(fullText) if fullText.strip() else 'unknown'
-            except LangDetectException:
-                language = 'unknown'
+            language = detect_language(fullText)
             
             metadata = {
                 'page_count': None,
@@ -101,10 +137,7 @@ class DocumentProcessor:
                 with open(file_path, 'r', encoding=current_encoding) as file:
                     fullText = file.read().strip()
                 
-                try:
-                    language = detect(fullText) if fullText.strip() else 'unknown'
-                except LangDetectException:
-                    language = 'unknown'
+                language = detect_language(fullText)
 
                 metadata = {
                     'page_count': None,
@@ -218,11 +251,7 @@ class DocumentProcessor:
             blob = self.bucket.blob(storage_path)
             blob.upload_from_filename(file_path)
 
-            download_url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(hours=7),
-                method="GET"
-            )
+            download_url = signed_url_service.get(storage_path).url
 
             return storage_path, download_url
 
@@ -244,11 +273,7 @@ class DocumentProcessor:
             blob = self.bucket.blob(storage_path)
             blob.upload_from_filename(file_path)
 
-            download_url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(hours=1),
-                method="GET"
-            )
+            download_url = signed_url_service.get(storage_path).url
 
             return storage_path, download_url
 
@@ -272,7 +297,7 @@ class DocumentProcessor:
         try:
             # Step 1 get the file type
             file_type = self.get_file_type_from_path(file_name)
-            print(f"Processing file: {file_name}, of type: {file_type}")
+            logger.info("Processing file: %s, of type: %s", file_name, file_type)
 
             # Step 2, Extract text, "metadata" using the file type
             fullText, extracted_metadata = self.extract_text(file_path, file_type)
@@ -296,7 +321,7 @@ class DocumentProcessor:
 
             document_id = document_record['document_id']
             # when we create a document and associate it with a specific pipeline id and user id, we have to lead the cascasde of it.
-            print(f"Created Document record with ID: {document_id}")
+            logger.info("Created Document record with ID: %s", document_id)
 
             # Step 5, Upload document to firebase storage
             storage_path, download_url = self.upload_to_firebase(
@@ -305,7 +330,7 @@ class DocumentProcessor:
                 document_id=document_id,
                 file_name=file_name
             )
-            print(f"Uploaded document ({document_id}) to Firebase Storage at path: {storage_path}")
+            logger.info("Uploaded document (%s) to Firebase Storage at path: %s", document_id, storage_path)
 
             # Step 6, Calculate checksum and mime type for metadata
             checksum = self.calculate_checksum(file_path)
@@ -359,7 +384,7 @@ class DocumentProcessor:
             }
 
         except Exception as e:
-            print(f"Error processing document: {str(e)}")
+            logger.exception("Error processing document %s", file_name)
             return {
                 "success": False,
                 "error": str(e),
@@ -0,0 +1,224 @@
+### Replacing a document with a new version, re-embedding only the chunks that changed
+# The new file is extracted and chunked as usual. Chunk texts are then matched to the stored ones
+# by content hash, and only chunks without a match are embedded. The chunker snaps to sentence
+# ends, so after an edit the chunk boundaries fall back into step and most chunks hash the same
+# as before. Unchanged chunks keep their Document_Chunk rows and Firestore vectors, and just get
+# their new chunk_index. Removed chunks are deleted. The document keeps its document_id and
+# storage path, and the new file overwrites the old blob.
+#
+# Write order: new vectors, then the MySQL transaction, then Firestore renumbering and deletes,
+# then the blob. If the transaction fails, the new vectors are deleted again. Anything later that
+# fails is repaired by replacing with the same file again, since the Firestore side is diffed
+# against what Firestore actually holds.
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.crudFunctions import documentFunctions
+from app.logging_config import get_logger
+from app.metrics import chunks_processed, time_stage
+from app.services.dimensionality import vector_field_for_dimensions
+from app.services.document_processor import DocumentProcessor, file_sha256
+from app.services.service_factory import pipeline_embedding, shared_firestore_service, shared_storage_service
+
+logger = get_logger(__name__)
+
+
+def chunk_digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class ChunkDiff:
+    # kept: (position in old, index in new); added: indexes in new; removed: positions in old
+    kept: List[Tuple[int, int]] = field(default_factory=list)
+    added: List[int] = field(default_factory=list)
+    removed: List[int] = field(default_factory=list)
+
+
+def diff_chunks(old_texts: List[str], new_texts: List[str]) -> ChunkDiff:
+    # Repeated texts (headers, boilerplate) pair up in document order
+    unmatched: Dict[str, Deque[int]] = defaultdict(deque)
+    for position, old_text in enumerate(old_texts):
+        unmatched[chunk_digest(old_text)].append(position)
+
+    diff = ChunkDiff()
+    for index, new_text in enumerate(new_texts):
+        positions = unmatched.get(chunk_digest(new_text))
+        if positions:
+            diff.kept.append((positions.popleft(), index))
+        else:
+            diff.added.append(index)
+    diff.removed = sorted(position for positions in unmatched.values() for position in positions)
+    return diff
+
+
+class DocumentReplacer:
+
+    def __init__(self, db: Session, user_id: int, firebase_uid: str, pipeline_id: int, document_id: int,
+                 storage_path: str, embedding_dimensions: Optional[int] = None):
+        self.db = db
+        self.user_id = user_id
+        self.firebase_uid = firebase_uid
+        self.pipeline_id = pipeline_id
+        self.document_id = document_id
+        self.storage_path = storage_path
+        self.embedding_service, self.embedding_dimensions = pipeline_embedding(pipeline_id, embedding_dimensions)
+        self.firestore_service = shared_firestore_service()
+        self.storage_service = shared_storage_service()
+        self.timings: Dict[str, float] = {}
+
+    async def run(self, file_path: str, file_name: str, mime_type: str, previous_checksum: Optional[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        processor = DocumentProcessor()
+        file_type = processor.get_file_type_from_path(file_name)
+
+        with time_stage("text_extraction"):
+            (text, metadata), checksum = await asyncio.gather(
+                asyncio.to_thread(processor.extract_text, file_path, file_type),
+                asyncio.to_thread(file_sha256, file_path)
+            )
+        with time_stage("chunking"):
+            chunks = processor.chunk_text(text)
+
+        vector_field = vector_field_for_dimensions(self.embedding_dimensions)
+        rows, stored = await asyncio.gather(
+            asyncio.to_thread(documentFunctions.get_chunks_by_document, self.db, self.document_id),
+            asyncio.to_thread(self.firestore_service.get_document_chunks, self.storage_path, self.pipeline_id, vector_field)
+        )
+        rows = sorted(rows, key=lambda row: row['chunk_index'])
+        # MySQL rows and Firestore vectors are diffed separately, so either side is repaired if
+        # an earlier replacement stopped part way
+        row_diff = diff_chunks([row['chunk_text'] for row in rows], chunks)
+        vector_diff = diff_chunks([chunk['text'] for chunk in stored], chunks)
+        # A vector that never came back from Firestore is embedded again like a new chunk
+        missing = [(position, index) for position, index in vector_diff.kept if stored[position]['embedding'] is None]
+        if missing:
+            vector_diff.kept = [pair for pair in vector_diff.kept if stored[pair[0]]['embedding'] is not None]
+            vector_diff.added = sorted(vector_diff.added + [index for _, index in missing])
+            vector_diff.removed = sorted(vector_diff.removed + [position for position, _ in missing])
+
+        embed_started = time.perf_counter()
+        new_embeddings = []
+        if vector_diff.added:
+            new_embeddings = await asyncio.to_thread(
+                self.embedding_service.generate_embeddings,
+                [chunks[index] for index in vector_diff.added],
+                self.embedding_dimensions
+            )
+            chunks_processed.inc(len(new_embeddings))
+        self.timings["embedding"] = round(time.perf_counter() - embed_started, 4)
+
+        new_chunk_ids = [f"{self.firebase_uid}_{uuid.uuid4()}_{index}" for index in vector_diff.added]
+        await asyncio.to_thread(self._write_new_vectors, new_chunk_ids, vector_diff.added, chunks, new_embeddings, file_name)
+
+        try:
+            changes = await asyncio.to_thread(
+                documentFunctions.replace_document_chunks,
+                self.db,
+                document_id=self.document_id,
+                removed_chunk_ids=[rows[position]['chunk_id'] for position in row_diff.removed],
+                moved_chunks=[
+                    {'chunk_id': rows[position]['chunk_id'], 'chunk_index': index}
+                    for position, index in row_diff.kept if rows[position]['chunk_index'] != index
+                ],
+                added_chunks=[{'chunk_text': chunks[index], 'chunk_index': index} for index in row_diff.added],
+                file_name=file_name,
+                file_size=os.path.getsize(file_path),
+                page_count=metadata.get("page_count", 1) if metadata else 1,
+                word_count=len(text.split()),
+                checksum=checksum,
+                mime_type=mime_type
+            )
+        except Exception:
+            if new_chunk_ids:
+                await asyncio.to_thread(self.firestore_service.delete_embeddings, new_chunk_ids, self.pipeline_id)
+                await asyncio.to_thread(
+                    self._refresh_document_vector,
+                    [chunk['embedding'] for chunk in stored if chunk['embedding'] is not None],
+                    stored[0]['file_name'] if stored else file_name
+                )
+            raise
+
+        await asyncio.to_thread(self._renumber_and_delete_vectors, stored, vector_diff, file_name)
+        await asyncio.to_thread(
+            self._refresh_document_vector,
+            [stored[position]['embedding'] for position, _ in vector_diff.kept] + list(new_embeddings),
+            file_name
+        )
+        if checksum != previous_checksum:
+            with time_stage("storage_upload"):
+                await asyncio.to_thread(
+                    self.storage_service.upload_file,
+                    file_path=file_path,
+                    firebase_uid=self.firebase_uid,
+                    file_name=file_name,
+                    storage_path=self.storage_path
+                )
+
+        self.timings["total"] = round(time.perf_counter() - started, 4)
+        return {
+            "chunk_count": len(chunks),
+            "reused_chunks": len(vector_diff.kept),
+            "embedded_chunks": len(vector_diff.added),
+            "deleted_chunks": len(vector_diff.removed),
+            "mysql_changes": changes,
+            "unchanged_file": checksum == previous_checksum,
+            "timings": self.timings,
+        }
+
+    def _write_new_vectors(self, chunk_ids: List[str], indexes: List[int], chunks: List[str],
+                           embeddings: List[np.ndarray], file_name: str):
+        if not chunk_ids:
+            return
+        with time_stage("firestore_write"):
+            self.firestore_service.add_embeddings_batch(
+                embeddings,
+                chunk_ids,
+                [chunks[index] for index in indexes],
+                [
+                    {
+                        "storage_path": self.storage_path,
+                        "chunk_index": index,
+                        "file_name": file_name,
+                        "pipeline_id": self.pipeline_id,
+                        "user_id": self.user_id,
+                        "firebase_uid": self.firebase_uid
+                    }
+                    for index in indexes
+                ]
+            )
+
+    def _renumber_and_delete_vectors(self, stored: List[Dict[str, Any]], diff: ChunkDiff, file_name: str):
+        updates = {}
+        for position, index in diff.kept:
+            fields = {}
+            if stored[position]['chunk_index'] != index:
+                fields['chunk_index'] = index
+            if stored[position]['file_name'] != file_name:
+                # Deleting a document finds its vectors by file name
+                fields['file_name'] = file_name
+            if fields:
+                updates[stored[position]['id']] = fields
+        self.firestore_service.update_chunk_fields(updates, self.pipeline_id)
+        if diff.removed:
+            self.firestore_service.delete_embeddings([stored[position]['id'] for position in diff.removed], self.pipeline_id)
+
+    def _refresh_document_vector(self, embeddings: List[np.ndarray], file_name: str):
+        # Rebuilt from the final set of chunks rather than patched
+        try:
+            self.firestore_service.delete_document_vectors([self.storage_path], self.pipeline_id)
+            self.firestore_service.update_document_vectors(
+                embeddings,
+                [{"storage_path": self.storage_path, "file_name": file_name, "pipeline_id": self.pipeline_id}] * len(embeddings)
+            )
+        except Exception:
+            # Searches in documents mode fall back to every chunk until the vector is rebuilt
+            logger.exception("Failed to rebuild the document vector of %s", self.storage_path)
@@ -0,0 +1,77 @@
+### Document-level vectors for two-stage retrieval (VECTOR_SEARCH_MODE=documents)
+# Every uploaded document gets one vector: the normalized centroid of its normalized chunk
+# embeddings. It lives in a companion collection next to the chunks ('doc_vectors__embeddings' for
+# 'embeddings'), keyed by storage path, and holds the running sum and count so later chunk writes
+# for the same document update it instead of recomputing it. Retrieval first scores a pipeline's
+# document vectors (a few hundred at most, held in memory) and keeps the best
+# DOCUMENT_SEARCH_CANDIDATES. It then runs find_nearest over only those documents' chunks.
+# scripts/build_document_vectors.py builds the vectors for documents uploaded before this existed
+# and for the collection a re-embedding run cuts over to.
+
+import hashlib
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.services.dimensionality import vector_field_for_dimensions
+from app.services.vector_quantization import l2_normalize, to_float32
+
+load_dotenv()
+
+# A prefix, not a suffix: re-embedding shadows are 'embeddings_<run id>', so a suffix such as
+# '_documents' could name the same collection as a shadow
+DOCUMENT_VECTOR_PREFIX = 'doc_vectors__'
+# Documents whose chunks are searched in the second stage; Firestore's 'in' filter takes at most 30
+DOCUMENT_SEARCH_CANDIDATES = min(int(os.getenv('DOCUMENT_SEARCH_CANDIDATES', '5')), 30)
+
+# Read back when the running sum is updated, not needed for search
+DOCUMENT_VECTOR_SUM_FIELD = 'embedding_sum'
+DOCUMENT_VECTOR_PAYLOAD_FIELDS = ['storage_path', 'document_id', 'file_name', 'pipeline_id', 'chunk_count']
+
+
+def document_vector_collection(chunk_collection: str) -> str:
+    return f"{DOCUMENT_VECTOR_PREFIX}{chunk_collection}"
+
+def document_vector_id(storage_path: str) -> str:
+    # Storage paths contain '/', which Firestore document ids can't
+    return hashlib.sha256(storage_path.encode('utf-8')).hexdigest()
+
+def document_centroid(vector_sum: np.ndarray) -> np.ndarray:
+    # Chunks are normalized before summing, so long chunks don't outweigh short ones
+    return l2_normalize(to_float32(vector_sum))
+
+def build_document_vector(vector_sum: np.ndarray, chunk_count: int, storage_path: str,
+                          metadata: Dict[str, Any]) -> Dict[str, Any]:
+    from google.cloud.firestore_v1.vector import Vector
+    pipeline_id = metadata.get('pipeline_id')
+    return {
+        vector_field_for_dimensions(len(vector_sum)): Vector(document_centroid(vector_sum).tolist()),
+        DOCUMENT_VECTOR_SUM_FIELD: Vector(np.asarray(vector_sum, dtype=np.float64).tolist()),
+        'embedding_dimensions': len(vector_sum),
+        'chunk_count': chunk_count,
+        'storage_path': storage_path,
+        'file_name': metadata.get('file_name'),
+        'document_id': metadata.get('document_id'),
+        'pipeline_id': int(pipeline_id) if pipeline_id is not None else None,
+    }
+
+def sum_chunk_vectors(embeddings: Iterable[np.ndarray], metadata_list: Iterable[Optional[Dict[str, Any]]]
+                      ) -> Dict[str, Tuple[np.ndarray, int, Dict[str, Any]]]:
+    # Groups a write's chunks by document: storage_path -> (sum of normalized vectors, count, metadata)
+    sums: Dict[str, Tuple[np.ndarray, int, Dict[str, Any]]] = {}
+    for embedding, metadata in zip(embeddings, metadata_list):
+        storage_path = (metadata or {}).get('storage_path')
+        if not storage_path:
+            continue
+        vector = l2_normalize(to_float32(embedding))
+        if storage_path in sums:
+            total, count, first = sums[storage_path]
+            sums[storage_path] = (total + vector, count + 1, first)
+        else:
+            sums[storage_path] = (vector.astype(np.float64), 1, metadata)
+    return sums
+
+def top_documents(index, query: np.ndarray, candidates: int = DOCUMENT_SEARCH_CANDIDATES,
+                  mask: Optional[np.ndarray] = None) -> List[str]:
+    # Storage paths of the documents whose centroids are nearest the query
+    return [index.payloads[position]['storage_path'] for position, _ in index.search(query, candidates, mask=mask)]
@@ -0,0 +1,137 @@
+### Which Firestore collection holds each pipeline's chunk embeddings
+# Normally that is 'embeddings' for every pipeline. scripts/reembed_corpus.py writes re-embedded
+# chunks to a shadow collection and then cuts over by rewriting the one pointer document below,
+# so retrieval switches from the old vectors to the new ones in a single write. The pointer can
+# also name a collection per pipeline, for runs limited to some users or pipelines. While a run is
+# in progress, deletes are mirrored into its shadow collection so removed chunks don't come back
+# at cutover. Every worker re-reads the pointer at most every EMBEDDING_COLLECTION_REFRESH_SECONDS.
+# The pointer also records the model and dimensions each re-embedded collection was written with,
+# so queries and uploads switch model and vector size in the same write as the collection.
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from app.logging_config import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+DEFAULT_EMBEDDINGS_COLLECTION = 'embeddings'
+EMBEDDING_CONFIG_COLLECTION = 'embedding_config'
+EMBEDDING_POINTER_DOCUMENT = 'active'
+EMBEDDING_COLLECTION_REFRESH_SECONDS = float(os.getenv('EMBEDDING_COLLECTION_REFRESH_SECONDS', '30'))
+
+
+class EmbeddingCollections:
+
+    def __init__(self, client, refresh_seconds: float = EMBEDDING_COLLECTION_REFRESH_SECONDS):
+        self.client = client
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._pointer: Dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+
+    def _reference(self):
+        return self.client.collection(EMBEDDING_CONFIG_COLLECTION).document(EMBEDDING_POINTER_DOCUMENT)
+
+    def pointer(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+                return self._pointer
+        try:
+            snapshot = self._reference().get()
+            pointer = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        except Exception:
+            # Keep serving from the last pointer we saw rather than failing retrieval
+            logger.exception("Could not read the embedding collection pointer")
+            with self._lock:
+                return self._pointer
+
+        with self._lock:
+            previous, self._pointer, self._loaded_at = self._pointer, pointer, time.monotonic()
+        if previous != pointer and previous:
+            self._on_change(previous, pointer)
+        return pointer
+
+    def _on_change(self, previous: Dict[str, Any], current: Dict[str, Any]):
+        # Indexes built from the old collection must not outlive the cutover
+        from app.services.vector_quantization import vector_index_cache
+        from app.services.vector_segments import mapped_vector_store
+
+        if previous.get('collection') != current.get('collection'):
+            logger.info("Embedding collection switched to %s", current.get('collection'))
+            vector_index_cache.clear()
+            mapped_vector_store.drop_all()
+            return
+
+        before, after = previous.get('pipelines') or {}, current.get('pipelines') or {}
+        for pipeline_id in set(before) | set(after):
+            if before.get(pipeline_id) != after.get(pipeline_id):
+                logger.info("Embedding collection of pipeline %s switched to %s", pipeline_id, after.get(pipeline_id))
+                vector_index_cache.invalidate(int(pipeline_id))
+                mapped_vector_store.drop(int(pipeline_id))
+
+    def default(self) -> str:
+        return self.pointer().get('collection') or DEFAULT_EMBEDDINGS_COLLECTION
+
+    def for_pipeline(self, pipeline_id: Optional[int]) -> str:
+        pointer = self.pointer()
+        if pipeline_id is not None:
+            override = (pointer.get('pipelines') or {}).get(str(int(pipeline_id)))
+            if override:
+                return override
+        return pointer.get('collection') or DEFAULT_EMBEDDINGS_COLLECTION
+
+    def settings_for(self, pipeline_id: Optional[int]) -> Dict[str, Any]:
+        # {'model', 'dimensions'} of the collection serving this pipeline; empty for one that was
+        # never cut over to, whose pipelines use the deployed model and their own dimensions
+        return (self.pointer().get('settings') or {}).get(self.for_pipeline(pipeline_id)) or {}
+
+    def delete_targets(self, pipeline_id: Optional[int]) -> List[str]:
+        # The live collection, plus the shadow of a re-embedding run that covers this pipeline
+        targets = [self.for_pipeline(pipeline_id)]
+        migration = self.pointer().get('migration') or {}
+        shadow = migration.get('collection')
+        scope = migration.get('pipelines')
+        if shadow and shadow not in targets and (scope is None or pipeline_id is None or int(pipeline_id) in scope):
+            targets.append(shadow)
+        return targets
+
+    ## CHANGES MADE BY scripts/reembed_corpus.py
+    def _write(self, pointer: Dict[str, Any]):
+        pointer['updated_at'] = datetime.now(timezone.utc).isoformat()
+        self._reference().set(pointer)
+        with self._lock:
+            self._loaded_at = None
+
+    def begin_migration(self, shadow_collection: str, pipeline_ids: Optional[List[int]] = None):
+        pointer = dict(self._read_fresh())
+        pointer['migration'] = {'collection': shadow_collection, 'pipelines': pipeline_ids}
+        self._write(pointer)
+
+    def cut_over(self, shadow_collection: str, pipeline_ids: Optional[List[int]] = None,
+                 model: Optional[str] = None, dimensions: Optional[int] = None):
+        pointer = dict(self._read_fresh())
+        pointer['settings'] = {**(pointer.get('settings') or {}),
+                               shadow_collection: {'model': model, 'dimensions': dimensions}}
+        if pipeline_ids is None:
+            pointer['collection'] = shadow_collection
+            pointer['pipelines'] = {}
+        else:
+            pointer['pipelines'] = {**(pointer.get('pipelines') or {}),
+                                    **{str(int(pipeline_id)): shadow_collection for pipeline_id in pipeline_ids}}
+        pointer.pop('migration', None)
+        self._write(pointer)
+
+    def abandon_migration(self):
+        pointer = dict(self._read_fresh())
+        pointer.pop('migration', None)
+        self._write(pointer)
+
+    def _read_fresh(self) -> Dict[str, Any]:
+        snapshot = self._reference().get()
+        return (snapshot.to_dict() or {}) if snapshot.exists else {}
@@ -1,14 +1,43 @@
-import vertexai
-from vertexai.language_models import TextEmbeddingModel
 import numpy as np
-from typing import List
+from typing import Dict, List, Optional
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from app.metrics import time_stage
+from app.services.api_scheduler import BACKGROUND, embedding_api
+from app.services.dimensionality import (
+    FULL_EMBEDDING_DIMENSIONS,
+    NATIVE_DIMENSIONALITY_MODELS,
+    PCAProjection,
+    validate_dimensions,
+)
 
 load_dotenv()
 
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'text-embedding-004')
+# Chunks sent per get_embeddings call. text-embedding-004 takes up to 250 inputs and 20k tokens per
+# request; 500-character chunks are ~125 tokens, so 100 stays well inside both limits
+EMBEDDING_BATCH_SIZE = max(1, int(os.getenv('EMBEDDING_BATCH_SIZE', '100')))
+# Batches in flight at once per generate_embeddings call
+EMBEDDING_MAX_CONCURRENT_BATCHES = max(1, int(os.getenv('EMBEDDING_MAX_CONCURRENT_BATCHES', '4')))
+
 class EmbeddingService:
-    def __init__(self):
+    def __init__(self, model=None, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_concurrent_batches: int = EMBEDDING_MAX_CONCURRENT_BATCHES, model_name: Optional[str] = None):
+        # model: anything with TextEmbeddingModel.get_embeddings, e.g. local_backends.HashEmbeddingModel
+        self._projections: Dict[int, PCAProjection] = {}
+        self.batch_size = max(1, batch_size)
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        if model is not None:
+            self.model_name = type(model).__name__
+            self.embedding_model = model
+            self.supports_output_dimensionality = True
+            return
+
+        # The Vertex AI SDK takes seconds to import, and the local model doesn't need it
+        import vertexai
+        from vertexai.language_models import TextEmbeddingModel
+
         project_id = os.getenv('GCP_PROJECT_ID', 'hoosstudying-478421')
         location = os.getenv('GCP_LOCATION', 'us-central1')
         os.environ['GOOGLE_CLOUD_QUOTA_PROJECT'] = project_id
@@ -16,13 +45,47 @@ class EmbeddingService:
             project=project_id,
             location=location
         )
-        self.embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-004")
-    
-    def generate_embeddings(self, chunks: List[str]) -> List[np.ndarray]:
-        embeddings = []
-        for chunk in chunks:
-            embedding_result = self.embedding_model.get_embeddings([chunk])[0]
-            embedding = np.array(embedding_result.values)
-            embeddings.append(embedding)
-        return embeddings
+        self.model_name = model_name or EMBEDDING_MODEL_NAME
+        self.embedding_model = TextEmbeddingModel.from_pretrained(self.model_name)
+        self.supports_output_dimensionality = self.model_name in NATIVE_DIMENSIONALITY_MODELS
+
+    def _get_projection(self, dimensions: int) -> PCAProjection:
+        if dimensions not in self._projections:
+            from app.services.service_factory import shared_storage_service
+            projection = PCAProjection.load(shared_storage_service().bucket, self.model_name, dimensions)
+            if projection is None:
+                raise ValueError(
+                    f"{self.model_name} cannot return {dimensions}-dimension embeddings and no PCA projection "
+                    f"has been fitted for it. Run scripts/fit_embedding_projection.py --model {self.model_name} "
+                    f"--dimensions {dimensions}"
+                )
+            self._projections[dimensions] = projection
+        return self._projections[dimensions]
 
+    def generate_embeddings(self, chunks: List[str], output_dimensionality: Optional[int] = None,
+                            priority: str = BACKGROUND) -> List[np.ndarray]:
+        dimensions = validate_dimensions(output_dimensionality or FULL_EMBEDDING_DIMENSIONS)
+        reduced = dimensions != FULL_EMBEDDING_DIMENSIONS
+        native = reduced and self.supports_output_dimensionality
+
+        def embed_batch(batch: List[str]) -> List[np.ndarray]:
+            # Every request goes through the process-wide scheduler, so ingestion queues behind queries
+            with time_stage("embedding_batch"):
+                if native:
+                    results = embedding_api.call(priority, self.embedding_model.get_embeddings, batch, output_dimensionality=dimensions)
+                else:
+                    results = embedding_api.call(priority, self.embedding_model.get_embeddings, batch)
+            return [np.asarray(result.values, dtype=np.float32) for result in results]
+
+        batches = [chunks[i:i + self.batch_size] for i in range(0, len(chunks), self.batch_size)]
+        if len(batches) <= 1:
+            embeddings = [embedding for batch in batches for embedding in embed_batch(batch)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrent_batches, len(batches))) as executor:
+                embeddings = [embedding for batch_embeddings in executor.map(embed_batch, batches) for embedding in batch_embeddings]
+
+        if reduced and not native and embeddings:
+            projected = self._get_projection(dimensions).transform(np.stack(embeddings))
+            embeddings = list(projected)
+
+        return embeddings
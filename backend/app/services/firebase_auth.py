@@ -1,12 +1,17 @@
-import firebase_admin
-from firebase_admin import auth, credentials
-from firebase_admin.exceptions import FirebaseError
+import base64
+import json
 import os
 from dotenv import load_dotenv
+from app.metrics import time_stage
+from app.services.service_factory import is_local
 
 load_dotenv()
 
 def get_firebase_app():
+    # firebase_admin pulls in google.auth and its crypto backends, so it is imported on first use
+    import firebase_admin
+    from firebase_admin import credentials
+
     firebase_credentials_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
     if not firebase_credentials_path:
         raise ValueError("FIREBASE_CREDENTIALS_PATH environment variable is not set")
@@ -16,6 +21,33 @@ def get_firebase_app():
         firebase_admin.initialize_app(cred)
     return firebase_admin.get_app()
 
+## LOCAL TOKENS (AUTH_BACKEND=local)
+# Unsigned JWT-shaped tokens whose payload is trusted as-is, for load tests and offline development
+def make_local_token(uid: str, email: str = "", name: str = "") -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode({'uid': uid, 'email': email, 'name': name})}.local"
+
+def _verify_local_token(token: str) -> dict:
+    # Cloud Run always sets K_SERVICE; unsigned tokens must never be accepted there
+    if os.getenv('K_SERVICE'):
+        raise ValueError("AUTH_BACKEND=local is not allowed in a deployed service")
+
+    payload_segment = token.split('.')[1]
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(payload_segment + "=" * (-len(payload_segment) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid local token payload: {e}")
+
+    if not payload.get("uid"):
+        raise ValueError("Local token payload must contain a uid")
+
+    return {
+        "uid": payload["uid"],
+        "email": payload.get("email"),
+        "name": payload.get("name") or "",
+    }
+
 def verify_firebase_token(token: str) -> dict:
 
     if not token or not isinstance(token, str):
@@ -29,9 +61,17 @@ def verify_firebase_token(token: str) -> dict:
             f"Please provide a valid Firebase ID token."
         )
     
+    if is_local('auth'):
+        with time_stage("token_verify"):
+            return _verify_local_token(token)
+
+    from firebase_admin import auth
+    from firebase_admin.exceptions import FirebaseError
+
     try:
         get_firebase_app()
-        decoded_token = auth.verify_id_token(token)
+        with time_stage("token_verify"):
+            decoded_token = auth.verify_id_token(token)
 
         uid = decoded_token.get("uid")
         email = decoded_token.get("email")
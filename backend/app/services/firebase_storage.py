@@ -2,21 +2,27 @@ import firebase_admin
 from firebase_admin import credentials, storage
 import os
 import uuid
-from datetime import timedelta
-from typing import Tuple
+from typing import Optional, Tuple
 from dotenv import load_dotenv
+from app.services.service_factory import get_storage_bucket
+from app.services.signed_urls import signed_url_service
 
 load_dotenv()
 
 class FirebaseStorageService:
     
     def __init__(self):
+        firebase_storage_bucket = os.getenv('FIREBASE_STORAGE_BUCKET', 'hoosstudying-ab036.firebasestorage.app')
+
+        # STORAGE_BACKEND=local writes blobs to the local filesystem instead
+        self.bucket = get_storage_bucket(firebase_storage_bucket)
+        if self.bucket is not None:
+            return
+
         firebase_credentials_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
         if not firebase_credentials_path:
             raise ValueError("FIREBASE_CREDENTIALS_PATH environment variable is not set")
         
-        firebase_storage_bucket = os.getenv('FIREBASE_STORAGE_BUCKET', 'hoosstudying-ab036.firebasestorage.app')
-        
         if not firebase_admin._apps:
             cred = credentials.Certificate(firebase_credentials_path)
             firebase_admin.initialize_app(cred, {
@@ -25,25 +31,26 @@ class FirebaseStorageService:
         
         self.bucket = storage.bucket(firebase_storage_bucket)
     
+    @staticmethod
+    def new_storage_path(firebase_uid: str, file_name: str, folder: str = "documents") -> str:
+        # Lets callers record where a file will live before its upload has finished
+        return f"users/{firebase_uid}/{folder}/{uuid.uuid4()}/{file_name}"
+
     def upload_file(
         self, 
         file_path: str, 
         firebase_uid: str, 
         file_name: str,
-        folder: str = "documents"
+        folder: str = "documents",
+        storage_path: Optional[str] = None
     ) -> Tuple[str, str]:
         try:
-            document_uuid = str(uuid.uuid4())
-            storage_path = f"users/{firebase_uid}/{folder}/{document_uuid}/{file_name}"
+            storage_path = storage_path or self.new_storage_path(firebase_uid, file_name, folder)
             
             blob = self.bucket.blob(storage_path)
             blob.upload_from_filename(file_path)
             
-            download_url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(hours=1),
-                method="GET"
-            )
+            download_url = signed_url_service.get(storage_path).url
             
             return storage_path, download_url
             
@@ -64,14 +71,16 @@ class FirebaseStorageService:
             blob = self.bucket.blob(storage_path)
             blob.upload_from_string(file_content)
             
-            download_url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(hours=1),
-                method="GET"
-            )
+            download_url = signed_url_service.get(storage_path).url
             
             return storage_path, download_url
             
         except Exception as e:
             raise Exception(f"Error uploading to Firebase Storage: {str(e)}")
 
+    def delete_file(self, storage_path: str):
+        try:
+            self.bucket.blob(storage_path).delete()
+            signed_url_service.invalidate(storage_path)
+        except Exception as e:
+            raise Exception(f"Error deleting from Firebase Storage: {str(e)}")
@@ -2,16 +2,74 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.vector import Vector
 from google.cloud.firestore_v1.base_vector_query import DistanceMeasure
+from google.api_core.exceptions import FailedPrecondition
 import os
 import numpy as np
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
+from app.services.active_document_cache import ActiveDocumentSet
+from app.services.vector_quantization import QuantizedVectorIndex, quantized_fields, to_float32
+from app.services.vector_segments import VECTOR_INDEX_STORAGE, mapped_vector_store
+from app.services.dimensionality import vector_field_for_dimensions
+from app.services.embedding_collections import EmbeddingCollections
+from app.services.document_vectors import (
+    DOCUMENT_VECTOR_PAYLOAD_FIELDS,
+    DOCUMENT_VECTOR_SUM_FIELD,
+    build_document_vector,
+    document_vector_collection,
+    document_vector_id,
+    sum_chunk_vectors,
+)
+from app.logging_config import get_logger
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
+# Optional compact codes written next to each full-precision vector: none, int8 or binary
+EMBEDDING_QUANTIZATION = os.getenv('EMBEDDING_QUANTIZATION', 'none').lower()
+
+# Metadata copied into the local vector index so results don't need another read
+VECTOR_PAYLOAD_FIELDS = ['text', 'file_name', 'chunk_index', 'document_id', 'storage_path', 'pipeline_id']
+
+# Over-fetch used when the pipeline_id pre-filter index is unavailable
+LEGACY_PIPELINE_SEARCH_LIMIT = 200
+
+
+def build_embedding_document(embedding: np.ndarray, text: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # The Firestore document written for one chunk: the full vector in its per-size field,
+    # any quantized codes, the chunk text and the caller's metadata
+    embedding = to_float32(embedding)
+
+    data = {
+        vector_field_for_dimensions(len(embedding)): Vector(embedding.tolist()),
+        'embedding_dimensions': len(embedding),
+        'text': text
+    }
+    data.update(quantized_fields(embedding, EMBEDDING_QUANTIZATION))
+
+    if metadata:
+        metadata = metadata.copy()
+        if 'pipeline_id' in metadata and metadata['pipeline_id'] is not None:
+            metadata['pipeline_id'] = int(metadata['pipeline_id'])
+        data.update(metadata)
+
+    return data
+
 class FirestoreService:
+
+    # Collections for which Firestore reported a composite vector index missing. Per collection, so
+    # cutting over to a re-embedded collection with its indexes in place uses them again
+    pipeline_prefilter_unsupported = set()
+    document_prefilter_unsupported = set()
     
-    def __init__(self):
+    def __init__(self, client=None):
+        # client: an alternative Firestore client, e.g. the in-memory one from local_backends
+        if client is not None:
+            self.db = client
+            self.collections = EmbeddingCollections(self.db)
+            return
+
         firebase_credentials_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
         if not firebase_credentials_path:
             raise ValueError("FIREBASE_CREDENTIALS_PATH environment variable is not set")
@@ -21,6 +79,7 @@ class FirestoreService:
             firebase_admin.initialize_app(cred)
         
         self.db = firestore.client()
+        self.collections = EmbeddingCollections(self.db)
     
     def get_collection(self, collection_name: str):
         return self.db.collection(collection_name)
@@ -60,78 +119,308 @@ class FirestoreService:
     
     def add_embedding(self, document_id: str, embedding: List[float], text: str, metadata: Dict[str, Any] = None) -> str:
         if isinstance(embedding, np.ndarray):
-            embedding = embedding.tolist()
+            embedding = to_float32(embedding).tolist()
         data = {
             'embedding': embedding,
             'text': text
         }
         if metadata:
             data.update(metadata)
-        return self.add_document('embeddings', document_id, data)
+        return self.add_document(self.collections.for_pipeline((metadata or {}).get('pipeline_id')), document_id, data)
     
     def add_embeddings_batch(self, embeddings: List[np.ndarray], chunk_ids: List[str], texts: List[str], metadata_list: List[Dict[str, Any]] = None) -> int:
         batch = self.db.batch()
         count = 0
+        batch_count = 0
         
         for i, (embedding, chunk_id, text) in enumerate(zip(embeddings, chunk_ids, texts)):
-            if isinstance(embedding, np.ndarray):
-                embedding_list = embedding.tolist()
-            else:
-                embedding_list = embedding
+            metadata = metadata_list[i] if metadata_list and i < len(metadata_list) else None
+            data = build_embedding_document(embedding, text, metadata)
             
-            data = {
-                'embedding': Vector(embedding_list),
-                'text': text
-            }
-            
-            if metadata_list and i < len(metadata_list):
-                metadata = metadata_list[i].copy()
-                if 'pipeline_id' in metadata and metadata['pipeline_id'] is not None:
-                    metadata['pipeline_id'] = int(metadata['pipeline_id'])
-                data.update(metadata)
-            
-            doc_ref = self.db.collection('embeddings').document(chunk_id)
+            collection_name = self.collections.for_pipeline(data.get('pipeline_id'))
+            doc_ref = self.db.collection(collection_name).document(chunk_id)
             batch.set(doc_ref, data)
             count += 1
+            batch_count += 1
+
+            # Firestore rejects batches of more than 500 writes
+            if batch_count >= 500:
+                batch.commit()
+                batch = self.db.batch()
+                batch_count = 0
         
-        batch.commit()
-        print(f"Stored {count} embeddings with metadata: {metadata_list[0] if metadata_list else 'None'}")
+        if batch_count > 0:
+            batch.commit()
+        logger.debug("Stored %d embeddings with metadata: %s", count, metadata_list[0] if metadata_list else None)
+
+        if VECTOR_INDEX_STORAGE == 'mmap':
+            self._append_to_vector_segments(embeddings, chunk_ids, texts, metadata_list)
+        try:
+            self.update_document_vectors(embeddings, metadata_list or [])
+        except Exception:
+            # Retrieval falls back to searching every chunk for documents without a vector
+            logger.exception("Failed to update document vectors")
         return count
+
+    ## CHUNKS OF ONE DOCUMENT, FOR REPLACING IT WITH A NEW VERSION
+    def get_document_chunks(self, storage_path: str, pipeline_id: Optional[int] = None,
+                            vector_field: str = 'embedding') -> List[Dict[str, Any]]:
+        collection = self.db.collection(self.collections.for_pipeline(pipeline_id))
+        docs = collection.where('storage_path', '==', storage_path).select(['text', 'chunk_index', 'file_name', vector_field]).stream()
+        chunks = []
+        for doc in docs:
+            data = doc.to_dict()
+            vector = data.get(vector_field)
+            chunks.append({
+                'id': doc.id,
+                'text': data.get('text', ''),
+                'chunk_index': data.get('chunk_index', 0),
+                'file_name': data.get('file_name'),
+                'embedding': to_float32(list(vector)) if vector is not None else None,
+            })
+        return sorted(chunks, key=lambda chunk: chunk['chunk_index'])
+
+    def update_chunk_fields(self, updates: Dict[str, Dict[str, Any]], pipeline_id: Optional[int] = None) -> int:
+        # chunk id -> fields, e.g. the new chunk_index of a chunk kept by a document replacement.
+        # Applied to a running re-embedding's shadow collection too, so its copies match after cutover
+        live = self.collections.for_pipeline(pipeline_id)
+        batch = self.db.batch()
+        batch_count = 0
+        for collection_name in self.collections.delete_targets(pipeline_id):
+            collection = self.db.collection(collection_name)
+            chunk_ids = list(updates)
+            if collection_name != live and chunk_ids:
+                # The shadow may not have reached these chunks yet, and updating a missing document fails the batch
+                refs = [collection.document(chunk_id) for chunk_id in chunk_ids]
+                chunk_ids = [doc.id for doc in self.db.get_all(refs, field_paths=['chunk_index']) if doc.exists]
+            for chunk_id in chunk_ids:
+                batch.update(collection.document(chunk_id), updates[chunk_id])
+                batch_count += 1
+                if batch_count >= 500:
+                    batch.commit()
+                    batch = self.db.batch()
+                    batch_count = 0
+        if batch_count > 0:
+            batch.commit()
+
+        if updates and VECTOR_INDEX_STORAGE == 'mmap' and pipeline_id is not None:
+            # Segment payloads can't be edited in place; the next search rebuilds them
+            mapped_vector_store.drop(pipeline_id)
+        return len(updates)
+
+    ## DOCUMENT VECTORS FOR TWO-STAGE RETRIEVAL
+    def update_document_vectors(self, embeddings: List[np.ndarray], metadata_list: List[Dict[str, Any]]):
+        for storage_path, (total, count, metadata) in sum_chunk_vectors(embeddings, metadata_list).items():
+            pipeline_id = metadata.get('pipeline_id')
+            collection = self.db.collection(document_vector_collection(self.collections.for_pipeline(pipeline_id)))
+            doc_ref = collection.document(document_vector_id(storage_path))
+
+            # Add to what earlier writes for this document already summed
+            snapshot = doc_ref.get()
+            existing = snapshot.to_dict() if snapshot.exists else None
+            if existing and existing.get('embedding_dimensions') == len(total):
+                total = total + np.asarray(list(existing[DOCUMENT_VECTOR_SUM_FIELD]), dtype=np.float64)
+                count += existing.get('chunk_count', 0)
+
+            doc_ref.set(build_document_vector(total, count, storage_path, metadata))
+
+    def delete_document_vectors(self, storage_paths: List[str], pipeline_id: Optional[int] = None):
+        batch = self.db.batch()
+        batch_count = 0
+        for collection_name in self.collections.delete_targets(pipeline_id):
+            collection = self.db.collection(document_vector_collection(collection_name))
+            for storage_path in set(storage_paths):
+                batch.delete(collection.document(document_vector_id(storage_path)))
+                batch_count += 1
+                if batch_count >= 500:
+                    batch.commit()
+                    batch = self.db.batch()
+                    batch_count = 0
+        if batch_count > 0:
+            batch.commit()
+
+    def load_document_vector_index(self, pipeline_id: int, dimensions: Optional[int] = None) -> QuantizedVectorIndex:
+        index = QuantizedVectorIndex("float32")
+        vector_field = vector_field_for_dimensions(dimensions)
+        collection = self.db.collection(document_vector_collection(self.collections.for_pipeline(pipeline_id)))
+        docs = collection.where('pipeline_id', '==', int(pipeline_id)).select(DOCUMENT_VECTOR_PAYLOAD_FIELDS + [vector_field]).stream()
+
+        ids, vectors, payloads = [], [], []
+        for doc in docs:
+            data = doc.to_dict()
+            if data.get(vector_field) is None:
+                continue
+            ids.append(doc.id)
+            vectors.append(to_float32(list(data[vector_field])))
+            payloads.append({field: data.get(field) for field in DOCUMENT_VECTOR_PAYLOAD_FIELDS})
+        if ids:
+            index.add(ids, np.stack(vectors), payloads)
+
+        logger.info("Loaded %d document vectors for pipeline %s", len(index), pipeline_id)
+        return index
+
+    def _append_to_vector_segments(self, embeddings: List[np.ndarray], chunk_ids: List[str], texts: List[str],
+                                   metadata_list: Optional[List[Dict[str, Any]]]):
+        rows_by_pipeline: Dict[int, List[int]] = {}
+        for i in range(len(chunk_ids)):
+            metadata = metadata_list[i] if metadata_list and i < len(metadata_list) else {}
+            if metadata.get('pipeline_id') is not None:
+                rows_by_pipeline.setdefault(int(metadata['pipeline_id']), []).append(i)
+
+        for pipeline_id, rows in rows_by_pipeline.items():
+            try:
+                mapped_vector_store.append(
+                    pipeline_id,
+                    [chunk_ids[i] for i in rows],
+                    np.stack([to_float32(embeddings[i]) for i in rows]),
+                    [texts[i] for i in rows],
+                    [metadata_list[i] for i in rows]
+                )
+            except Exception:
+                # The next search rebuilds the pipeline from Firestore instead
+                logger.exception("Failed to append to the vector segments of pipeline %s", pipeline_id)
+                mapped_vector_store.drop(pipeline_id)
     
     def get_embedding(self, document_id: str) -> Optional[Dict[str, Any]]:
-        return self.get_document('embeddings', document_id)
+        return self.get_document(self.collections.default(), document_id)
     
     def delete_embeddings_by_file(self, file_name: str, pipeline_id: int) -> int:
         try:
-            collection = self.db.collection('embeddings')
-            query = collection.where('file_name', '==', file_name).where('pipeline_id', '==', int(pipeline_id))
-            docs = query.stream()
-            
             deleted_count = 0
+            deleted_ids = []
+            storage_paths = set()
             batch = self.db.batch()
             batch_count = 0
             
-            for doc in docs:
-                batch.delete(doc.reference)
-                batch_count += 1
-                deleted_count += 1
-                
-                if batch_count >= 500:
-                    batch.commit()
-                    batch = self.db.batch()
-                    batch_count = 0
+            # The live collection first, then the shadow of a re-embedding run in progress
+            for target, collection_name in enumerate(self.collections.delete_targets(pipeline_id)):
+                collection = self.db.collection(collection_name)
+                query = collection.where('file_name', '==', file_name).where('pipeline_id', '==', int(pipeline_id))
+                docs = query.stream()
+
+                for doc in docs:
+                    batch.delete(doc.reference)
+                    batch_count += 1
+                    if target == 0:
+                        deleted_ids.append(doc.id)
+                        deleted_count += 1
+                        if doc.get('storage_path'):
+                            storage_paths.add(doc.get('storage_path'))
+                    
+                    if batch_count >= 500:
+                        batch.commit()
+                        batch = self.db.batch()
+                        batch_count = 0
             
             if batch_count > 0:
                 batch.commit()
+            if storage_paths:
+                self.delete_document_vectors(list(storage_paths), pipeline_id)
+
+            if VECTOR_INDEX_STORAGE == 'mmap':
+                try:
+                    mapped_vector_store.delete(pipeline_id, deleted_ids)
+                except Exception:
+                    logger.exception("Failed to tombstone deleted chunks in the vector segments of pipeline %s", pipeline_id)
+                    mapped_vector_store.drop(pipeline_id)
             
-            print(f"Deleted {deleted_count} embeddings for file '{file_name}' in pipeline {pipeline_id}")
+            logger.info("Deleted %d embeddings for file '%s' in pipeline %s", deleted_count, file_name, pipeline_id)
             return deleted_count
         except Exception as e:
-            print(f"Error deleting embeddings: {str(e)}")
+            logger.exception("Error deleting embeddings for file '%s' in pipeline %s", file_name, pipeline_id)
             return 0
     
+    def delete_embeddings(self, chunk_ids: List[str], pipeline_id: Optional[int] = None,
+                          storage_paths: Optional[List[str]] = None) -> int:
+        # Removes specific chunks, e.g. the ones an upload wrote before a later step failed, and
+        # the vectors of the documents they belonged to
+        batch = self.db.batch()
+        batch_count = 0
+        for collection_name in self.collections.delete_targets(pipeline_id):
+            for chunk_id in chunk_ids:
+                batch.delete(self.db.collection(collection_name).document(chunk_id))
+                batch_count += 1
+                if batch_count >= 500:
+                    batch.commit()
+                    batch = self.db.batch()
+                    batch_count = 0
+        if batch_count > 0:
+            batch.commit()
+        if storage_paths:
+            self.delete_document_vectors(storage_paths, pipeline_id)
+
+        if VECTOR_INDEX_STORAGE == 'mmap' and pipeline_id is not None:
+            try:
+                mapped_vector_store.delete(pipeline_id, chunk_ids)
+            except Exception:
+                logger.exception("Failed to tombstone deleted chunks in the vector segments of pipeline %s", pipeline_id)
+                mapped_vector_store.drop(pipeline_id)
+        return len(chunk_ids)
+    
+    def get_embedding_vectors(self, chunk_ids: List[str], vector_field: str = 'embedding',
+                              pipeline_id: Optional[int] = None) -> Dict[str, np.ndarray]:
+        # chunk id -> vector; chunks deleted since the caller saw them are left out
+        collection = self.db.collection(self.collections.for_pipeline(pipeline_id))
+        refs = [collection.document(chunk_id) for chunk_id in chunk_ids]
+        vectors_by_id = {}
+        for doc in self.db.get_all(refs, field_paths=[vector_field]):
+            vector = (doc.to_dict() or {}).get(vector_field) if doc.exists else None
+            if vector is not None:
+                vectors_by_id[doc.id] = to_float32(list(vector))
+        return vectors_by_id
+
+    def load_pipeline_vector_index(self, pipeline_id: int, mode: str, dimensions: Optional[int] = None) -> QuantizedVectorIndex:
+        index = QuantizedVectorIndex(mode)
+        vector_field = vector_field_for_dimensions(dimensions)
+        code_fields = {
+            'int8': ['embedding_int8', 'embedding_int8_scale'],
+            'binary': ['embedding_bits'],
+        }.get(mode, [vector_field])
+
+        query = self.db.collection(self.collections.for_pipeline(pipeline_id)).where('pipeline_id', '==', int(pipeline_id))
+        docs = query.select(VECTOR_PAYLOAD_FIELDS + code_fields).stream()
+
+        ids, payloads, codes, scales, missing = [], [], [], [], []
+        for doc in docs:
+            data = doc.to_dict()
+            if mode == 'int8' and data.get('embedding_int8') is not None:
+                codes.append(np.frombuffer(data['embedding_int8'], dtype=np.int8))
+                scales.append(data['embedding_int8_scale'])
+            elif mode == 'binary' and data.get('embedding_bits') is not None:
+                codes.append(np.frombuffer(data['embedding_bits'], dtype=np.uint8))
+            elif mode == 'float32' and data.get(vector_field) is not None:
+                codes.append(to_float32(list(data[vector_field])))
+            else:
+                # Written before EMBEDDING_QUANTIZATION was enabled; encode locally below
+                missing.append((doc.id, {field: data.get(field) for field in VECTOR_PAYLOAD_FIELDS}))
+                continue
+            ids.append(doc.id)
+            payloads.append({field: data.get(field) for field in VECTOR_PAYLOAD_FIELDS})
+
+        if codes:
+            if mode == 'float32':
+                index.add(ids, np.stack(codes), payloads)
+            else:
+                index.add(ids, payloads=payloads, codes=np.stack(codes), scales=np.asarray(scales) if scales else None)
+
+        if missing:
+            vectors = self.get_embedding_vectors([chunk_id for chunk_id, _ in missing], vector_field, pipeline_id)
+            missing = [(chunk_id, payload) for chunk_id, payload in missing if chunk_id in vectors]
+            if missing:
+                index.add(
+                    [chunk_id for chunk_id, _ in missing],
+                    np.stack([vectors[chunk_id] for chunk_id, _ in missing]),
+                    [payload for _, payload in missing]
+                )
+
+        logger.info(
+            "Loaded %d %s vectors for pipeline %s (%d bytes, %d encoded locally)",
+            len(index), mode, pipeline_id, index.nbytes, len(missing)
+        )
+        return index
+
     def get_all_embeddings(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        return self.query_collection('embeddings', limit=limit)
+        return self.query_collection(self.collections.default(), limit=limit)
     
     def get_all_documents_with_ids(self, collection_name: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         query = self.db.collection(collection_name)
@@ -140,15 +429,76 @@ class FirestoreService:
         docs = query.stream()
         return [{'id': doc.id, **doc.to_dict()} for doc in docs]
 
+    def _stream_nearest(self, query, query_vector: List[float], measure, limit: int,
+                        distance_threshold: Optional[float] = None) -> list:
+        vector_query = query.find_nearest(
+            vector_field=vector_field_for_dimensions(len(query_vector)),
+            query_vector=Vector(query_vector),
+            distance_measure=measure,
+            limit=limit,
+            distance_result_field="vector_distance",
+            distance_threshold=distance_threshold
+        )
+        return list(vector_query.stream())
+
+    def find_nearest_in_documents(
+        self,
+        query_vector: List[float],
+        pipeline_id: int,
+        storage_paths: List[str],
+        top_k: int = 5,
+        distance_threshold: Optional[float] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        # Second stage of VECTOR_SEARCH_MODE=documents: cosine search over the chunks of the given
+        # documents only. None means the (storage_path, embedding) index is missing; search flat instead
+        collection_name = self.collections.for_pipeline(pipeline_id)
+        if collection_name in FirestoreService.document_prefilter_unsupported:
+            return None
+        collection = self.db.collection(collection_name)
+        try:
+            docs = self._stream_nearest(
+                collection.where('storage_path', 'in', list(storage_paths)),
+                query_vector,
+                DistanceMeasure.COSINE,
+                top_k,
+                distance_threshold
+            )
+        except FailedPrecondition as e:
+            logger.warning("Composite vector index on (storage_path, embedding) is missing, searching all chunks instead: %s", e)
+            FirestoreService.document_prefilter_unsupported.add(collection_name)
+            return None
+
+        results = []
+        for doc in docs:
+            data = doc.to_dict()
+            distance = data.pop('vector_distance', None)
+            results.append({
+                'id': doc.id,
+                'text': data.get('text', ''),
+                'file_name': data.get('file_name', 'Unknown'),
+                'chunk_index': data.get('chunk_index', 0),
+                'document_id': data.get('document_id'),
+                'storage_path': data.get('storage_path'),
+                'pipeline_id': int(pipeline_id),
+                'similarity_score': 1 - distance if distance is not None else 0,
+                'distance': distance
+            })
+        return results
+
     def find_nearest_embeddings(
         self,
         query_vector: List[float],
         pipeline_id: Optional[int] = None,
         top_k: int = 5,
-        distance_measure: str = "COSINE"
+        distance_measure: str = "COSINE",
+        active_documents: Optional[ActiveDocumentSet] = None,
+        distance_threshold: Optional[float] = None
     ) -> List[Dict[str, Any]]:
+        # distance_threshold drops weaker matches server-side: results further than it (or, for
+        # DOT_PRODUCT, scoring below it) are never returned
         try:
-            collection = self.db.collection('embeddings')
+            collection_name = self.collections.for_pipeline(pipeline_id)
+            collection = self.db.collection(collection_name)
             
             measure_map = {
                 "COSINE": DistanceMeasure.COSINE,
@@ -156,36 +506,45 @@ class FirestoreService:
                 "DOT_PRODUCT": DistanceMeasure.DOT_PRODUCT
             }
             measure = measure_map.get(distance_measure.upper(), DistanceMeasure.COSINE)
+
+            if active_documents is not None and active_documents.active_count == 0:
+                logger.debug("Pipeline %s has no active documents, skipping vector search", pipeline_id)
+                return []
+
+            docs = None
+            limit = top_k
+
+            if pipeline_id is not None and collection_name not in FirestoreService.pipeline_prefilter_unsupported:
+                # Pre-filter on pipeline_id using the composite index in firestore_index_config.json,
+                # so the only over-fetch needed is for the pipeline's inactive documents
+                limit = active_documents.overfetch_limit(top_k) if active_documents else top_k
+                try:
+                    docs = self._stream_nearest(
+                        collection.where('pipeline_id', '==', int(pipeline_id)),
+                        query_vector,
+                        measure,
+                        limit,
+                        distance_threshold
+                    )
+                except FailedPrecondition as e:
+                    logger.warning("Composite vector index on (pipeline_id, embedding) is missing, falling back to post-filtering: %s", e)
+                    FirestoreService.pipeline_prefilter_unsupported.add(collection_name)
+
+            if docs is None:
+                # Without the composite index, Firestore's vector search returns results from ALL
+                # pipelines and we filter afterward, so we need a MUCH larger limit to still find
+                # this pipeline's embeddings.
+                if pipeline_id is not None:
+                    limit = LEGACY_PIPELINE_SEARCH_LIMIT
+                    if active_documents is not None:
+                        limit = max(limit, active_documents.overfetch_limit(LEGACY_PIPELINE_SEARCH_LIMIT))
+                docs = self._stream_nearest(collection, query_vector, measure, limit, distance_threshold)
             
-            # CRITICAL FIX: When filtering by pipeline_id, we need a MUCH larger limit
-            # because Firestore's vector search returns results from ALL pipelines,
-            # then we filter afterward. If none of the top results are from our pipeline,
-            # we get 0 results even if embeddings exist!
-            if pipeline_id is not None:
-                # Increased from 15 to 200 to ensure we find relevant documents
-                # TODO: Create composite index for better performance using:
-                # gcloud firestore indexes composite create --collection-group=embeddings \
-                #   --query-scope=COLLECTION \
-                #   --field-config=order=ASCENDING,field-path=pipeline_id \
-                #   --field-config=vector-config='{"dimension":"768","flat": "{}"}',field-path=embedding
-                limit = 200
-            else:
-                limit = top_k
-            
-            print(f"Searching for embeddings with pipeline_id={pipeline_id}, top_k={top_k}, limit={limit}")
-            
-            vector_query = collection.find_nearest(
-                vector_field="embedding",
-                query_vector=Vector(query_vector),
-                distance_measure=measure,
-                limit=limit,
-                distance_result_field="vector_distance"
-            )
-            
-            docs = vector_query.stream()
+            logger.debug("Searching for embeddings with pipeline_id=%s, top_k=%d, limit=%d", pipeline_id, top_k, limit)
             
             results = []
             checked = 0
+            skipped_inactive = 0
             for doc in docs:
                 checked += 1
                 data = doc.to_dict()
@@ -197,6 +556,10 @@ class FirestoreService:
                         continue
                     if int(doc_pipeline_id) != int(pipeline_id):
                         continue
+
+                if active_documents is not None and not active_documents.contains(data.get('document_id'), data.get('storage_path')):
+                    skipped_inactive += 1
+                    continue
                 
                 distance = data.pop('vector_distance', None)
                 
@@ -211,6 +574,7 @@ class FirestoreService:
                     'file_name': data.get('file_name', 'Unknown'),
                     'chunk_index': data.get('chunk_index', 0),
                     'document_id': data.get('document_id'),
+                    'storage_path': data.get('storage_path'),
                     'pipeline_id': int(doc_pipeline_id) if doc_pipeline_id is not None else None,
                     'similarity_score': similarity_score,
                     'distance': distance
@@ -219,12 +583,13 @@ class FirestoreService:
                 if len(results) >= top_k:
                     break
             
-            print(f"Checked {checked} embeddings, found {len(results)} matching pipeline_id={pipeline_id}")
+            logger.debug(
+                "Checked %d embeddings, skipped %d inactive, found %d matching pipeline_id=%s",
+                checked, skipped_inactive, len(results), pipeline_id
+            )
             return results
-        except Exception as e:
-            print(f"Error in find_nearest_embeddings: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error in find_nearest_embeddings for pipeline %s", pipeline_id)
             return []
 
 if __name__ == "__main__":
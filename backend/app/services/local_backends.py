@@ -0,0 +1,420 @@
+### Deterministic local stand-ins for Firestore, Cloud Storage, Vertex embeddings and the chat LLM
+# Each one plugs in underneath the existing service class (the Firestore client, the Storage
+# bucket, the Vertex model, the LangChain chat model), so FirestoreService, FirebaseStorageService,
+# EmbeddingService and RAGService run their real code paths against them. Latency is injected
+# per call so load tests and benchmarks see realistic timings without touching paid services.
+# Selected with the *_BACKEND environment variables in app/services/service_factory.py.
+
+import hashlib
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
+
+load_dotenv()
+
+# Injected latencies in milliseconds; set any of them to 0 for the fastest possible runs
+LOCAL_FIRESTORE_LATENCY_MS = float(os.getenv('LOCAL_FIRESTORE_LATENCY_MS', '15'))
+LOCAL_STORAGE_LATENCY_MS = float(os.getenv('LOCAL_STORAGE_LATENCY_MS', '40'))
+LOCAL_EMBEDDING_LATENCY_MS = float(os.getenv('LOCAL_EMBEDDING_LATENCY_MS', '60'))
+LOCAL_LLM_FIRST_TOKEN_MS = float(os.getenv('LOCAL_LLM_FIRST_TOKEN_MS', '400'))
+LOCAL_LLM_TOKEN_MS = float(os.getenv('LOCAL_LLM_TOKEN_MS', '15'))
+
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', os.path.join('data', 'local_storage'))
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _sleep_ms(milliseconds: float):
+    if milliseconds > 0:
+        time.sleep(milliseconds / 1000.0)
+
+def _as_float_list(value) -> List[float]:
+    return [float(x) for x in value]
+
+
+## IN-MEMORY FIRESTORE
+# Implements the slice of google.cloud.firestore used by FirestoreService: documents, batches,
+# get_all, equality/range filters, select, limit and find_nearest with the three distance measures.
+
+class LocalDocumentSnapshot:
+
+    def __init__(self, reference: "LocalDocumentReference", data: Optional[Dict[str, Any]], field_paths: Optional[List[str]] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        self._data = dict(data) if data is not None else None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str):
+        return self._data.get(field) if self._data is not None else None
+
+
+class LocalDocumentReference:
+
+    def __init__(self, store: "LocalFirestoreClient", collection: str, document_id: Optional[str] = None):
+        self._store = store
+        self.collection_name = collection
+        self.id = document_id or uuid.uuid4().hex
+
+    def set(self, data: Dict[str, Any]):
+        self._store._write(self.collection_name, self.id, data)
+
+    def update(self, data: Dict[str, Any]):
+        self._store._write(self.collection_name, self.id, data, merge=True)
+
+    def delete(self):
+        self._store._delete(self.collection_name, self.id)
+
+    def get(self, field_paths: Optional[List[str]] = None) -> LocalDocumentSnapshot:
+        _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        return LocalDocumentSnapshot(self, self._store._read(self.collection_name, self.id), field_paths)
+
+
+class LocalVectorQuery:
+
+    def __init__(self, query: "LocalQuery", vector_field: str, query_vector, distance_measure, limit: int, distance_result_field: Optional[str],
+                 distance_threshold: Optional[float] = None):
+        self._query = query
+        self._vector_field = vector_field
+        self._query_vector = np.asarray(_as_float_list(query_vector), dtype=np.float32)
+        self._measure = getattr(distance_measure, 'name', str(distance_measure)).upper()
+        self._limit = limit
+        self._distance_result_field = distance_result_field
+        self._distance_threshold = distance_threshold
+
+    def _within_threshold(self, distance: float) -> bool:
+        # Like Firestore: at most the threshold for distances, at least it for DOT_PRODUCT
+        if self._distance_threshold is None:
+            return True
+        if self._measure == 'DOT_PRODUCT':
+            return distance >= self._distance_threshold
+        return distance <= self._distance_threshold
+
+    def stream(self) -> Iterator[LocalDocumentSnapshot]:
+        _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        candidates = []
+        for document_id, data in self._query._matching():
+            vector = data.get(self._vector_field)
+            if vector is None:
+                continue
+            vector = np.asarray(_as_float_list(vector), dtype=np.float32)
+            if vector.shape != self._query_vector.shape:
+                continue
+            distance = self._distance(vector)
+            if self._within_threshold(distance):
+                candidates.append((document_id, data, distance))
+
+        # DOT_PRODUCT is a similarity, so larger values are nearer
+        reverse = self._measure == 'DOT_PRODUCT'
+        candidates.sort(key=lambda item: item[2], reverse=reverse)
+
+        for document_id, data, distance in candidates[:self._limit]:
+            data = dict(data)
+            if self._distance_result_field:
+                data[self._distance_result_field] = distance
+            yield LocalDocumentSnapshot(self._query._reference(document_id), data)
+
+    def _distance(self, vector: np.ndarray) -> float:
+        if self._measure == 'EUCLIDEAN':
+            return float(np.linalg.norm(vector - self._query_vector))
+        if self._measure == 'DOT_PRODUCT':
+            return float(vector @ self._query_vector)
+        denominator = float(np.linalg.norm(vector) * np.linalg.norm(self._query_vector)) or 1.0
+        return 1.0 - float(vector @ self._query_vector) / denominator
+
+
+class LocalQuery:
+
+    _OPERATORS = {
+        '==': lambda a, b: a == b,
+        '!=': lambda a, b: a != b,
+        '<': lambda a, b: a is not None and a < b,
+        '<=': lambda a, b: a is not None and a <= b,
+        '>': lambda a, b: a is not None and a > b,
+        '>=': lambda a, b: a is not None and a >= b,
+        'in': lambda a, b: a in b,
+        'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    }
+
+    def __init__(self, store: "LocalFirestoreClient", collection: str, filters: Tuple = (), limit_count: Optional[int] = None,
+                 field_paths: Optional[List[str]] = None):
+        self._store = store
+        self._collection = collection
+        self._filters = filters
+        self._limit_count = limit_count
+        self._field_paths = field_paths
+
+    def where(self, field: str, operator: str, value: Any) -> "LocalQuery":
+        if operator not in self._OPERATORS:
+            raise ValueError(f"Unsupported operator for the local Firestore backend: {operator}")
+        return LocalQuery(self._store, self._collection, self._filters + ((field, operator, value),), self._limit_count, self._field_paths)
+
+    def limit(self, count: int) -> "LocalQuery":
+        return LocalQuery(self._store, self._collection, self._filters, count, self._field_paths)
+
+    def select(self, field_paths: Iterable[str]) -> "LocalQuery":
+        return LocalQuery(self._store, self._collection, self._filters, self._limit_count, list(field_paths))
+
+    def find_nearest(self, vector_field: str, query_vector, distance_measure, limit: int, distance_result_field: Optional[str] = None,
+                     distance_threshold: Optional[float] = None, **_) -> LocalVectorQuery:
+        return LocalVectorQuery(self, vector_field, query_vector, distance_measure, limit, distance_result_field, distance_threshold)
+
+    def _reference(self, document_id: str) -> LocalDocumentReference:
+        return LocalDocumentReference(self._store, self._collection, document_id)
+
+    def _matching(self) -> List[Tuple[str, Dict[str, Any]]]:
+        matches = []
+        for document_id, data in self._store._snapshot(self._collection):
+            if all(self._OPERATORS[operator](data.get(field), value) for field, operator, value in self._filters):
+                matches.append((document_id, data))
+                if self._limit_count is not None and len(matches) >= self._limit_count:
+                    break
+        return matches
+
+    def stream(self) -> Iterator[LocalDocumentSnapshot]:
+        _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        for document_id, data in self._matching():
+            yield LocalDocumentSnapshot(self._reference(document_id), data, self._field_paths)
+
+
+class LocalCollectionReference(LocalQuery):
+
+    def __init__(self, store: "LocalFirestoreClient", collection: str):
+        super().__init__(store, collection)
+        self.id = collection
+
+    def document(self, document_id: Optional[str] = None) -> LocalDocumentReference:
+        return LocalDocumentReference(self._store, self._collection, document_id)
+
+
+class LocalWriteBatch:
+
+    def __init__(self, store: "LocalFirestoreClient"):
+        self._store = store
+        self._operations: List[Tuple[str, LocalDocumentReference, Optional[Dict[str, Any]]]] = []
+
+    def set(self, reference: LocalDocumentReference, data: Dict[str, Any]):
+        self._operations.append(('set', reference, data))
+
+    def update(self, reference: LocalDocumentReference, data: Dict[str, Any]):
+        self._operations.append(('update', reference, data))
+
+    def delete(self, reference: LocalDocumentReference):
+        self._operations.append(('delete', reference, None))
+
+    def commit(self):
+        # One round trip for the whole batch, like the real client
+        _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        with self._store._lock:
+            for operation, reference, data in self._operations:
+                if operation == 'delete':
+                    self._store._collections.get(reference.collection_name, {}).pop(reference.id, None)
+                else:
+                    self._store._write(reference.collection_name, reference.id, data, merge=operation == 'update', latency=False)
+        self._operations = []
+
+
+class LocalFirestoreClient:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def collection(self, name: str) -> LocalCollectionReference:
+        return LocalCollectionReference(self, name)
+
+    def collections(self) -> List[LocalCollectionReference]:
+        with self._lock:
+            return [LocalCollectionReference(self, name) for name in self._collections]
+
+    def batch(self) -> LocalWriteBatch:
+        return LocalWriteBatch(self)
+
+    def get_all(self, references: Iterable[LocalDocumentReference], field_paths: Optional[List[str]] = None) -> Iterator[LocalDocumentSnapshot]:
+        _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        for reference in references:
+            yield LocalDocumentSnapshot(reference, self._read(reference.collection_name, reference.id), field_paths)
+
+    def _write(self, collection: str, document_id: str, data: Dict[str, Any], merge: bool = False, latency: bool = True):
+        if latency:
+            _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        with self._lock:
+            documents = self._collections.setdefault(collection, {})
+            if merge and document_id in documents:
+                documents[document_id] = {**documents[document_id], **data}
+            else:
+                documents[document_id] = dict(data)
+
+    def _read(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._collections.get(collection, {}).get(document_id)
+            return dict(data) if data is not None else None
+
+    def _delete(self, collection: str, document_id: str):
+        _sleep_ms(LOCAL_FIRESTORE_LATENCY_MS)
+        with self._lock:
+            self._collections.get(collection, {}).pop(document_id, None)
+
+    def _snapshot(self, collection: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return list(self._collections.get(collection, {}).items())
+
+
+## FILESYSTEM BLOB STORE
+# Mirrors the google.cloud.storage Bucket/Blob calls the app makes, rooted at LOCAL_STORAGE_DIR
+
+class LocalBlob:
+
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.root, *self.name.split('/'))
+
+    def upload_from_filename(self, filename: str, **_):
+        _sleep_ms(LOCAL_STORAGE_LATENCY_MS)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path)
+
+    def upload_from_string(self, data, content_type: Optional[str] = None, **_):
+        _sleep_ms(LOCAL_STORAGE_LATENCY_MS)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as file:
+            file.write(data.encode('utf-8') if isinstance(data, str) else data)
+
+    def download_to_filename(self, filename: str, **_):
+        _sleep_ms(LOCAL_STORAGE_LATENCY_MS)
+        shutil.copyfile(self.path, filename)
+
+    def download_as_bytes(self, **_) -> bytes:
+        _sleep_ms(LOCAL_STORAGE_LATENCY_MS)
+        with open(self.path, 'rb') as file:
+            return file.read()
+
+    def exists(self, **_) -> bool:
+        return os.path.exists(self.path)
+
+    def delete(self, **_):
+        _sleep_ms(LOCAL_STORAGE_LATENCY_MS)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def generate_signed_url(self, expiration=None, method: str = "GET", **_) -> str:
+        # Signing is a local HMAC in the real client as well, so no latency here
+        return f"file://{os.path.abspath(self.path)}"
+
+
+class LocalBucket:
+
+    def __init__(self, name: str, root: str = LOCAL_STORAGE_DIR):
+        self.name = name
+        self.root = os.path.join(root, name)
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+
+## HASH-BASED EMBEDDINGS
+# Signed feature hashing of word unigrams and bigrams: deterministic, and texts that share
+# words land near each other, so retrieval over local data still returns sensible chunks.
+
+class LocalTextEmbedding:
+
+    def __init__(self, values: List[float]):
+        self.values = values
+
+
+class HashEmbeddingModel:
+
+    def __init__(self, dimensions: int = 768):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str, dimensions: int) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        # Truncate then renormalize, which is what output_dimensionality does for Matryoshka models
+        vector = vector[:dimensions]
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def get_embeddings(self, texts: List[str], output_dimensionality: Optional[int] = None, **_) -> List[LocalTextEmbedding]:
+        # One round trip per call regardless of batch size, like the Vertex endpoint
+        _sleep_ms(LOCAL_EMBEDDING_LATENCY_MS)
+        dimensions = output_dimensionality or self.dimensions
+        return [LocalTextEmbedding(self._embed(text, dimensions)) for text in texts]
+
+
+## CANNED-RESPONSE CHAT MODEL
+
+class CannedChatModel:
+    # Streams a deterministic answer built from the question and the retrieved context, with a
+    # first-token delay and per-token delay, and reports token usage like ChatOpenAI(stream_usage=True)
+
+    def __init__(self, first_token_ms: float = LOCAL_LLM_FIRST_TOKEN_MS, token_ms: float = LOCAL_LLM_TOKEN_MS,
+                 response: Optional[str] = None):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.response = response if response is not None else os.getenv('LOCAL_LLM_RESPONSE')
+
+    @staticmethod
+    def _count_tokens(text: str) -> int:
+        # Roughly four characters per token for English text
+        return max(1, math.ceil(len(text) / 4))
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        if self.response:
+            return self.response
+
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        sources = re.findall(r"\[Source \d+: ([^\]]+)\]", messages[0].content if messages else "")
+        if sources:
+            return (f"(local model) Based on {len(sources)} excerpt(s) from {', '.join(dict.fromkeys(sources))}, "
+                    f"here is a summary that addresses: {question}")
+        return f"(local model) I could not find anything in your documents about: {question}"
+
+    def stream(self, messages: List[BaseMessage], **_) -> Iterator[AIMessageChunk]:
+        answer = self._answer(messages)
+        words = answer.split(' ')
+        prompt_tokens = sum(self._count_tokens(str(m.content)) for m in messages)
+
+        _sleep_ms(self.first_token_ms)
+        for i, word in enumerate(words):
+            if i:
+                _sleep_ms(self.token_ms)
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
+
+        yield AIMessageChunk(content="", usage_metadata={
+            'input_tokens': prompt_tokens,
+            'output_tokens': self._count_tokens(answer),
+            'total_tokens': prompt_tokens + self._count_tokens(answer),
+        })
+
+    def invoke(self, messages: List[BaseMessage], **kwargs) -> AIMessageChunk:
+        response = None
+        for chunk in self.stream(messages, **kwargs):
+            response = chunk if response is None else response + chunk
+        return response
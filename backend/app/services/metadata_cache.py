@@ -0,0 +1,286 @@
+### Per-process read-through cache for pipeline, tag and document metadata
+# The CRUD functions look rows up here before querying MySQL and invalidate them right after
+# committing a write. With METADATA_CACHE_INVALIDATION=mysql, every invalidation is also
+# recorded in the Cache_Invalidation table, and each worker polls that table so it drops
+# entries written by other workers. Without the channel, another worker's change shows up
+# once the entry's TTL expires.
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import text
+from app.logging_config import get_logger
+from app.metrics import metadata_cache_hits, metadata_cache_misses
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+METADATA_CACHE_TTL_SECONDS = float(os.getenv('METADATA_CACHE_TTL_SECONDS', '300'))
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv('METADATA_CACHE_MAX_ENTRIES', '10000'))
+# 'none' keeps invalidations inside the process; 'mysql' shares them through Cache_Invalidation
+METADATA_CACHE_INVALIDATION = os.getenv('METADATA_CACHE_INVALIDATION', 'none').lower()
+METADATA_CACHE_POLL_SECONDS = float(os.getenv('METADATA_CACHE_POLL_SECONDS', '2'))
+# Each poll also re-reads this many ids below the highest one seen, for rows that committed out of order
+METADATA_CACHE_POLL_WINDOW = int(os.getenv('METADATA_CACHE_POLL_WINDOW', '1000'))
+# Cache_Invalidation rows older than this are deleted by the pollers
+METADATA_CACHE_RETENTION_SECONDS = int(os.getenv('METADATA_CACHE_RETENTION_SECONDS', '3600'))
+
+## NAMESPACES
+PIPELINES = 'pipeline'
+PIPELINE_TAGS = 'pipeline_tags'
+PIPELINE_DOCUMENT_COUNTS = 'pipeline_document_count'
+SYSTEM_TAGS = 'system_tags'
+DOCUMENTS = 'document'
+DOCUMENT_METADATA = 'document_metadata'
+
+NAMESPACES = (PIPELINES, PIPELINE_TAGS, PIPELINE_DOCUMENT_COUNTS, SYSTEM_TAGS, DOCUMENTS, DOCUMENT_METADATA)
+
+# Key used on the invalidation channel for "every key" and "every namespace"
+WILDCARD = '*'
+
+def _cache_key(key: Any) -> str:
+    # Keys travel through MySQL as strings, so they are stored that way too
+    return '-' if key is None else str(key)
+
+
+class MetadataCache:
+
+    def __init__(self, ttl_seconds: float = METADATA_CACHE_TTL_SECONDS, max_entries: int = METADATA_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.channel = None
+        self._lock = threading.Lock()
+        self._global_version = 0
+        self._namespace_versions: Dict[str, int] = {}
+        self._key_versions: Dict[Tuple[str, str], int] = {}
+        # (namespace, key) -> (version, loaded_at, value), least recently used first
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, float, Any]]" = OrderedDict()
+
+    def _current_version(self, namespace: str, key: str) -> int:
+        # All three counters only ever grow, so any bump changes the sum
+        return self._global_version + self._namespace_versions.get(namespace, 0) + self._key_versions.get((namespace, key), 0)
+
+    def lookup(self, namespace: str, key: Any = None) -> Tuple[Optional[Any], int]:
+        # Returns (value or None on a miss, version to pass to put() after loading)
+        key = _cache_key(key)
+        with self._lock:
+            version = self._current_version(namespace, key)
+            entry = self._entries.get((namespace, key))
+            if entry and entry[0] == version and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end((namespace, key))
+                value = entry[2]
+            else:
+                value = None
+
+        if value is None:
+            metadata_cache_misses.inc(label=namespace)
+            return None, version
+
+        metadata_cache_hits.inc(label=namespace)
+        # Callers are free to modify what they get back
+        return copy.deepcopy(value), version
+
+    def put(self, namespace: str, key: Any, value: Any, version: int):
+        if value is None or self.ttl_seconds <= 0:
+            return
+        key = _cache_key(key)
+        value = copy.deepcopy(value)
+        with self._lock:
+            # Don't cache a value that was invalidated while it was loading
+            if self._current_version(namespace, key) != version:
+                return
+            self._entries[(namespace, key)] = (version, time.monotonic(), value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, key: Any = None, publish: bool = True):
+        key = _cache_key(key)
+        with self._lock:
+            self._key_versions[(namespace, key)] = self._key_versions.get((namespace, key), 0) + 1
+            self._entries.pop((namespace, key), None)
+        if publish:
+            self._publish(namespace, key)
+
+    def invalidate_namespace(self, namespace: str, publish: bool = True):
+        with self._lock:
+            self._namespace_versions[namespace] = self._namespace_versions.get(namespace, 0) + 1
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+                del self._entries[entry_key]
+        if publish:
+            self._publish(namespace, WILDCARD)
+
+    def invalidate_all(self, publish: bool = True):
+        with self._lock:
+            self._global_version += 1
+            self._entries.clear()
+        if publish:
+            self._publish(WILDCARD, WILDCARD)
+
+    def invalidate_pipeline(self, pipeline_id: int):
+        for namespace in (PIPELINES, PIPELINE_TAGS, PIPELINE_DOCUMENT_COUNTS):
+            self.invalidate(namespace, pipeline_id)
+
+    def apply(self, namespace: str, key: str):
+        # Applies an invalidation received from another worker
+        if namespace == WILDCARD:
+            self.invalidate_all(publish=False)
+        elif key == WILDCARD:
+            self.invalidate_namespace(namespace, publish=False)
+        else:
+            self.invalidate(namespace, key, publish=False)
+
+    def _publish(self, namespace: str, key: str):
+        if self.channel is not None:
+            self.channel.publish(namespace, key)
+
+
+class MySQLInvalidationChannel:
+    # Cross-worker invalidation through an append-only Cache_Invalidation table. Each worker
+    # remembers the highest invalidation_id it has seen and polls for newer rows. Concurrent
+    # inserts can commit out of id order, so every poll re-reads a window of ids below that and
+    # applies the ones it hasn't seen yet.
+
+    def __init__(self, engine, cache: MetadataCache, poll_seconds: float = METADATA_CACHE_POLL_SECONDS,
+                 retention_seconds: int = METADATA_CACHE_RETENTION_SECONDS, window: int = METADATA_CACHE_POLL_WINDOW):
+        self.engine = engine
+        self.cache = cache
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.window = window
+        self.last_id = 0
+        # Ids inside the window that were already applied or skipped
+        self._seen_ids = set()
+        self._published_ids = set()
+        self._published_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._healthy = True
+
+    def publish(self, namespace: str, key: str):
+        # Called after the write has committed, so a failure here only delays other workers
+        # until the TTL expires
+        try:
+            with self.engine.begin() as connection:
+                result = connection.execute(
+                    text("""
+                        INSERT INTO Cache_Invalidation (namespace, cache_key)
+                        VALUES (:namespace, :cache_key)
+                    """),
+                    {'namespace': namespace, 'cache_key': key}
+                )
+            with self._published_lock:
+                self._published_ids.add(result.lastrowid)
+        except Exception as e:
+            logger.warning("Failed to publish cache invalidation %s/%s: %s", namespace, key, e)
+
+    def poll_once(self) -> int:
+        low = max(self.last_id - self.window, 0)
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text("""
+                    SELECT invalidation_id, namespace, cache_key
+                    FROM Cache_Invalidation
+                    WHERE invalidation_id > :low
+                    ORDER BY invalidation_id
+                """),
+                {'low': low}
+            ).mappings().all()
+
+        applied = 0
+        for row in rows:
+            invalidation_id = row['invalidation_id']
+            if invalidation_id in self._seen_ids:
+                continue
+            self._seen_ids.add(invalidation_id)
+            self.last_id = max(self.last_id, invalidation_id)
+            with self._published_lock:
+                if invalidation_id in self._published_ids:
+                    self._published_ids.discard(invalidation_id)
+                    continue
+            self.cache.apply(row['namespace'], row['cache_key'])
+            applied += 1
+
+        low = max(self.last_id - self.window, 0)
+        self._seen_ids = {seen for seen in self._seen_ids if seen > low}
+        with self._published_lock:
+            # Our own rows that were read before publish() recorded their ids
+            self._published_ids = {published for published in self._published_ids if published > low}
+        return applied
+
+    def prune(self):
+        with self.engine.begin() as connection:
+            connection.execute(
+                text("""
+                    DELETE FROM Cache_Invalidation
+                    WHERE created_at < NOW() - INTERVAL :seconds SECOND
+                """),
+                {'seconds': self.retention_seconds}
+            )
+
+    def start(self):
+        with self.engine.connect() as connection:
+            self.last_id = connection.execute(
+                text("SELECT COALESCE(MAX(invalidation_id), 0) FROM Cache_Invalidation")
+            ).scalar()
+            # Rows from before startup don't concern this worker's empty cache
+            self._seen_ids = set(connection.execute(
+                text("SELECT invalidation_id FROM Cache_Invalidation WHERE invalidation_id > :low"),
+                {'low': max(self.last_id - self.window, 0)}
+            ).scalars().all())
+        self.cache.channel = self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metadata-cache-invalidation", daemon=True)
+        self._thread.start()
+        logger.info("Metadata cache invalidation channel started at id %d", self.last_id)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 5)
+            self._thread = None
+        if self.cache.channel is self:
+            self.cache.channel = None
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll_once()
+                if not self._healthy:
+                    # Invalidations may have been missed while MySQL was unreachable
+                    self.cache.invalidate_all(publish=False)
+                    self._healthy = True
+                if time.monotonic() - last_prune > self.retention_seconds / 4:
+                    self.prune()
+                    last_prune = time.monotonic()
+            except Exception as e:
+                if self._healthy:
+                    logger.warning("Metadata cache invalidation poll failed: %s", e)
+                self._healthy = False
+
+
+metadata_cache = MetadataCache()
+
+_channel: Optional[MySQLInvalidationChannel] = None
+
+def start_invalidation_channel() -> Optional[MySQLInvalidationChannel]:
+    global _channel
+    if METADATA_CACHE_INVALIDATION != 'mysql' or _channel is not None:
+        return _channel
+
+    from app.database import engine
+    _channel = MySQLInvalidationChannel(engine, metadata_cache)
+    _channel.start()
+    return _channel
+
+def stop_invalidation_channel():
+    global _channel
+    if _channel is not None:
+        _channel.stop()
+        _channel = None
@@ -1,32 +1,50 @@
 import os
+import time
 import numpy as np
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
-from app.services.firestore_service import FirestoreService
-from app.services.embedding_service import EmbeddingService
+from app.services.active_document_cache import ActiveDocumentSet, active_document_cache
+from app.services.vector_quantization import QUANTIZATION_MODES, vector_index_cache
+from app.services.vector_segments import VECTOR_INDEX_STORAGE, mapped_vector_store
+from app.services.dimensionality import vector_field_for_dimensions
+from app.services.document_vectors import DOCUMENT_SEARCH_CANDIDATES, top_documents
+from app.services.service_factory import pipeline_embedding, shared_chat_llm, shared_embedding_service, shared_firestore_service
+from app.services.api_scheduler import INTERACTIVE, llm_api
+from app.services.chat_coalescing import chat_single_flight, history_hash, normalize_query
+from app.services.retrieval_policy import (
+    BASELINE_TOP_K,
+    CHUNK_TOKEN_ESTIMATE,
+    RETRIEVAL_MAX_DISTANCE,
+    RETRIEVAL_MAX_K,
+    RETRIEVAL_MIN_K,
+    adaptive_cutoff,
+    estimate_tokens_saved,
+    small_talk_reply,
+)
+from app.metrics import time_stage, stage_latency, llm_tokens, prompt_tokens_saved
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# "firestore" runs find_nearest server-side; float32, int8 or binary search a per-pipeline
+# in-memory index and rescore the shortlist at full precision; "documents" picks the nearest
+# documents by their centroid vectors first and runs find_nearest over only their chunks
+VECTOR_SEARCH_MODE = os.getenv('VECTOR_SEARCH_MODE', 'firestore').lower()
+# A document index missing some of the pipeline's documents is reloaded at most this often
+DOCUMENT_INDEX_RELOAD_SECONDS = 30
 
 class RAGService:
     def __init__(self):
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
-        
-        self.firestore_service = FirestoreService()
-        self.embedding_service = EmbeddingService()
-        self.llm = ChatOpenAI(
-            openai_api_key=OPENAI_API_KEY,
-            model="gpt-4o-mini",
-            temperature=0.7
-        )
+        # The factories pick the Google Cloud / OpenAI clients or their local stand-ins. The
+        # clients are shared across requests and created during startup warm-up (app/warmup.py)
+        self.llm = shared_chat_llm()
+        self.firestore_service = shared_firestore_service()
+        self.embedding_service = shared_embedding_service()
     
-    def embed_query(self, query: str) -> List[float]:
-        embeddings = self.embedding_service.generate_embeddings([query])
+    def embed_query(self, query: str, embedding_dimensions: Optional[int] = None, embedding_service=None) -> List[float]:
+        embeddings = (embedding_service or self.embedding_service).generate_embeddings(
+            [query], output_dimensionality=embedding_dimensions, priority=INTERACTIVE
+        )
         if embeddings:
             return embeddings[0].tolist()
         return []
@@ -35,18 +53,135 @@ class RAGService:
         self, 
         query_embedding: List[float], 
         pipeline_id: Optional[int],
-        top_k: int = 5
+        top_k: int = 5,
+        active_documents: Optional[ActiveDocumentSet] = None,
+        max_distance: Optional[float] = None,
+        mode: Optional[str] = None
     ) -> List[Dict[str, Any]]:
+        mode = mode or VECTOR_SEARCH_MODE
+        if mode in QUANTIZATION_MODES and pipeline_id is not None:
+            return self.local_similarity_search(query_embedding, pipeline_id, top_k, mode, active_documents, max_distance)
+        if mode == "documents" and pipeline_id is not None:
+            results = self.document_similarity_search(query_embedding, pipeline_id, top_k, active_documents, max_distance)
+            if results is not None:
+                return results
+
         results = self.firestore_service.find_nearest_embeddings(
             query_vector=query_embedding,
             pipeline_id=pipeline_id,
             top_k=top_k,
-            distance_measure="COSINE"
+            distance_measure="COSINE",
+            active_documents=active_documents,
+            distance_threshold=max_distance
         )
         
         return results
     
-    def build_context(self, relevant_chunks: List[Dict[str, Any]]) -> str:
+    def document_similarity_search(
+        self,
+        query_embedding: List[float],
+        pipeline_id: int,
+        top_k: int,
+        active_documents: Optional[ActiveDocumentSet] = None,
+        max_distance: Optional[float] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        # None means two stages can't help here and the caller should search every chunk
+        collection_name = self.firestore_service.collections.for_pipeline(pipeline_id)
+        index = vector_index_cache.get(
+            pipeline_id,
+            "documents",
+            (active_document_cache.version(pipeline_id), len(query_embedding), collection_name),
+            lambda: self.firestore_service.load_document_vector_index(pipeline_id, len(query_embedding))
+        )
+
+        indexed = {payload.get('storage_path') for payload in index.payloads}
+        if active_documents is not None and not active_documents.storage_paths <= indexed:
+            # Uploaded before document vectors existed, or the index predates the upload
+            if time.monotonic() - index.created_at > DOCUMENT_INDEX_RELOAD_SECONDS:
+                vector_index_cache.invalidate(pipeline_id, "documents")
+            return None
+
+        mask = None
+        if active_documents is not None:
+            mask = np.array([
+                active_documents.contains(payload.get('document_id'), payload.get('storage_path'))
+                for payload in index.payloads
+            ], dtype=bool)
+        eligible = len(index) if mask is None else int(mask.sum())
+        if eligible <= DOCUMENT_SEARCH_CANDIDATES:
+            # Every document would be searched anyway
+            return None
+
+        storage_paths = top_documents(index, np.asarray(query_embedding, dtype=np.float32), mask=mask)
+        return self.firestore_service.find_nearest_in_documents(
+            query_vector=query_embedding,
+            pipeline_id=pipeline_id,
+            storage_paths=storage_paths,
+            top_k=top_k,
+            distance_threshold=max_distance
+        )
+
+    def local_similarity_search(
+        self,
+        query_embedding: List[float],
+        pipeline_id: int,
+        top_k: int,
+        mode: str,
+        active_documents: Optional[ActiveDocumentSet] = None,
+        max_distance: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        load_index = lambda: self.firestore_service.load_pipeline_vector_index(pipeline_id, mode, len(query_embedding))
+        # Also notices a re-embedding cutover, which drops the indexes built from the old collection
+        collection_name = self.firestore_service.collections.for_pipeline(pipeline_id)
+        if mode == "float32" and VECTOR_INDEX_STORAGE == "mmap":
+            # Shared, memory-mapped segments kept current by the upload and delete paths
+            index = mapped_vector_store.get(pipeline_id, len(query_embedding), load_index)
+        else:
+            index = vector_index_cache.get(
+                pipeline_id,
+                mode,
+                (active_document_cache.version(pipeline_id), len(query_embedding), collection_name),
+                load_index
+            )
+
+        vector_field = vector_field_for_dimensions(len(query_embedding))
+
+        mask = None
+        if active_documents is not None:
+            mask = np.array([
+                active_documents.contains(payload.get('document_id'), payload.get('storage_path'))
+                for payload in index.payloads
+            ], dtype=bool)
+
+        hits = index.search(
+            np.asarray(query_embedding, dtype=np.float32),
+            top_k,
+            fetch_full_vectors=lambda chunk_ids: self.firestore_service.get_embedding_vectors(chunk_ids, vector_field, pipeline_id),
+            mask=mask
+        )
+
+        results = []
+        for position, similarity_score in hits:
+            if max_distance is not None and 1 - similarity_score > max_distance:
+                # Hits are sorted, so the rest are further still
+                break
+            payload = index.payloads[position]
+            results.append({
+                'id': index.ids[position],
+                'text': index.text(position),
+                'file_name': payload.get('file_name') or 'Unknown',
+                'chunk_index': payload.get('chunk_index') or 0,
+                'document_id': payload.get('document_id'),
+                'storage_path': payload.get('storage_path'),
+                'pipeline_id': pipeline_id,
+                'similarity_score': similarity_score,
+                'distance': 1 - similarity_score
+            })
+
+        return results
+
+    @staticmethod
+    def build_context(relevant_chunks: List[Dict[str, Any]]) -> str:
         if not relevant_chunks:
             return ""
         
@@ -58,6 +193,23 @@ class RAGService:
         
         return "\n\n---\n\n".join(context_parts)
     
+    @staticmethod
+    def prompt_history(conversation_history: Optional[List[Dict[str, str]]]) -> List[Tuple[str, str]]:
+        # The turns generate_response puts in the prompt; anything else can't change the answer
+        return [
+            (msg.get('role'), msg.get('content', ''))
+            for msg in (conversation_history or [])[-10:]
+            if msg.get('role') in ('user', 'assistant')
+        ]
+
+    @classmethod
+    def has_earlier_turns(cls, query: str, conversation_history: Optional[List[Dict[str, str]]]) -> bool:
+        # The chat router includes the message being answered as the last turn
+        history = cls.prompt_history(conversation_history)
+        if history and history[-1] == ('user', query):
+            history = history[:-1]
+        return bool(history)
+
     def generate_response(
         self, 
         query: str, 
@@ -79,27 +231,52 @@ Context from uploaded documents:
 {context}
 """
         
+        from langchain_core.messages import HumanMessage, SystemMessage
+
         messages = [SystemMessage(content=system_prompt.format(context=context))]
         
-        if conversation_history:
-            for msg in conversation_history[-10:]:
-                if msg.get('role') == 'user':
-                    messages.append(HumanMessage(content=msg.get('content', '')))
-                elif msg.get('role') == 'assistant':
-                    messages.append(SystemMessage(content=msg.get('content', '')))
+        for role, content in self.prompt_history(conversation_history):
+            if role == 'user':
+                messages.append(HumanMessage(content=content))
+            else:
+                messages.append(SystemMessage(content=content))
         
         messages.append(HumanMessage(content=query))
         
-        response = self.llm.invoke(messages)
+        # Stream so time-to-first-token can be measured; the chunks are merged back into one message
+        started = time.perf_counter()
+
+        def start_stream():
+            # A 429 surfaces when the first chunk is requested, so that is what the scheduler retries
+            stream = iter(self.llm.stream(messages))
+            return next(stream, None), stream
+
+        response, stream = llm_api.call(INTERACTIVE, start_stream)
+        if response is not None:
+            stage_latency.observe(time.perf_counter() - started, "llm_first_token")
+            for chunk in stream:
+                response = response + chunk
+        stage_latency.observe(time.perf_counter() - started, "llm_total")
+
+        if response is None:
+            return ""
+
+        usage = getattr(response, 'usage_metadata', None) or {}
+        llm_tokens.inc(usage.get('input_tokens', 0), "prompt")
+        llm_tokens.inc(usage.get('output_tokens', 0), "completion")
+
         return response.content
     
-    def chat(
+    async def chat(
         self, 
         query: str, 
         pipeline_id: Optional[int],
         conversation_history: Optional[List[Dict[str, str]]] = None,
-        top_k: int = 5
+        top_k: int = RETRIEVAL_MAX_K,
+        active_documents: Optional[ActiveDocumentSet] = None,
+        embedding_dimensions: Optional[int] = None
     ) -> Dict[str, Any]:
+        # top_k is the most chunks an answer can use; fewer are used when the rest are weak matches
         
         if not query or not query.strip():
             return {
@@ -107,8 +284,56 @@ Context from uploaded documents:
                 "sources": [],
                 "has_context": False
             }
-        
-        query_embedding = self.embed_query(query)
+
+        reply = small_talk_reply(query)
+        if reply is not None:
+            prompt_tokens_saved.observe(BASELINE_TOP_K * CHUNK_TOKEN_ESTIMATE, label="small_talk")
+            return {
+                "response": reply,
+                "sources": [],
+                "has_context": False
+            }
+
+        # The model and size the pipeline's current collection was embedded with
+        embedding_service, embedding_dimensions = pipeline_embedding(pipeline_id, embedding_dimensions)
+
+        if pipeline_id is None:
+            version = None
+        elif active_documents is not None:
+            version = active_documents.version
+        else:
+            version = active_document_cache.version(pipeline_id)
+        key = (
+            pipeline_id,
+            version,
+            self.firestore_service.collections.for_pipeline(pipeline_id),
+            normalize_query(query),
+            history_hash(self.prompt_history(conversation_history)),
+            top_k,
+            embedding_service.model_name,
+            embedding_dimensions,
+        )
+        # Identical questions asked at the same time share one embedding, search and LLM call
+        result = await chat_single_flight.do(
+            key,
+            lambda: self._answer(query, pipeline_id, conversation_history, top_k, active_documents,
+                                 embedding_dimensions, embedding_service)
+        )
+        return dict(result)
+
+    def _answer(
+        self,
+        query: str,
+        pipeline_id: Optional[int],
+        conversation_history: Optional[List[Dict[str, str]]],
+        top_k: int,
+        active_documents: Optional[ActiveDocumentSet],
+        embedding_dimensions: Optional[int],
+        embedding_service=None
+    ) -> Dict[str, Any]:
+        # Queries must be embedded at the pipeline's dimensionality to be comparable with its chunks
+        with time_stage("query_embed"):
+            query_embedding = self.embed_query(query, embedding_dimensions, embedding_service)
         
         if not query_embedding:
             return {
@@ -117,12 +342,44 @@ Context from uploaded documents:
                 "has_context": False
             }
         
-        relevant_chunks = self.similarity_search(
-            query_embedding=query_embedding,
-            pipeline_id=pipeline_id,
-            top_k=top_k
-        )
+        with time_stage("vector_search"):
+            candidates = self.similarity_search(
+                query_embedding=query_embedding,
+                pipeline_id=pipeline_id,
+                top_k=top_k,
+                active_documents=active_documents,
+                max_distance=RETRIEVAL_MAX_DISTANCE
+            )
+        relevant_chunks = adaptive_cutoff(candidates)
         
+        if not relevant_chunks and active_documents is not None and active_documents.total_count > 0 and active_documents.active_count == 0:
+            return {
+                "response": "All of the documents in this pipeline are currently inactive. Activate a document to chat about it!",
+                "sources": [],
+                "has_context": False
+            }
+
+        if not relevant_chunks and active_documents is not None and active_documents.active_count > 0 \
+                and self.has_earlier_turns(query, conversation_history):
+            # Follow-ups like "explain that more simply" embed far from every chunk but are answered
+            # from the conversation, so they get the nearest few chunks regardless of distance
+            with time_stage("vector_search"):
+                relevant_chunks = self.similarity_search(
+                    query_embedding=query_embedding,
+                    pipeline_id=pipeline_id,
+                    top_k=RETRIEVAL_MIN_K,
+                    active_documents=active_documents
+                )
+
+        if not relevant_chunks and active_documents is not None and active_documents.active_count > 0:
+            # The pipeline has documents, but nothing in them is close enough to the question
+            prompt_tokens_saved.observe(BASELINE_TOP_K * CHUNK_TOKEN_ESTIMATE, label="no_relevant_context")
+            return {
+                "response": "I couldn't find anything in this pipeline's documents about that. Try rephrasing your question or asking about a topic your documents cover.",
+                "sources": [],
+                "has_context": False
+            }
+
         if not relevant_chunks:
             return {
                 "response": "I don't have any documents to reference for this pipeline yet. Please upload some documents first!",
@@ -130,6 +387,7 @@ Context from uploaded documents:
                 "has_context": False
             }
         
+        prompt_tokens_saved.observe(estimate_tokens_saved(candidates, relevant_chunks), label="retrieval")
         context = self.build_context(relevant_chunks)
         
         response = self.generate_response(query, context, conversation_history)
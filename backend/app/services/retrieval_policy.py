@@ -0,0 +1,71 @@
+### How many chunks a chat answer gets as context
+# Retrieval asks for at most RETRIEVAL_MAX_K chunks and lets the vector search drop anything
+# further than RETRIEVAL_MAX_DISTANCE (cosine distance, so 1 - similarity). What is left is cut at
+# the largest drop in similarity, provided that drop is at least RETRIEVAL_MIN_GAP and at least
+# RETRIEVAL_MIN_K chunks stay. A question with one clearly relevant passage then doesn't drag
+# four weak ones into the prompt. Greetings, thanks and goodbyes get a fixed reply without
+# retrieval or an LLM call.
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RETRIEVAL_MAX_DISTANCE = float(os.getenv('RETRIEVAL_MAX_DISTANCE', '0.6'))
+RETRIEVAL_MIN_K = max(1, int(os.getenv('RETRIEVAL_MIN_K', '2')))
+RETRIEVAL_MAX_K = max(RETRIEVAL_MIN_K, int(os.getenv('RETRIEVAL_MAX_K', '5')))
+RETRIEVAL_MIN_GAP = float(os.getenv('RETRIEVAL_MIN_GAP', '0.05'))
+SMALL_TALK_FAST_PATH = os.getenv('SMALL_TALK_FAST_PATH', 'true').lower() == 'true'
+
+# The fixed top_k chat used before, which hoos_prompt_tokens_saved is measured against
+BASELINE_TOP_K = 5
+# DocumentProcessor.chunk_text makes ~500 character chunks, ~4 characters per token
+CHUNK_TOKEN_ESTIMATE = 125
+
+SMALL_TALK_REPLIES = {
+    "greeting": "Hi! Ask me anything about the documents in this pipeline.",
+    "thanks": "You're welcome! Let me know if you have more questions about your documents.",
+    "farewell": "Good luck with your studying!",
+    "acknowledgement": "Great! Ask me another question about your documents whenever you're ready.",
+}
+
+SMALL_TALK_PATTERNS = {
+    "greeting": re.compile(r"(hi|hello|hey|hiya|yo|good (morning|afternoon|evening))( there)?"),
+    "thanks": re.compile(r"(thanks|thank you|thx|ty)( (so|very) much| a lot)?|appreciate it"),
+    "farewell": re.compile(r"(bye|goodbye|see (you|ya)|later|good night)"),
+    "acknowledgement": re.compile(r"(ok|okay|cool|got it|great|nice|awesome|perfect)"),
+}
+
+
+def small_talk_reply(query: str) -> Optional[str]:
+    # Only whole messages match, so "hi, what is a mitochondrion?" still goes to retrieval
+    if not SMALL_TALK_FAST_PATH:
+        return None
+    normalized = re.sub(r"[^a-z ]+", " ", query.casefold())
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    for kind, pattern in SMALL_TALK_PATTERNS.items():
+        if pattern.fullmatch(normalized):
+            return SMALL_TALK_REPLIES[kind]
+    return None
+
+def adaptive_cutoff(chunks: List[Dict[str, Any]], min_k: int = RETRIEVAL_MIN_K,
+                    min_gap: float = RETRIEVAL_MIN_GAP) -> List[Dict[str, Any]]:
+    if len(chunks) <= min_k:
+        return chunks
+    scores = [chunk.get('similarity_score', 0) for chunk in chunks]
+    # Each gap is the drop from the last chunk kept to the first one cut at that position
+    gaps = [(scores[i - 1] - scores[i], i) for i in range(min_k, len(scores))]
+    gap, cut = max(gaps)
+    return chunks[:cut] if gap >= min_gap else chunks
+
+def estimate_tokens(chunks: List[Dict[str, Any]]) -> int:
+    return sum(len(chunk.get('text', '')) // 4 for chunk in chunks)
+
+def estimate_tokens_saved(candidates: List[Dict[str, Any]], used: List[Dict[str, Any]]) -> int:
+    # The baseline is the first BASELINE_TOP_K candidates. Chunks the distance threshold removed
+    # were never fetched, so each missing one counts as an average chunk
+    baseline = candidates[:BASELINE_TOP_K]
+    missing = BASELINE_TOP_K - len(baseline)
+    return max(estimate_tokens(baseline) + missing * CHUNK_TOKEN_ESTIMATE - estimate_tokens(used), 0)
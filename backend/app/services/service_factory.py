@@ -0,0 +1,133 @@
+### Chooses between the Google Cloud / OpenAI services and their local stand-ins
+# SERVICE_BACKEND=local switches everything to app/services/local_backends.py; the per-service
+# variables (FIRESTORE_BACKEND, STORAGE_BACKEND, EMBEDDING_BACKEND, LLM_BACKEND, AUTH_BACKEND)
+# override it one service at a time, e.g. real Vertex embeddings with a canned LLM.
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from app.logging_config import get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+SERVICE_BACKEND = os.getenv('SERVICE_BACKEND', 'cloud').lower()
+
+_local_lock = threading.Lock()
+_local_firestore_client = None
+_local_bucket = None
+
+
+def backend_for(service: str) -> str:
+    backend = os.getenv(f'{service.upper()}_BACKEND', SERVICE_BACKEND).lower()
+    if backend not in ('cloud', 'local'):
+        raise ValueError(f"{service.upper()}_BACKEND must be 'cloud' or 'local', got '{backend}'")
+    return backend
+
+def is_local(service: str) -> bool:
+    return backend_for(service) == 'local'
+
+def _shared_local_firestore_client():
+    # One in-memory store per process, so uploads are visible to chat in the same worker
+    global _local_firestore_client
+    with _local_lock:
+        if _local_firestore_client is None:
+            from app.services.local_backends import LocalFirestoreClient
+            logger.warning("Using the in-memory Firestore backend; embeddings are lost when the process exits")
+            _local_firestore_client = LocalFirestoreClient()
+        return _local_firestore_client
+
+def get_storage_bucket(bucket_name: str):
+    global _local_bucket
+    if not is_local('storage'):
+        return None
+    with _local_lock:
+        if _local_bucket is None or _local_bucket.name != bucket_name:
+            from app.services.local_backends import LocalBucket
+            _local_bucket = LocalBucket(bucket_name)
+        return _local_bucket
+
+def get_firestore_service():
+    from app.services.firestore_service import FirestoreService
+    if is_local('firestore'):
+        return FirestoreService(client=_shared_local_firestore_client())
+    return FirestoreService()
+
+def get_storage_service():
+    from app.services.firebase_storage import FirebaseStorageService
+    return FirebaseStorageService()
+
+def get_embedding_service(model_name: Optional[str] = None):
+    from app.services.embedding_service import EmbeddingService
+    if is_local('embedding'):
+        from app.services.local_backends import HashEmbeddingModel
+        return EmbeddingService(model=HashEmbeddingModel())
+    return EmbeddingService(model_name=model_name)
+
+def get_chat_llm():
+    if is_local('llm'):
+        from app.services.local_backends import CannedChatModel
+        return CannedChatModel()
+
+    from langchain_openai import ChatOpenAI
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    if not openai_api_key:
+        raise ValueError("OPENAI_API_KEY environment variable is not set")
+
+    return ChatOpenAI(
+        openai_api_key=openai_api_key,
+        model="gpt-4o-mini",
+        temperature=0.7,
+        stream_usage=True
+    )
+
+## SHARED CLIENTS
+# Vertex AI, Firestore, Storage and the OpenAI client are expensive to set up and safe to share
+# across threads, so request handlers use one instance per process. app/warmup.py creates them
+# in the background at startup; anything not warm yet is created by the first request needing it.
+_shared_services: Dict[str, Any] = {}
+_shared_locks: Dict[str, threading.Lock] = {}
+_shared_locks_guard = threading.Lock()
+
+def _shared(name: str, factory: Callable[[], Any]) -> Any:
+    service = _shared_services.get(name)
+    if service is not None:
+        return service
+    with _shared_locks_guard:
+        lock = _shared_locks.setdefault(name, threading.Lock())
+    # One lock per service, so a slow Vertex init doesn't hold up the Firestore client
+    with lock:
+        if name not in _shared_services:
+            _shared_services[name] = factory()
+        return _shared_services[name]
+
+def shared_firestore_service():
+    return _shared('firestore', get_firestore_service)
+
+def shared_storage_service():
+    return _shared('storage', get_storage_service)
+
+def shared_embedding_service():
+    return _shared('embedding', get_embedding_service)
+
+def shared_chat_llm():
+    return _shared('llm', get_chat_llm)
+
+def embedding_service_for_model(model_name: Optional[str]):
+    shared = shared_embedding_service()
+    if not model_name or model_name == shared.model_name or is_local('embedding'):
+        return shared
+    return _shared(f'embedding:{model_name}', lambda: get_embedding_service(model_name))
+
+def pipeline_embedding(pipeline_id: Optional[int], stored_dimensions: Optional[int] = None) -> Tuple[Any, Optional[int]]:
+    # The embedding service and size for a pipeline's queries and new chunks. What the collection
+    # pointer records wins over the Pipeline row, so both change in the same write at a cutover
+    settings = shared_firestore_service().collections.settings_for(pipeline_id)
+    return embedding_service_for_model(settings.get('model')), settings.get('dimensions') or stored_dimensions
+
+def reset_shared_services():
+    # For tests and scripts that switch backends within one process
+    with _shared_locks_guard:
+        _shared_services.clear()
@@ -0,0 +1,102 @@
+### V4 signed download URLs generated on demand from firebase_storage_path
+# The firebase_download_url stored at upload time expires within hours, so document reads sign
+# a fresh URL from the storage path instead. Each URL is cached until
+# SIGNED_URL_REFRESH_MARGIN_SECONDS before it expires, so a student opening the same document
+# again gets the same URL, and list endpoints sign every row in one call. With the service
+# account key from FIREBASE_CREDENTIALS_PATH, the Storage client signs with RSA locally; only
+# keyless credentials (e.g. the Cloud Run metadata server) would need the IAM signBlob API.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
+from app.metrics import signed_url_requests
+
+load_dotenv()
+
+# V4 signed URLs are valid for at most 7 days
+SIGNED_URL_TTL_SECONDS = min(int(os.getenv('SIGNED_URL_TTL_SECONDS', '21600')), 7 * 24 * 3600)
+# A cached URL is re-signed once it has less than this left, so clients never get one that is
+# about to expire
+SIGNED_URL_REFRESH_MARGIN_SECONDS = int(os.getenv('SIGNED_URL_REFRESH_MARGIN_SECONDS', '900'))
+SIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv('SIGNED_URL_CACHE_MAX_ENTRIES', '20000'))
+
+
+class SignedUrl(NamedTuple):
+    url: str
+    expires_at: datetime
+
+
+def _default_bucket():
+    from app.services.service_factory import shared_storage_service
+    return shared_storage_service().bucket
+
+
+class SignedUrlService:
+
+    def __init__(self, bucket_provider: Callable[[], Any] = _default_bucket, ttl_seconds: int = SIGNED_URL_TTL_SECONDS,
+                 refresh_margin_seconds: int = SIGNED_URL_REFRESH_MARGIN_SECONDS,
+                 max_entries: int = SIGNED_URL_CACHE_MAX_ENTRIES):
+        self.bucket_provider = bucket_provider
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = min(refresh_margin_seconds, ttl_seconds // 2)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # storage path -> (signed URL, monotonic time it must be refreshed by), least recent first
+        self._entries: "OrderedDict[str, Tuple[SignedUrl, float]]" = OrderedDict()
+
+    def _cached(self, storage_path: str) -> Optional[SignedUrl]:
+        with self._lock:
+            entry = self._entries.get(storage_path)
+            if entry is None or time.monotonic() >= entry[1]:
+                return None
+            self._entries.move_to_end(storage_path)
+            return entry[0]
+
+    def _sign(self, bucket, storage_path: str) -> SignedUrl:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        url = bucket.blob(storage_path).generate_signed_url(
+            version="v4",
+            expiration=timedelta(seconds=self.ttl_seconds),
+            method="GET"
+        )
+        signed = SignedUrl(url, expires_at)
+        refresh_by = time.monotonic() + self.ttl_seconds - self.refresh_margin_seconds
+        with self._lock:
+            self._entries[storage_path] = (signed, refresh_by)
+            self._entries.move_to_end(storage_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return signed
+
+    def get(self, storage_path: str) -> SignedUrl:
+        return self.get_many([storage_path])[storage_path]
+
+    def get_many(self, storage_paths: Iterable[str]) -> Dict[str, SignedUrl]:
+        # Cached URLs are returned as they are; the rest are signed with one bucket lookup
+        results: Dict[str, SignedUrl] = {}
+        missing = []
+        for storage_path in dict.fromkeys(path for path in storage_paths if path):
+            cached = self._cached(storage_path)
+            if cached is not None:
+                results[storage_path] = cached
+            else:
+                missing.append(storage_path)
+
+        signed_url_requests.inc(len(results), label="cached")
+        if missing:
+            bucket = self.bucket_provider()
+            for storage_path in missing:
+                results[storage_path] = self._sign(bucket, storage_path)
+            signed_url_requests.inc(len(missing), label="signed")
+        return results
+
+    def invalidate(self, storage_path: str):
+        with self._lock:
+            self._entries.pop(storage_path, None)
+
+
+signed_url_service = SignedUrlService()
@@ -0,0 +1,151 @@
+### A small dependency graph of blocking stages, run concurrently on worker threads
+# Each stage starts as soon as the stages it depends on have finished, so independent work
+# (e.g. the Storage upload and text extraction) overlaps and the wall-clock time approaches the
+# critical path: the slowest chain of dependent stages. If a stage fails, no new stages start,
+# the running ones are allowed to finish (threads can't be interrupted), and the compensation
+# of every stage that completed is run, most recent first, before the error is re-raised. A stage
+# that can fail after a partial write (e.g. some Firestore batches committed) sets
+# compensate_on_failure so its own compensation runs too, with None as the result.
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.logging_config import get_logger
+from app.metrics import STAGES, time_stage
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Stage:
+    name: str
+    # Called with the results of the stages it depends on, keyed by stage name
+    run: Callable[[Dict[str, Any]], Any]
+    depends_on: Sequence[str] = ()
+    # Called with this stage's result to undo it when a later stage fails
+    compensate: Optional[Callable[[Any], None]] = None
+    compensate_on_failure: bool = False
+
+
+@dataclass
+class StageRun:
+    results: Dict[str, Any]
+    # stage -> (start, end) in seconds since the run started
+    timings: Dict[str, Tuple[float, float]]
+    wall_s: float
+    critical_path: List[str] = field(default_factory=list)
+    critical_path_s: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'wall_s': round(self.wall_s, 4),
+            'critical_path_s': round(self.critical_path_s, 4),
+            'critical_path': self.critical_path,
+            'stages': {name: round(end - start, 4) for name, (start, end) in self.timings.items()},
+        }
+
+
+class StageDAG:
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _run_stage(self, stage: Stage, inputs: Dict[str, Any]) -> Any:
+        if stage.name in STAGES:
+            with time_stage(stage.name):
+                return stage.run(inputs)
+        return stage.run(inputs)
+
+    def _critical_path(self, timings: Dict[str, Tuple[float, float]]) -> Tuple[List[str], float]:
+        # Longest chain of dependent stages, weighted by how long each one took
+        longest: Dict[str, Tuple[float, List[str]]] = {}
+        for name in self.order:
+            duration = timings[name][1] - timings[name][0]
+            before = max((longest[dependency] for dependency in self.stages[name].depends_on),
+                         key=lambda item: item[0], default=(0.0, []))
+            longest[name] = (before[0] + duration, before[1] + [name])
+        total, path = max(longest.values(), key=lambda item: item[0])
+        return path, total
+
+    async def run(self) -> StageRun:
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        timings: Dict[str, Tuple[float, float]] = {}
+        completed: List[str] = []
+        running: Dict[asyncio.Task, str] = {}
+        error: Optional[BaseException] = None
+
+        def launch_ready():
+            launched = set(running.values()) | set(results)
+            for name in self.order:
+                stage = self.stages[name]
+                if name not in launched and all(dependency in results for dependency in stage.depends_on):
+                    inputs = {dependency: results[dependency] for dependency in stage.depends_on}
+                    running[asyncio.create_task(self._timed(stage, inputs, started))] = name
+
+        launch_ready()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    results[name], timings[name] = task.result()
+                    completed.append(name)
+                except Exception as e:
+                    if self.stages[name].compensate_on_failure:
+                        completed.append(name)
+                    if error is None:
+                        error = e
+                        logger.warning("Stage %s failed; waiting for %d running stage(s) before compensating", name, len(running))
+            if error is None:
+                launch_ready()
+
+        if error is not None:
+            await self._compensate(completed, results)
+            raise error
+
+        run = StageRun(results=results, timings=timings, wall_s=time.perf_counter() - started)
+        run.critical_path, run.critical_path_s = self._critical_path(timings)
+        return run
+
+    async def _timed(self, stage: Stage, inputs: Dict[str, Any], started: float) -> Tuple[Any, Tuple[float, float]]:
+        stage_started = time.perf_counter() - started
+        result = await asyncio.to_thread(self._run_stage, stage, inputs)
+        return result, (stage_started, time.perf_counter() - started)
+
+    async def _compensate(self, completed: List[str], results: Dict[str, Any]):
+        for name in reversed(completed):
+            stage = self.stages[name]
+            if stage.compensate is None:
+                continue
+            try:
+                await asyncio.to_thread(stage.compensate, results.get(name))
+                logger.info("Compensated stage %s", name)
+            except Exception:
+                # Leaves an orphan behind; logged so it can be cleaned up by hand
+                logger.exception("Compensation for stage %s failed", name)
@@ -0,0 +1,239 @@
+### Compact vector representations used for candidate generation before full-precision rescoring
+
+import os
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUANTIZATION_MODES = ("float32", "int8", "binary")
+
+# How many candidates per requested result the quantized stage hands to rescoring
+RESCORE_MULTIPLIER = int(os.getenv('VECTOR_RESCORE_MULTIPLIER', '4'))
+# Rescoring fetches each candidate's full vector from Firestore, so the shortlist is capped
+# (but never below top_k) however large top_k * multiplier gets
+RESCORE_MAX_CANDIDATES = int(os.getenv('VECTOR_RESCORE_MAX_CANDIDATES', '64'))
+# int8 codes are widened to float32 this many rows at a time, so a query never copies the whole index
+INT8_SCORE_BLOCK_ROWS = 4096
+VECTOR_INDEX_TTL_SECONDS = float(os.getenv('VECTOR_INDEX_TTL_SECONDS', '300'))
+
+# Firestore stores every number in a Vector as an 8-byte double
+FIRESTORE_DOUBLE_BYTES = 8
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def to_float32(embedding) -> np.ndarray:
+    return np.asarray(embedding, dtype=np.float32)
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+## INT8 SCALAR QUANTIZATION
+# Symmetric, one scale per vector. Queries stay float32 (asymmetric distance), which keeps
+# the ranking error much lower than quantizing both sides.
+def encode_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    max_abs = np.abs(vectors).max(axis=1)
+    scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+def decode_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+def int8_scores(query: np.ndarray, codes: np.ndarray, scales: np.ndarray,
+                block_rows: int = INT8_SCORE_BLOCK_ROWS) -> np.ndarray:
+    query = to_float32(query)
+    scores = np.empty(len(codes), dtype=np.float32)
+    buffer = np.empty((min(block_rows, len(codes)), codes.shape[1]), dtype=np.float32)
+    for start in range(0, len(codes), block_rows):
+        block = codes[start:start + block_rows]
+        widened = buffer[:len(block)]
+        np.copyto(widened, block, casting='unsafe')
+        np.matmul(widened, query, out=scores[start:start + len(block)])
+    return scores * scales
+
+## BINARY QUANTIZATION
+# One sign bit per dimension, compared by Hamming distance. Higher score is better.
+def encode_binary(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return np.packbits(vectors > 0, axis=1)
+
+def binary_scores(query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    query_bits = encode_binary(query)[0]
+    hamming = _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+    return -hamming.astype(np.float32)
+
+## FIRESTORE FIELD ENCODING
+def quantized_fields(embedding: np.ndarray, mode: str) -> Dict[str, Any]:
+    embedding = l2_normalize(to_float32(embedding))
+    if mode == "int8":
+        codes, scales = encode_int8(embedding)
+        return {'embedding_int8': codes[0].tobytes(), 'embedding_int8_scale': float(scales[0])}
+    if mode == "binary":
+        return {'embedding_bits': encode_binary(embedding)[0].tobytes()}
+    return {}
+
+## SIZE ACCOUNTING
+# memory: resident bytes in the local index. transfer: bytes streamed from Firestore to build it.
+# storage: Firestore bytes per chunk, since the full Vector is always kept for find_nearest and rescoring.
+def bytes_per_vector(mode: str, dimensions: int) -> Dict[str, int]:
+    full_vector = FIRESTORE_DOUBLE_BYTES * dimensions
+    if mode == "float64":
+        return {'memory': 8 * dimensions, 'transfer': full_vector, 'storage': full_vector}
+    if mode == "float32":
+        return {'memory': 4 * dimensions, 'transfer': full_vector, 'storage': full_vector}
+    if mode == "int8":
+        code_bytes = dimensions + FIRESTORE_DOUBLE_BYTES
+        return {'memory': dimensions + 4, 'transfer': code_bytes, 'storage': full_vector + code_bytes}
+    if mode == "binary":
+        packed = (dimensions + 7) // 8
+        return {'memory': packed, 'transfer': packed, 'storage': full_vector + packed}
+    raise ValueError(f"Unsupported quantization mode: {mode}")
+
+
+class QuantizedVectorIndex:
+
+    def __init__(self, mode: str = "int8", rescore_multiplier: int = RESCORE_MULTIPLIER,
+                 max_rescore_candidates: int = RESCORE_MAX_CANDIDATES):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+
+        self.mode = mode
+        self.rescore_multiplier = max(1, rescore_multiplier)
+        self.max_rescore_candidates = max(1, max_rescore_candidates)
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.dimensions: Optional[int] = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._codes = np.zeros((0, 0), dtype=np.int8)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self.created_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self._vectors.nbytes + self._codes.nbytes + self._scales.nbytes
+
+    @property
+    def vectors(self) -> np.ndarray:
+        # The normalized rows; only populated in float32 mode
+        return self._vectors
+
+    def text(self, position: int) -> str:
+        return self.payloads[position].get('text') or ''
+
+    def add(self, ids: Sequence[str], vectors: Optional[np.ndarray] = None, payloads: Optional[Sequence[Dict[str, Any]]] = None,
+            codes: Optional[np.ndarray] = None, scales: Optional[np.ndarray] = None):
+        if not ids:
+            return
+
+        # Pre-encoded codes (as stored in Firestore) can be passed instead of full vectors
+        if codes is None:
+            normalized = l2_normalize(np.atleast_2d(vectors))
+            if self.mode == "float32":
+                codes = normalized
+            elif self.mode == "int8":
+                codes, scales = encode_int8(normalized)
+            else:
+                codes = encode_binary(normalized)
+
+        self.dimensions = codes.shape[1] * 8 if self.mode == "binary" else codes.shape[1]
+
+        if self.mode == "float32":
+            self._vectors = codes if len(self._vectors) == 0 else np.vstack([self._vectors, codes])
+        else:
+            self._codes = codes if len(self._codes) == 0 else np.vstack([self._codes, codes])
+        if self.mode == "int8":
+            self._scales = np.concatenate([self._scales, np.asarray(scales, dtype=np.float32)])
+
+        self.ids.extend(ids)
+        self.payloads.extend(payloads if payloads is not None else [{} for _ in ids])
+
+    def candidate_scores(self, query: np.ndarray) -> np.ndarray:
+        query = l2_normalize(to_float32(query))
+        if self.mode == "float32":
+            return self._vectors @ query
+        if self.mode == "int8":
+            return int8_scores(query, self._codes, self._scales)
+        return binary_scores(query, self._codes)
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        fetch_full_vectors: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        scores = self.candidate_scores(query)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        eligible = int(np.isfinite(scores).sum())
+        if eligible == 0:
+            return []
+
+        if self.mode == "float32" or fetch_full_vectors is None:
+            count = min(top_k, eligible)
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top])]
+            return [(int(i), float(scores[i])) for i in top]
+
+        # Quantized candidate generation, then exact cosine rescoring of the shortlist
+        candidate_count = min(max(min(top_k * self.rescore_multiplier, self.max_rescore_candidates), top_k), eligible)
+        candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+        fetched = fetch_full_vectors([self.ids[i] for i in candidates])
+        # Chunks deleted after this index was built can't be rescored and are dropped
+        candidates = np.asarray([i for i in candidates if self.ids[i] in fetched], dtype=np.int64)
+        if len(candidates) == 0:
+            return []
+        full = l2_normalize(np.stack([fetched[self.ids[i]] for i in candidates]))
+        exact = full @ l2_normalize(to_float32(query))
+
+        order = np.argsort(-exact)[:top_k]
+        return [(int(candidates[i]), float(exact[i])) for i in order]
+
+
+class VectorIndexCache:
+
+    def __init__(self, ttl_seconds: float = VECTOR_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[int, str], Tuple[Any, QuantizedVectorIndex]] = {}
+
+    def get(self, pipeline_id: int, mode: str, version: Any, loader: Callable[[], QuantizedVectorIndex]) -> QuantizedVectorIndex:
+        key = (pipeline_id, mode)
+        with self._lock:
+            cached = self._entries.get(key)
+
+        if cached and cached[0] == version and time.monotonic() - cached[1].created_at < self.ttl_seconds:
+            return cached[1]
+
+        index = loader()
+        with self._lock:
+            self._entries[key] = (version, index)
+        return index
+
+    def invalidate(self, pipeline_id: int, mode: Optional[str] = None):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == pipeline_id and mode in (None, key[1])]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+vector_index_cache = VectorIndexCache()
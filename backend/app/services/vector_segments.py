@@ -0,0 +1,340 @@
+### Memory-mapped float32 vector segments shared by every worker on a node
+# With VECTOR_INDEX_STORAGE=mmap, float32 local search reads each pipeline's vectors from files
+# under VECTOR_SEGMENT_DIR instead of a per-worker in-memory index. The files are mapped
+# read-only, so all uvicorn workers share one page-cache copy and a worker's resident memory
+# doesn't grow with the number of workers.
+#
+# Layout, one directory per pipeline and vector size:
+#   {VECTOR_SEGMENT_DIR}/pipeline_{id}/d{dimensions}/
+#       manifest.json      generation, build time, live segment names and deleted chunk ids
+#       {segment}.f32      L2-normalized float32 rows, C order
+#       {segment}.txt      the chunk texts, UTF-8, back to back
+#       {segment}.json     sidecar: chunk ids, text offsets and the payload fields results need
+#       lock               flock()ed by writers
+# Segments are immutable. Uploads append a segment, deletes add tombstones to the manifest, and
+# once there are too many segments or tombstones everything live is compacted into one segment.
+# Every change writes a new manifest with os.replace, so readers never see a partial one. Changes
+# made on other nodes show up when the pipeline is rebuilt from Firestore, every
+# VECTOR_INDEX_TTL_SECONDS.
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from app.logging_config import get_logger
+from app.services.vector_quantization import VECTOR_INDEX_TTL_SECONDS, QuantizedVectorIndex, l2_normalize, to_float32
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# 'memory' keeps a QuantizedVectorIndex per worker; 'mmap' uses the shared segment files
+VECTOR_INDEX_STORAGE = os.getenv('VECTOR_INDEX_STORAGE', 'memory').lower()
+VECTOR_SEGMENT_DIR = os.getenv('VECTOR_SEGMENT_DIR', '/tmp/hoos-vector-segments')
+# Compact once a pipeline has more segments than this, or this share of its rows are deleted
+VECTOR_SEGMENT_MAX_SEGMENTS = int(os.getenv('VECTOR_SEGMENT_MAX_SEGMENTS', '8'))
+VECTOR_SEGMENT_MAX_DELETED_RATIO = float(os.getenv('VECTOR_SEGMENT_MAX_DELETED_RATIO', '0.2'))
+
+# Payload fields kept in the sidecar; the chunk text lives in the .txt file
+SEGMENT_PAYLOAD_FIELDS = ['file_name', 'chunk_index', 'document_id', 'storage_path']
+
+MANIFEST = 'manifest.json'
+
+
+def _write_atomic(path: str, data: bytes):
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temporary, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class Segment:
+    # One immutable segment, mapped read-only
+
+    def __init__(self, directory: str, name: str):
+        with open(os.path.join(directory, f"{name}.json")) as file:
+            sidecar = json.load(file)
+        self.name = name
+        self.ids: List[str] = sidecar['ids']
+        self.payloads: List[Dict[str, Any]] = sidecar['payloads']
+        self.text_offsets = np.asarray(sidecar['text_offsets'], dtype=np.int64)
+        self.dimensions = sidecar['dimensions']
+
+        count = len(self.ids)
+        if count:
+            self.vectors = np.memmap(os.path.join(directory, f"{name}.f32"), dtype=np.float32, mode='r',
+                                     shape=(count, self.dimensions))
+        else:
+            self.vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+        text_size = int(self.text_offsets[-1])
+        self.texts = np.memmap(os.path.join(directory, f"{name}.txt"), dtype=np.uint8, mode='r') if text_size else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def text(self, row: int) -> str:
+        if self.texts is None:
+            return ''
+        return bytes(self.texts[self.text_offsets[row]:self.text_offsets[row + 1]]).decode('utf-8')
+
+    @staticmethod
+    def write(directory: str, ids: Sequence[str], vectors: np.ndarray, texts: Sequence[str],
+              payloads: Sequence[Dict[str, Any]]) -> str:
+        name = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        encoded = [(text or '').encode('utf-8') for text in texts]
+        offsets = np.concatenate([[0], np.cumsum([len(text) for text in encoded], dtype=np.int64)]).tolist()
+        sidecar = {
+            'dimensions': int(vectors.shape[1]),
+            'ids': list(ids),
+            'text_offsets': offsets,
+            'payloads': [{field: payload.get(field) for field in SEGMENT_PAYLOAD_FIELDS} for payload in payloads],
+        }
+
+        # The sidecar goes last; a segment without one is never listed in a manifest
+        _write_atomic(os.path.join(directory, f"{name}.f32"), vectors.tobytes())
+        _write_atomic(os.path.join(directory, f"{name}.txt"), b''.join(encoded))
+        _write_atomic(os.path.join(directory, f"{name}.json"), json.dumps(sidecar, separators=(',', ':')).encode('utf-8'))
+        return name
+
+
+class MappedVectorIndex:
+    # One generation of a pipeline's segments. Same search interface as a float32
+    # QuantizedVectorIndex, but the vectors and texts stay in the page cache.
+
+    def __init__(self, directory: str, manifest: Dict[str, Any], manifest_mtime: int):
+        self.directory = directory
+        self.generation = manifest['generation']
+        self.built_at = manifest['built_at']
+        self.manifest_mtime = manifest_mtime
+        self.dimensions = manifest['dimensions']
+        self.segments = [Segment(directory, name) for name in manifest['segments']]
+        self.deleted = set(manifest['deleted'])
+
+        self.ids: List[str] = [chunk_id for segment in self.segments for chunk_id in segment.ids]
+        self.payloads: List[Dict[str, Any]] = [payload for segment in self.segments for payload in segment.payloads]
+        self._locations: List[Tuple[Segment, int]] = [(segment, row) for segment in self.segments for row in range(len(segment))]
+        self.live = np.array([chunk_id not in self.deleted for chunk_id in self.ids], dtype=bool)
+
+    def __len__(self) -> int:
+        return int(self.live.sum())
+
+    @property
+    def nbytes(self) -> int:
+        # Mapped, not resident: shared with every other worker through the page cache
+        return sum(segment.vectors.nbytes for segment in self.segments)
+
+    def text(self, position: int) -> str:
+        segment, row = self._locations[position]
+        return segment.text(row)
+
+    def search(self, query: np.ndarray, top_k: int, fetch_full_vectors: Optional[Callable] = None,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        # Full precision already, so fetch_full_vectors is never needed
+        if not self.ids or top_k <= 0:
+            return []
+
+        query = l2_normalize(to_float32(query))
+        scores = np.concatenate([segment.vectors @ query for segment in self.segments])
+        eligible_rows = self.live if mask is None else self.live & mask
+        scores = np.where(eligible_rows, scores, -np.inf)
+
+        eligible = int(eligible_rows.sum())
+        if eligible == 0:
+            return []
+
+        count = min(top_k, eligible)
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class MappedVectorStore:
+
+    def __init__(self, root: str = VECTOR_SEGMENT_DIR, rebuild_seconds: float = VECTOR_INDEX_TTL_SECONDS):
+        self.root = root
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._open: Dict[Tuple[int, int], MappedVectorIndex] = {}
+
+    def _directory(self, pipeline_id: int, dimensions: int) -> str:
+        return os.path.join(self.root, f"pipeline_{int(pipeline_id)}", f"d{int(dimensions)}")
+
+    @contextmanager
+    def _writer(self, directory: str, blocking: bool = True) -> Iterator[bool]:
+        # Serializes writers across processes; yields False if non-blocking and someone else holds it
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'lock'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self, directory: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        path = os.path.join(directory, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path) as file:
+                return json.load(file), mtime
+        except FileNotFoundError:
+            return None, 0
+
+    def _write_manifest(self, directory: str, dimensions: int, segments: List[str], deleted: Sequence[str],
+                        previous: Optional[Dict[str, Any]], built_at: Optional[float] = None):
+        manifest = {
+            'generation': (previous['generation'] + 1) if previous else 1,
+            'built_at': built_at if built_at is not None else previous['built_at'],
+            'dimensions': dimensions,
+            'segments': segments,
+            'deleted': sorted(set(deleted)),
+        }
+        _write_atomic(os.path.join(directory, MANIFEST), json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+        return manifest
+
+    def _remove_segments(self, directory: str, names: Sequence[str]):
+        # Workers still mapping these keep their pages until they reopen the new generation
+        for name in names:
+            for suffix in ('.json', '.f32', '.txt'):
+                try:
+                    os.remove(os.path.join(directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _is_stale(self, manifest: Dict[str, Any]) -> bool:
+        return time.time() - manifest['built_at'] > self.rebuild_seconds
+
+    ## READ
+    def get(self, pipeline_id: int, dimensions: int, loader: Callable[[], QuantizedVectorIndex]) -> MappedVectorIndex:
+        key = (int(pipeline_id), int(dimensions))
+        directory = self._directory(pipeline_id, dimensions)
+        manifest, mtime = self._read_manifest(directory)
+
+        if manifest is None or self._is_stale(manifest):
+            # Only one process rebuilds; the others keep serving the previous generation meanwhile
+            with self._writer(directory, blocking=manifest is None) as acquired:
+                if acquired:
+                    manifest, mtime = self._read_manifest(directory)
+                    if manifest is None or self._is_stale(manifest):
+                        try:
+                            manifest = self._rebuild(directory, dimensions, loader(), manifest)
+                            mtime = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+                        except Exception:
+                            if manifest is None:
+                                raise
+                            logger.exception("Rebuilding %s failed; serving generation %d", directory, manifest['generation'])
+
+        with self._lock:
+            current = self._open.get(key)
+        if current is not None and current.manifest_mtime == mtime and current.generation == manifest['generation']:
+            return current
+
+        try:
+            index = MappedVectorIndex(directory, manifest, mtime)
+        except FileNotFoundError:
+            # Compacted between reading the manifest and opening its segments
+            manifest, mtime = self._read_manifest(directory)
+            index = MappedVectorIndex(directory, manifest, mtime)
+
+        with self._lock:
+            self._open[key] = index
+        return index
+
+    ## WRITE
+    def _rebuild(self, directory: str, dimensions: int, source: QuantizedVectorIndex,
+                 previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # source is a float32 index loaded from Firestore, so its rows are already normalized
+        vectors = source.vectors if len(source) else np.zeros((0, dimensions), dtype=np.float32)
+        name = Segment.write(directory, source.ids, vectors, [payload.get('text') for payload in source.payloads], source.payloads)
+        manifest = self._write_manifest(directory, dimensions, [name], [], previous, built_at=time.time())
+        if previous:
+            self._remove_segments(directory, previous['segments'])
+        logger.info("Built vector segment for %s: %d rows, %d bytes mapped", directory, len(source), vectors.nbytes)
+        return manifest
+
+    def append(self, pipeline_id: int, ids: Sequence[str], vectors: np.ndarray, texts: Sequence[str],
+               payloads: Sequence[Dict[str, Any]]):
+        # Only pipelines that already have segments are appended to; the others are built from
+        # Firestore, which already includes these rows, on their first search
+        if not ids:
+            return
+        vectors = l2_normalize(np.atleast_2d(vectors))
+        directory = self._directory(pipeline_id, vectors.shape[1])
+        if not os.path.exists(os.path.join(directory, MANIFEST)):
+            return
+
+        with self._writer(directory):
+            manifest, _ = self._read_manifest(directory)
+            if manifest is None:
+                return
+            name = Segment.write(directory, ids, vectors, texts, payloads)
+            manifest = self._write_manifest(directory, manifest['dimensions'], manifest['segments'] + [name],
+                                            manifest['deleted'], manifest)
+            self._compact_if_needed(directory, manifest)
+
+    def delete(self, pipeline_id: int, ids: Sequence[str]):
+        pipeline_directory = os.path.join(self.root, f"pipeline_{int(pipeline_id)}")
+        if not ids or not os.path.isdir(pipeline_directory):
+            return
+
+        for entry in os.listdir(pipeline_directory):
+            directory = os.path.join(pipeline_directory, entry)
+            with self._writer(directory):
+                manifest, _ = self._read_manifest(directory)
+                if manifest is None:
+                    continue
+                manifest = self._write_manifest(directory, manifest['dimensions'], manifest['segments'],
+                                                list(manifest['deleted']) + list(ids), manifest)
+                self._compact_if_needed(directory, manifest)
+
+    def _compact_if_needed(self, directory: str, manifest: Dict[str, Any]):
+        # Called with the writer lock held
+        segments = [Segment(directory, name) for name in manifest['segments']]
+        total = sum(len(segment) for segment in segments)
+        deleted = set(manifest['deleted'])
+        if len(segments) <= VECTOR_SEGMENT_MAX_SEGMENTS and (total == 0 or len(deleted) / total <= VECTOR_SEGMENT_MAX_DELETED_RATIO):
+            return
+
+        ids, vectors, texts, payloads = [], [], [], []
+        for segment in segments:
+            for row, chunk_id in enumerate(segment.ids):
+                if chunk_id in deleted:
+                    continue
+                ids.append(chunk_id)
+                texts.append(segment.text(row))
+                payloads.append(segment.payloads[row])
+            live_rows = [row for row, chunk_id in enumerate(segment.ids) if chunk_id not in deleted]
+            vectors.append(np.asarray(segment.vectors[live_rows]))
+
+        stacked = np.concatenate(vectors) if vectors else np.zeros((0, manifest['dimensions']), dtype=np.float32)
+        name = Segment.write(directory, ids, stacked, texts, payloads)
+        self._write_manifest(directory, manifest['dimensions'], [name], [], manifest)
+        self._remove_segments(directory, manifest['segments'])
+        logger.info("Compacted %d vector segments in %s into %d rows", len(segments), directory, len(ids))
+
+    def drop(self, pipeline_id: int):
+        shutil.rmtree(os.path.join(self.root, f"pipeline_{int(pipeline_id)}"), ignore_errors=True)
+        with self._lock:
+            for key in [key for key in self._open if key[0] == int(pipeline_id)]:
+                del self._open[key]
+
+    def drop_all(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self._open.clear()
+
+
+mapped_vector_store = MappedVectorStore()
@@ -0,0 +1,143 @@
+### Startup warm-up and readiness
+# Importing app.main only loads FastAPI, SQLAlchemy and the routers. Vertex AI, Firestore,
+# firebase_admin, LangChain/OpenAI, pypdf, python-docx and langdetect are imported where they
+# are first used, and the steps below use them ahead of traffic: opening pooled MySQL
+# connections, initializing Firebase and creating the shared clients from service_factory.
+# The lifespan runs the steps in the background so the port opens right away, and GET /ready
+# answers 503 until they have all finished. A failed step is logged and reported by /ready but
+# doesn't hold readiness back; the first request that needs that client creates it again.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from app.logging_config import get_logger
+from app.metrics import ready, warmup_step_duration
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# 'background' opens the port before warm-up finishes; 'blocking' finishes it first, like before
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', 'background').lower()
+
+## WARM-UP STEPS
+def _database_pool():
+    from app.database import DB_POOL_PREWARM, prewarm_pool
+    prewarm_pool(DB_POOL_PREWARM)
+
+def _cache_invalidation():
+    from app.services.metadata_cache import start_invalidation_channel
+    start_invalidation_channel()
+
+def _firebase_auth():
+    from app.services.service_factory import is_local
+    if not is_local('auth'):
+        from app.services.firebase_auth import get_firebase_app
+        get_firebase_app()
+
+def _document_extractors():
+    from app.services.document_processor import warm_extractors
+    warm_extractors()
+
+def _embedding_service():
+    from app.services.service_factory import shared_embedding_service
+    shared_embedding_service()
+
+def _firestore_service():
+    from app.services.service_factory import shared_firestore_service
+    shared_firestore_service()
+
+def _storage_service():
+    from app.services.service_factory import shared_storage_service
+    shared_storage_service()
+
+def _chat_llm():
+    from app.services.service_factory import shared_chat_llm
+    shared_chat_llm()
+
+WARMUP_STEPS: Dict[str, Callable[[], Any]] = {
+    "database_pool": _database_pool,
+    "cache_invalidation": _cache_invalidation,
+    "firebase_auth": _firebase_auth,
+    "document_extractors": _document_extractors,
+    "embedding_service": _embedding_service,
+    "firestore_service": _firestore_service,
+    "storage_service": _storage_service,
+    "chat_llm": _chat_llm,
+}
+
+
+class Warmup:
+
+    def __init__(self, steps: Dict[str, Callable[[], Any]] = WARMUP_STEPS):
+        self.steps = steps
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._status: Dict[str, str] = {name: 'pending' for name in steps}
+        self._durations: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._elapsed: Optional[float] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def _run_step(self, name: str):
+        with self._lock:
+            self._status[name] = 'running'
+        started = time.perf_counter()
+        try:
+            self.steps[name]()
+            status, error = 'ok', None
+        except Exception as e:
+            logger.exception("Warm-up step %s failed", name)
+            status, error = 'failed', str(e)
+        duration = time.perf_counter() - started
+        warmup_step_duration.set(duration, label=name)
+        with self._lock:
+            self._status[name] = status
+            self._durations[name] = duration
+            if error is not None:
+                self._errors[name] = error
+
+    def run(self):
+        # The steps are independent and mostly wait on the network, so they run side by side
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.steps), thread_name_prefix="warmup") as executor:
+            list(executor.map(self._run_step, self.steps))
+        self._elapsed = time.perf_counter() - started
+
+        ready.set(1)
+        self._finished.set()
+        if self._errors:
+            logger.warning("Warm-up finished in %.2fs with failed steps: %s", self._elapsed, ", ".join(sorted(self._errors)))
+        else:
+            logger.info("Warm-up finished in %.2fs", self._elapsed)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self.is_ready:
+                status = 'starting'
+            else:
+                status = 'degraded' if self._errors else 'ready'
+            return {
+                'status': status,
+                'elapsed_s': self._elapsed,
+                'steps': {
+                    name: {
+                        'status': self._status[name],
+                        'duration_s': self._durations.get(name),
+                        **({'error': self._errors[name]} if name in self._errors else {}),
+                    }
+                    for name in self.steps
+                },
+            }
+
+
+warmup = Warmup()
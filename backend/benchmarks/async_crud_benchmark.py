@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-worker throughput of the three ways a route can reach MySQL:
+  blocking    async def route calling app/crudFunctions (what most routers do today; each
+              query blocks the event loop)
+  threadpool  plain def route calling app/crudFunctions (FastAPI hops to its thread pool)
+  async       async def route awaiting app/asyncCrudFunctions on the aiomysql engine
+Each request looks up a user and lists their pipelines, like the start of most routes.
+--sleep-ms adds a server-side SELECT SLEEP per request to model Cloud SQL round trips when
+benchmarking against a local MySQL.
+
+Requires a MySQL database with the app schema and at least one user:
+Usage: DATABASE_URL=mysql+pymysql://root:pw@localhost/hoosstudying \\
+       python benchmarks/async_crud_benchmark.py --firebase-uid <uid> [--concurrency 1 8 32 64]
+                                                 [--duration 10] [--sleep-ms 5] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.async_database import dispose_async_engine, get_async_db
+from app.crudFunctions import userFunctions, pipelineFunctions
+from app.asyncCrudFunctions import userFunctions as asyncUserFunctions, pipelineFunctions as asyncPipelineFunctions
+
+MODES = ("blocking", "threadpool", "async")
+
+
+def build_app(firebase_uid: str, sleep_seconds: float) -> FastAPI:
+    app = FastAPI()
+
+    def sync_work(db: Session):
+        user = userFunctions.get_user_by_firebase_uid(db, firebase_uid)
+        if sleep_seconds:
+            db.execute(text("SELECT SLEEP(:seconds)"), {'seconds': sleep_seconds})
+        return len(pipelineFunctions.get_pipelines_by_user_id(db, user['user_id']))
+
+    @app.get("/blocking")
+    async def blocking(db: Session = Depends(get_db)):
+        return {'pipelines': sync_work(db)}
+
+    @app.get("/threadpool")
+    def threadpool(db: Session = Depends(get_db)):
+        return {'pipelines': sync_work(db)}
+
+    @app.get("/async")
+    async def async_route(db: AsyncSession = Depends(get_async_db)):
+        user = await asyncUserFunctions.get_user_by_firebase_uid(db, firebase_uid)
+        if sleep_seconds:
+            await db.execute(text("SELECT SLEEP(:seconds)"), {'seconds': sleep_seconds})
+        return {'pipelines': len(await asyncPipelineFunctions.get_pipelines_by_user_id(db, user['user_id']))}
+
+    return app
+
+async def run_level(client: httpx.AsyncClient, mode: str, concurrency: int, duration: float) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(f"/{mode}")
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2) if latencies else None,
+    }
+
+async def main(args):
+    app = build_app(args.firebase_uid, args.sleep_ms / 1000.0)
+    rows = []
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for mode in args.modes:
+            await client.get(f"/{mode}")  # open the first pooled connection outside the timing
+            for concurrency in args.concurrency:
+                row = await run_level(client, mode, concurrency, args.duration)
+                rows.append(row)
+                if not args.json:
+                    print(f"{mode:<11} x{concurrency:<4} {row['throughput_rps']:>9} req/s  "
+                          f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  errors {row['errors']}")
+    await dispose_async_engine()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--firebase-uid', required=True, help='An existing user to look up')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode and concurrency level')
+    parser.add_argument('--sleep-ms', type=float, default=0.0, help='Extra server-side latency per request (MySQL SLEEP)')
+    parser.add_argument('--json', action='store_true')
+    asyncio.run(main(parser.parse_args()))
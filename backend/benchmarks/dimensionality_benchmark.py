@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Compare retrieval latency, storage and recall@k for reduced embedding dimensionalities
+against full 768-dimension search. Reduced vectors come from truncation (what the model's
+output_dimensionality returns) and from a PCA projection fitted on the corpus.
+Usage: python benchmarks/dimensionality_benchmark.py [--vectors 20000] [--embeddings recorded.npy] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.dimensionality import FULL_EMBEDDING_DIMENSIONS, PCAProjection
+from app.services.vector_quantization import bytes_per_vector, l2_normalize
+from benchmarks.synthetic import clustered_embeddings, exact_top_k, recall
+
+def flat_search(corpus: np.ndarray, queries: np.ndarray, top_k: int):
+    corpus = l2_normalize(corpus)
+    found = []
+    started = time.perf_counter()
+    for query in l2_normalize(queries):
+        scores = corpus @ query
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        found.append(top[np.argsort(-scores[top])].tolist())
+    elapsed = time.perf_counter() - started
+    return found, elapsed / len(queries) * 1000
+
+def run_benchmark(corpus: np.ndarray, queries: np.ndarray, top_k: int, dimensions_list):
+    truth = exact_top_k(corpus, queries, top_k)
+    rows = []
+
+    for dimensions in dimensions_list:
+        methods = [("full", corpus, queries)] if dimensions == corpus.shape[1] else []
+        if dimensions < corpus.shape[1]:
+            methods.append(("truncate", corpus[:, :dimensions], queries[:, :dimensions]))
+            projection = PCAProjection.fit(corpus, dimensions)
+            methods.append(("pca", projection.transform(corpus), projection.transform(queries)))
+
+        for method, reduced_corpus, reduced_queries in methods:
+            found, mean_ms = flat_search(reduced_corpus, reduced_queries, top_k)
+            sizes = bytes_per_vector("float32", dimensions)
+            rows.append({
+                'dimensions': dimensions,
+                'method': method,
+                'memory_bytes_per_vector': sizes['memory'],
+                'storage_bytes_per_vector': sizes['storage'],
+                f'recall_at_{top_k}': round(recall(found, truth), 4),
+                'mean_query_ms': round(mean_ms, 3),
+            })
+
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[768, 512, 384, 256])
+    parser.add_argument("--embeddings", help="recorded .npy matrix of real embeddings; queries are held out from it")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        recorded = np.load(args.embeddings).astype(np.float32)
+        corpus, queries = recorded[args.queries:], recorded[:args.queries]
+        source = args.embeddings
+    else:
+        corpus, queries = clustered_embeddings(args.vectors, FULL_EMBEDDING_DIMENSIONS, args.queries)
+        source = "synthetic"
+
+    rows = run_benchmark(corpus, queries, args.top_k, args.dimensions)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        sys.exit(0)
+
+    print(f"\n{len(corpus)} {source} vectors, {len(queries)} queries, recall@{args.top_k} vs full-dimension search\n")
+    print(f"{'dims':>5} {'method':<9} {'memory B/vec':>13} {'storage B/vec':>14} {'recall':>7} {'ms/query':>9}")
+    for row in rows:
+        print(f"{row['dimensions']:>5} {row['method']:<9} {row['memory_bytes_per_vector']:>13} "
+              f"{row['storage_bytes_per_vector']:>14} {row[f'recall_at_{args.top_k}']:>7.3f} {row['mean_query_ms']:>9.3f}")
@@ -0,0 +1,105 @@
+### Deterministic document fixtures for the offline benchmarks
+# Text comes from a seeded generator over a fixed vocabulary, so the same size always
+# produces byte-identical TXT, DOCX and PDF files and runs stay comparable across machines.
+
+import os
+import random
+from typing import List
+
+CORPUS_SIZES = {
+    'small': 10_000,
+    'medium': 100_000,
+    'large': 500_000,
+}
+
+_VOCABULARY = (
+    "algorithm analysis array binary cache complexity data database derivative distribution "
+    "eigenvalue entropy equation function gradient graph hypothesis integral lemma limit "
+    "matrix memory model network node optimization parameter probability process proof "
+    "protocol query recursion regression sample schema sequence set signal space stack "
+    "statistic system theorem transaction tree variable vector"
+).split()
+
+_ENDINGS = ('. ', '. ', '. ', '? ', '! ', '; ', '.\n')
+
+
+def synthetic_text(characters: int, seed: int = 11) -> str:
+    # Sentence lengths and punctuation vary, so chunk_text exercises every delimiter branch
+    rng = random.Random(seed)
+    parts: List[str] = []
+    length = 0
+    while length < characters:
+        words = rng.choices(_VOCABULARY, k=rng.randint(6, 24))
+        sentence = " ".join(words).capitalize() + rng.choice(_ENDINGS)
+        if rng.random() < 0.08:
+            sentence += "\n"
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:characters]
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, text: str, lines_per_page: int = 50, line_width: int = 90):
+    # Minimal PDF with one Helvetica text stream per page, enough for pypdf's text extraction
+    lines = []
+    for paragraph in text.split("\n"):
+        while len(paragraph) > line_width:
+            lines.append(paragraph[:line_width])
+            paragraph = paragraph[line_width:]
+        lines.append(paragraph)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Object 1 catalog, 2 page tree, 3 font, then a page and content stream per page
+    objects = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page_lines in zip(page_ids, pages):
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode('latin-1')
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1')
+
+    with open(path, 'wb') as file:
+        file.write(bytes(output))
+
+def write_docx(path: str, text: str):
+    from docx import Document as DocxDocument
+
+    document = DocxDocument()
+    for paragraph in text.split("\n"):
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+def write_txt(path: str, text: str):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(text)
+
+def build_fixtures(directory: str, size_name: str) -> dict:
+    text = synthetic_text(CORPUS_SIZES[size_name])
+    paths = {
+        'text': text,
+        'txt': os.path.join(directory, f"{size_name}.txt"),
+        'docx': os.path.join(directory, f"{size_name}.docx"),
+        'pdf': os.path.join(directory, f"{size_name}.pdf"),
+    }
+    write_txt(paths['txt'], text)
+    write_docx(paths['docx'], text)
+    write_pdf(paths['pdf'], text)
+    return paths
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Latency and recall of two-stage retrieval (VECTOR_SEARCH_MODE=documents) against flat search
+as a pipeline grows. Flat search scores every chunk. Two-stage search scores the document
+centroids (app/services/document_vectors.py), keeps the best --candidates documents and scores
+only their chunks, as find_nearest does when filtered to those storage paths. Both run in memory
+on synthetic documents, so the latencies compare the work done, not Firestore round trips;
+chunks_scored is what the second-stage find_nearest has to scan. Recall is against exact top-k.
+Usage: python benchmarks/hierarchical_benchmark.py [--documents 20 100 500 2000] [--chunks-per-document 40]
+                                                   [--candidates 5] [--dimensions 768] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.document_vectors import document_centroid
+from app.services.vector_quantization import QuantizedVectorIndex, l2_normalize
+from benchmarks.synthetic import document_embeddings, exact_top_k, recall
+
+
+def run(document_count: int, chunks_per_document: int, dimensions: int, query_count: int,
+        top_k: int, candidates: int) -> Dict[str, float]:
+    corpus, documents, queries = document_embeddings(document_count, chunks_per_document, dimensions, query_count)
+    truth = exact_top_k(corpus, queries, top_k)
+
+    flat = QuantizedVectorIndex("float32")
+    flat.add([str(i) for i in range(len(corpus))], corpus)
+
+    normalized = l2_normalize(corpus)
+    rows_by_document = [np.flatnonzero(documents == document) for document in range(document_count)]
+    centroids = QuantizedVectorIndex("float32")
+    centroids.add(
+        [str(document) for document in range(document_count)],
+        np.stack([document_centroid(normalized[rows].sum(axis=0)) for rows in rows_by_document])
+    )
+
+    started = time.perf_counter()
+    flat_found = [[position for position, _ in flat.search(query, top_k)] for query in queries]
+    flat_s = time.perf_counter() - started
+
+    two_stage_found: List[List[int]] = []
+    scored = 0
+    started = time.perf_counter()
+    for query in queries:
+        chosen = [int(centroids.ids[position]) for position, _ in centroids.search(query, candidates)]
+        rows = np.concatenate([rows_by_document[document] for document in chosen])
+        scores = normalized[rows] @ l2_normalize(query)
+        two_stage_found.append(rows[np.argsort(-scores)[:top_k]].tolist())
+        scored += len(rows)
+    two_stage_s = time.perf_counter() - started
+
+    return {
+        'documents': document_count,
+        'chunks': len(corpus),
+        'flat_ms': round(flat_s / query_count * 1000, 3),
+        'two_stage_ms': round(two_stage_s / query_count * 1000, 3),
+        'chunks_scored': round(scored / query_count + document_count, 1),
+        'flat_recall': round(recall(flat_found, truth), 4),
+        'two_stage_recall': round(recall(two_stage_found, truth), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, nargs="+", default=[20, 100, 500, 2000])
+    parser.add_argument("--chunks-per-document", type=int, default=40)
+    parser.add_argument("--candidates", type=int, default=5, help="documents searched in the second stage")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    rows = [
+        run(document_count, args.chunks_per_document, args.dimensions, args.queries, args.top_k, args.candidates)
+        for document_count in args.documents
+    ]
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'documents':>9} {'chunks':>8} {'flat ms':>8} {'2-stage ms':>11} {'scored':>8} {'flat recall':>12} {'2-stage recall':>15}")
+    for row in rows:
+        print(f"{row['documents']:>9} {row['chunks']:>8} {row['flat_ms']:>8} {row['two_stage_ms']:>11} "
+              f"{row['chunks_scored']:>8} {row['flat_recall']:>12} {row['two_stage_recall']:>15}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for the HoosStudying API.
+Simulated students sign in, open their pipelines, list conversations, send chat messages
+and upload PDFs, pausing for an exponentially distributed think time between actions.
+Reports throughput, p50/p95/p99 latency and error rate per endpoint, and with --sweep
+raises concurrency level by level until throughput stops scaling (the saturation point).
+
+In-process (default): drives app.main:app through httpx's ASGI transport. SERVICE_BACKEND
+defaults to local (see app/services/service_factory.py), so only MySQL has to be reachable.
+Remote: --url https://... with --tokens-file holding one Firebase ID token per line.
+
+Usage: python benchmarks/load_test.py [--users 10] [--duration 60] [--think-time 2.0]
+                                      [--sweep 1 2 4 8 16 32] [--mix chat=5,conversations=2,pipelines=2,upload=1]
+                                      [--url http://localhost:8000] [--tokens-file tokens.txt] [--app app.main:app] [--json]
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from benchmarks.fixtures import synthetic_text, write_pdf
+
+DEFAULT_MIX = {'chat': 5, 'conversations': 2, 'pipelines': 2, 'upload': 1}
+
+QUESTIONS = [
+    "Can you summarize the main ideas of this document?",
+    "What is the definition of an eigenvalue?",
+    "Explain the difference between a process and a thread.",
+    "What are the key steps in the proof of the theorem?",
+    "How does gradient descent choose its step size?",
+    "List the assumptions behind linear regression.",
+    "What does the lecture say about cache complexity?",
+    "Give me three practice questions on probability distributions.",
+]
+
+# A level is saturated when it adds less than this much throughput over the previous level...
+SATURATION_THROUGHPUT_GAIN = 0.10
+# ...or when more than this fraction of requests fail
+SATURATION_ERROR_RATE = 0.01
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    position = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[position]
+
+
+class LoadStats:
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self) -> Dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        total_requests = 0
+        total_errors = 0
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            total_requests += len(values)
+            total_errors += self.errors[endpoint]
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors[endpoint],
+                'error_rate': round(self.errors[endpoint] / len(values), 4),
+                'throughput_rps': round(len(values) / elapsed, 3),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+            }
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total_requests,
+            'errors': total_errors,
+            'error_rate': round(total_errors / total_requests, 4) if total_requests else 0.0,
+            'throughput_rps': round(total_requests / elapsed, 3) if elapsed else 0.0,
+            'endpoints': endpoints,
+        }
+
+
+class Student:
+
+    def __init__(self, client: httpx.AsyncClient, token: str, stats: LoadStats, mix: Dict[str, int], think_time: float,
+                 pdf_bytes: bytes, rng: random.Random):
+        self.client = client
+        self.token = token
+        self.stats = stats
+        self.mix = mix
+        self.think_time = think_time
+        self.pdf_bytes = pdf_bytes
+        self.rng = rng
+        self.pipeline_id: Optional[int] = None
+        self.conversation_id: Optional[int] = None
+
+    async def request(self, endpoint: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(endpoint, time.perf_counter() - started, False)
+            return None
+        self.stats.record(endpoint, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    @property
+    def auth_header(self) -> Dict[str, str]:
+        return {'Authorization': f"Bearer {self.token}"}
+
+    async def sign_in(self):
+        await self.request('auth_verify', 'POST', '/api/auth/verify', json={'token': self.token})
+        response = await self.request('default_pipeline', 'POST', '/api/pipeline/get-default-pipeline', json={'token': self.token})
+        if response is not None and response.status_code == 200:
+            self.pipeline_id = response.json().get('pipeline_id')
+
+    async def open_pipelines(self):
+        await self.request('pipelines', 'POST', '/api/pipeline/get-non-default-pipelines', json={'token': self.token})
+
+    async def list_conversations(self):
+        if self.pipeline_id is None:
+            return
+        await self.request('conversations', 'GET', f"/api/conversation/pipeline/{self.pipeline_id}/conversations",
+                           headers=self.auth_header)
+
+    async def chat(self):
+        body = {'message_text': self.rng.choice(QUESTIONS), 'pipeline_id': self.pipeline_id}
+        # Students mostly continue the conversation they are in, and occasionally start a new one
+        if self.conversation_id is not None and self.rng.random() < 0.8:
+            body['conversation_id'] = self.conversation_id
+        response = await self.request('chat', 'POST', '/api/chat/message', json=body, headers=self.auth_header)
+        if response is not None and response.status_code == 200:
+            self.conversation_id = response.json().get('conversation_id')
+
+    async def upload(self):
+        if self.pipeline_id is None:
+            return
+        await self.request(
+            'upload', 'POST', '/api/upload-simple',
+            data={'pipeline_id': str(self.pipeline_id)},
+            files={'file': (f"notes-{self.rng.randint(0, 10**6)}.pdf", self.pdf_bytes, 'application/pdf')},
+            headers=self.auth_header
+        )
+
+    async def run(self, deadline: float):
+        await self.sign_in()
+        actions = list(self.mix)
+        weights = [self.mix[action] for action in actions]
+        handlers = {
+            'chat': self.chat,
+            'conversations': self.list_conversations,
+            'pipelines': self.open_pipelines,
+            'upload': self.upload,
+        }
+        while time.perf_counter() < deadline:
+            if self.think_time > 0:
+                await asyncio.sleep(min(self.rng.expovariate(1 / self.think_time), max(0.0, deadline - time.perf_counter())))
+                if time.perf_counter() >= deadline:
+                    break
+            await handlers[self.rng.choices(actions, weights)[0]]()
+
+
+def build_client(url: Optional[str], app_path: str, timeout: float) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+
+    module_name, _, attribute = app_path.partition(':')
+    app = getattr(importlib.import_module(module_name), attribute or 'app')
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout)
+
+def load_tokens(tokens_file: Optional[str], users: int) -> List[str]:
+    if tokens_file:
+        with open(tokens_file) as file:
+            tokens = [line.strip() for line in file if line.strip()]
+        if not tokens:
+            raise ValueError(f"No tokens found in {tokens_file}")
+        return [tokens[i % len(tokens)] for i in range(users)]
+
+    from app.services.firebase_auth import make_local_token
+    return [make_local_token(f"loadtest-{i}", f"loadtest-{i}@example.com", f"Load Test {i}") for i in range(users)]
+
+def sample_pdf_bytes(characters: int = 20_000) -> bytes:
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'sample.pdf')
+        write_pdf(path, synthetic_text(characters))
+        with open(path, 'rb') as file:
+            return file.read()
+
+async def run_level(users: int, args, mix: Dict[str, int], pdf_bytes: bytes) -> Dict:
+    stats = LoadStats()
+    tokens = load_tokens(args.tokens_file, users)
+    async with build_client(args.url, args.app, args.timeout) as client:
+        deadline = time.perf_counter() + args.duration
+        students = [
+            Student(client, token, stats, mix, args.think_time, pdf_bytes, random.Random(args.seed + i))
+            for i, token in enumerate(tokens)
+        ]
+        await asyncio.gather(*(student.run(deadline) for student in students))
+    stats.finished = time.perf_counter()
+    return {'users': users, **stats.summary()}
+
+def find_saturation(levels: List[Dict]) -> Optional[Dict]:
+    # The last level that still scaled: the next one added little throughput or started failing
+    if levels and levels[0]['error_rate'] > SATURATION_ERROR_RATE:
+        return {'users': None, 'reason': f"{levels[0]['error_rate'] * 100:.1f}% errors already at {levels[0]['users']} users"}
+
+    for previous, current in zip(levels, levels[1:]):
+        if current['error_rate'] > SATURATION_ERROR_RATE:
+            return {'users': previous['users'], 'throughput_rps': previous['throughput_rps'],
+                    'reason': f"{current['error_rate'] * 100:.1f}% errors at {current['users']} users"}
+
+        gain = (current['throughput_rps'] - previous['throughput_rps']) / previous['throughput_rps'] if previous['throughput_rps'] else 0
+        if gain < SATURATION_THROUGHPUT_GAIN:
+            return {'users': previous['users'], 'throughput_rps': previous['throughput_rps'],
+                    'reason': f"{current['users']} users added only {gain * 100:.1f}% throughput"}
+    return None
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown action '{name}', expected one of {list(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return mix
+
+def print_level(level: Dict):
+    print(f"\n{level['users']} users: {level['requests']} requests in {level['elapsed_s']}s, "
+          f"{level['throughput_rps']} req/s, {level['error_rate'] * 100:.2f}% errors")
+    print(f"  {'endpoint':<18}{'requests':>9}{'req/s':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, row in level['endpoints'].items():
+        print(f"  {endpoint:<18}{row['requests']:>9}{row['throughput_rps']:>9}{row['errors']:>8}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+async def main(args):
+    if not args.url:
+        # In-process: every service except MySQL defaults to its local stand-in. Set before the
+        # first app import, since service_factory reads SERVICE_BACKEND once when it loads
+        os.environ.setdefault('SERVICE_BACKEND', 'local')
+    mix = args.mix or DEFAULT_MIX
+    pdf_bytes = sample_pdf_bytes()
+    levels = []
+    for users in (args.sweep or [args.users]):
+        level = await run_level(users, args, mix, pdf_bytes)
+        levels.append(level)
+        if not args.json:
+            print_level(level)
+
+    saturation = find_saturation(levels) if len(levels) > 1 else None
+    if args.json:
+        print(json.dumps({'target': args.url or 'in-process', 'mix': mix, 'think_time_s': args.think_time,
+                          'levels': levels, 'saturation': saturation}, indent=2))
+    elif len(levels) > 1:
+        if saturation and saturation['users'] is None:
+            print(f"\nNo usable level: {saturation['reason']}")
+        elif saturation:
+            print(f"\nSaturation at about {saturation['users']} users ({saturation['throughput_rps']} req/s): {saturation['reason']}")
+        else:
+            print("\nThroughput was still scaling at the highest level tested")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server; omit to drive app.main:app in-process')
+    parser.add_argument('--app', default='app.main:app', help='ASGI app to drive in-process, as module:attribute')
+    parser.add_argument('--tokens-file', help='Firebase ID tokens, one per line (required against a real deployment)')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent simulated students')
+    parser.add_argument('--sweep', type=int, nargs='+', help='Run once per concurrency level and report the saturation point')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds per level')
+    parser.add_argument('--think-time', type=float, default=2.0, help='Mean seconds between a student\'s actions (0 for closed-loop)')
+    parser.add_argument('--mix', type=parse_mix, help='Relative action weights, e.g. chat=5,conversations=2,pipelines=2,upload=1')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Report memory, transfer and Firestore storage bytes per vector and recall@k for each
+embedding representation used by VECTOR_SEARCH_MODE / EMBEDDING_QUANTIZATION.
+Usage: python benchmarks/quantization_report.py [--vectors 20000] [--dimensions 768] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.vector_quantization import QuantizedVectorIndex, bytes_per_vector, l2_normalize
+from benchmarks.synthetic import clustered_embeddings, exact_top_k, recall
+
+def run_report(vector_count: int, dimensions: int, query_count: int, top_k: int):
+    corpus, queries = clustered_embeddings(vector_count, dimensions, query_count)
+    truth = exact_top_k(corpus, queries, top_k)
+    full_precision = l2_normalize(corpus)
+    ids = [str(i) for i in range(vector_count)]
+
+    def fetch_full_vectors(chunk_ids):
+        return {chunk_id: full_precision[int(chunk_id)] for chunk_id in chunk_ids}
+
+    rows = []
+    for mode, rescore in [("float32", False), ("int8", False), ("int8", True), ("binary", False), ("binary", True)]:
+        index = QuantizedVectorIndex(mode)
+        index.add(ids, corpus)
+
+        started = time.perf_counter()
+        found = [
+            [position for position, _ in index.search(query, top_k, fetch_full_vectors if rescore else None)]
+            for query in queries
+        ]
+        elapsed = time.perf_counter() - started
+
+        sizes = bytes_per_vector(mode, dimensions)
+        rows.append({
+            'mode': mode + (" + rescore" if rescore else ""),
+            'memory_bytes_per_vector': sizes['memory'],
+            'transfer_bytes_per_vector': sizes['transfer'],
+            'storage_bytes_per_vector': sizes['storage'],
+            'index_bytes': index.nbytes,
+            f'recall_at_{top_k}': round(recall(found, truth), 4),
+            'mean_query_ms': round(elapsed / query_count * 1000, 3),
+        })
+
+    baseline = bytes_per_vector("float64", dimensions)
+    rows.insert(0, {
+        'mode': "float64 (previous)",
+        'memory_bytes_per_vector': baseline['memory'],
+        'transfer_bytes_per_vector': baseline['transfer'],
+        'storage_bytes_per_vector': baseline['storage'],
+        'index_bytes': baseline['memory'] * vector_count,
+        f'recall_at_{top_k}': 1.0,
+        'mean_query_ms': None,
+    })
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+
+    rows = run_report(args.vectors, args.dimensions, args.queries, args.top_k)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        sys.exit(0)
+
+    print(f"\n{args.vectors} vectors x {args.dimensions} dims, {args.queries} queries, recall@{args.top_k} vs exact float64 search\n")
+    print(f"{'mode':<20} {'memory B/vec':>13} {'transfer B/vec':>15} {'storage B/vec':>14} {'index MB':>9} {'recall':>7} {'ms/query':>9}")
+    for row in rows:
+        ms = f"{row['mean_query_ms']:.3f}" if row['mean_query_ms'] is not None else "-"
+        print(f"{row['mode']:<20} {row['memory_bytes_per_vector']:>13} {row['transfer_bytes_per_vector']:>15} {row['storage_bytes_per_vector']:>14} "
+              f"{row['index_bytes'] / 1e6:>9.1f} {row[f'recall_at_{args.top_k}']:>7.3f} {ms:>9}")
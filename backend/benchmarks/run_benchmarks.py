@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Offline micro-benchmarks for the ingestion and retrieval hot paths: text extraction,
+chunking, checksums, context building, Firestore document serialization and local
+similarity search, each over small, medium and large synthetic corpora.
+Results are written as JSON and compared against a stored baseline; any case whose
+median slows down by more than --threshold is reported and the exit code is 1.
+Usage: python benchmarks/run_benchmarks.py [--sizes small medium] [--output results.json]
+                                           [--baseline benchmarks/baseline.json] [--threshold 0.25]
+                                           [--save-baseline] [--filter chunk_text]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.document_processor import DocumentProcessor
+from app.services.firestore_service import build_embedding_document
+from app.services.rag_service import RAGService
+from app.services.vector_quantization import QuantizedVectorIndex
+from benchmarks.fixtures import CORPUS_SIZES, build_fixtures
+from benchmarks.synthetic import clustered_embeddings
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Number of stored chunk vectors searched per corpus size
+VECTOR_COUNTS = {'small': 1_000, 'medium': 10_000, 'large': 50_000}
+EMBEDDING_DIMENSIONS = 768
+TOP_K = 5
+
+
+def measure(function: Callable[[], object], min_time: float, max_repeats: int) -> Dict[str, float]:
+    function()  # warm-up: imports, caches, first-touch allocations
+
+    timings: List[float] = []
+    started = time.perf_counter()
+    while len(timings) < max_repeats and (len(timings) < 3 or time.perf_counter() - started < min_time):
+        begin = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - begin)
+
+    timings.sort()
+    return {
+        'repeats': len(timings),
+        'min_s': timings[0],
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'p95_s': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+    }
+
+def build_cases(size_name: str, directory: str) -> Dict[str, Callable[[], object]]:
+    processor = DocumentProcessor()
+    fixtures = build_fixtures(directory, size_name)
+    text = fixtures['text']
+    chunks = processor.chunk_text(text)
+
+    corpus, queries = clustered_embeddings(VECTOR_COUNTS[size_name], EMBEDDING_DIMENSIONS, 16)
+    ids = [str(i) for i in range(len(corpus))]
+    full_precision = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+
+    def fetch_full_vectors(chunk_ids):
+        return {chunk_id: full_precision[int(chunk_id)] for chunk_id in chunk_ids}
+
+    indexes = {}
+    for mode in ("float32", "int8", "binary"):
+        indexes[mode] = QuantizedVectorIndex(mode)
+        indexes[mode].add(ids, corpus)
+
+    # One upload's worth of vectors, capped so the large case measures serialization, not allocation
+    batch_vectors = corpus[:min(len(chunks), 500)]
+    batch_texts = chunks[:len(batch_vectors)]
+    metadata = {'storage_path': 'users/bench/documents/0/file.pdf', 'file_name': 'file.pdf', 'pipeline_id': 1, 'user_id': 1}
+    relevant_chunks = [{'text': chunk, 'file_name': 'file.pdf'} for chunk in chunks[:TOP_K]]
+
+    def search(mode: str, rescore: bool):
+        def run():
+            for query in queries:
+                indexes[mode].search(query, TOP_K, fetch_full_vectors if rescore else None)
+        return run
+
+    return {
+        'extract_text_from_txt': lambda: processor.extract_text_from_txt(fixtures['txt']),
+        'extract_text_from_docx': lambda: processor.extract_text_from_docx(fixtures['docx']),
+        'extract_text_from_pdf': lambda: processor.extract_text_from_pdf(fixtures['pdf']),
+        'chunk_text': lambda: processor.chunk_text(text),
+        'calculate_checksum': lambda: processor.calculate_checksum(fixtures['pdf']),
+        'build_context': lambda: RAGService.build_context(relevant_chunks),
+        'build_embedding_document': lambda: [
+            build_embedding_document(vector, chunk, metadata) for vector, chunk in zip(batch_vectors, batch_texts)
+        ],
+        'similarity_float32': search("float32", False),
+        'similarity_int8_rescore': search("int8", True),
+        'similarity_binary_rescore': search("binary", True),
+    }
+
+def run_suite(sizes: List[str], min_time: float, max_repeats: int, name_filter: Optional[str]) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size_name in sizes:
+            for case_name, function in build_cases(size_name, directory).items():
+                if name_filter and name_filter not in case_name:
+                    continue
+                key = f"{case_name}[{size_name}]"
+                results[key] = measure(function, min_time, max_repeats)
+                print(f"{key:<42} median {results[key]['median_s'] * 1000:10.3f} ms  ({results[key]['repeats']} runs)", file=sys.stderr)
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[Dict[str, float]]:
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        ratio = current['median_s'] / previous['median_s']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': key,
+                'baseline_median_s': previous['median_s'],
+                'median_s': current['median_s'],
+                'slowdown': round(ratio, 3),
+            })
+    return regressions
+
+def environment() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'numpy': np.__version__,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=list(CORPUS_SIZES), default=list(CORPUS_SIZES))
+    parser.add_argument('--filter', dest='name_filter', help='Only run cases whose name contains this string')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Seconds to keep repeating each case')
+    parser.add_argument('--max-repeats', type=int, default=50)
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed median slowdown before a case counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with these results')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.min_time, args.max_repeats, args.name_filter)
+    report = {'environment': environment(), 'threshold': args.threshold, 'results': results, 'regressions': []}
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'environment': report['environment'], 'results': results}, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            report['regressions'] = compare(results, json.load(file)['results'], args.threshold)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    for regression in report['regressions']:
+        print(f"REGRESSION {regression['case']}: {regression['slowdown']}x the baseline median", file=sys.stderr)
+    sys.exit(1 if report['regressions'] else 0)
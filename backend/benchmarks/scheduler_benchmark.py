@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Interactive latency while a bulk ingestion saturates the embedding quota, with and without the
+process-wide API scheduler (app/services/api_scheduler.py). The API is simulated: it enforces
+--quota requests per minute as a token bucket holding one second of quota, takes --latency-ms per
+request and answers anything over the quota with a 429. Background threads embed as fast as they can while
+query threads send one request every --think-ms.
+  direct     callers hit the API themselves and retry a 429 after a jittered exponential backoff
+  scheduled  every call goes through RateLimitedApi, queries as interactive, ingestion as background
+Reports query latency p50/p99, the ingestion rate achieved and the 429s the API returned.
+Usage: python benchmarks/scheduler_benchmark.py [--quota 600] [--duration 10] [--background 8]
+                                                [--interactive 2] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, List
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.api_scheduler import BACKGROUND, INTERACTIVE, RateLimitedApi
+
+MODES = ("direct", "scheduled")
+
+
+class QuotaExceeded(Exception):
+    code = 429
+
+
+class SimulatedApi:
+
+    def __init__(self, requests_per_minute: float, latency_s: float):
+        self.per_second = requests_per_minute / 60.0
+        self.latency_s = latency_s
+        self.tokens = self.per_second
+        self.updated_at = time.monotonic()
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def request(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated_at) * self.per_second)
+            self.updated_at = now
+            if self.tokens < 1:
+                self.rejected += 1
+                raise QuotaExceeded("429 RESOURCE_EXHAUSTED")
+            self.tokens -= 1
+        time.sleep(self.latency_s)
+
+
+def direct_call(api: SimulatedApi, retries: int = 6):
+    for attempt in range(retries + 1):
+        try:
+            return api.request()
+        except QuotaExceeded:
+            if attempt == retries:
+                raise
+            time.sleep(min(0.1 * 2 ** attempt, 5.0) * random.uniform(0.5, 1.5))
+
+def run(mode: str, args) -> Dict[str, float]:
+    api = SimulatedApi(args.quota, args.latency_ms / 1000)
+    # The scheduler is given the quota it is protecting, and the same one-second burst
+    scheduler = RateLimitedApi("embedding", args.quota, burst_seconds=1.0)
+    stop = threading.Event()
+    query_latencies: List[float] = []
+    failures = {'interactive': 0, 'background': 0}
+    ingested = [0]
+    lock = threading.Lock()
+
+    def call(priority: str):
+        if mode == "direct":
+            direct_call(api)
+        else:
+            scheduler.call(priority, api.request)
+
+    def ingest():
+        while not stop.is_set():
+            try:
+                call(BACKGROUND)
+                with lock:
+                    ingested[0] += 1
+            except QuotaExceeded:
+                with lock:
+                    failures['background'] += 1
+
+    def query():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                call(INTERACTIVE)
+                with lock:
+                    query_latencies.append(time.perf_counter() - started)
+            except QuotaExceeded:
+                with lock:
+                    failures['interactive'] += 1
+            stop.wait(args.think_ms / 1000)
+
+    threads = [threading.Thread(target=ingest) for _ in range(args.background)]
+    threads += [threading.Thread(target=query) for _ in range(args.interactive)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(query_latencies) or [0.0]
+    return {
+        'queries': len(query_latencies),
+        'query_p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'query_p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+        'query_failures': failures['interactive'],
+        'ingested_per_minute': round(ingested[0] / args.duration * 60, 1),
+        'ingest_failures': failures['background'],
+        'api_429s': api.rejected,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quota", type=float, default=600, help="API requests per minute")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--background", type=int, default=8, help="ingestion threads")
+    parser.add_argument("--interactive", type=int, default=2, help="query threads")
+    parser.add_argument("--think-ms", type=float, default=500, help="pause between one thread's queries")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {mode: run(mode, args) for mode in MODES}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<10} {'queries':>8} {'p50 ms':>8} {'p99 ms':>9} {'q fail':>7} {'ingest/min':>11} {'429s':>6}")
+    for mode, result in results.items():
+        print(f"{mode:<10} {result['queries']:>8} {result['query_p50_ms']:>8} {result['query_p99_ms']:>9} "
+              f"{result['query_failures']:>7} {result['ingested_per_minute']:>11} {result['api_429s']:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Per-worker memory of the float32 local vector index with VECTOR_INDEX_STORAGE=memory versus
+mmap, as the number of worker processes grows. Every worker loads one synthetic pipeline and
+runs searches against it, then reports from /proc/self/smaps_rollup (Linux only):
+  private_mb  memory only this worker holds (USS); grows with the index in memory mode
+  pss_mb      proportional set size; shared page-cache pages are split between the workers
+With mmap, the mapped vectors only count as private while a single worker maps them; from two
+workers on, private memory per worker is just the interpreter and the sidecars, and the summed
+PSS stays near one copy of the vectors however many workers there are.
+Usage: python benchmarks/shared_index_benchmark.py [--vectors 50000] [--dimensions 768]
+                                                   [--workers 1 2 4 8] [--queries 50] [--json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+from typing import Dict, List
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.services.vector_quantization import QuantizedVectorIndex
+from app.services.vector_segments import MappedVectorStore
+from benchmarks.synthetic import clustered_embeddings
+
+MODES = ("memory", "mmap")
+PIPELINE_ID = 1
+
+
+def memory_usage() -> Dict[str, float]:
+    fields = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        'private_mb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'pss_mb': fields.get('Pss', 0),
+    }
+
+def source_index(vectors: np.ndarray) -> QuantizedVectorIndex:
+    index = QuantizedVectorIndex("float32")
+    index.add([f"chunk_{i}" for i in range(len(vectors))], vectors,
+              [{'text': f"chunk {i}", 'document_id': i // 50, 'file_name': 'file.pdf', 'chunk_index': i % 50} for i in range(len(vectors))])
+    return index
+
+def worker(mode: str, directory: str, corpus_path: str, queries: np.ndarray, ready, release, results):
+    corpus = np.load(corpus_path, mmap_mode='r')
+    if mode == "memory":
+        # What each worker holds today: its own copy, as loaded from Firestore
+        index = source_index(np.array(corpus))
+    else:
+        index = MappedVectorStore(directory, rebuild_seconds=float('inf')).get(PIPELINE_ID, corpus.shape[1], lambda: None)
+    del corpus
+
+    for query in queries:
+        index.search(query, 5)
+
+    # Measure while every worker has its index open, so shared pages are split between them
+    ready.wait()
+    results.put(memory_usage())
+    release.wait()
+
+def run(mode: str, workers: int, directory: str, corpus_path: str, queries: np.ndarray) -> Dict[str, float]:
+    context = multiprocessing.get_context('spawn')
+    ready, release = context.Barrier(workers + 1), context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, directory, corpus_path, queries, ready, release, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    usage = [results.get() for _ in processes]
+    release.set()
+    for process in processes:
+        process.join()
+
+    return {
+        'mode': mode,
+        'workers': workers,
+        'private_mb_per_worker': round(statistics.fmean(item['private_mb'] for item in usage), 1),
+        'pss_mb_per_worker': round(statistics.fmean(item['pss_mb'] for item in usage), 1),
+        'pss_mb_total': round(sum(item['pss_mb'] for item in usage), 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=50_000)
+    parser.add_argument('--dimensions', type=int, default=768)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    corpus, queries = clustered_embeddings(args.vectors, args.dimensions, args.queries)
+    rows: List[Dict[str, float]] = []
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_path = os.path.join(directory, 'corpus.npy')
+        np.save(corpus_path, corpus.astype(np.float32))
+        MappedVectorStore(directory).get(PIPELINE_ID, args.dimensions, lambda: source_index(corpus))
+        del corpus
+
+        for workers in args.workers:
+            for mode in MODES:
+                rows.append(run(mode, workers, directory, corpus_path, queries))
+                print(f"{mode:<7} {workers:>3} workers  private {rows[-1]['private_mb_per_worker']:8.1f} MB/worker  "
+                      f"PSS {rows[-1]['pss_mb_per_worker']:8.1f} MB/worker  {rows[-1]['pss_mb_total']:8.1f} MB total",
+                      file=sys.stderr)
+
+    if args.json:
+        print(json.dumps({'vectors': args.vectors, 'dimensions': args.dimensions, 'results': rows}, indent=2))
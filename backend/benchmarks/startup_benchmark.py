@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of a worker: how long `import app.main` takes in a fresh interpreter and how
+long until GET /ready would answer 200 (the lifespan's warm-up run against the local service
+backends), each measured over several fresh processes. Also reports the modules that dominate
+the import from `python -X importtime`, and fails if any SDK that should be imported lazily
+(Vertex AI, Firestore, firebase_admin, LangChain, pypdf, python-docx, langdetect) is loaded
+by the import itself.
+Results are compared against a stored baseline like run_benchmarks.py; a median slowdown of
+more than --threshold, or an eagerly imported SDK, makes the exit code 1.
+Usage: python benchmarks/startup_benchmark.py [--runs 5] [--top 15] [--no-ready]
+                                              [--output results.json] [--threshold 0.25]
+                                              [--baseline benchmarks/startup_baseline.json]
+                                              [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import compare, environment
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_baseline.json')
+
+# Packages that only request handlers and the warm-up steps may import
+DEFERRED_PACKAGES = (
+    'vertexai',
+    'google.cloud.aiplatform',
+    'google.cloud.firestore',
+    'google.cloud.firestore_v1',
+    'google.cloud.sql.connector',
+    'firebase_admin',
+    'langchain_core',
+    'langchain_openai',
+    'pypdf',
+    'docx',
+    'langdetect',
+)
+
+# Run in each fresh interpreter; prints one JSON line
+CHILD_SCRIPT = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+result = {'import_s': time.perf_counter() - started}
+if sys.argv[1] == 'ready':
+    async def start():
+        async with app.main.lifespan(app.main.app):
+            await asyncio.to_thread(app.main.warmup.wait)
+            result['ready_s'] = time.perf_counter() - started
+            result['warmup'] = app.main.warmup.report()
+    asyncio.run(start())
+print(json.dumps(result))
+"""
+
+
+def child_environment() -> Dict[str, str]:
+    # Local stand-ins so warm-up needs no credentials or network; no DATABASE_URL or pre-warm,
+    # so the MySQL engine is built but never connects
+    env = dict(os.environ)
+    env.update({
+        'SERVICE_BACKEND': 'local',
+        'DB_POOL_PREWARM': '0',
+        'METADATA_CACHE_INVALIDATION': 'none',
+        'PYTHONPATH': BACKEND_DIRECTORY,
+    })
+    env.pop('DATABASE_URL', None)
+    return env
+
+def run_child(mode: str, import_time: bool) -> Tuple[Dict, str]:
+    command = [sys.executable] + (['-X', 'importtime'] if import_time else []) + ['-c', CHILD_SCRIPT, mode]
+    completed = subprocess.run(command, cwd=BACKEND_DIRECTORY, env=child_environment(), capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+def parse_import_time(stderr: str) -> Dict[str, Tuple[int, int]]:
+    # module -> (self microseconds, cumulative microseconds), keeping the first import of each
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return modules
+
+def top_level_packages(modules: Dict[str, Tuple[int, int]], top: int) -> List[Dict]:
+    # Self time summed per top-level package, so nested imports aren't counted twice
+    packages: Dict[str, int] = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'package': package, 'self_ms': round(microseconds / 1000, 2)} for package, microseconds in ranked]
+
+def eager_imports(modules: Dict[str, Tuple[int, int]]) -> List[str]:
+    return sorted(
+        package for package in DEFERRED_PACKAGES
+        if any(name == package or name.startswith(package + '.') for name in modules)
+    )
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    timings = sorted(timings)
+    return {
+        'repeats': len(timings),
+        'min_s': timings[0],
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'p95_s': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+    }
+
+def run_suite(runs: int, top: int, measure_ready: bool) -> Dict:
+    # One -X importtime run for the profile; its own timings are inflated, so they aren't counted
+    _, stderr = run_child('import', import_time=True)
+    modules = parse_import_time(stderr)
+
+    import_timings, ready_timings, warmup = [], [], None
+    for _ in range(runs):
+        result, _ = run_child('ready' if measure_ready else 'import', import_time=False)
+        import_timings.append(result['import_s'])
+        if measure_ready:
+            ready_timings.append(result['ready_s'])
+            warmup = result['warmup']
+
+    results = {'import[app.main]': summarize(import_timings)}
+    if measure_ready:
+        results['ready[local]'] = summarize(ready_timings)
+    for key, stats in results.items():
+        print(f"{key:<20} median {stats['median_s'] * 1000:10.1f} ms  ({stats['repeats']} runs)", file=sys.stderr)
+
+    return {
+        'results': results,
+        'top_packages': top_level_packages(modules, top),
+        'eager_imports': eager_imports(modules),
+        'warmup': warmup,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list in the import profile')
+    parser.add_argument('--no-ready', dest='measure_ready', action='store_false', help='Only time the import, not warm-up')
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed median slowdown before it counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with these results')
+    args = parser.parse_args()
+
+    suite = run_suite(args.runs, args.top, args.measure_ready)
+    report = {'environment': environment(), 'threshold': args.threshold, 'regressions': [], **suite}
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump({'environment': report['environment'], 'results': suite['results']}, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            report['regressions'] = compare(suite['results'], json.load(file)['results'], args.threshold)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    for package in report['eager_imports']:
+        print(f"EAGER IMPORT {package}: imported by app.main instead of on first use", file=sys.stderr)
+    for regression in report['regressions']:
+        print(f"REGRESSION {regression['case']}: {regression['slowdown']}x the baseline median", file=sys.stderr)
+    sys.exit(1 if report['regressions'] or report['eager_imports'] else 0)
@@ -0,0 +1,46 @@
+### Deterministic synthetic embedding corpora shared by the benchmarks
+
+import numpy as np
+
+def clustered_embeddings(vector_count: int, dimensions: int, query_count: int, seed: int = 7):
+    # Clustered vectors look more like real chunk embeddings (documents form topics) than
+    # isotropic noise. Per-dimension scales decay like a real embedding spectrum and put the
+    # most information in the leading dimensions, as Matryoshka-trained models such as
+    # text-embedding-004 do, so truncation behaves like the model's output_dimensionality.
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(np.arange(1, dimensions + 1))
+
+    cluster_count = max(1, vector_count // 50)
+    centers = rng.normal(size=(cluster_count, dimensions)) * spectrum
+    assignments = rng.integers(0, cluster_count, size=vector_count)
+    corpus = centers[assignments] + 0.6 * rng.normal(size=(vector_count, dimensions)) * spectrum
+
+    query_sources = rng.integers(0, vector_count, size=query_count)
+    queries = corpus[query_sources] + 0.8 * rng.normal(size=(query_count, dimensions)) * spectrum
+    return corpus.astype(np.float32), queries.astype(np.float32)
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries.astype(np.float64) @ corpus.astype(np.float64).T
+    return np.argsort(-scores, axis=1)[:, :top_k]
+
+def recall(found, truth: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found, truth.tolist()))
+    return hits / truth.size
+
+def document_embeddings(document_count: int, chunks_per_document: int, dimensions: int, query_count: int, seed: int = 7):
+    # Chunks grouped into documents, and documents into topics: a document's chunks sit around
+    # the document's own center, which sits near its topic's. Queries are perturbed chunks.
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(np.arange(1, dimensions + 1))
+
+    topic_count = max(1, document_count // 10)
+    topics = rng.normal(size=(topic_count, dimensions)) * spectrum
+    document_centers = topics[rng.integers(0, topic_count, size=document_count)] + 0.5 * rng.normal(size=(document_count, dimensions)) * spectrum
+    documents = np.repeat(np.arange(document_count), chunks_per_document)
+    corpus = document_centers[documents] + 0.6 * rng.normal(size=(len(documents), dimensions)) * spectrum
+
+    query_sources = rng.integers(0, len(corpus), size=query_count)
+    queries = corpus[query_sources] + 0.8 * rng.normal(size=(query_count, dimensions)) * spectrum
+    return corpus.astype(np.float32), documents, queries.astype(np.float32)
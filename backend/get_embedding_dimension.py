@@ -9,16 +9,18 @@ os.environ['GOOGLE_CLOUD_QUOTA_PROJECT'] = project_id
 
 import vertexai
 from vertexai.language_models import TextEmbeddingModel
+from app.services.dimensionality import DEFAULT_EMBEDDING_DIMENSIONS, vector_field_for_dimensions
+from app.services.embedding_service import EMBEDDING_MODEL_NAME
 
 vertexai.init(
     project=project_id,
     location=location
 )
 
-embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-004")
+embedding_model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
 test_result = embedding_model.get_embeddings(["test"])[0]
 dimension = len(test_result.values)
 
-print(f"Embedding dimension for text-embedding-004: {dimension}")
-print(f"\nUse this dimension when creating your Vector Search index: {dimension}")
-
+print(f"Full embedding dimension for {EMBEDDING_MODEL_NAME}: {dimension}")
+print(f"Default dimension for new pipelines (EMBEDDING_DIMENSIONS): {DEFAULT_EMBEDDING_DIMENSIONS}")
+print(f"\nUse this dimension when creating the Vector Search index on '{vector_field_for_dimensions(DEFAULT_EMBEDDING_DIMENSIONS)}': {DEFAULT_EMBEDDING_DIMENSIONS}")
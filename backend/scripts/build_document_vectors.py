@@ -0,0 +1,77 @@
+"""
+Build the document vectors used by VECTOR_SEARCH_MODE=documents from the chunks already stored.
+
+Uploads keep document vectors up to date as they write chunks, so this is only needed once for
+documents uploaded before they existed, and after a re-embedding run cuts over to a new
+collection. Every document vector in the target is rewritten from its chunks. Until a pipeline's
+documents all have one, its searches go over every chunk as before.
+
+Usage:
+    python -m scripts.build_document_vectors                    # the live embedding collection
+    python -m scripts.build_document_vectors --pipeline 7 --pipeline 9
+    python -m scripts.build_document_vectors --collection embeddings_v2
+"""
+
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.services.dimensionality import SUPPORTED_EMBEDDING_DIMENSIONS, vector_field_for_dimensions
+from app.services.document_vectors import build_document_vector, document_vector_collection, document_vector_id
+from app.services.service_factory import shared_firestore_service
+from app.services.vector_quantization import l2_normalize, to_float32
+
+FIRESTORE_BATCH_LIMIT = 500
+CHUNK_FIELDS = ['pipeline_id', 'storage_path', 'file_name', 'document_id', 'embedding_dimensions']
+VECTOR_FIELDS = sorted({vector_field_for_dimensions(dimensions) for dimensions in SUPPORTED_EMBEDDING_DIMENSIONS})
+
+
+def sum_collection(firestore, collection_name: str, pipeline_ids: Optional[List[int]]
+                   ) -> Dict[str, Tuple[np.ndarray, int, Dict[str, Any]]]:
+    queries = [firestore.db.collection(collection_name)]
+    if pipeline_ids:
+        queries = [queries[0].where('pipeline_id', '==', pipeline_id) for pipeline_id in pipeline_ids]
+
+    sums: Dict[str, Tuple[np.ndarray, int, Dict[str, Any]]] = {}
+    for query in queries:
+        for doc in query.select(CHUNK_FIELDS + VECTOR_FIELDS).stream():
+            data = doc.to_dict()
+            vector = data.get(vector_field_for_dimensions(data.get('embedding_dimensions')))
+            storage_path = data.get('storage_path')
+            if vector is None or not storage_path:
+                continue
+            vector = l2_normalize(to_float32(list(vector))).astype(np.float64)
+            if storage_path in sums:
+                total, count, metadata = sums[storage_path]
+                sums[storage_path] = (total + vector, count + 1, metadata)
+            else:
+                sums[storage_path] = (vector, 1, data)
+    return sums
+
+def build_document_vectors(collection_name: Optional[str], pipeline_ids: Optional[List[int]]):
+    firestore = shared_firestore_service()
+    collection_name = collection_name or firestore.collections.default()
+    target = firestore.db.collection(document_vector_collection(collection_name))
+
+    sums = sum_collection(firestore, collection_name, pipeline_ids)
+    print(f"Summed chunks of {len(sums)} documents in {collection_name}")
+
+    batch = firestore.db.batch()
+    batch_count = 0
+    for storage_path, (total, count, metadata) in sums.items():
+        batch.set(target.document(document_vector_id(storage_path)), build_document_vector(total, count, storage_path, metadata))
+        batch_count += 1
+        if batch_count >= FIRESTORE_BATCH_LIMIT:
+            batch.commit()
+            batch = firestore.db.batch()
+            batch_count = 0
+    if batch_count > 0:
+        batch.commit()
+    print(f"Wrote {len(sums)} document vectors to {document_vector_collection(collection_name)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", help="chunk collection to build from (default: the live one)")
+    parser.add_argument("--pipeline", type=int, action="append", dest="pipeline_ids")
+    args = parser.parse_args()
+
+    build_document_vectors(args.collection, args.pipeline_ids)
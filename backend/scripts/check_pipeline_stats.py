@@ -0,0 +1,51 @@
+"""
+Compare Pipeline_Stats with the base tables and rebuild the rows that drifted.
+
+Usage:
+    python -m scripts.check_pipeline_stats            # report drift, exit 1 if any
+    python -m scripts.check_pipeline_stats --fix      # rebuild the drifted rows
+    python -m scripts.check_pipeline_stats --rebuild  # rebuild every row (after the migration)
+"""
+
+import argparse
+import sys
+from app.database import localSession
+from app.crudFunctions import pipelineStatsFunctions
+
+def check_pipeline_stats(fix: bool = False, rebuild: bool = False) -> int:
+    db = localSession()
+    try:
+        if rebuild:
+            pipelineStatsFunctions.rebuild_pipeline_stats(db)
+            print("Rebuilt Pipeline_Stats for every pipeline")
+            return 0
+
+        drift = pipelineStatsFunctions.find_pipeline_stats_drift(db)
+        for entry in drift:
+            state = "missing" if entry['missing'] else "drifted"
+            details = ", ".join(
+                f"{column}: {values['actual']} -> {values['expected']}"
+                for column, values in entry['differences'].items()
+            )
+            print(f"Pipeline {entry['pipeline_id']} {state}: {details}")
+
+        if not drift:
+            print("Pipeline_Stats is consistent")
+            return 0
+
+        if fix:
+            pipelineStatsFunctions.rebuild_pipeline_stats(db, [entry['pipeline_id'] for entry in drift])
+            print(f"Rebuilt Pipeline_Stats for {len(drift)} pipeline(s)")
+            return 0
+
+        print(f"{len(drift)} pipeline(s) drifted; run with --fix to rebuild them")
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fix', action='store_true', help='Rebuild the rows that drifted')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild every row without checking')
+    args = parser.parse_args()
+    sys.exit(check_pipeline_stats(fix=args.fix, rebuild=args.rebuild))
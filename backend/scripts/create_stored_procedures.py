@@ -4,22 +4,21 @@ from app.database import engine
 GET_PIPELINE_STATS = """
 CREATE PROCEDURE IF NOT EXISTS get_pipeline_stats(IN p_pipeline_id INT)
 BEGIN
+    -- Reads the trigger-maintained Pipeline_Stats row instead of aggregating the documents
     SELECT 
         p.pipeline_id, 
         p.pipeline_name, 
-        COUNT(DISTINCT pd.document_id) AS total_documents,
-        SUM(CASE WHEN pd.is_active = TRUE THEN 1 ELSE 0 END) AS active_documents, 
-        SUM(CASE WHEN pd.is_active = FALSE THEN 1 ELSE 0 END) AS inactive_documents, 
-        COALESCE(SUM(dm.word_count), 0) AS total_word_count,
-        COALESCE(AVG(dm.word_count), 0) AS average_word_count,
-        COALESCE(AVG(dm.file_size), 0) AS average_file_size, 
-        MAX(d.upload_date) AS most_recent_upload_date 
-    FROM Pipeline p 
-    JOIN Pipeline_Documents pd ON pd.pipeline_id = p.pipeline_id 
-    JOIN Document_Metadata dm ON dm.document_id = pd.document_id 
-    JOIN Document d ON d.document_id = pd.document_id 
-    WHERE p.pipeline_id = p_pipeline_id 
-    GROUP BY p.pipeline_id, p.pipeline_name;
+        ps.total_documents,
+        ps.active_documents, 
+        ps.inactive_documents, 
+        ps.total_word_count,
+        COALESCE(ps.total_word_count / NULLIF(ps.total_documents, 0), 0) AS average_word_count,
+        COALESCE(ps.total_file_size / NULLIF(ps.total_documents, 0), 0) AS average_file_size, 
+        ps.total_chunks,
+        ps.last_upload_at AS most_recent_upload_date 
+    FROM Pipeline_Stats ps 
+    JOIN Pipeline p ON p.pipeline_id = ps.pipeline_id 
+    WHERE ps.pipeline_id = p_pipeline_id;
 END
 """
 
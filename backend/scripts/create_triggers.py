@@ -1,4 +1,5 @@
 from sqlalchemy.sql import text
+from app.services.dimensionality import DEFAULT_EMBEDDING_DIMENSIONS, validate_dimensions
 
 UPDATE_CONVERSATION_AFTER_MESSAGE = """
     CREATE TRIGGER Update_Conversation_After_Message
@@ -11,13 +12,17 @@ UPDATE_CONVERSATION_AFTER_MESSAGE = """
     END;
 """
 
-CREATE_GENERAL_PIPELINE = """
+# The general pipeline gets the configured EMBEDDING_DIMENSIONS, like pipelines created through the API.
+# The value is fixed when the trigger is created, so it is dropped and recreated on every run.
+DROP_GENERAL_PIPELINE = "DROP TRIGGER IF EXISTS Create_General_Pipeline"
+
+CREATE_GENERAL_PIPELINE = f"""
     CREATE TRIGGER Create_General_Pipeline
     AFTER INSERT ON User
     FOR EACH ROW
     BEGIN
-        INSERT INTO Pipeline (user_id, pipeline_name, description, created_at) 
-        VALUES (New.user_id, 'general', 'general pipeline for chatbot', New.created_at);
+        INSERT INTO Pipeline (user_id, pipeline_name, description, created_at, embedding_dimensions) 
+        VALUES (New.user_id, 'general', 'general pipeline for chatbot', New.created_at, {validate_dimensions(DEFAULT_EMBEDDING_DIMENSIONS)});
     END;
 """
 
@@ -31,13 +36,173 @@ ADD_DOCUMENT_TO_GENERAL_PIPELINE = """
     END
 """
 
+## PIPELINE STATS
+# Pipeline_Stats is maintained incrementally. Foreign key cascades don't fire triggers in
+# MySQL, so deleting a Document is handled before the delete, while its Pipeline_Documents,
+# Document_Metadata and Document_Chunk rows can still be read. Deleting a Pipeline removes its
+# Pipeline_Stats row through the cascade.
+
+CREATE_PIPELINE_STATS_ROW = """
+    CREATE TRIGGER Create_Pipeline_Stats_Row
+    AFTER INSERT ON Pipeline
+    FOR EACH ROW
+    BEGIN
+        INSERT IGNORE INTO Pipeline_Stats (pipeline_id) VALUES (NEW.pipeline_id);
+    END;
+"""
+
+STATS_AFTER_PIPELINE_DOCUMENT_INSERT = """
+    CREATE TRIGGER Stats_After_Pipeline_Document_Insert
+    AFTER INSERT ON Pipeline_Documents
+    FOR EACH ROW
+    BEGIN
+        INSERT IGNORE INTO Pipeline_Stats (pipeline_id) VALUES (NEW.pipeline_id);
+
+        UPDATE Pipeline_Stats ps
+        JOIN Document d ON d.document_id = NEW.document_id
+        SET ps.total_documents = ps.total_documents + 1,
+            ps.active_documents = ps.active_documents + IF(NEW.is_active, 1, 0),
+            ps.inactive_documents = ps.inactive_documents + IF(NEW.is_active, 0, 1),
+            ps.total_word_count = ps.total_word_count + COALESCE(
+                (SELECT dm.word_count FROM Document_Metadata dm WHERE dm.document_id = NEW.document_id), 0),
+            ps.total_file_size = ps.total_file_size + COALESCE(
+                (SELECT dm.file_size FROM Document_Metadata dm WHERE dm.document_id = NEW.document_id), 0),
+            ps.total_chunks = ps.total_chunks + (
+                SELECT COUNT(*) FROM Document_Chunk dc WHERE dc.document_id = NEW.document_id),
+            ps.last_upload_at = GREATEST(COALESCE(ps.last_upload_at, d.upload_date), d.upload_date)
+        WHERE ps.pipeline_id = NEW.pipeline_id;
+    END;
+"""
+
+STATS_AFTER_PIPELINE_DOCUMENT_UPDATE = """
+    CREATE TRIGGER Stats_After_Pipeline_Document_Update
+    AFTER UPDATE ON Pipeline_Documents
+    FOR EACH ROW
+    BEGIN
+        IF IF(NEW.is_active, 1, 0) <> IF(OLD.is_active, 1, 0) THEN
+            UPDATE Pipeline_Stats
+            SET active_documents = active_documents + IF(NEW.is_active, 1, -1),
+                inactive_documents = inactive_documents + IF(NEW.is_active, -1, 1)
+            WHERE pipeline_id = NEW.pipeline_id;
+        END IF;
+    END;
+"""
+
+STATS_AFTER_PIPELINE_DOCUMENT_DELETE = """
+    CREATE TRIGGER Stats_After_Pipeline_Document_Delete
+    AFTER DELETE ON Pipeline_Documents
+    FOR EACH ROW
+    BEGIN
+        UPDATE Pipeline_Stats
+        SET total_documents = total_documents - 1,
+            active_documents = active_documents - IF(OLD.is_active, 1, 0),
+            inactive_documents = inactive_documents - IF(OLD.is_active, 0, 1),
+            total_word_count = total_word_count - COALESCE(
+                (SELECT dm.word_count FROM Document_Metadata dm WHERE dm.document_id = OLD.document_id), 0),
+            total_file_size = total_file_size - COALESCE(
+                (SELECT dm.file_size FROM Document_Metadata dm WHERE dm.document_id = OLD.document_id), 0),
+            total_chunks = total_chunks - (
+                SELECT COUNT(*) FROM Document_Chunk dc WHERE dc.document_id = OLD.document_id),
+            last_upload_at = (
+                SELECT MAX(d.upload_date)
+                FROM Pipeline_Documents pd
+                JOIN Document d ON d.document_id = pd.document_id
+                WHERE pd.pipeline_id = OLD.pipeline_id)
+        WHERE pipeline_id = OLD.pipeline_id;
+    END;
+"""
+
+STATS_BEFORE_DOCUMENT_DELETE = """
+    CREATE TRIGGER Stats_Before_Document_Delete
+    BEFORE DELETE ON Document
+    FOR EACH ROW
+    BEGIN
+        UPDATE Pipeline_Stats ps
+        JOIN Pipeline_Documents pd ON pd.pipeline_id = ps.pipeline_id AND pd.document_id = OLD.document_id
+        SET ps.total_documents = ps.total_documents - 1,
+            ps.active_documents = ps.active_documents - IF(pd.is_active, 1, 0),
+            ps.inactive_documents = ps.inactive_documents - IF(pd.is_active, 0, 1),
+            ps.total_word_count = ps.total_word_count - COALESCE(
+                (SELECT dm.word_count FROM Document_Metadata dm WHERE dm.document_id = OLD.document_id), 0),
+            ps.total_file_size = ps.total_file_size - COALESCE(
+                (SELECT dm.file_size FROM Document_Metadata dm WHERE dm.document_id = OLD.document_id), 0),
+            ps.total_chunks = ps.total_chunks - (
+                SELECT COUNT(*) FROM Document_Chunk dc WHERE dc.document_id = OLD.document_id),
+            ps.last_upload_at = (
+                SELECT MAX(d.upload_date)
+                FROM Pipeline_Documents other
+                JOIN Document d ON d.document_id = other.document_id
+                WHERE other.pipeline_id = ps.pipeline_id AND other.document_id <> OLD.document_id);
+    END;
+"""
+
+STATS_AFTER_DOCUMENT_METADATA_INSERT = """
+    CREATE TRIGGER Stats_After_Document_Metadata_Insert
+    AFTER INSERT ON Document_Metadata
+    FOR EACH ROW
+    BEGIN
+        UPDATE Pipeline_Stats ps
+        JOIN Pipeline_Documents pd ON pd.pipeline_id = ps.pipeline_id
+        SET ps.total_word_count = ps.total_word_count + COALESCE(NEW.word_count, 0),
+            ps.total_file_size = ps.total_file_size + COALESCE(NEW.file_size, 0)
+        WHERE pd.document_id = NEW.document_id;
+    END;
+"""
+
+STATS_AFTER_DOCUMENT_METADATA_UPDATE = """
+    CREATE TRIGGER Stats_After_Document_Metadata_Update
+    AFTER UPDATE ON Document_Metadata
+    FOR EACH ROW
+    BEGIN
+        UPDATE Pipeline_Stats ps
+        JOIN Pipeline_Documents pd ON pd.pipeline_id = ps.pipeline_id
+        SET ps.total_word_count = ps.total_word_count + COALESCE(NEW.word_count, 0) - COALESCE(OLD.word_count, 0),
+            ps.total_file_size = ps.total_file_size + COALESCE(NEW.file_size, 0) - COALESCE(OLD.file_size, 0)
+        WHERE pd.document_id = NEW.document_id;
+    END;
+"""
+
+STATS_AFTER_DOCUMENT_CHUNK_INSERT = """
+    CREATE TRIGGER Stats_After_Document_Chunk_Insert
+    AFTER INSERT ON Document_Chunk
+    FOR EACH ROW
+    BEGIN
+        UPDATE Pipeline_Stats ps
+        JOIN Pipeline_Documents pd ON pd.pipeline_id = ps.pipeline_id
+        SET ps.total_chunks = ps.total_chunks + 1
+        WHERE pd.document_id = NEW.document_id;
+    END;
+"""
+
+STATS_AFTER_DOCUMENT_CHUNK_DELETE = """
+    CREATE TRIGGER Stats_After_Document_Chunk_Delete
+    AFTER DELETE ON Document_Chunk
+    FOR EACH ROW
+    BEGIN
+        UPDATE Pipeline_Stats ps
+        JOIN Pipeline_Documents pd ON pd.pipeline_id = ps.pipeline_id
+        SET ps.total_chunks = ps.total_chunks - 1
+        WHERE pd.document_id = OLD.document_id;
+    END;
+"""
+
 def create_triggers(engine):
     """Create all triggers using raw SQL and no ORM"""
     with engine.connect() as conn:
         triggers = [
             UPDATE_CONVERSATION_AFTER_MESSAGE,
+            DROP_GENERAL_PIPELINE,
             CREATE_GENERAL_PIPELINE,
-            ADD_DOCUMENT_TO_GENERAL_PIPELINE
+            ADD_DOCUMENT_TO_GENERAL_PIPELINE,
+            CREATE_PIPELINE_STATS_ROW,
+            STATS_AFTER_PIPELINE_DOCUMENT_INSERT,
+            STATS_AFTER_PIPELINE_DOCUMENT_UPDATE,
+            STATS_AFTER_PIPELINE_DOCUMENT_DELETE,
+            STATS_BEFORE_DOCUMENT_DELETE,
+            STATS_AFTER_DOCUMENT_METADATA_INSERT,
+            STATS_AFTER_DOCUMENT_METADATA_UPDATE,
+            STATS_AFTER_DOCUMENT_CHUNK_INSERT,
+            STATS_AFTER_DOCUMENT_CHUNK_DELETE
         ]
         
         for trigger in triggers:
@@ -45,4 +210,8 @@ def create_triggers(engine):
                 conn.execute(text(trigger))
                 conn.commit()
             except Exception as e:
-                print(f"Trigger error (may already exist): {e}")
\ No newline at end of file
+                print(f"Trigger error (may already exist): {e}")
+
+if __name__ == "__main__":
+    from app.database import engine
+    create_triggers(engine)
@@ -0,0 +1,43 @@
+"""
+Fit the PCA projection used when the embedding model cannot return reduced-size vectors itself.
+The projection is fitted on the full-size vectors of one embeddings collection (the live one by
+default), so --model must be the model that collection was embedded with. It is stored in the
+storage bucket under that model's name, where every worker loads it from.
+Usage: python -m scripts.fit_embedding_projection --dimensions 256 [--model NAME] [--collection NAME] [--sample 5000]
+"""
+
+import argparse
+import numpy as np
+from app.services.service_factory import shared_firestore_service, shared_storage_service
+from app.services.embedding_service import EMBEDDING_MODEL_NAME
+from app.services.dimensionality import FULL_EMBEDDING_DIMENSIONS, PCAProjection, validate_dimensions
+
+def fit_embedding_projection(dimensions: int, sample_size: int, model_name: str = None, collection: str = None):
+    service = shared_firestore_service()
+    collection = collection or service.collections.default()
+    # A collection a re-embedding run cut over to records its model in the pointer
+    settings = (service.collections.pointer().get('settings') or {}).get(collection) or {}
+    model_name = model_name or settings.get('model') or EMBEDDING_MODEL_NAME
+
+    docs = service.db.collection(collection).select(['embedding']).limit(sample_size).stream()
+    vectors = [(doc.to_dict() or {}).get('embedding') for doc in docs]
+    vectors = [np.asarray(list(vector), dtype=np.float32) for vector in vectors if vector is not None]
+    vectors = [vector for vector in vectors if len(vector) == FULL_EMBEDDING_DIMENSIONS]
+    print(f"Sampled {len(vectors)} full-size {model_name} embeddings from {collection}")
+
+    projection = PCAProjection.fit(np.stack(vectors), dimensions)
+    path = projection.save(shared_storage_service().bucket, model_name)
+
+    full = np.stack(vectors) - projection.mean
+    retained = np.square(full @ projection.components.T).sum() / np.square(full).sum()
+    print(f"Saved {FULL_EMBEDDING_DIMENSIONS} -> {dimensions} projection to {path} ({retained:.1%} of variance retained)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dimensions", type=int, required=True)
+    parser.add_argument("--model", help="model the sampled vectors came from (default: the collection's)")
+    parser.add_argument("--collection", help="embeddings collection to sample (default: the live one)")
+    parser.add_argument("--sample", type=int, default=5000)
+    args = parser.parse_args()
+
+    fit_embedding_projection(validate_dimensions(args.dimensions), args.sample, args.model, args.collection)
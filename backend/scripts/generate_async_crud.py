@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Generate app/asyncCrudFunctions from app/crudFunctions.
+
+Every CRUD function becomes an `async def` with the same name and parameters, taking an
+AsyncSession instead of a Session; db.execute/commit/rollback and calls to other CRUD
+functions are awaited. Edits are applied at the exact AST positions in the original source,
+so formatting, comments and SQL are preserved line for line and a diff against the sync
+module only shows the async keywords.
+
+Run after changing any module in app/crudFunctions:
+    python scripts/generate_async_crud.py
+CI / pre-commit check that the async modules are up to date:
+    python scripts/generate_async_crud.py --check
+"""
+
+import argparse
+import ast
+import os
+import sys
+from typing import Dict, List, Set, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIR = os.path.join(BACKEND_DIR, 'app', 'crudFunctions')
+TARGET_DIR = os.path.join(BACKEND_DIR, 'app', 'asyncCrudFunctions')
+
+SESSION_METHODS = {'execute', 'commit', 'rollback'}
+
+HEADER = (
+    "### GENERATED by scripts/generate_async_crud.py from app/crudFunctions/{name} - do not edit by hand.\n"
+    "# Async counterparts of the synchronous CRUD functions: same names and parameters, awaited.\n"
+)
+
+INIT_SOURCE = (
+    "### GENERATED by scripts/generate_async_crud.py - do not edit by hand.\n"
+    "# Async versions of app/crudFunctions for routes that use app.async_database.get_async_db.\n"
+)
+
+
+def _module_names() -> List[str]:
+    return sorted(
+        name for name in os.listdir(SOURCE_DIR)
+        if name.endswith('.py') and name != '__init__.py'
+    )
+
+def _crud_function_names(sources: Dict[str, str]) -> Set[str]:
+    names = set()
+    for source in sources.values():
+        for node in ast.parse(source).body:
+            if isinstance(node, ast.FunctionDef) and node.args.args and node.args.args[0].arg == 'db':
+                names.add(node.name)
+    return names
+
+def convert(source: str, crud_functions: Set[str]) -> str:
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+    # (position, text to insert); positions are character offsets into source
+    insertions: List[Tuple[int, str]] = []
+
+    def offset(lineno: int, col_offset: int) -> int:
+        # ast column offsets count UTF-8 bytes, not characters
+        return line_starts[lineno - 1] + len(lines[lineno - 1].encode('utf-8')[:col_offset].decode('utf-8'))
+
+    def position(node: ast.AST) -> int:
+        return offset(node.lineno, node.col_offset)
+
+    # Calls used as the base of an attribute or subscript, e.g. db.execute(...).mappings(),
+    # need parentheses so the await applies to the call rather than the whole chain
+    chained = {
+        id(parent.value) for parent in ast.walk(tree)
+        if isinstance(parent, (ast.Attribute, ast.Subscript))
+    }
+
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.args.args and node.args.args[0].arg == 'db':
+            insertions.append((position(node), 'async '))
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        session_call = (
+            isinstance(func, ast.Attribute)
+            and func.attr in SESSION_METHODS
+            and isinstance(func.value, ast.Name)
+            and func.value.id == 'db'
+        )
+        crud_call = isinstance(func, ast.Name) and func.id in crud_functions
+        if session_call or crud_call:
+            if id(node) in chained:
+                insertions.append((position(node), '(await '))
+                insertions.append((offset(node.end_lineno, node.end_col_offset), ')'))
+            else:
+                insertions.append((position(node), 'await '))
+
+    converted = source
+    for at, text in sorted(insertions, reverse=True):
+        converted = converted[:at] + text + converted[at:]
+
+    converted = converted.replace(
+        "from sqlalchemy.orm import Session\n",
+        "from sqlalchemy.ext.asyncio import AsyncSession as Session\n"
+    )
+    return converted
+
+def generate() -> Dict[str, str]:
+    sources = {}
+    for name in _module_names():
+        with open(os.path.join(SOURCE_DIR, name)) as file:
+            sources[name] = file.read()
+
+    crud_functions = _crud_function_names(sources)
+    outputs = {'__init__.py': INIT_SOURCE}
+    for name, source in sources.items():
+        outputs[name] = HEADER.format(name=name) + convert(source, crud_functions)
+    return outputs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='Exit 1 if the generated modules are out of date')
+    args = parser.parse_args()
+
+    outputs = generate()
+    stale = []
+    for name, content in outputs.items():
+        path = os.path.join(TARGET_DIR, name)
+        current = open(path).read() if os.path.exists(path) else None
+        if current != content:
+            stale.append(name)
+            if not args.check:
+                os.makedirs(TARGET_DIR, exist_ok=True)
+                with open(path, 'w') as file:
+                    file.write(content)
+
+    if args.check:
+        if stale:
+            print(f"app/asyncCrudFunctions is out of date: {', '.join(stale)}. Run scripts/generate_async_crud.py")
+            sys.exit(1)
+        print("app/asyncCrudFunctions is up to date")
+    else:
+        print(f"Wrote {len(stale)} module(s) to {os.path.relpath(TARGET_DIR, BACKEND_DIR)}")
@@ -0,0 +1,423 @@
+"""
+Re-embed stored chunks into a shadow Firestore collection, then switch retrieval over to it.
+
+Run after changing EMBEDDING_MODEL_NAME, or with --dimensions to change pipelines' embedding size.
+Chunks are read from Document_Chunk in chunk_id order, a page at a time. Only chunks that are
+searchable today are re-embedded: each keeps its Firestore id and metadata and gets a new
+vector. Progress is checkpointed in Firestore (embedding_migrations/<run id>) after every page,
+so running the same command again resumes where it stopped. Once every page is done, the
+embedding collection pointer is switched in one write (app/services/embedding_collections.py).
+Once every worker has picked up the switch, chunks uploaded during the run are swept up. The old
+collection is left in place for rollback.
+
+Usage:
+    python -m scripts.reembed_corpus --run-id v2                  # everything, then cut over
+    python -m scripts.reembed_corpus --run-id v2 --user 12        # only these users' pipelines
+    python -m scripts.reembed_corpus --run-id v2 --pipeline 7 --pipeline 9
+    python -m scripts.reembed_corpus --run-id v2 --dimensions 256 # also switch to 256-d vectors
+    python -m scripts.reembed_corpus --run-id v2 --no-cutover     # fill the shadow collection only
+    python -m scripts.reembed_corpus --run-id v2 --status
+    python -m scripts.reembed_corpus --run-id v2 --abandon        # delete the shadow collection
+    python -m scripts.reembed_corpus --run-id v2 --restart        # start an abandoned run over
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.database import localSession
+from app.crudFunctions import documentFunctions, pipelineFunctions
+from app.services.dimensionality import FULL_EMBEDDING_DIMENSIONS, validate_dimensions
+from app.services.embedding_collections import DEFAULT_EMBEDDINGS_COLLECTION, EMBEDDING_COLLECTION_REFRESH_SECONDS
+from app.services.firestore_service import build_embedding_document
+from app.services.service_factory import is_local, shared_embedding_service, shared_firestore_service
+
+MIGRATIONS_COLLECTION = 'embedding_migrations'
+FIRESTORE_BATCH_LIMIT = 500
+EMBEDDING_ATTEMPTS = 5
+INDEX_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'firestore_index_config.json')
+# How long cutover waits for the shadow collection's vector indexes to finish building
+INDEX_BUILD_TIMEOUT_SECONDS = 1800
+# Workers keep the old collection pointer for up to EMBEDDING_COLLECTION_REFRESH_SECONDS after the
+# switch, and an upload that read it just before can still be embedding; the sweep waits them out
+SWEEP_MARGIN_SECONDS = 30
+
+
+class RateLimiter:
+    # Spaces embedding requests evenly so the run stays under the project's quota
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def resolve_collection(pointer: Dict[str, Any], pipeline_id: Optional[int]) -> str:
+    override = (pointer.get('pipelines') or {}).get(str(int(pipeline_id))) if pipeline_id is not None else None
+    return override or pointer.get('collection') or DEFAULT_EMBEDDINGS_COLLECTION
+
+def is_vector_field(field: str) -> bool:
+    return field.startswith('embedding') or field == 'vector_distance'
+
+def vector_indexes_for(collection_name: str) -> List[Dict[str, Any]]:
+    # Firestore indexes belong to one collection id, so a shadow collection needs its own copy of
+    # the live collection's composite vector indexes before find_nearest can run on it
+    with open(INDEX_CONFIG_PATH) as file:
+        config = json.load(file)
+    return [
+        dict(index, collectionGroup=collection_name)
+        for index in config['indexes']
+        if index['collectionGroup'] == DEFAULT_EMBEDDINGS_COLLECTION and any('vectorConfig' in field for field in index['fields'])
+    ]
+
+def index_signature(fields) -> Tuple:
+    # The same tuple for a firestore_index_config.json entry and an index listed by the admin API
+    signature = []
+    for field in fields:
+        if isinstance(field, dict):
+            vector = field.get('vectorConfig')
+            signature.append((field['fieldPath'], f"vector:{vector['dimension']}" if vector else field.get('order')))
+        elif field.field_path != '__name__':
+            vector = field.vector_config.dimension if 'vector_config' in field else None
+            signature.append((field.field_path, f"vector:{vector}" if vector else field.order.name))
+    return tuple(signature)
+
+
+class CorpusReembedder:
+
+    def __init__(self, run_id: str, user_ids: Optional[List[int]], pipeline_ids: Optional[List[int]],
+                 dimensions: Optional[int], page_size: int, concurrency: int, requests_per_minute: float):
+        self.run_id = run_id
+        self.user_ids = user_ids
+        self.dimensions = dimensions
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(requests_per_minute)
+        self.db = localSession()
+        self.firestore = shared_firestore_service()
+        self.embedding_service = shared_embedding_service()
+        self.checkpoint_ref = self.firestore.db.collection(MIGRATIONS_COLLECTION).document(run_id)
+
+        self.requested_pipeline_ids = pipeline_ids
+        if user_ids is not None and pipeline_ids is None:
+            pipeline_ids = sorted({
+                pipeline['pipeline_id']
+                for user_id in user_ids
+                for pipeline in pipelineFunctions.get_pipelines_by_user_id(self.db, user_id)
+            })
+        self.pipeline_ids = pipeline_ids
+        self.checkpoint: Dict[str, Any] = {}
+
+    ## CHECKPOINT
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        snapshot = self.checkpoint_ref.get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def save_checkpoint(self, **fields):
+        self.checkpoint.update(fields, updated_at=datetime.now(timezone.utc).isoformat())
+        self.checkpoint_ref.set(self.checkpoint)
+
+    def start(self, restart: bool = False):
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None and checkpoint.get('status') == 'abandoned' and not restart:
+            # Its shadow collection was deleted, so resuming from the old cursor would cut over to a partial copy
+            raise ValueError(f"Run {self.run_id} was abandoned; pass --restart to start it over from the first chunk")
+        if checkpoint is not None and not restart:
+            scope = (checkpoint.get('user_ids'), checkpoint.get('requested_pipeline_ids'), checkpoint.get('dimensions'))
+            if scope != (self.user_ids, self.requested_pipeline_ids, self.dimensions):
+                raise ValueError(f"Run {self.run_id} was started with users={scope[0]} pipelines={scope[1]} "
+                                 f"dimensions={scope[2]}; resume it with the same options")
+            # A user's pipelines are resolved once, when the run starts
+            self.pipeline_ids = checkpoint.get('pipeline_ids')
+            self.checkpoint = checkpoint
+            print(f"Resuming run {self.run_id} after chunk {checkpoint['after_chunk_id']} ({checkpoint['embedded']} embedded)")
+            return
+
+        pointer = self.firestore.collections.pointer()
+        migration = pointer.get('migration') or {}
+        shadow = f"embeddings_{self.run_id}"
+        if migration.get('collection') and migration['collection'] != shadow:
+            raise ValueError(f"Another re-embedding run is writing to {migration['collection']}; finish or abandon it first")
+        if shadow in {resolve_collection(pointer, None), *(pointer.get('pipelines') or {}).values()}:
+            raise ValueError(f"{shadow} is already live; pick a new run id")
+
+        self.firestore.collections.begin_migration(shadow, self.pipeline_ids)
+        # Started now so they build while the corpus is re-embedded
+        self.ensure_vector_indexes(shadow, wait=False)
+        self.save_checkpoint(
+            status='running',
+            shadow_collection=shadow,
+            source_pointer={'collection': pointer.get('collection'), 'pipelines': pointer.get('pipelines') or {}},
+            user_ids=self.user_ids,
+            requested_pipeline_ids=self.requested_pipeline_ids,
+            pipeline_ids=self.pipeline_ids,
+            dimensions=self.dimensions,
+            model=self.embedding_service.model_name,
+            after_chunk_id=0,
+            embedded=0,
+            skipped=0,
+            started_at=datetime.now(timezone.utc).isoformat(),
+        )
+        print(f"Started run {self.run_id}: writing to {shadow}")
+
+    ## ONE PAGE
+    def source_documents(self, storage_path: str) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+        # The live Firestore documents of one file, by chunk_index, as they were when the run started
+        pointer = self.checkpoint['source_pointer']
+        documents = {}
+        for collection_name in {resolve_collection(pointer, None), *pointer['pipelines'].values()}:
+            query = self.firestore.db.collection(collection_name).where('storage_path', '==', storage_path)
+            for doc in query.stream():
+                data = doc.to_dict()
+                pipeline_id = data.get('pipeline_id')
+                if resolve_collection(pointer, pipeline_id) != collection_name:
+                    continue
+                if self.pipeline_ids is not None and (pipeline_id is None or int(pipeline_id) not in self.pipeline_ids):
+                    continue
+                documents[data.get('chunk_index')] = (doc.id, data)
+        return documents
+
+    def embed(self, texts: List[str], dimensions: int) -> List:
+        for attempt in range(EMBEDDING_ATTEMPTS):
+            self.limiter.acquire()
+            try:
+                return self.embedding_service.generate_embeddings(texts, output_dimensionality=dimensions)
+            except Exception as e:
+                if attempt == EMBEDDING_ATTEMPTS - 1:
+                    raise
+                delay = 2 ** attempt
+                print(f"  Embedding batch failed ({e}); retrying in {delay}s", file=sys.stderr)
+                time.sleep(delay)
+
+    def process_page(self, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+        documents_by_path: Dict[str, Dict[int, Tuple[str, Dict[str, Any]]]] = {}
+        work = []
+        for row in rows:
+            storage_path = row['firebase_storage_path']
+            if not storage_path:
+                continue
+            if storage_path not in documents_by_path:
+                documents_by_path[storage_path] = self.source_documents(storage_path)
+            match = documents_by_path[storage_path].get(row['chunk_index'])
+            if match is not None:
+                work.append((row, *match))
+        skipped = len(rows) - len(work)
+
+        # Batches share a size so the embedding requests stay full
+        by_dimensions: Dict[int, List] = {}
+        for item in work:
+            dimensions = self.dimensions or item[2].get('embedding_dimensions') or FULL_EMBEDDING_DIMENSIONS
+            by_dimensions.setdefault(int(dimensions), []).append(item)
+
+        jobs = []
+        batch_size = self.embedding_service.batch_size
+        for dimensions, items in by_dimensions.items():
+            for start in range(0, len(items), batch_size):
+                jobs.append((dimensions, items[start:start + batch_size]))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            embedded = list(executor.map(lambda job: (job[1], self.embed([row['chunk_text'] for row, _, _ in job[1]], job[0])), jobs))
+
+        shadow = self.firestore.db.collection(self.checkpoint['shadow_collection'])
+        batch = self.firestore.db.batch()
+        batch_count = 0
+        for items, embeddings in embedded:
+            for (row, chunk_id, data), embedding in zip(items, embeddings):
+                metadata = {field: value for field, value in data.items() if not is_vector_field(field) and field != 'text'}
+                batch.set(shadow.document(chunk_id), build_embedding_document(embedding, row['chunk_text'], metadata))
+                batch_count += 1
+                if batch_count >= FIRESTORE_BATCH_LIMIT:
+                    batch.commit()
+                    batch = self.firestore.db.batch()
+                    batch_count = 0
+        if batch_count > 0:
+            batch.commit()
+
+        return len(work), skipped
+
+    ## THE WALK
+    def walk(self, label: str):
+        remaining = documentFunctions.count_chunks(self.db, self.checkpoint['after_chunk_id'], self.user_ids, self.pipeline_ids)
+        print(f"{label}: {remaining} chunks to go")
+        started = time.monotonic()
+        done = 0
+        while True:
+            rows = documentFunctions.get_chunks_page(
+                self.db, self.page_size, self.checkpoint['after_chunk_id'], self.user_ids, self.pipeline_ids
+            )
+            if not rows:
+                break
+
+            embedded, skipped = self.process_page(rows)
+            # Only after the page is durably in the shadow collection
+            self.save_checkpoint(
+                after_chunk_id=rows[-1]['chunk_id'],
+                embedded=self.checkpoint['embedded'] + embedded,
+                skipped=self.checkpoint['skipped'] + skipped,
+            )
+
+            done += len(rows)
+            rate = done / max(time.monotonic() - started, 1e-9)
+            left = max(remaining - done, 0)
+            print(f"  chunk {rows[-1]['chunk_id']}: {done}/{remaining} ({embedded} embedded, {skipped} skipped), "
+                  f"{rate:.1f} chunks/s, ETA {time.strftime('%H:%M:%S', time.gmtime(left / rate if rate else 0))}")
+
+    ## VECTOR INDEXES
+    def ensure_vector_indexes(self, collection_name: str, wait: bool):
+        # Creates whatever vector indexes the collection is missing; with wait, returns once all are READY
+        if is_local('firestore'):
+            return
+        from google.cloud import firestore_admin_v1
+        from google.cloud.firestore_admin_v1.types import Index
+
+        admin = firestore_admin_v1.FirestoreAdminClient()
+        database = getattr(self.firestore.db, '_database', None) or '(default)'
+        parent = f"projects/{self.firestore.db.project}/databases/{database}/collectionGroups/{collection_name}"
+        wanted = {index_signature(index['fields']): index for index in vector_indexes_for(collection_name)}
+        deadline = time.monotonic() + INDEX_BUILD_TIMEOUT_SECONDS
+        created = False
+        while True:
+            states = {index_signature(index.fields): index.state.name for index in admin.list_indexes(parent=parent)}
+            if not created:
+                for signature, index in wanted.items():
+                    if signature in states:
+                        continue
+                    fields = [
+                        Index.IndexField(field_path=field['fieldPath'], vector_config=Index.IndexField.VectorConfig(
+                            dimension=field['vectorConfig']['dimension'], flat=Index.IndexField.VectorConfig.FlatIndex()))
+                        if 'vectorConfig' in field else
+                        Index.IndexField(field_path=field['fieldPath'], order=Index.IndexField.Order[field['order']])
+                        for field in index['fields']
+                    ]
+                    admin.create_index(parent=parent, index=Index(query_scope=Index.QueryScope.COLLECTION, fields=fields))
+                    print(f"Creating vector index {signature} on {collection_name}")
+                created = True
+                continue
+
+            building = [signature for signature in wanted if states.get(signature) != 'READY']
+            if not building or not wait:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Vector indexes on {collection_name} still building after {INDEX_BUILD_TIMEOUT_SECONDS}s: "
+                                   f"{building}; rerun the same command to resume the cutover")
+            print(f"Waiting for {len(building)} vector index(es) on {collection_name} to finish building")
+            time.sleep(30)
+
+    def cut_over(self):
+        shadow = self.checkpoint['shadow_collection']
+        # Without them find_nearest fails on the new collection and chat would run with no context
+        self.ensure_vector_indexes(shadow, wait=True)
+        # One write switches the collection together with the model and dimensions queries and
+        # uploads use for it, so no worker pairs the new collection with the old settings
+        self.firestore.collections.cut_over(shadow, self.pipeline_ids, self.checkpoint.get('model'), self.dimensions)
+        print(f"Retrieval now reads {shadow}" + (f" for pipelines {self.pipeline_ids}" if self.pipeline_ids is not None else ""))
+
+    def update_pipeline_dimensions(self):
+        # Only once every worker reads the new pointer, which already overrides the Pipeline rows;
+        # until then the old collection is still queried at the old size
+        if self.dimensions is not None:
+            changed = pipelineFunctions.update_pipeline_embedding_dimensions(self.db, self.pipeline_ids, self.dimensions)
+            print(f"Set {changed} pipeline(s) to {self.dimensions}-dimension embeddings")
+
+    def run(self, cutover: bool, restart: bool = False) -> int:
+        self.start(restart)
+        if self.checkpoint['status'] == 'cut_over':
+            print(f"Run {self.run_id} already cut over to {self.checkpoint['shadow_collection']}")
+            return 0
+
+        self.walk("Re-embedding")
+        if not cutover:
+            print(f"Shadow collection {self.checkpoint['shadow_collection']} is up to date; rerun without --no-cutover to switch")
+            return 0
+
+        self.cut_over()
+        # Chunks uploaded between the last page and the moment every worker sees the switch went
+        # to the old collection
+        settle = EMBEDDING_COLLECTION_REFRESH_SECONDS + SWEEP_MARGIN_SECONDS
+        print(f"Waiting {settle:.0f}s for workers to pick up the new collection")
+        time.sleep(settle)
+        self.update_pipeline_dimensions()
+        self.walk("Sweeping chunks uploaded during the run")
+        self.save_checkpoint(status='cut_over', finished_at=datetime.now(timezone.utc).isoformat())
+        print(f"Done: {self.checkpoint['embedded']} chunks re-embedded, {self.checkpoint['skipped']} skipped (not searchable)")
+        return 0
+
+    def abandon(self) -> int:
+        checkpoint = self.load_checkpoint()
+        if checkpoint is None:
+            print(f"No run {self.run_id}")
+            return 1
+        if checkpoint['status'] == 'cut_over':
+            print(f"Run {self.run_id} is already live; cut over to another collection instead")
+            return 1
+
+        self.firestore.collections.abandon_migration()
+        collection = self.firestore.db.collection(checkpoint['shadow_collection'])
+        deleted = 0
+        while True:
+            docs = list(collection.limit(FIRESTORE_BATCH_LIMIT).stream())
+            if not docs:
+                break
+            batch = self.firestore.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            deleted += len(docs)
+        self.checkpoint = checkpoint
+        self.save_checkpoint(status='abandoned')
+        print(f"Abandoned run {self.run_id} and deleted {deleted} documents from {checkpoint['shadow_collection']}")
+        return 0
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--run-id', required=True, help='Names the shadow collection and the checkpoint')
+    parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only this user (repeatable)')
+    parser.add_argument('--pipeline', type=int, action='append', dest='pipeline_ids', help='Only this pipeline (repeatable)')
+    parser.add_argument('--dimensions', type=int, help='Re-embed at this size and switch the pipelines to it')
+    parser.add_argument('--page-size', type=int, default=500, help='Chunks read from MySQL per page')
+    parser.add_argument('--concurrency', type=int, default=4, help='Embedding requests in flight')
+    parser.add_argument('--requests-per-minute', type=float, default=300, help='Embedding request rate limit (0 for none)')
+    parser.add_argument('--no-cutover', action='store_true', help='Fill the shadow collection without switching to it')
+    parser.add_argument('--status', action='store_true', help='Print the checkpoint and exit')
+    parser.add_argument('--abandon', action='store_true', help='Delete the shadow collection of an unfinished run')
+    parser.add_argument('--restart', action='store_true', help='Start the run over from the first chunk, e.g. after --abandon')
+    args = parser.parse_args()
+
+    if not re.fullmatch(r'[a-z0-9_-]+', args.run_id):
+        parser.error("--run-id may only contain lowercase letters, digits, '-' and '_'")
+
+    reembedder = CorpusReembedder(
+        args.run_id,
+        sorted(args.user_ids) if args.user_ids else None,
+        sorted(args.pipeline_ids) if args.pipeline_ids else None,
+        validate_dimensions(args.dimensions) if args.dimensions else None,
+        args.page_size,
+        max(1, args.concurrency),
+        args.requests_per_minute,
+    )
+    try:
+        if args.status:
+            checkpoint = reembedder.load_checkpoint()
+            print(checkpoint if checkpoint is not None else f"No run {args.run_id}")
+            sys.exit(0 if checkpoint is not None else 1)
+        sys.exit(reembedder.abandon() if args.abandon else reembedder.run(cutover=not args.no_cutover, restart=args.restart))
+    finally:
+        reembedder.close()
@@ -0,0 +1,18 @@
+from sqlalchemy import text
+from app.database import engine
+from app.schemas import ALL_MIGRATIONS
+
+def run_all_migrations():
+    with engine.connect() as connection:
+        for i, (migration_name, migration_sql) in enumerate(ALL_MIGRATIONS, 1):
+            try:
+                print(f"[{i}/{len(ALL_MIGRATIONS)}] Running migration: {migration_name}")
+                connection.execute(text(migration_sql))
+                connection.commit()
+                print(f"Migration {migration_name} applied successfully")
+            except Exception as e:
+                print(f"Migration {migration_name} skipped (may already be applied): {e}")
+                connection.rollback()
+
+if __name__ == "__main__":
+    run_all_migrations()
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+from app.services.api_scheduler import BACKGROUND, RateLimitedApi
+
+class TestApiSchedulerComplete:
+
+    def run_all_tests(self):
+        print("Run ALL API Scheduler Tests")
+
+        try:
+            print("Test Bucket Sizing")
+            self.test_background_fits_at_low_rate()
+            self.test_reserve_kept_at_default_rate()
+
+            print("Test Acquire")
+            self.test_background_acquires_at_low_rate()
+        except Exception as e:
+            print(f"TEST FAILED: {e}")
+            raise
+
+    def test_background_fits_at_low_rate(self):
+        for requests_per_minute in (1, 10, 30, 37):
+            api = RateLimitedApi("embedding", requests_per_minute)
+            assert api.capacity >= api.reserve + 1, \
+                f"Background can never acquire at {requests_per_minute} rpm"
+            assert api.reserve > 0, "Reserve should not be dropped for small buckets"
+        print("Bucket holds a background token above the reserve at low rates")
+
+    def test_reserve_kept_at_default_rate(self):
+        api = RateLimitedApi("embedding", 600)
+        assert api.capacity == 20, f"Expected 20 tokens, got {api.capacity}"
+        assert api.reserve == 4, f"Expected a reserve of 4, got {api.reserve}"
+        print("Default bucket sizing unchanged")
+
+    def test_background_acquires_at_low_rate(self):
+        api = RateLimitedApi("embedding", 30)
+        done = threading.Event()
+
+        def acquire():
+            api.acquire(BACKGROUND)
+            done.set()
+
+        thread = threading.Thread(target=acquire, daemon=True)
+        thread.start()
+        assert done.wait(timeout=1.0), "Background acquire blocked on a full bucket at 30 rpm"
+        print("Background acquires from a full bucket at 30 rpm")
+
+if __name__ == "__main__":
+    tester = TestApiSchedulerComplete()
+    tester.run_all_tests()
@@ -31,6 +31,7 @@ class TestConversationFunctionsComplete:
             self.test_get_conversations_by_pipeline()
             self.test_get_general_conversations_for_user()
             self.test_get_recent_conversations()
+            self.test_get_recent_conversations_per_pipeline()
 
             print("Test All Update Functions")
             self.test_update_conversation_timestamp()
@@ -186,6 +187,20 @@ class TestConversationFunctionsComplete:
         assert invalid == [], "Should return empty for invalid user"
         print("Correctly handles invalid user ID")
 
+    def test_get_recent_conversations_per_pipeline(self):
+        user_id = self.test_user_ids[0]
+
+        recent = conversationFunctions.get_recent_conversations_per_pipeline(self.db, user_id, per_pipeline=1)
+        pipeline_ids = [conversation['pipeline_id'] for conversation in recent]
+        assert len(pipeline_ids) == len(set(pipeline_ids)), "Should return at most one conversation per pipeline"
+        assert all(conversation['user_id'] == user_id for conversation in recent), "Should only return the user's conversations"
+        assert all('first_message_content' in conversation for conversation in recent), "Missing first_message_content"
+        print(f"Retrieved {len(recent)} recent conversations across pipelines")
+
+        invalid = conversationFunctions.get_recent_conversations_per_pipeline(self.db, 99999)
+        assert invalid == [], "Should return empty for invalid user"
+        print("Correctly handles invalid user ID")
+
     def test_update_conversation_timestamp(self):
         conversation_id = self.test_conversation_ids[0]
         
@@ -3,7 +3,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import localSession
-from app.crudFunctions import userFunctions, documentFunctions
+from app.crudFunctions import userFunctions, documentFunctions, pipelineFunctions, pipelineStatsFunctions
 import random
 
 def get_db():
@@ -38,6 +38,9 @@ class TestDocumentFunctionsComplete:
             self.test_get_chunks_by_document()
             self.test_get_chunks_by_document_and_user()
             self.test_get_chunks_from_list()
+            self.test_insert_documents_with_stored_procedure()
+            self.test_get_chunks_page()
+            self.test_replace_document_chunks()
 
             self.test_delete_document_by_id()
 
@@ -337,6 +340,119 @@ class TestDocumentFunctionsComplete:
         assert invalid == [] or invalid is None, "Invalid IDs should return empty"
         print("Correctly handles empty and invalid inputs")
 
+    def test_insert_documents_with_stored_procedure(self):
+
+        user_id = self.test_user_ids[0]
+        pipeline_id = pipelineFunctions.get_general_pipeline_id(self.db, user_id)
+        assert pipeline_id is not None, "Test user should have a general pipeline"
+
+        documents = [
+            {
+                "file_name": f"Bulk_{i}.pdf",
+                "file_type": "pdf",
+                "file_size": 1000 * (i + 1),
+                "page_count": i + 1,
+                "word_count": 100 * (i + 1),
+                "firebase_storage_path": f"users/{user_id}/documents/bulk_{i}.pdf",
+                "checksum": f"bulk_checksum_{i}_{random.randint(1000,9999)}",
+                "mime_type": "application/pdf",
+                "chunks": [f"Bulk document {i}, chunk {j}." for j in range(i + 2)],
+            }
+            for i in range(3)
+        ]
+
+        results = documentFunctions.insert_documents_with_stored_procedure(
+            self.db,
+            user_id=user_id,
+            pipeline_id=pipeline_id,
+            documents=documents
+        )
+        assert len(results) == 3, "There should be one result per document"
+
+        for document, result in zip(documents, results):
+            assert result['error'] is None, f"Insert failed: {result['error']}"
+            document_id = result['document_id']
+            self.test_document_ids.append(document_id)
+
+            inserted = documentFunctions.get_document_by_document_id(self.db, document_id)
+            assert inserted is not None, f"Document {document_id} was not inserted"
+            assert inserted['file_name'] == document['file_name'], "The file name is mismatched"
+
+            chunks = documentFunctions.get_chunks_by_document(self.db, document_id)
+            assert len(chunks) == len(document['chunks']), \
+                f"Expected {len(document['chunks'])} chunks for document {document_id}, got {len(chunks)}"
+        print(f"Inserted {len(results)} documents through the stored procedure in one call")
+
+    def test_get_chunks_page(self):
+
+        user_ids = self.test_user_ids[:2]
+        expected = documentFunctions.count_chunks(self.db, user_ids=user_ids)
+        assert expected >= 17, f"Expected at least the 17 setup chunks of the first two users, got {expected}"
+
+        seen = []
+        after_chunk_id = 0
+        while True:
+            page = documentFunctions.get_chunks_page(self.db, 4, after_chunk_id, user_ids=user_ids)
+            if not page:
+                break
+            assert len(page) <= 4, "A page should never exceed the limit"
+            assert all(row['user_id'] in user_ids for row in page), "The page includes another user's chunks"
+            seen.extend(row['chunk_id'] for row in page)
+            after_chunk_id = page[-1]['chunk_id']
+
+        assert seen == sorted(seen), "Chunks should come back in chunk_id order"
+        assert len(seen) == len(set(seen)) == expected, f"Walked {len(seen)} chunks, expected {expected}"
+        assert documentFunctions.count_chunks(self.db, after_chunk_id, user_ids=user_ids) == 0, \
+            "Nothing should be left after the last page"
+        print(f"Walked {len(seen)} chunks in keyset pages of 4")
+
+    def test_replace_document_chunks(self):
+
+        document_id = self.test_document_ids[2]
+        old_chunks = documentFunctions.get_chunks_by_document(self.db, document_id)
+        assert len(old_chunks) == 5, f"Research_Paper.pdf should start with 5 chunks, found {len(old_chunks)}"
+        by_index = {chunk['chunk_index']: chunk for chunk in old_chunks}
+
+        # New version: chunks 2 and 0 swap places, 1 and 3 are gone, 4 moves up and one chunk is new
+        changes = documentFunctions.replace_document_chunks(
+            self.db,
+            document_id=document_id,
+            removed_chunk_ids=[by_index[1]['chunk_id'], by_index[3]['chunk_id']],
+            moved_chunks=[
+                {'chunk_id': by_index[2]['chunk_id'], 'chunk_index': 0},
+                {'chunk_id': by_index[0]['chunk_id'], 'chunk_index': 2},
+                {'chunk_id': by_index[4]['chunk_id'], 'chunk_index': 3},
+            ],
+            added_chunks=[{'chunk_text': "A paragraph added in the new version.", 'chunk_index': 1}],
+            file_name="Research_Paper_v2.pdf",
+            file_size=123456,
+            page_count=12,
+            word_count=2000,
+            checksum=f"checksum_v2_{random.randint(1000,9999)}",
+            mime_type="application/pdf"
+        )
+        assert changes == {'removed': 2, 'moved': 3, 'added': 1}, f"Unexpected changes {changes}"
+
+        new_chunks = documentFunctions.get_chunks_by_document(self.db, document_id)
+        new_by_index = {chunk['chunk_index']: chunk for chunk in new_chunks}
+        assert sorted(new_by_index) == [0, 1, 2, 3], f"Chunks should be indexed 0-3, got {sorted(new_by_index)}"
+        assert new_by_index[0]['chunk_id'] == by_index[2]['chunk_id'], "Chunk 2 should keep its row at index 0"
+        assert new_by_index[2]['chunk_id'] == by_index[0]['chunk_id'], "Chunk 0 should keep its row at index 2"
+        assert new_by_index[3]['chunk_id'] == by_index[4]['chunk_id'], "Chunk 4 should keep its row at index 3"
+        assert new_by_index[1]['chunk_text'] == "A paragraph added in the new version.", "The new chunk is missing"
+
+        document = documentFunctions.get_document_by_document_id(self.db, document_id)
+        metadata = documentFunctions.get_document_metadata_by_document_id(self.db, document_id)
+        assert document['file_name'] == "Research_Paper_v2.pdf", "The file name was not updated"
+        assert metadata['word_count'] == 2000 and metadata['page_count'] == 12, "The metadata was not updated"
+        print(f"Replaced document {document_id} in place: {changes}")
+
+        pipeline_id = pipelineFunctions.get_general_pipeline_id(self.db, self.test_user_ids[1])
+        drift = [entry for entry in pipelineStatsFunctions.find_pipeline_stats_drift(self.db)
+                 if entry['pipeline_id'] == pipeline_id]
+        assert not drift, f"Pipeline_Stats drifted from the base tables: {drift}"
+        print("Pipeline_Stats matches the base tables after the replacement")
+
     def test_delete_document_by_id(self):
 
         user_id = self.test_user_ids[0]
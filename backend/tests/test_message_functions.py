@@ -34,6 +34,7 @@ class TestMessageFunctionsComplete:
             self.test_get_message_by_id()
             self.test_get_recent_messages()
             self.test_get_last_message_in_conversation()
+            self.test_get_messages_page()
 
         except Exception as e:
             print(f"TEST FAILED: {e}")
@@ -319,6 +320,41 @@ class TestMessageFunctionsComplete:
         assert invalid_last is None, "Should return None for invalid conversation"
         print("Correctly handles invalid conversation ID")
 
+    def test_get_messages_page(self):
+        conversation_id = self.test_conversation_ids[0]
+
+        all_messages = messageFunctions.get_all_messages_in_conversation(
+            self.db,
+            conversation_id
+        )
+
+        paged_ids = []
+        after_timestamp, after_message_id = None, None
+        while True:
+            rows = messageFunctions.get_messages_page(
+                self.db,
+                conversation_id,
+                limit=2,
+                after_timestamp=after_timestamp,
+                after_message_id=after_message_id
+            )
+            assert len(rows) <= 3, "Page query should fetch at most limit + 1 rows"
+            page = rows[:2]
+            paged_ids.extend(message['message_id'] for message in page)
+            if len(rows) <= 2:
+                break
+            after_timestamp, after_message_id = page[-1]['timestamp'], page[-1]['message_id']
+
+        expected_ids = [message['message_id'] for message in sorted(
+            all_messages, key=lambda m: (m['timestamp'], m['message_id'])
+        )]
+        assert paged_ids == expected_ids, "Paging through the conversation skipped or repeated messages"
+        print(f"Paged through {len(paged_ids)} messages in conversation {conversation_id} two at a time")
+
+        empty_page = messageFunctions.get_messages_page(self.db, 99999, limit=2)
+        assert empty_page == [], "Should return empty for invalid conversation"
+        print("Correctly handles invalid conversation ID")
+
     def cleanup(self):
         print("Cleaning up test data...")
         
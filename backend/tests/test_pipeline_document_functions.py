@@ -3,7 +3,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import localSession
-from app.crudFunctions import userFunctions, documentFunctions, pipelineFunctions, pipelineDocumentFunctions
+from app.crudFunctions import userFunctions, documentFunctions, pipelineFunctions, pipelineDocumentFunctions, pipelineStatsFunctions
 import random
 
 def get_db():
@@ -33,6 +33,7 @@ class TestPipelineDocumentFunctionsComplete:
             self.test_get_documents_in_pipeline()
             self.test_get_active_documents_in_pipeline()
             self.test_toggle_document_active_status()
+            self.test_pipeline_stats_follow_document_changes()
             self.test_remove_document_from_pipeline()
             self.test_remove_all_documents_from_pipeline()
         except Exception as e:
@@ -268,6 +269,28 @@ class TestPipelineDocumentFunctionsComplete:
         assert result['is_active'] == True, "Document should be active"
         print(f"Toggled document {document_id} back to active")
 
+    def test_pipeline_stats_follow_document_changes(self):
+        pipeline_id = self.test_pipeline_ids[1]
+        document_id = self.test_document_ids[5]
+
+        stats_before = pipelineFunctions.get_pipeline_stats(self.db, pipeline_id)
+        assert stats_before is not None, f"Pipeline {pipeline_id} should have a Pipeline_Stats row"
+
+        pipelineDocumentFunctions.toggle_document_active_status(self.db, pipeline_id, document_id, False)
+        stats_after = pipelineFunctions.get_pipeline_stats(self.db, pipeline_id)
+
+        assert stats_after['total_documents'] == stats_before['total_documents'], "Deactivating should not change the total"
+        assert stats_after['active_documents'] == stats_before['active_documents'] - 1, "Active count should drop by 1"
+        assert stats_after['inactive_documents'] == stats_before['inactive_documents'] + 1, "Inactive count should grow by 1"
+        print(f"Pipeline_Stats followed deactivating document {document_id}")
+
+        pipelineDocumentFunctions.toggle_document_active_status(self.db, pipeline_id, document_id, True)
+
+        drift = [entry for entry in pipelineStatsFunctions.find_pipeline_stats_drift(self.db)
+                 if entry['pipeline_id'] in self.test_pipeline_ids]
+        assert not drift, f"Pipeline_Stats drifted from the base tables: {drift}"
+        print("Pipeline_Stats matches the base tables")
+
     def test_remove_document_from_pipeline(self):
         pipeline_id = self.test_pipeline_ids[1]
         document_id = self.test_document_ids[4]
@@ -4,6 +4,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import localSession
 from app.crudFunctions import userFunctions, pipelineFunctions
+from app.services.dimensionality import FULL_EMBEDDING_DIMENSIONS, SUPPORTED_EMBEDDING_DIMENSIONS
 import random
 
 def get_db():
@@ -29,9 +30,11 @@ class TestPipelineFunctionsComplete:
             self.test_get_pipelines_by_user_id()
             self.test_get_all_pipelines()
             self.test_get_general_pipeline_id()
+            self.test_get_pipeline_embedding_dimensions()
 
             print("Test All Update Functions")
             self.test_update_pipeline()
+            self.test_cached_pipeline_is_invalidated_on_update()
         except Exception as e:
             print(f"TEST FAILED: {e}")
             raise
@@ -148,6 +151,36 @@ class TestPipelineFunctionsComplete:
             "Should return None for invalid user ID"
         print("Correctly returns None for invalid user ID")
 
+    def test_get_pipeline_embedding_dimensions(self):
+        pipeline_id = self.test_pipelines[0]
+        user_id = self.test_user_ids[0]
+
+        dimensions = pipelineFunctions.get_pipeline_embedding_dimensions(self.db, pipeline_id)
+        assert dimensions in SUPPORTED_EMBEDDING_DIMENSIONS, f"Unexpected embedding dimensionality {dimensions}"
+        print(f"Pipeline {pipeline_id} uses {dimensions}-dimension embeddings")
+
+        reduced_pipeline = pipelineFunctions.create_pipeline(
+            self.db,
+            user_id=user_id,
+            pipeline_name="Reduced Dimensions",
+            description="Pipeline with 256-dimension embeddings",
+            embedding_dimensions=256
+        )
+        self.test_pipelines.append(reduced_pipeline['pipeline_id'])
+
+        assert pipelineFunctions.get_pipeline_embedding_dimensions(self.db, reduced_pipeline['pipeline_id']) == 256, \
+            "Pipeline should keep the dimensionality it was created with"
+        print("Successfully created a pipeline with 256-dimension embeddings")
+
+        assert pipelineFunctions.get_pipeline_embedding_dimensions(self.db, None) == FULL_EMBEDDING_DIMENSIONS, \
+            "Conversations without a pipeline should use full-size embeddings"
+
+        try:
+            pipelineFunctions.create_pipeline(self.db, user_id, "Bad Dimensions", "Unsupported size", embedding_dimensions=100)
+            assert False, "Should reject unsupported embedding dimensionality"
+        except ValueError:
+            print("Correctly rejects unsupported embedding dimensionality")
+
     def test_update_pipeline(self):
         ## to update tha pipeline i need
         pipeline_id = self.test_pipelines[3]
@@ -185,6 +218,19 @@ class TestPipelineFunctionsComplete:
         assert updated['description'] == "last change description", "Failed to update all fields"
         print("Successfully updated all fields at once")
 
+    def test_cached_pipeline_is_invalidated_on_update(self):
+        pipeline_id = self.test_pipelines[4]
+
+        first_read = pipelineFunctions.get_pipeline_by_id(self.db, pipeline_id, include_tags=False)
+        first_read['pipeline_name'] = "modified by caller"
+        second_read = pipelineFunctions.get_pipeline_by_id(self.db, pipeline_id, include_tags=False)
+        assert second_read['pipeline_name'] == "Research", "Changes to a returned pipeline should not reach the cache"
+        print("Cached pipeline is copied on every read")
+
+        pipelineFunctions.update_pipeline(self.db, pipeline_id, pipeline_name="Research (renamed)")
+        after_update = pipelineFunctions.get_pipeline_by_id(self.db, pipeline_id, include_tags=False)
+        assert after_update['pipeline_name'] == "Research (renamed)", "Update should invalidate the cached pipeline"
+        print("Successfully invalidated the cached pipeline on update")
 
     def cleanup(self):
         print("Cleaning up test pipeline data and user data...")
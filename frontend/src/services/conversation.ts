@@ -1,34 +1,43 @@
 import axios from "axios";
 import type { MySQLConversation, MySQLMessage } from "../types";
 
+// The API returns these lists a page at a time and sends X-Next-Cursor while there are more
+const PAGE_SIZE = 200;
+
+async function getAllPages<T>(token: string, url: string): Promise<T[]> {
+    const items: T[] = [];
+    let cursor: string | undefined;
+    do {
+      const response = await axios.get(url, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+        params: { limit: PAGE_SIZE, cursor },
+      });
+      items.push(...response.data);
+      cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+    return items;
+  }
+
 export async function getConversations(
     token: string, 
     pipeline_id: number
   ): Promise<MySQLConversation[]> {
-    const response = await axios.get(
-      `http://localhost:8000/api/conversation/pipeline/${pipeline_id}/conversations`,
-      {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      }
+    return getAllPages<MySQLConversation>(
+      token,
+      `http://localhost:8000/api/conversation/pipeline/${pipeline_id}/conversations`
     );
-    return response.data;
   }
   
   export async function getMessagesForConversation(
     token: string, 
     conversation_id: number
   ): Promise<MySQLMessage[]> {
-    const response = await axios.get(
-      `http://localhost:8000/api/conversation/conversation/${conversation_id}/messages`,
-      {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      }
+    return getAllPages<MySQLMessage>(
+      token,
+      `http://localhost:8000/api/conversation/conversation/${conversation_id}/messages`
     );
-    return response.data;
   }
 
   export async function deleteConversation(
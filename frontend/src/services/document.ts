@@ -6,15 +6,23 @@ import { getAuth } from 'firebase/auth'
 
 export async function getPipelineDocuments(token: string, pipeline_id: number): Promise<PipelineDocument[]> {
     try {
-      const response = await axios.get(
-        `http://localhost:8000/api/pipeline/${pipeline_id}/documents`,
-        {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        }
-      );
-      return response.data.documents || [];
+      // Returned a page at a time; next_cursor is set while there are more
+      const documents: PipelineDocument[] = [];
+      let cursor: string | undefined;
+      do {
+        const response = await axios.get(
+          `http://localhost:8000/api/pipeline/${pipeline_id}/documents`,
+          {
+            headers: {
+              Authorization: `Bearer ${token}`,
+            },
+            params: { limit: 200, cursor },
+          }
+        );
+        documents.push(...(response.data.documents || []));
+        cursor = response.data.next_cursor || undefined;
+      } while (cursor);
+      return documents;
     } catch (error) {
       console.error("Error fetching documents:", error);
       return [];